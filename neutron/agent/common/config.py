@@ -29,6 +29,14 @@ LOG = logging.getLogger(__name__)
 ROOT_HELPER_OPTS = [
     cfg.StrOpt('root_helper', default='sudo',
                help=_('Root helper application.')),
+    cfg.StrOpt('root_helper_daemon',
+               help=_('Root helper daemon application, e.g. "sudo '
+                      'neutron-rootwrap-daemon /etc/neutron/rootwrap.conf". '
+                      'Commands run as root are sent to it rather than to '
+                      'a new root helper process.')),
+    cfg.IntOpt('root_helper_daemon_pool_size', default=4,
+               help=_('Maximum number of root helper daemons started, each '
+                      'running one command at a time.')),
 ]
 
 AGENT_STATE_OPTS = [
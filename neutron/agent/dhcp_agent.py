@@ -15,9 +15,14 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import heapq
+import itertools
 import os
+import time
 
 import eventlet
+from eventlet import queue
 import netaddr
 from oslo.config import cfg
 
@@ -25,6 +30,7 @@ from neutron.agent.common import config
 from neutron.agent.linux import dhcp
 from neutron.agent.linux import external_process
 from neutron.agent.linux import interface
+from neutron.agent.linux import ip_lib
 from neutron.agent import rpc as agent_rpc
 from neutron.common import constants
 from neutron.common import legacy
@@ -41,6 +47,132 @@ from neutron import service as neutron_service
 
 LOG = logging.getLogger(__name__)
 
+REFRESH_NETWORK = 'refresh'
+DISABLE_NETWORK = 'disable'
+RELOAD_ALLOCATIONS = 'reload'
+# Latencies of the network updates kept between two state reports
+MAX_LATENCIES = 1000
+
+
+class NetworkUpdate(object):
+    """A pending change of a network.
+
+    REFRESH_NETWORK fetches the network from the plugin to enable,
+    refresh or disable DHCP for it, DISABLE_NETWORK disables DHCP for it
+    and RELOAD_ALLOCATIONS reloads its allocations from the cache.  The
+    leases of releases, (mac_address, removed_ips) pairs, are released
+    once the network is refreshed or reloaded.  The port_events, (port,
+    deleted) pairs, already applied to the cache are applied again before
+    reloading, a refresh running meanwhile may have replaced the network
+    in the cache by one fetched before them.
+    """
+
+    def __init__(self, network_id, action, releases=None, timestamp=None,
+                 port_events=None):
+        self.id = network_id
+        self.action = action
+        self.releases = list(releases or [])
+        self.port_events = list(port_events or [])
+        self.timestamp = timestamp or time.time()
+
+    def merge(self, pending):
+        """Fold the pending update of the same network into this one."""
+        self.timestamp = pending.timestamp
+        if self.action == RELOAD_ALLOCATIONS:
+            self.action = pending.action
+        if self.action == DISABLE_NETWORK:
+            self.releases = []
+            self.port_events = []
+        else:
+            self.releases = pending.releases + self.releases
+            self.port_events = pending.port_events + self.port_events
+
+
+class NetworkUpdateQueue(object):
+    """Queue of the pending network updates, at most one per network.
+
+    A new update of a network is merged into its pending one.  Updates
+    are handed out delay seconds after the first of the updates they
+    merge was added, and a network is not handed out again before the
+    processing of its previous update is done.
+    """
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self._pending = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._in_progress = set()
+        self._wakeup = queue.LightQueue()
+        self._latencies = collections.deque(maxlen=MAX_LATENCIES)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, update):
+        pending = self._pending.get(update.id)
+        if pending:
+            update.merge(pending)
+        self._pending[update.id] = update
+        if update.id not in self._in_progress:
+            self._push(update)
+
+    def _push(self, update):
+        heapq.heappush(self._heap, (update.timestamp + self.delay,
+                                    next(self._counter), update))
+        self._wakeup.put(None)
+
+    def _pop(self):
+        """Return the next ready update, or the seconds until one is."""
+        while self._heap:
+            ready_time, count, update = self._heap[0]
+            # Skip the updates which were replaced since they were pushed
+            if self._pending.get(update.id) is not update:
+                heapq.heappop(self._heap)
+                continue
+            wait = ready_time - time.time()
+            if wait > 0:
+                return None, wait
+            heapq.heappop(self._heap)
+            del self._pending[update.id]
+            self._in_progress.add(update.id)
+            return update, None
+        return None, None
+
+    def get(self):
+        """Return the next update to process, waiting for one."""
+        update, wait = self._pop()
+        while update is None:
+            try:
+                self._wakeup.get(timeout=wait)
+            except queue.Empty:
+                pass
+            update, wait = self._pop()
+        return update
+
+    def done(self, update):
+        """Mark the processing of update as done."""
+        self._in_progress.discard(update.id)
+        self._latencies.append(time.time() - update.timestamp)
+        pending = self._pending.get(update.id)
+        if pending:
+            self._push(pending)
+
+    def get_state(self):
+        """Return the queue depth and the update latencies.
+
+        The latencies, from the first event of an update to the end of its
+        processing, are the ones of the last MAX_LATENCIES updates done
+        since the last call.
+        """
+        latencies = list(self._latencies)
+        self._latencies.clear()
+        return {'update_queue_depth': len(self._pending),
+                'update_queue_in_progress': len(self._in_progress),
+                'update_latency_avg': round(
+                    sum(latencies) / len(latencies), 3) if latencies else 0,
+                'update_latency_max': round(max(latencies or [0]), 3)}
+
 
 class DhcpAgent(manager.Manager):
     OPTS = [
@@ -59,6 +191,11 @@ class DhcpAgent(manager.Manager):
                            "enable_isolated_metadata = True")),
         cfg.IntOpt('num_sync_threads', default=4,
                    help=_('Number of threads to use during sync process.')),
+        cfg.FloatOpt('network_update_delay', default=0.5,
+                     help=_('Seconds to wait after a network, subnet or '
+                            'port event before updating the DHCP server of '
+                            'its network, so that the events arriving '
+                            'meanwhile are applied by a single update.')),
         cfg.StrOpt('metadata_proxy_socket',
                    default='$state_path/metadata_proxy',
                    help=_('Location of Metadata Proxy UNIX domain '
@@ -70,6 +207,7 @@ class DhcpAgent(manager.Manager):
         self.needs_resync = False
         self.conf = cfg.CONF
         self.cache = NetworkCache()
+        self.update_queue = NetworkUpdateQueue(self.conf.network_update_delay)
         self.root_helper = config.get_root_helper(self.conf)
         self.dhcp_driver_cls = importutils.import_class(self.conf.dhcp_driver)
         ctx = context.get_admin_context_without_session()
@@ -111,23 +249,28 @@ class DhcpAgent(manager.Manager):
         """Activate the DHCP agent."""
         self.sync_state()
         self.periodic_resync()
+        eventlet.spawn_n(self._process_updates_loop)
+
+    def _get_driver(self, network):
+        # the Driver expects something that is duck typed similar to
+        # the base models.
+        return self.dhcp_driver_cls(self.conf,
+                                    network,
+                                    self.root_helper,
+                                    self.dhcp_version,
+                                    self.plugin_rpc)
 
     def call_driver(self, action, network, **action_kwargs):
         """Invoke an action on a DHCP driver instance."""
         try:
-            # the Driver expects something that is duck typed similar to
-            # the base models.
-            driver = self.dhcp_driver_cls(self.conf,
-                                          network,
-                                          self.root_helper,
-                                          self.dhcp_version,
-                                          self.plugin_rpc)
-
+            driver = self._get_driver(network)
             getattr(driver, action)(**action_kwargs)
             return True
 
         except Exception:
             self.needs_resync = True
+            # Fetch the whole network again on the next sync
+            network.revision = None
             LOG.exception(_('Unable to %s dhcp.'), action)
 
     def sync_state(self):
@@ -137,7 +280,8 @@ class DhcpAgent(manager.Manager):
         known_network_ids = set(self.cache.get_network_ids())
 
         try:
-            active_networks = self.plugin_rpc.get_active_networks_info()
+            active_networks = self.plugin_rpc.get_active_networks_info(
+                network_revisions=self.cache.get_network_revisions())
             active_network_ids = set(network.id for network in active_networks)
             for deleted_id in known_network_ids - active_network_ids:
                 try:
@@ -148,12 +292,28 @@ class DhcpAgent(manager.Manager):
                                     'network %s'), deleted_id)
 
             for network in active_networks:
-                pool.spawn_n(self.configure_dhcp_for_network, network)
+                if hasattr(network, 'subnets'):
+                    pool.spawn_n(self.configure_dhcp_for_network, network)
+                else:
+                    # The network did not change since it was cached
+                    pool.spawn_n(self._check_dhcp_for_network, network.id)
 
         except Exception:
             self.needs_resync = True
             LOG.exception(_('Unable to sync network state.'))
 
+    def _check_dhcp_for_network(self, network_id):
+        """Configure DHCP again for a cached network if it is not active."""
+        network = self.cache.get_network_by_id(network_id)
+        if not network:
+            return
+        try:
+            active = self._get_driver(network).active
+        except Exception:
+            active = False
+        if not active:
+            self.configure_dhcp_for_network(network)
+
     def _periodic_resync_helper(self):
         """Resync the dhcp state at the configured interval."""
         while True:
@@ -227,46 +387,72 @@ class DhcpAgent(manager.Manager):
         else:
             self.disable_dhcp_helper(network.id)
 
-    def release_lease_for_removed_ips(self, prev_port, updated_port, network):
-        """Releases the dhcp lease for ips removed from a port."""
-        if prev_port:
-            previous_ips = set(fixed_ip.ip_address
-                               for fixed_ip in prev_port.fixed_ips)
-            current_ips = set(fixed_ip.ip_address
-                              for fixed_ip in updated_port.fixed_ips)
-            # pass in port with removed ips on it
-            removed_ips = previous_ips - current_ips
-            if removed_ips:
-                self.call_driver('release_lease',
-                                 network,
-                                 mac_address=updated_port.mac_address,
-                                 removed_ips=removed_ips)
+    def _process_update(self, update):
+        try:
+            if update.action == DISABLE_NETWORK:
+                self.disable_dhcp_helper(update.id)
+                return
+            if update.action == REFRESH_NETWORK:
+                self.refresh_dhcp_helper(update.id)
+                network = self.cache.get_network_by_id(update.id)
+            else:
+                network = self.cache.get_network_by_id(update.id)
+                if network:
+                    self._apply_port_events(update.port_events)
+                    self.call_driver('reload_allocations', network)
+            if network:
+                for mac_address, removed_ips in update.releases:
+                    self.call_driver('release_lease',
+                                     network,
+                                     mac_address=mac_address,
+                                     removed_ips=removed_ips)
+        except Exception:
+            self.needs_resync = True
+            LOG.exception(_('Unable to update network %s.'), update.id)
+        finally:
+            self.update_queue.done(update)
+
+    @utils.synchronized('dhcp-agent')
+    def _apply_port_events(self, port_events):
+        for port, deleted in port_events:
+            if deleted:
+                self.cache.remove_port(port)
+            elif self.cache.get_network_by_id(port.network_id):
+                self.cache.put_port(port)
+
+    def _process_updates_loop(self):
+        """Process the network updates, num_sync_threads at a time."""
+        pool = eventlet.GreenPool(self.conf.num_sync_threads)
+        while True:
+            pool.spawn_n(self._process_update, self.update_queue.get())
 
     @utils.synchronized('dhcp-agent')
     def network_create_end(self, context, payload):
         """Handle the network.create.end notification event."""
         network_id = payload['network']['id']
-        self.enable_dhcp_helper(network_id)
+        self.update_queue.add(NetworkUpdate(network_id, REFRESH_NETWORK))
 
     @utils.synchronized('dhcp-agent')
     def network_update_end(self, context, payload):
         """Handle the network.update.end notification event."""
         network_id = payload['network']['id']
         if payload['network']['admin_state_up']:
-            self.enable_dhcp_helper(network_id)
+            action = REFRESH_NETWORK
         else:
-            self.disable_dhcp_helper(network_id)
+            action = DISABLE_NETWORK
+        self.update_queue.add(NetworkUpdate(network_id, action))
 
     @utils.synchronized('dhcp-agent')
     def network_delete_end(self, context, payload):
         """Handle the network.delete.end notification event."""
-        self.disable_dhcp_helper(payload['network_id'])
+        self.update_queue.add(NetworkUpdate(payload['network_id'],
+                                            DISABLE_NETWORK))
 
     @utils.synchronized('dhcp-agent')
     def subnet_update_end(self, context, payload):
         """Handle the subnet.update.end notification event."""
         network_id = payload['subnet']['network_id']
-        self.refresh_dhcp_helper(network_id)
+        self.update_queue.add(NetworkUpdate(network_id, REFRESH_NETWORK))
 
     # Use the update handler for the subnet create event.
     subnet_create_end = subnet_update_end
@@ -277,19 +463,28 @@ class DhcpAgent(manager.Manager):
         subnet_id = payload['subnet_id']
         network = self.cache.get_network_by_subnet_id(subnet_id)
         if network:
-            self.refresh_dhcp_helper(network.id)
+            self.update_queue.add(NetworkUpdate(network.id, REFRESH_NETWORK))
 
     @utils.synchronized('dhcp-agent')
     def port_update_end(self, context, payload):
         """Handle the port.update.end notification event."""
-        updated_port = dhcp.DictModel(payload['port'])
+        updated_port = dhcp.PortModel(payload['port'])
         network = self.cache.get_network_by_id(updated_port.network_id)
         if network:
             prev_port = self.cache.get_port_by_id(updated_port.id)
             self.cache.put_port(updated_port)
-            self.call_driver('reload_allocations', network)
-            self.release_lease_for_removed_ips(prev_port, updated_port,
-                                               network)
+            releases = []
+            if prev_port:
+                removed_ips = (
+                    set(fixed_ip.ip_address
+                        for fixed_ip in prev_port.fixed_ips) -
+                    set(fixed_ip.ip_address
+                        for fixed_ip in updated_port.fixed_ips))
+                if removed_ips:
+                    releases.append((updated_port.mac_address, removed_ips))
+            self.update_queue.add(NetworkUpdate(
+                network.id, RELOAD_ALLOCATIONS, releases,
+                port_events=[(updated_port, False)]))
 
     # Use the update handler for the port create event.
     port_create_end = port_update_end
@@ -301,13 +496,12 @@ class DhcpAgent(manager.Manager):
         if port:
             network = self.cache.get_network_by_id(port.network_id)
             self.cache.remove_port(port)
-            self.call_driver('reload_allocations', network)
             removed_ips = [fixed_ip.ip_address
                            for fixed_ip in port.fixed_ips]
-            self.call_driver('release_lease',
-                             network,
-                             mac_address=port.mac_address,
-                             removed_ips=removed_ips)
+            self.update_queue.add(NetworkUpdate(
+                network.id, RELOAD_ALLOCATIONS,
+                [(port.mac_address, removed_ips)],
+                port_events=[(port, True)]))
 
     def enable_isolated_metadata_proxy(self, network):
 
@@ -371,6 +565,9 @@ class DhcpPluginApi(proxy.RpcProxy):
         1.1 - Added get_active_networks_info, create_dhcp_port,
               and update_dhcp_port methods.
 
+    get_active_networks_info sends the network_revisions argument
+    without a version bump, servers which do not know it ignore it and
+    return every network in full.
     """
 
     BASE_RPC_API_VERSION = '1.1'
@@ -382,12 +579,16 @@ class DhcpPluginApi(proxy.RpcProxy):
         self.host = cfg.CONF.host
         self.use_namespaces = use_namespaces
 
-    def get_active_networks_info(self):
-        """Make a remote process call to retrieve all network info."""
-        networks = self.call(self.context,
-                             self.make_msg('get_active_networks_info',
-                                           host=self.host),
-                             topic=self.topic)
+    def get_active_networks_info(self, network_revisions=None):
+        """Make a remote process call to retrieve all network info.
+
+        The networks of network_revisions, a {network_id: revision} map,
+        which did not change are returned without subnets and ports.
+        """
+        msg = self.make_msg('get_active_networks_info',
+                            host=self.host,
+                            network_revisions=network_revisions)
+        networks = self.call(self.context, msg, topic=self.topic)
         return [dhcp.NetModel(self.use_namespaces, n) for n in networks]
 
     def get_network_info(self, network_id):
@@ -446,11 +647,18 @@ class DhcpPluginApi(proxy.RpcProxy):
 
 
 class NetworkCache(object):
-    """Agent cache of the current network state."""
+    """Agent cache of the current network state.
+
+    Ports are indexed by id, by MAC address and by position in the ports
+    of their network, so that port events on networks with many ports do
+    not scan them all.
+    """
     def __init__(self):
         self.cache = {}
         self.subnet_lookup = {}
         self.port_lookup = {}
+        self.port_positions = {}
+        self.mac_lookup = {}
 
     def get_network_ids(self):
         return self.cache.keys()
@@ -458,6 +666,12 @@ class NetworkCache(object):
     def get_network_by_id(self, network_id):
         return self.cache.get(network_id)
 
+    def get_network_revisions(self):
+        """Return the known revisions of the cached networks by id."""
+        return dict((network_id, network.revision)
+                    for network_id, network in self.cache.iteritems()
+                    if getattr(network, 'revision', None) is not None)
+
     def get_network_by_subnet_id(self, subnet_id):
         return self.cache.get(self.subnet_lookup.get(subnet_id))
 
@@ -473,8 +687,8 @@ class NetworkCache(object):
         for subnet in network.subnets:
             self.subnet_lookup[subnet.id] = network.id
 
-        for port in network.ports:
-            self.port_lookup[port.id] = network.id
+        for index, port in enumerate(network.ports):
+            self._index_port(network.id, port, index)
 
     def remove(self, network):
         del self.cache[network.id]
@@ -484,33 +698,53 @@ class NetworkCache(object):
 
         for port in network.ports:
             del self.port_lookup[port.id]
+            self.port_positions.pop(port.id, None)
+            self._unindex_mac(network.id, port)
+
+    def _index_port(self, network_id, port, index):
+        self.port_lookup[port.id] = network_id
+        self.port_positions[port.id] = index
+        self.mac_lookup[(network_id, port.mac_address)] = port
+
+    def _unindex_mac(self, network_id, port):
+        key = (network_id, port.mac_address)
+        if self.mac_lookup.get(key) is port:
+            del self.mac_lookup[key]
 
     def put_port(self, port):
         network = self.get_network_by_id(port.network_id)
-        for index in range(len(network.ports)):
-            if network.ports[index].id == port.id:
-                network.ports[index] = port
-                break
+        index = self.port_positions.get(port.id)
+        if index is not None:
+            self._unindex_mac(network.id, network.ports[index])
+            network.ports[index] = port
         else:
+            index = len(network.ports)
             network.ports.append(port)
 
-        self.port_lookup[port.id] = network.id
+        self._index_port(network.id, port, index)
 
     def remove_port(self, port):
         network = self.get_network_by_port_id(port.id)
+        if not network:
+            return
 
-        for index in range(len(network.ports)):
-            if network.ports[index] == port:
-                del network.ports[index]
-                del self.port_lookup[port.id]
-                break
+        index = self.port_positions.pop(port.id)
+        removed_port = network.ports[index]
+        # Move the last port in place of the removed one
+        last_port = network.ports.pop()
+        if index < len(network.ports):
+            network.ports[index] = last_port
+            self.port_positions[last_port.id] = index
+        del self.port_lookup[port.id]
+        self._unindex_mac(network.id, removed_port)
 
     def get_port_by_id(self, port_id):
         network = self.get_network_by_port_id(port_id)
         if network:
-            for port in network.ports:
-                if port.id == port_id:
-                    return port
+            return network.ports[self.port_positions[port_id]]
+
+    def get_port_by_mac(self, network_id, mac_address):
+        return self.mac_lookup.get((network_id, mac_address))
 
     def get_state(self):
         net_ids = self.get_network_ids()
@@ -551,6 +785,10 @@ class DhcpAgentWithStateReport(DhcpAgent):
         try:
             self.agent_state.get('configurations').update(
                 self.cache.get_state())
+            # The server ignores the queue statistics when it decides if
+            # the configurations changed, see VOLATILE_CONFIGURATIONS.
+            self.agent_state.get('configurations').update(
+                self.update_queue.get_state())
             ctx = context.get_admin_context_without_session()
             self.state_rpc.report_state(ctx, self.agent_state, self.use_call)
             self.use_call = False
@@ -582,6 +820,7 @@ def register_options():
     config.register_root_helper(cfg.CONF)
     cfg.CONF.register_opts(dhcp.OPTS)
     cfg.CONF.register_opts(interface.OPTS)
+    cfg.CONF.register_opts(ip_lib.OPTS)
 
 
 def main():
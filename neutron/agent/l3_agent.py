@@ -17,7 +17,13 @@
 # @author: Dan Wendlandt, Nicira, Inc
 #
 
+import heapq
+import itertools
+import time
+
 import eventlet
+from eventlet import queue
+from eventlet import semaphore
 import netaddr
 from oslo.config import cfg
 
@@ -35,7 +41,6 @@ from neutron.common import utils as common_utils
 from neutron import context
 from neutron import manager
 from neutron.openstack.common import importutils
-from neutron.openstack.common import lockutils
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import loopingcall
 from neutron.openstack.common import periodic_task
@@ -49,7 +54,10 @@ LOG = logging.getLogger(__name__)
 NS_PREFIX = 'qrouter-'
 INTERNAL_DEV_PREFIX = 'qr-'
 EXTERNAL_DEV_PREFIX = 'qg-'
-RPC_LOOP_INTERVAL = 1
+DELETE_ROUTER = 1
+# Lower priorities are processed first
+PRIORITY_RPC = 0
+PRIORITY_SYNC_ROUTERS_TASK = 1
 
 
 class L3PluginApi(proxy.RpcProxy):
@@ -138,6 +146,110 @@ class RouterInfo(object):
         self._snat_action = None
 
 
+class RouterUpdate(object):
+    """A pending change of a router.
+
+    Updates which don't carry the router fetch it from the plugin when
+    they are processed.
+    """
+
+    def __init__(self, router_id, priority, action=None, router=None,
+                 timestamp=None):
+        self.id = router_id
+        self.priority = priority
+        self.action = action
+        self.router = router
+        self.timestamp = timestamp or time.time()
+
+
+class RouterUpdateQueue(object):
+    """Queue of the pending router updates, at most one per router.
+
+    A new update of a router replaces its pending one and keeps the
+    highest priority of both.  An update older than the latest update
+    added for its router is dropped, e.g. a full sync fetched before the
+    router was deleted.  A router is not handed out again before the
+    processing of its previous update is done.
+
+    The latest update times are only needed while a full sync is running,
+    the updates added otherwise being newer than all the previous ones,
+    so they are forgotten once the router is processed and no sync runs.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._in_progress = set()
+        self._latest = {}
+        self._syncs = 0
+        self._wakeup = queue.LightQueue()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def idle(self):
+        """Return True if no update is pending or being processed."""
+        return not self._pending and not self._in_progress
+
+    def add(self, update):
+        if update.timestamp < self._latest.get(update.id, 0):
+            LOG.debug(_("Dropping outdated update of router %s"), update.id)
+            return
+        self._latest[update.id] = update.timestamp
+        pending = self._pending.get(update.id)
+        if pending:
+            update.priority = min(update.priority, pending.priority)
+        self._pending[update.id] = update
+        if update.id not in self._in_progress:
+            self._push(update)
+
+    def _push(self, update):
+        heapq.heappush(self._heap,
+                       (update.priority, next(self._counter), update))
+        self._wakeup.put(None)
+
+    def _pop(self):
+        while self._heap:
+            update = heapq.heappop(self._heap)[2]
+            # Skip the updates which were replaced since they were pushed
+            if self._pending.get(update.id) is update:
+                del self._pending[update.id]
+                self._in_progress.add(update.id)
+                return update
+
+    def get(self):
+        """Return the next update to process, waiting for one."""
+        update = self._pop()
+        while update is None:
+            self._wakeup.get()
+            update = self._pop()
+        return update
+
+    def done(self, update):
+        """Mark the processing of update as done."""
+        self._in_progress.discard(update.id)
+        pending = self._pending.get(update.id)
+        if pending:
+            self._push(pending)
+        elif not self._syncs:
+            self._latest.pop(update.id, None)
+
+    def start_sync(self):
+        """Return the timestamp of the updates of a full sync starting."""
+        self._syncs += 1
+        return time.time()
+
+    def end_sync(self):
+        """Mark the full sync started last as done."""
+        self._syncs -= 1
+        if not self._syncs:
+            for router_id in list(self._latest):
+                if (router_id not in self._pending and
+                    router_id not in self._in_progress):
+                    del self._latest[router_id]
+
+
 class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
     """Manager for L3NatAgent
 
@@ -184,6 +296,8 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
                    default='$state_path/metadata_proxy',
                    help=_('Location of Metadata Proxy UNIX domain '
                           'socket')),
+        cfg.IntOpt('router_workers', default=8,
+                   help=_("Number of routers processed concurrently.")),
     ]
 
     def __init__(self, host, conf=None):
@@ -210,15 +324,13 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
         self.context = context.get_admin_context_without_session()
         self.plugin_rpc = L3PluginApi(topics.L3PLUGIN, host)
         self.fullsync = True
-        self.updated_routers = set()
-        self.removed_routers = set()
-        self.sync_progress = False
+        self.target_ex_net_id = None
+        self._queue = RouterUpdateQueue()
+        # The routers processed since the queue was last drained
+        self._processed_routers = {}
         if self.conf.use_namespaces:
             self._destroy_router_namespaces(self.conf.router_id)
 
-        self.rpc_loop = loopingcall.FixedIntervalLoopingCall(
-            self._rpc_loop)
-        self.rpc_loop.start(interval=RPC_LOOP_INTERVAL)
         super(L3NATAgent, self).__init__(conf=self.conf)
 
     def _check_config_params(self):
@@ -275,12 +387,16 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
             ip_wrapper = ip_wrapper_root.ensure_namespace(ri.ns_name())
             ip_wrapper.netns.execute(['sysctl', '-w', 'net.ipv4.ip_forward=1'])
 
-    def _fetch_external_net_id(self):
+    def _fetch_external_net_id(self, force=False):
         """Find UUID of single external network for this agent."""
         if self.conf.gateway_external_network_id:
             return self.conf.gateway_external_network_id
+        if self.target_ex_net_id and not force:
+            return self.target_ex_net_id
         try:
-            return self.plugin_rpc.get_external_network_id(self.context)
+            self.target_ex_net_id = self.plugin_rpc.get_external_network_id(
+                self.context)
+            return self.target_ex_net_id
         except rpc_common.RemoteError as e:
             if e.exc_type == 'TooManyExternalNetworks':
                 msg = _(
@@ -638,7 +754,8 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
     def router_deleted(self, context, router_id):
         """Deal with router deletion RPC message."""
         LOG.debug(_('Got router deleted notification for %s'), router_id)
-        self.removed_routers.add(router_id)
+        self._queue.add(RouterUpdate(router_id, PRIORITY_RPC,
+                                     action=DELETE_ROUTER))
 
     def routers_updated(self, context, routers):
         """Deal with routers modification and creation RPC message."""
@@ -647,17 +764,19 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
             # This is needed for backward compatiblity
             if isinstance(routers[0], dict):
                 routers = [router['id'] for router in routers]
-            self.updated_routers.update(routers)
+            for router_id in routers:
+                self._queue.add(RouterUpdate(router_id, PRIORITY_RPC))
 
     def router_removed_from_agent(self, context, payload):
         LOG.debug(_('Got router removed from agent :%r'), payload)
-        self.removed_routers.add(payload['router_id'])
+        self._queue.add(RouterUpdate(payload['router_id'], PRIORITY_RPC,
+                                     action=DELETE_ROUTER))
 
     def router_added_to_agent(self, context, payload):
         LOG.debug(_('Got router added to agent :%r'), payload)
         self.routers_updated(context, payload)
 
-    def _process_routers(self, routers, all_routers=False):
+    def _process_routers(self, routers):
         pool = eventlet.GreenPool()
         if (self.conf.external_network_bridge and
             not ip_lib.device_exists(self.conf.external_network_bridge)):
@@ -666,16 +785,11 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
             return
 
         target_ex_net_id = self._fetch_external_net_id()
-        # if routers are all the routers we have (They are from router sync on
-        # starting or when error occurs during running), we seek the
-        # routers which should be removed.
-        # If routers are from server side notification, we seek them
-        # from subset of incoming routers and ones we have now.
-        if all_routers:
-            prev_router_ids = set(self.router_info)
-        else:
-            prev_router_ids = set(self.router_info) & set(
-                [router['id'] for router in routers])
+        refreshed = False
+        # The stale routers are removed by the full sync, only the
+        # incoming routers which must not be hosted anymore are removed.
+        prev_router_ids = set(self.router_info) & set(
+            [router['id'] for router in routers])
         cur_router_ids = set()
         for r in routers:
             if not r['admin_state_up']:
@@ -689,6 +803,11 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
             ex_net_id = (r['external_gateway_info'] or {}).get('network_id')
             if not ex_net_id and not self.conf.handle_internal_only_routers:
                 continue
+            if ex_net_id and ex_net_id != target_ex_net_id and not refreshed:
+                # The external network may have been replaced since the
+                # cached id was fetched
+                target_ex_net_id = self._fetch_external_net_id(force=True)
+                refreshed = True
             if ex_net_id and ex_net_id != target_ex_net_id:
                 continue
             cur_router_ids.add(r['id'])
@@ -702,39 +821,69 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
             pool.spawn_n(self._router_removed, router_id)
         pool.waitall()
 
-    @lockutils.synchronized('l3-agent', 'neutron-')
-    def _rpc_loop(self):
-        # _rpc_loop and _sync_routers_task will not be
-        # executed in the same time because of lock.
-        # so we can clear the value of updated_routers
-        # and removed_routers
+    def _process_router_update(self, update):
         try:
-            LOG.debug(_("Starting RPC loop for %d updated routers"),
-                      len(self.updated_routers))
-            if self.updated_routers:
-                router_ids = list(self.updated_routers)
-                self.updated_routers.clear()
-                routers = self.plugin_rpc.get_routers(
-                    self.context, router_ids)
+            if update.action == DELETE_ROUTER:
+                self._router_removed(update.id)
+                return
+            if update.router:
+                routers = [update.router]
+            else:
+                routers = self.plugin_rpc.get_routers(self.context,
+                                                      [update.id])
+            if routers:
                 self._process_routers(routers)
-            self._process_router_delete()
-            LOG.debug(_("RPC loop successfully completed"))
+                for router in routers:
+                    self._processed_routers[router['id']] = router
+            elif update.id in self.router_info:
+                # The router was deleted or moved to another agent
+                self._router_removed(update.id)
         except Exception:
-            LOG.exception(_("Failed synchronizing routers"))
+            LOG.exception(_("Failed processing router %s"), update.id)
+            self.fullsync = True
+        finally:
+            self._queue.done(update)
+            if self._queue.idle() and self._processed_routers:
+                self._queue_drained()
+
+    def _queue_drained(self):
+        routers = self._processed_routers.values()
+        self._processed_routers = {}
+        try:
+            self._routers_processed(routers)
+        except Exception:
+            LOG.exception(_("Failed handling the processed routers"))
             self.fullsync = True
 
-    def _process_router_delete(self):
-        current_removed_routers = list(self.removed_routers)
-        for router_id in current_removed_routers:
-            self._router_removed(router_id)
-            self.removed_routers.remove(router_id)
+    def _routers_processed(self, routers):
+        """Called with the routers processed once the queue is drained.
+
+        A full sync or a burst of notifications results in a single call,
+        for the subclasses to act once on all the routers updated.
+        """
+        pass
+
+    def _process_routers_loop(self):
+        workers = semaphore.Semaphore(self.conf.router_workers)
+
+        def process(update):
+            try:
+                self._process_router_update(update)
+            finally:
+                workers.release()
+
+        while True:
+            # The next update is only taken once a worker is free,
+            # meanwhile new updates are coalesced with the pending ones
+            # and the higher priority ones overtake them.
+            workers.acquire()
+            eventlet.spawn_n(process, self._queue.get())
 
     def _router_ids(self):
         if not self.conf.use_namespaces:
             return [self.conf.router_id]
 
     @periodic_task.periodic_task
-    @lockutils.synchronized('l3-agent', 'neutron-')
     def _sync_routers_task(self, context):
         if self.services_sync:
             super(L3NATAgent, self).process_services_sync(context)
@@ -742,22 +891,36 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
                   self.fullsync)
         if not self.fullsync:
             return
+        # Notifications received while the routers are fetched are newer
+        timestamp = self._queue.start_sync()
         try:
             router_ids = self._router_ids()
-            self.updated_routers.clear()
-            self.removed_routers.clear()
             routers = self.plugin_rpc.get_routers(
                 context, router_ids)
-
-            LOG.debug(_('Processing :%r'), routers)
-            self._process_routers(routers, all_routers=True)
+            self._fetch_external_net_id(force=True)
+
+            LOG.debug(_('Queueing :%r'), routers)
+            for r in routers:
+                self._queue.add(RouterUpdate(r['id'],
+                                             PRIORITY_SYNC_ROUTERS_TASK,
+                                             router=r, timestamp=timestamp))
+            # identify and remove routers that no longer exist
+            stale_ids = set(self.router_info) - set(r['id'] for r in routers)
+            for router_id in stale_ids:
+                self._queue.add(RouterUpdate(router_id,
+                                             PRIORITY_SYNC_ROUTERS_TASK,
+                                             action=DELETE_ROUTER,
+                                             timestamp=timestamp))
             self.fullsync = False
             LOG.debug(_("_sync_routers_task successfully completed"))
         except Exception:
             LOG.exception(_("Failed synchronizing routers"))
             self.fullsync = True
+        finally:
+            self._queue.end_sync()
 
     def after_start(self):
+        eventlet.spawn_n(self._process_routers_loop)
         LOG.info(_("L3 agent started"))
 
     def _update_routing_table(self, ri, operation, route):
@@ -866,6 +1029,7 @@ def main(manager='neutron.agent.l3_agent.L3NATAgentWithStateReport'):
     config.register_root_helper(conf)
     conf.register_opts(interface.OPTS)
     conf.register_opts(external_process.OPTS)
+    conf.register_opts(ip_lib.OPTS)
     conf(project='neutron')
     config.setup_logging(conf)
     legacy.modernize_quantum_config(conf)
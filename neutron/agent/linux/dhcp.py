@@ -87,9 +87,63 @@ class DictModel(object):
             setattr(self, key, value)
 
 
+class SlotModel(object):
+    """DictModel keeping the attributes of __slots__ without a dict.
+
+    The other attributes go to a dict only created for the objects which
+    have any.  Networks with many thousands of ports need much less
+    memory this way.
+    """
+    __slots__ = ('_extra',)
+
+    # Models of the dicts in the list values, by key
+    _list_models = {}
+
+    def __init__(self, d):
+        self._extra = None
+        for key, value in d.iteritems():
+            if isinstance(value, list):
+                model = self._list_models.get(key, DictModel)
+                value = [model(item) if isinstance(item, dict) else item
+                         for item in value]
+            elif isinstance(value, dict):
+                value = DictModel(value)
+
+            setattr(self, key, value)
+
+    def __setattr__(self, name, value):
+        try:
+            super(SlotModel, self).__setattr__(name, value)
+        except AttributeError:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[name] = value
+
+    def __getattr__(self, name):
+        # Only called for the attributes missing from the slots
+        if name != '_extra' and self._extra and name in self._extra:
+            return self._extra[name]
+        raise AttributeError(name)
+
+
+class FixedIpModel(SlotModel):
+    __slots__ = ('subnet_id', 'ip_address')
+
+
+class PortModel(SlotModel):
+    __slots__ = ('id', 'network_id', 'mac_address', 'fixed_ips',
+                 'device_id', 'device_owner', 'admin_state_up', 'status',
+                 'name', 'tenant_id', 'extra_dhcp_opts')
+
+    _list_models = {'fixed_ips': FixedIpModel}
+
+
 class NetModel(DictModel):
 
     def __init__(self, use_namespaces, d):
+        if 'ports' in d:
+            d = dict(d, ports=[PortModel(port) if isinstance(port, dict)
+                               else port for port in d['ports']])
         super(NetModel, self).__init__(d)
 
         self._ns_name = (use_namespaces and
@@ -268,6 +322,10 @@ class Dnsmasq(DhcpLocalProcess):
     NEUTRON_RELAY_SOCKET_PATH_KEY = 'NEUTRON_RELAY_SOCKET_PATH'
     MINIMUM_VERSION = 2.59
 
+    # Content last written to each hosts and opts file, shared by the
+    # driver instances of the agent which creates one per action.
+    _config_files = {}
+
     @classmethod
     def check_version(cls):
         ver = 0
@@ -386,9 +444,14 @@ class Dnsmasq(DhcpLocalProcess):
                         'turned off DHCP: %s'), self.network.id)
             return
 
-        self._output_hosts_file()
-        self._output_opts_file()
-        if self.active:
+        hosts_changed = self._write_config_file(
+            self.get_conf_file_name('host'), self._build_hosts())
+        opts_changed = self._write_config_file(
+            self.get_conf_file_name('opts'), self._build_opts())
+        if not (hosts_changed or opts_changed):
+            LOG.debug(_('Allocations unchanged for network: %s'),
+                      self.network.id)
+        elif self.active:
             cmd = ['kill', '-HUP', self.pid]
             utils.execute(cmd, self.root_helper)
         else:
@@ -396,8 +459,30 @@ class Dnsmasq(DhcpLocalProcess):
         LOG.debug(_('Reloading allocations for network: %s'), self.network.id)
         self.device_manager.update(self.network)
 
+    def _remove_config_files(self):
+        super(Dnsmasq, self)._remove_config_files()
+        for kind in ('host', 'opts'):
+            self._config_files.pop(self.get_conf_file_name(kind), None)
+
+    def _write_config_file(self, name, content):
+        """Write content to the config file name unless it holds it already.
+
+        Returns whether the file was written.
+        """
+        if self._config_files.get(name) == content and os.path.exists(name):
+            return False
+        utils.replace_file(name, content)
+        self._config_files[name] = content
+        return True
+
     def _output_hosts_file(self):
         """Writes a dnsmasq compatible hosts file."""
+        name = self.get_conf_file_name('host')
+        self._write_config_file(name, self._build_hosts())
+        return name
+
+    def _build_hosts(self):
+        """Return the content of the dnsmasq hosts file."""
         r = re.compile('[:.]')
         buf = StringIO.StringIO()
 
@@ -417,13 +502,16 @@ class Dnsmasq(DhcpLocalProcess):
                     buf.write('%s,%s,%s\n' %
                               (port.mac_address, name, alloc.ip_address))
 
-        name = self.get_conf_file_name('host')
-        utils.replace_file(name, buf.getvalue())
-        return name
+        return buf.getvalue()
 
     def _output_opts_file(self):
         """Write a dnsmasq compatible options file."""
+        name = self.get_conf_file_name('opts')
+        self._write_config_file(name, self._build_opts())
+        return name
 
+    def _build_opts(self):
+        """Return the content of the dnsmasq options file."""
         if self.conf.enable_isolated_metadata:
             subnet_to_interface_ip = self._make_subnet_interface_ip_map()
 
@@ -476,9 +564,7 @@ class Dnsmasq(DhcpLocalProcess):
                     self._format_option(port.id, opt.opt_name, opt.opt_value)
                     for opt in port.extra_dhcp_opts)
 
-        name = self.get_conf_file_name('opts')
-        utils.replace_file(name, '\n'.join(options))
-        return name
+        return '\n'.join(options)
 
     def _make_subnet_interface_ip_map(self):
         ip_dev = ip_lib.IPDevice(
@@ -17,20 +17,49 @@
 import netaddr
 from oslo.config import cfg
 
+from neutron.agent.linux import netlink
 from neutron.agent.linux import utils
 from neutron.common import exceptions
+from neutron.openstack.common import log as logging
 
 
+LOG = logging.getLogger(__name__)
+
 OPTS = [
     cfg.BoolOpt('ip_lib_force_root',
                 default=False,
                 help=_('Force ip_lib calls to use the root helper')),
+    cfg.StrOpt('ip_lib_backend',
+               default='subprocess',
+               help=_("How ip_lib queries links, addresses, routes and "
+                      "namespaces: 'subprocess' runs ip, 'netlink' uses "
+                      "netlink sockets when it can. Changes always run "
+                      "ip.")),
 ]
 
 
 LOOPBACK_DEVNAME = 'lo'
 
 
+def _get_netlink_backend(namespace=None):
+    """Return the netlink backend if it may query namespace, else None."""
+    try:
+        backend = cfg.CONF.ip_lib_backend
+    except cfg.NoSuchOptError:
+        # Only callers that want the netlink backend need to register
+        # the option.
+        return None
+    if backend != 'netlink' or not netlink.is_supported():
+        return None
+    if namespace and not netlink.can_enter_namespace():
+        return None
+    return netlink
+
+
+def _netlink_failed(e):
+    LOG.debug(_("Netlink query failed, running ip instead: %s"), e)
+
+
 class SubProcessBase(object):
     def __init__(self, root_helper=None, namespace=None):
         self.root_helper = root_helper
@@ -86,6 +115,16 @@ class IPWrapper(SubProcessBase):
         return IPDevice(name, self.root_helper, self.namespace)
 
     def get_devices(self, exclude_loopback=False):
+        backend = _get_netlink_backend(self.namespace)
+        if backend:
+            try:
+                return [IPDevice(name, self.root_helper, self.namespace)
+                        for index, name, attributes
+                        in backend.get_links(self.namespace)
+                        if not (exclude_loopback and
+                                name == LOOPBACK_DEVNAME)]
+            except backend.NetlinkError as e:
+                _netlink_failed(e)
         retval = []
         output = self._execute('o', 'link', ('list',),
                                self.root_helper, self.namespace)
@@ -171,6 +210,12 @@ class IPWrapper(SubProcessBase):
 
     @classmethod
     def get_namespaces(cls, root_helper):
+        backend = _get_netlink_backend()
+        if backend:
+            try:
+                return backend.list_namespaces()
+            except backend.NetlinkError as e:
+                _netlink_failed(e)
         output = cls._execute('', 'netns', ('list',), root_helper=root_helper)
         return [l.strip() for l in output.split('\n')]
 
@@ -269,6 +314,13 @@ class IpLinkCommand(IpDeviceCommandBase):
 
     @property
     def attributes(self):
+        backend = _get_netlink_backend(self._parent.namespace)
+        if backend:
+            try:
+                return backend.get_link_attributes(self.name,
+                                                   self._parent.namespace)
+            except backend.NetlinkError as e:
+                _netlink_failed(e)
         return self._parse_line(self._run('show', self.name, options='o'))
 
     def _parse_line(self, value):
@@ -309,6 +361,16 @@ class IpAddrCommand(IpDeviceCommandBase):
         self._as_root('flush', self.name)
 
     def list(self, scope=None, to=None, filters=None):
+        backend = not filters and _get_netlink_backend(
+            self._parent.namespace)
+        if backend:
+            try:
+                return backend.get_addresses(self.name,
+                                             self._parent.namespace,
+                                             scope=scope, to=to)
+            except backend.NetlinkError as e:
+                _netlink_failed(e)
+
         if filters is None:
             filters = []
 
@@ -367,6 +429,16 @@ class IpRouteCommand(IpDeviceCommandBase):
                       self.name)
 
     def get_gateway(self, scope=None, filters=None):
+        backend = not filters and _get_netlink_backend(
+            self._parent.namespace)
+        if backend:
+            try:
+                return backend.get_default_gateway(self.name,
+                                                   self._parent.namespace,
+                                                   scope=scope)
+            except backend.NetlinkError as e:
+                _netlink_failed(e)
+
         if filters is None:
             filters = []
 
@@ -458,6 +530,12 @@ class IpNetnsCommand(IpCommandBase):
                 check_exit_code=check_exit_code)
 
     def exists(self, name):
+        backend = _get_netlink_backend()
+        if backend:
+            try:
+                return name in backend.list_namespaces()
+            except backend.NetlinkError as e:
+                _netlink_failed(e)
         output = self._as_root('list', options='o', use_root_namespace=True)
 
         for line in output.split('\n'):
@@ -0,0 +1,94 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Implements sets of IP addresses using the ipset utility."""
+
+from neutron.agent.linux import utils as linux_utils
+from neutron.common import constants
+from neutron.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# ipset set names are limited to 31 characters.
+MAX_SET_NAME_LEN = 31
+SET_FAMILY = {constants.IPv4: 'inet',
+              constants.IPv6: 'inet6'}
+
+
+def get_set_name(id, ethertype):
+    """Return the name of the set of ethertype addresses for id."""
+    return ('%s%s' % (ethertype, id))[:MAX_SET_NAME_LEN]
+
+
+class IpsetManager(object):
+    """Wrapper for ipset.
+
+    Keeps one hash:ip set per (id, ethertype), for instance per remote
+    security group, and only sends the members which were added or
+    removed since the previous update to ipset.
+
+    """
+
+    def __init__(self, _execute=None, root_helper=None):
+        if _execute:
+            self.execute = _execute
+        else:
+            self.execute = linux_utils.execute
+        self.root_helper = root_helper
+        # members of each set we created, by set name
+        self.sets = {}
+
+    def set_members(self, id, ethertype, member_ips):
+        """Make the set of ethertype addresses for id hold member_ips.
+
+        The set is created if it does not exist yet.
+        """
+        name = get_set_name(id, ethertype)
+        new_members = set(member_ips)
+        lines = []
+        if name in self.sets:
+            old_members = self.sets[name]
+        else:
+            # The set may be left over from a previous run, so flush it
+            # rather than trusting its content.
+            old_members = set()
+            lines += ['create %s hash:ip family %s' %
+                      (name, SET_FAMILY[ethertype]),
+                      'flush %s' % name]
+        lines += ['add %s %s' % (name, ip)
+                  for ip in sorted(new_members - old_members)]
+        lines += ['del %s %s' % (name, ip)
+                  for ip in sorted(old_members - new_members)]
+        if lines:
+            self._restore(lines)
+        self.sets[name] = new_members
+
+    def destroy(self, id, ethertype):
+        """Destroy the set of ethertype addresses for id.
+
+        Nothing may reference the set anymore, e.g. no iptables rule.
+        """
+        name = get_set_name(id, ethertype)
+        if name not in self.sets:
+            return
+        self.execute(['ipset', 'destroy', name],
+                     root_helper=self.root_helper)
+        del self.sets[name]
+
+    def _restore(self, lines):
+        self.execute(['ipset', 'restore', '-exist'],
+                     process_input='\n'.join(lines + ['']),
+                     root_helper=self.root_helper)
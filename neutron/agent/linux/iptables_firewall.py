@@ -15,16 +15,21 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+
 import netaddr
 from oslo.config import cfg
 
 from neutron.agent import firewall
+from neutron.agent.linux import ipset_manager
 from neutron.agent.linux import iptables_manager
 from neutron.common import constants
 from neutron.openstack.common import log as logging
 
 
 LOG = logging.getLogger(__name__)
+cfg.CONF.import_opt('enable_ipset', 'neutron.agent.securitygroups_rpc',
+                    'SECURITYGROUP')
 SG_CHAIN = 'sg-chain'
 INGRESS_DIRECTION = 'ingress'
 EGRESS_DIRECTION = 'egress'
@@ -33,6 +38,10 @@ CHAIN_NAME_PREFIX = {INGRESS_DIRECTION: 'i',
                      EGRESS_DIRECTION: 'o',
                      SPOOF_FILTER: 's'}
 LINUX_DEV_LEN = 14
+DIRECTION_IP_PREFIX = {INGRESS_DIRECTION: 'source_ip_prefix',
+                       EGRESS_DIRECTION: 'dest_ip_prefix'}
+IPSET_DIRECTION = {INGRESS_DIRECTION: 'src',
+                   EGRESS_DIRECTION: 'dst'}
 
 
 class IptablesFirewallDriver(firewall.FirewallDriver):
@@ -44,6 +53,13 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         self.iptables = iptables_manager.IptablesManager(
             root_helper=cfg.CONF.AGENT.root_helper,
             use_ipv6=True)
+        self.ipset = None
+        if cfg.CONF.SECURITYGROUP.enable_ipset:
+            self.ipset = ipset_manager.IpsetManager(
+                root_helper=cfg.CONF.AGENT.root_helper)
+        # (remote security group id, ethertype) of the sets we maintain
+        self.ipsets = set()
+        self.unused_ipsets = set()
         # list of port which has security group
         self.filtered_ports = {}
         self._add_fallback_chain_v4v6()
@@ -61,6 +77,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         # each security group has it own chains
         self._setup_chains()
         self.iptables.apply()
+        self._destroy_unused_ipsets()
 
     def update_port_filter(self, port):
         LOG.debug(_("Updating device (%s) filter"), port['device'])
@@ -72,6 +89,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         self.filtered_ports[port['device']] = port
         self._setup_chains()
         self.iptables.apply()
+        self._destroy_unused_ipsets()
 
     def remove_port_filter(self, port):
         LOG.debug(_("Removing device (%s) filter"), port['device'])
@@ -83,6 +101,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         self.filtered_ports.pop(port['device'], None)
         self._setup_chains()
         self.iptables.apply()
+        self._destroy_unused_ipsets()
 
     def _setup_chains(self):
         """Setup ingress and egress chain for a port."""
@@ -90,6 +109,8 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
             self._setup_chains_apply(self.filtered_ports)
 
     def _setup_chains_apply(self, ports):
+        if self.ipset:
+            self._update_ipsets(ports)
         self._add_chain_by_name_v4v6(SG_CHAIN)
         for port in ports.values():
             self._setup_chain(port, INGRESS_DIRECTION)
@@ -97,6 +118,33 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
             self.iptables.ipv4['filter'].add_rule(SG_CHAIN, '-j ACCEPT')
             self.iptables.ipv6['filter'].add_rule(SG_CHAIN, '-j ACCEPT')
 
+    def _update_ipsets(self, ports):
+        """Update the sets of members of the remote security groups.
+
+        The server expands remote group rules into one rule per member
+        address, each keeping the remote_group_id, so the members are
+        collected from these rules.  Sets no longer used are destroyed by
+        _destroy_unused_ipsets once the iptables rules are applied.
+        """
+        members = collections.defaultdict(set)
+        for port in ports.values():
+            for rule in port.get('security_group_rules', []):
+                if not self._is_ipset_rule(rule):
+                    continue
+                ip_prefix = rule.get(DIRECTION_IP_PREFIX[rule['direction']])
+                ips = members[(rule['remote_group_id'], rule['ethertype'])]
+                if ip_prefix:
+                    ips.add(str(netaddr.IPNetwork(ip_prefix).ip))
+        for (remote_group_id, ethertype), ips in members.iteritems():
+            self.ipset.set_members(remote_group_id, ethertype, ips)
+        self.unused_ipsets |= self.ipsets - set(members)
+        self.ipsets = set(members)
+
+    def _destroy_unused_ipsets(self):
+        for remote_group_id, ethertype in self.unused_ipsets - self.ipsets:
+            self.ipset.destroy(remote_group_id, ethertype)
+        self.unused_ipsets = set()
+
     def _remove_chains(self):
         """Remove ingress and egress chain for a port."""
         if not self._defer_apply:
@@ -180,6 +228,42 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
                 ipv6_sg_rules.append(rule)
         return ipv4_sg_rules, ipv6_sg_rules
 
+    def _is_ipset_rule(self, rule):
+        """Return whether rule is matched through its remote group set.
+
+        Sets only hold host addresses, so the rules of the remote group
+        members allowing a wider prefix, e.g. an allowed address pair
+        with a /24 cidr, are kept as plain iptables rules.
+        """
+        if not rule.get('remote_group_id'):
+            return False
+        ip_prefix = rule.get(DIRECTION_IP_PREFIX[rule['direction']])
+        return not ip_prefix or netaddr.IPNetwork(ip_prefix).size == 1
+
+    def _merge_remote_group_rules(self, security_group_rules):
+        """Replace the rules of each remote group member by a set rule.
+
+        Rules only differing by the host address of a member of the same
+        remote group are merged into one rule matching the set of the
+        members of that group.
+        """
+        merged_rules = []
+        seen_rules = set()
+        for rule in security_group_rules:
+            if rule.get('remote_group_id'):
+                rule = rule.copy()
+                if not self._is_ipset_rule(rule):
+                    del rule['remote_group_id']
+                    merged_rules.append(rule)
+                    continue
+                rule.pop(DIRECTION_IP_PREFIX[rule['direction']], None)
+                key = tuple(sorted(rule.items()))
+                if key in seen_rules:
+                    continue
+                seen_rules.add(key)
+            merged_rules.append(rule)
+        return merged_rules
+
     def _select_sgr_by_direction(self, port, direction):
         return [rule
                 for rule in port.get('security_group_rules', [])
@@ -247,6 +331,9 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         chain_name = self._port_chain_name(port, direction)
         # select rules for current direction
         security_group_rules = self._select_sgr_by_direction(port, direction)
+        if self.ipset:
+            security_group_rules = self._merge_remote_group_rules(
+                security_group_rules)
         # split groups by ip version
         # for ipv4, iptables command is used
         # for ipv6, iptables6 command is used
@@ -280,7 +367,12 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
                                        rule.get('source_ip_prefix'))
             args += self._ip_prefix_arg('d',
                                         rule.get('dest_ip_prefix'))
-            args += self._protocol_arg(rule.get('protocol'))
+            protocol_args = self._protocol_arg(rule.get('protocol'))
+            # iptables-save shows the set match after '-p <protocol>' but
+            # before '-m <protocol>'
+            args += protocol_args[:2]
+            args += self._remote_group_arg(rule)
+            args += protocol_args[2:]
             args += self._port_arg('sport',
                                    rule.get('protocol'),
                                    rule.get('source_port_range_min'),
@@ -327,6 +419,15 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
                     '--%ss' % direction,
                     '%s:%s' % (port_range_min, port_range_max)]
 
+    def _remote_group_arg(self, rule):
+        remote_group_id = rule.get('remote_group_id')
+        if not (self.ipset and remote_group_id):
+            return []
+        set_name = ipset_manager.get_set_name(remote_group_id,
+                                              rule['ethertype'])
+        return ['-m set --match-set %s %s' %
+                (set_name, IPSET_DIRECTION[rule['direction']])]
+
     def _ip_prefix_arg(self, direction, ip_prefix):
         #NOTE (nati) : source_group_id is converted to list of source_
         # ip_prefix in server side
@@ -351,6 +452,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
             self._pre_defer_filtered_ports = None
             self._setup_chains_apply(self.filtered_ports)
             self.iptables.defer_apply_off()
+            self._destroy_unused_ipsets()
 
 
 class OVSHybridIptablesFirewallDriver(IptablesFirewallDriver):
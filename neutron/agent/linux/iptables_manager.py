@@ -54,6 +54,20 @@ def get_chain_name(chain_name, wrap=True):
         return chain_name[:MAX_CHAIN_LEN_NOWRAP]
 
 
+def _strip_counters(line):
+    """Return the text of a saved chain or rule line without its counts.
+
+    ':neutron-filter-top - [0:0]' gives ':neutron-filter-top' and
+    '[0:0] -A FORWARD -j neutron-filter-top' gives
+    '-A FORWARD -j neutron-filter-top'.  Any other line gives None.
+
+    """
+    if line.startswith(':'):
+        return line.split(' ', 1)[0]
+    elif line.startswith('['):
+        return line.partition('] ')[2].strip() or None
+
+
 class IptablesRule(object):
     """An iptables rule.
 
@@ -97,6 +111,10 @@ class IptablesTable(object):
         self.unwrapped_chains = set()
         self.remove_chains = set()
         self.wrap_name = binary_name[:16]
+        # Whether the table changed since it was last applied, and what
+        # was applied then (see IptablesManager._get_table_state).
+        self.dirty = True
+        self.applied_state = None
 
     def add_chain(self, name, wrap=True):
         """Adds a named chain to the table.
@@ -115,6 +133,7 @@ class IptablesTable(object):
             self.chains.add(name)
         else:
             self.unwrapped_chains.add(name)
+        self.dirty = True
 
     def _select_chain_set(self, wrap):
         if wrap:
@@ -153,6 +172,7 @@ class IptablesTable(object):
             return
 
         chain_set.remove(name)
+        self.dirty = True
 
         if not wrap:
             # non-wrapped chains and rules need to be dealt with specially,
@@ -196,6 +216,7 @@ class IptablesTable(object):
             rule = ' '.join(map(self._wrap_target_chain, rule.split(' ')))
 
         self.rules.append(IptablesRule(chain, rule, wrap, top, self.wrap_name))
+        self.dirty = True
 
     def _wrap_target_chain(self, s):
         if s.startswith('$'):
@@ -214,6 +235,7 @@ class IptablesTable(object):
         try:
             self.rules.remove(IptablesRule(chain, rule, wrap, top,
                                            self.wrap_name))
+            self.dirty = True
             if not wrap:
                 self.remove_rules.append(IptablesRule(chain, rule, wrap, top,
                                                       self.wrap_name))
@@ -230,6 +252,7 @@ class IptablesTable(object):
                          if rule.chain == chain and rule.wrap == wrap]
         for rule in chained_rules:
             self.rules.remove(rule)
+            self.dirty = True
 
 
 class IptablesManager(object):
@@ -350,28 +373,110 @@ class IptablesManager(object):
         same component of Nova, and replace them with our current set of
         rules. This happens atomically, thanks to iptables-restore.
 
+        Tables that did not change since the last successful apply are
+        left alone.  If only our own (wrapped) chains changed, just those
+        chains are rewritten with iptables-restore --noflush.
+
         """
         s = [('iptables', self.ipv4)]
         if self.use_ipv6:
             s += [('ip6tables', self.ipv6)]
 
         for cmd, tables in s:
-            args = ['%s-save' % (cmd,), '-c']
-            if self.namespace:
-                args = ['ip', 'netns', 'exec', self.namespace] + args
-            all_tables = self.execute(args, root_helper=self.root_helper)
-            all_lines = all_tables.split('\n')
+            changes = {}
             for table_name, table in tables.iteritems():
-                start, end = self._find_table(all_lines, table_name)
+                if not table.dirty:
+                    continue
+                state = self._get_table_state(table)
+                dirty_chains = self._get_dirty_chains(table, state)
+                if dirty_chains is None or dirty_chains:
+                    changes[table_name] = (state, dirty_chains)
+                else:
+                    table.dirty = False
+            if not changes:
+                continue
+
+            full = any(dirty_chains is None
+                       for state, dirty_chains in changes.itervalues())
+            if not full:
+                try:
+                    self._restore(cmd, tables, changes, noflush=True)
+                except RuntimeError:
+                    LOG.warn(_('Failed to update %(cmd)s chains, '
+                               'rewriting tables %(tables)s'),
+                             {'cmd': cmd, 'tables': sorted(changes)})
+                    full = True
+            if full:
+                self._restore(cmd, tables, changes)
+
+            for table_name, (state, dirty_chains) in changes.iteritems():
+                tables[table_name].applied_state = state
+                tables[table_name].dirty = False
+        LOG.debug(_("IPTablesManager.apply completed with success"))
+
+    def _restore(self, cmd, tables, changes, noflush=False):
+        args = ['%s-save' % (cmd,), '-c']
+        if len(changes) == 1:
+            args += ['-t', changes.keys()[0]]
+        if self.namespace:
+            args = ['ip', 'netns', 'exec', self.namespace] + args
+        all_tables = self.execute(args, root_helper=self.root_helper)
+        all_lines = all_tables.split('\n')
+        new_lines = []
+        for table_name, (state, dirty_chains) in changes.iteritems():
+            start, end = self._find_table(all_lines, table_name)
+            if noflush:
+                new_lines += self._modify_chains(
+                    all_lines[start:end], state, dirty_chains, table_name)
+            else:
                 all_lines[start:end] = self._modify_rules(
-                    all_lines[start:end], table, table_name)
+                    all_lines[start:end], tables[table_name], table_name)
 
-            args = ['%s-restore' % (cmd,), '-c']
-            if self.namespace:
-                args = ['ip', 'netns', 'exec', self.namespace] + args
-            self.execute(args, process_input='\n'.join(all_lines),
-                         root_helper=self.root_helper)
-        LOG.debug(_("IPTablesManager.apply completed with success"))
+        args = ['%s-restore' % (cmd,), '-c']
+        if noflush:
+            args.append('--noflush')
+            all_lines = new_lines + ['']
+        if self.namespace:
+            args = ['ip', 'netns', 'exec', self.namespace] + args
+        self.execute(args, process_input='\n'.join(all_lines),
+                     root_helper=self.root_helper)
+
+    def _get_table_state(self, table):
+        """Return what applying the table would put in place.
+
+        This is the set of unwrapped chains, the list of rules in unwrapped
+        chains and a dict of the list of rules of each wrapped chain, top
+        rules first, like _modify_rules orders them.
+
+        """
+        chain_rules = dict((name, []) for name in table.chains)
+        unwrapped_rules = []
+        for top in (True, False):
+            for rule in table.rules:
+                if rule.top != top:
+                    continue
+                if rule.wrap:
+                    chain_rules[rule.chain].append(rule)
+                else:
+                    unwrapped_rules.append(rule)
+        return (frozenset(table.unwrapped_chains), unwrapped_rules,
+                chain_rules)
+
+    def _get_dirty_chains(self, table, state):
+        """Return the wrapped chains which changed since the last apply.
+
+        None is returned when the whole table has to be rewritten, because
+        it was never applied or because something outside of our wrapped
+        chains changed.
+
+        """
+        applied = table.applied_state
+        if (applied is None or applied[:2] != state[:2] or
+                table.remove_chains or table.remove_rules):
+            return None
+        chain_rules, applied_rules = state[2], applied[2]
+        return set(name for name in set(chain_rules) | set(applied_rules)
+                   if chain_rules.get(name) != applied_rules.get(name))
 
     def _find_table(self, lines, table_name):
         if len(lines) < 3:
@@ -415,158 +520,129 @@ class IptablesManager(object):
                           '# Completed by iptables_manager']
             current_lines = fake_table
 
-        # Fill old_filter with any chains or rules we might have added,
-        # they could have a [packet:byte] count we want to preserve.
-        # Fill new_filter with any chains or rules without our name in them.
-        old_filter, new_filter = [], []
+        # Index the saved table once, keyed by the text of each chain or
+        # rule without its [packet:byte] count.  Lines with our name in
+        # them are only kept if they match a chain or rule we still have,
+        # so their counts can be preserved.  Any other line belongs to
+        # someone else and is kept unless we have a duplicate of it.
+        old_index = {}
+        new_index = {}
+        new_filter = []
         for line in current_lines:
-            (old_filter if self.wrap_name in line else
-             new_filter).append(line.strip())
+            line = line.strip()
+            key = _strip_counters(line)
+            if self.wrap_name in line:
+                if key:
+                    old_index[key] = line
+            else:
+                new_filter.append((key, line))
+                if key:
+                    new_index[key] = line
+
+        # Find an existing match for each of our chains and rules, letting
+        # the *last* occurrence win since it has the most recent counts.
+        our_keys = set()
 
-        rules_index = self._find_rules_index(new_filter)
+        def _find_existing(key, default):
+            our_keys.add(key)
+            return old_index.get(key) or new_index.get(key) or default
 
         all_chains = [':%s' % name for name in unwrapped_chains]
         all_chains += [':%s-%s' % (self.wrap_name, name) for name in chains]
+        our_chains = [_find_existing(chain, chain + ' - [0:0]')
+                      for chain in all_chains]
 
-        # Iterate through all the chains, trying to find an existing
-        # match.
-        our_chains = []
-        for chain in all_chains:
-            chain_str = str(chain).strip()
-
-            orig_filter = [s for s in old_filter if chain_str in s.strip()]
-            dup_filter = [s for s in new_filter if chain_str in s.strip()]
-            new_filter = [s for s in new_filter if chain_str not in s.strip()]
-
-            # if no old or duplicates, use original chain
-            if orig_filter:
-                # grab the last entry, if there is one
-                old = orig_filter[-1]
-                chain_str = str(old).strip()
-            elif dup_filter:
-                # grab the last entry, if there is one
-                dup = dup_filter[-1]
-                chain_str = str(dup).strip()
-            else:
-                # add-on the [packet:bytes]
-                chain_str += ' - [0:0]'
-
-            our_chains += [chain_str]
-
-        # Iterate through all the rules, trying to find an existing
-        # match.
         our_rules = []
         bot_rules = []
         for rule in rules:
             rule_str = str(rule).strip()
-            # Further down, we weed out duplicates from the bottom of the
-            # list, so here we remove the dupes ahead of time.
-
-            orig_filter = [s for s in old_filter if rule_str in s.strip()]
-            dup_filter = [s for s in new_filter if rule_str in s.strip()]
-            new_filter = [s for s in new_filter if rule_str not in s.strip()]
-
-            # if no old or duplicates, use original rule
-            if orig_filter:
-                # grab the last entry, if there is one
-                old = orig_filter[-1]
-                rule_str = str(old).strip()
-            elif dup_filter:
-                # grab the last entry, if there is one
-                dup = dup_filter[-1]
-                rule_str = str(dup).strip()
-                # backup one index so we write the array correctly
-                rules_index -= 1
-            else:
-                # add-on the [packet:bytes]
-                rule_str = '[0:0] ' + rule_str
-
+            rule_str = _find_existing(rule_str, '[0:0] ' + rule_str)
             if rule.top:
                 # rule.top == True means we want this rule to be at the top.
-                our_rules += [rule_str]
+                our_rules.append(rule_str)
             else:
-                bot_rules += [rule_str]
-
+                bot_rules.append(rule_str)
         our_rules += bot_rules
 
-        new_filter[rules_index:rules_index] = our_rules
-        new_filter[rules_index:rules_index] = our_chains
-
-        def _strip_packets_bytes(line):
-            # strip any [packet:byte] counts at start or end of lines
-            if line.startswith(':'):
-                # it's a chain, for example, ":neutron-billing - [0:0]"
-                line = line.split(':')[1]
-                line = line.split(' - [', 1)[0]
-            elif line.startswith('['):
-                # it's a rule, for example, "[0:0] -A neutron-billing..."
-                line = line.split('] ', 1)[1]
-            line = line.strip()
-            return line
-
-        seen_chains = set()
-
-        def _weed_out_duplicate_chains(line):
-            # ignore [packet:byte] counts at end of lines
-            if line.startswith(':'):
-                line = _strip_packets_bytes(line)
-                if line in seen_chains:
-                    return False
-                else:
-                    seen_chains.add(line)
-
-            # Leave it alone
-            return True
-
-        seen_rules = set()
-
-        def _weed_out_duplicate_rules(line):
-            if line.startswith('['):
-                line = _strip_packets_bytes(line)
-                if line in seen_rules:
-                    return False
-                else:
-                    seen_rules.add(line)
-
-            # Leave it alone
-            return True
-
-        def _weed_out_removes(line):
-            # We need to find exact matches here
-            if line.startswith(':'):
-                line = _strip_packets_bytes(line)
-                for chain in remove_chains:
-                    if chain == line:
-                        remove_chains.remove(chain)
-                        return False
-            elif line.startswith('['):
-                line = _strip_packets_bytes(line)
-                for rule in remove_rules:
-                    rule_str = _strip_packets_bytes(str(rule))
-                    if rule_str == line:
-                        remove_rules.remove(rule)
-                        return False
-
-            # Leave it alone
-            return True
-
-        # We filter duplicates.  Go throught the chains and rules, letting
-        # the *last* occurrence take precendence since it could have a
+        # Drop the duplicates of our chains and rules, they are replaced by
+        # ours, which go after the remaining chains and before their rules.
+        new_filter = [(key, line) for key, line in new_filter
+                      if key not in our_keys]
+        rules_index = self._find_rules_index([line for key, line
+                                              in new_filter])
+        new_filter[rules_index:rules_index] = (
+            [(_strip_counters(line), line) for line in our_chains + our_rules])
+
+        # We filter duplicates.  Go through the chains and rules, letting
+        # the *last* occurrence take precedence since it could have a
         # non-zero [packet:byte] count we want to preserve.  We also filter
         # out anything in the "remove" list.
-        new_filter.reverse()
-        new_filter = [line for line in new_filter
-                      if _weed_out_duplicate_chains(line) and
-                      _weed_out_duplicate_rules(line) and
-                      _weed_out_removes(line)]
-        new_filter.reverse()
+        remove_keys = set(':%s' % name for name in remove_chains)
+        remove_keys.update(str(rule).strip() for rule in remove_rules)
+        seen_keys = set()
+        result = []
+        for key, line in reversed(new_filter):
+            if key:
+                if key in seen_keys:
+                    continue
+                seen_keys.add(key)
+                if key in remove_keys:
+                    continue
+            result.append(line)
+        result.reverse()
 
         # flush lists, just in case we didn't find something
         remove_chains.clear()
-        for rule in remove_rules:
-            remove_rules.remove(rule)
+        del remove_rules[:]
+
+        return result
 
-        return new_filter
+    def _modify_chains(self, current_lines, state, dirty_chains, table_name):
+        """Return a --noflush restore payload rewriting only dirty chains.
+
+        Declaring an existing chain flushes it when restoring with
+        --noflush, so each dirty chain is declared and refilled with its
+        current rules, and the dirty chains we no longer have are deleted
+        once nothing can jump to them anymore.
+
+        """
+        chain_rules = state[2]
+        old_index = {}
+        for line in current_lines:
+            line = line.strip()
+            if self.wrap_name in line:
+                key = _strip_counters(line)
+                if key:
+                    old_index[key] = line
+
+        our_chains = []
+        our_rules = []
+        removed_chains = []
+        for name in sorted(dirty_chains):
+            chain = ':%s-%s' % (self.wrap_name, name)
+            our_chains.append(old_index.get(chain, chain + ' - [0:0]'))
+            if name not in chain_rules:
+                removed_chains.append('-X %s-%s' % (self.wrap_name, name))
+                continue
+            for rule in chain_rules[name]:
+                rule_str = str(rule).strip()
+                our_rules.append(old_index.get(rule_str,
+                                               '[0:0] ' + rule_str))
+
+        # Weed out duplicate rules, letting the *last* occurrence win like
+        # _modify_rules does.
+        seen_rules = set()
+        new_rules = []
+        for line in reversed(our_rules):
+            key = _strip_counters(line)
+            if key not in seen_rules:
+                seen_rules.add(key)
+                new_rules.append(line)
+        new_rules.reverse()
+
+        return (['# Generated by iptables_manager', '*' + table_name] +
+                our_chains + new_rules + removed_chains +
+                ['COMMIT', '# Completed by iptables_manager'])
 
     def _get_traffic_counters_cmd_tables(self, chain, wrap=True):
         name = get_chain_name(chain, wrap)
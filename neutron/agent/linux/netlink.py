@@ -0,0 +1,347 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Queries of links, addresses and routes through rtnetlink sockets.
+
+Used by ip_lib instead of forking ip and parsing its output.  Queries
+inside a namespace open their socket in it with setns(2), which requires
+running as root.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import socket
+import struct
+
+import netaddr
+
+
+NETNS_RUN_DIR = '/var/run/netns'
+
+NETLINK_ROUTE = 0
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+NLMSG_ERROR = 0x2
+NLMSG_DONE = 0x3
+
+RTM_NEWLINK = 16
+RTM_GETLINK = 18
+RTM_NEWADDR = 20
+RTM_GETADDR = 22
+RTM_NEWROUTE = 24
+RTM_GETROUTE = 26
+
+IFLA_ADDRESS = 1
+IFLA_IFNAME = 3
+IFLA_MTU = 4
+IFLA_QDISC = 6
+IFLA_TXQLEN = 13
+IFLA_OPERSTATE = 16
+IFLA_IFALIAS = 20
+
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+IFA_BROADCAST = 4
+IFA_F_PERMANENT = 0x80
+
+RTA_OIF = 4
+RTA_GATEWAY = 5
+RTA_PRIORITY = 6
+RTA_TABLE = 15
+RT_TABLE_MAIN = 254
+
+ARPHRD_ETHER = 1
+ARPHRD_LOOPBACK = 772
+
+CLONE_NEWNET = 0x40000000
+
+NLMSG = struct.Struct('=IHHII')
+RTATTR = struct.Struct('=HH')
+IFINFOMSG = struct.Struct('=BxHiII')
+IFADDRMSG = struct.Struct('=BBBBI')
+RTMSG = struct.Struct('=BBBBBBBBI')
+
+OPERSTATES = ['UNKNOWN', 'NOTPRESENT', 'DOWN', 'LOWERLAYERDOWN', 'TESTING',
+              'DORMANT', 'UP']
+# ip addr/route scope names
+SCOPES = {'global': 0, 'site': 200, 'link': 253, 'host': 254}
+FAMILIES = {socket.AF_INET: 4, socket.AF_INET6: 6}
+
+RECV_SIZE = 65536
+
+
+class NetlinkError(Exception):
+    """The query failed, it may be run with ip instead."""
+
+
+def _align(length):
+    return (length + 3) & ~3
+
+
+def is_supported():
+    return hasattr(socket, 'AF_NETLINK')
+
+
+def can_enter_namespace():
+    return os.geteuid() == 0 and _get_libc_setns() is not None
+
+
+_libc = None
+
+
+def _get_libc_setns():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    return getattr(_libc, 'setns', None)
+
+
+def _setns(fd):
+    if _get_libc_setns()(fd, CLONE_NEWNET) != 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+
+
+def _open_socket(namespace=None):
+    """Open a rtnetlink socket, in namespace if set.
+
+    A netlink socket stays in the namespace it was opened in, so this
+    process only stays in namespace while opening it.
+    """
+    if not namespace:
+        return socket.socket(socket.AF_NETLINK, socket.SOCK_RAW,
+                             NETLINK_ROUTE)
+    own_fd = os.open('/proc/self/ns/net', os.O_RDONLY)
+    try:
+        ns_fd = os.open(os.path.join(NETNS_RUN_DIR, namespace), os.O_RDONLY)
+        try:
+            _setns(ns_fd)
+            try:
+                return socket.socket(socket.AF_NETLINK, socket.SOCK_RAW,
+                                     NETLINK_ROUTE)
+            finally:
+                _setns(own_fd)
+        finally:
+            os.close(ns_fd)
+    finally:
+        os.close(own_fd)
+
+
+def parse_attributes(data):
+    """Return the rtattrs of data by type."""
+    attributes = {}
+    offset = 0
+    while offset + RTATTR.size <= len(data):
+        length, rta_type = RTATTR.unpack_from(data, offset)
+        if length < RTATTR.size:
+            break
+        attributes[rta_type] = data[offset + RTATTR.size:offset + length]
+        offset += _align(length)
+    return attributes
+
+
+def parse_messages(data):
+    """Split data into (type, payload) messages.
+
+    Returns the messages and whether the dump is done.
+    """
+    messages = []
+    offset = 0
+    while offset + NLMSG.size <= len(data):
+        length, msg_type, flags, seq, pid = NLMSG.unpack_from(data, offset)
+        if length < NLMSG.size:
+            raise NetlinkError(_('Invalid netlink message length %d') %
+                               length)
+        payload = data[offset + NLMSG.size:offset + length]
+        offset += _align(length)
+        if msg_type == NLMSG_DONE:
+            return messages, True
+        if msg_type == NLMSG_ERROR:
+            error = -struct.unpack_from('=i', payload)[0]
+            if error:
+                raise NetlinkError(os.strerror(error))
+            continue
+        messages.append((msg_type, payload))
+    return messages, False
+
+
+def _dump(msg_type, payload, namespace=None):
+    """Return the payloads of the messages of a dump request."""
+    try:
+        sock = _open_socket(namespace)
+    except (OSError, socket.error) as e:
+        raise NetlinkError(str(e))
+    try:
+        sock.bind((0, 0))
+        sock.send(NLMSG.pack(NLMSG.size + len(payload), msg_type,
+                             NLM_F_REQUEST | NLM_F_DUMP, 1, 0) + payload)
+        payloads = []
+        done = False
+        while not done:
+            messages, done = parse_messages(sock.recv(RECV_SIZE))
+            payloads += [message for message_type, message in messages
+                         if message_type in (RTM_NEWLINK, RTM_NEWADDR,
+                                             RTM_NEWROUTE)]
+        return payloads
+    except socket.error as e:
+        raise NetlinkError(str(e))
+    finally:
+        sock.close()
+
+
+def _format_mac(data):
+    return ':'.join('%02x' % ord(char) for char in data)
+
+
+def _string(data):
+    return data.split('\0', 1)[0]
+
+
+def parse_link(payload):
+    """Return the ifindex, name and ip link attributes of a link."""
+    family, if_type, index, flags, change = IFINFOMSG.unpack_from(payload)
+    attrs = parse_attributes(payload[IFINFOMSG.size:])
+    attributes = {}
+    if IFLA_MTU in attrs:
+        attributes['mtu'] = struct.unpack('=I', attrs[IFLA_MTU])[0]
+    if IFLA_QDISC in attrs:
+        attributes['qdisc'] = _string(attrs[IFLA_QDISC])
+    if IFLA_OPERSTATE in attrs:
+        state = ord(attrs[IFLA_OPERSTATE][0])
+        if state < len(OPERSTATES):
+            attributes['state'] = OPERSTATES[state]
+    if IFLA_TXQLEN in attrs:
+        attributes['qlen'] = struct.unpack('=I', attrs[IFLA_TXQLEN])[0]
+    if IFLA_IFALIAS in attrs:
+        attributes['alias'] = _string(attrs[IFLA_IFALIAS])
+    if IFLA_ADDRESS in attrs:
+        if if_type == ARPHRD_ETHER:
+            attributes['link/ether'] = _format_mac(attrs[IFLA_ADDRESS])
+        elif if_type == ARPHRD_LOOPBACK:
+            attributes['link/loopback'] = _format_mac(attrs[IFLA_ADDRESS])
+    return index, _string(attrs.get(IFLA_IFNAME, '')), attributes
+
+
+def parse_address(payload):
+    """Return the ifindex and ip_lib address dict of an address."""
+    family, prefixlen, flags, scope, index = IFADDRMSG.unpack_from(payload)
+    attrs = parse_attributes(payload[IFADDRMSG.size:])
+    address = attrs.get(IFA_LOCAL, attrs.get(IFA_ADDRESS))
+    cidr = '%s/%d' % (socket.inet_ntop(family, address), prefixlen)
+    if family == socket.AF_INET6:
+        broadcast = '::'
+    elif IFA_BROADCAST in attrs:
+        broadcast = socket.inet_ntop(family, attrs[IFA_BROADCAST])
+    else:
+        broadcast = str(netaddr.IPNetwork(cidr).broadcast)
+    scope_names = dict((value, name) for name, value in SCOPES.items())
+    return index, dict(cidr=cidr,
+                       broadcast=broadcast,
+                       scope=scope_names.get(scope, str(scope)),
+                       ip_version=FAMILIES[family],
+                       dynamic=not flags & IFA_F_PERMANENT)
+
+
+def parse_route(payload):
+    """Return the rtmsg fields and the attributes of a route."""
+    (family, dst_len, src_len, tos, table, protocol, scope, route_type,
+     flags) = RTMSG.unpack_from(payload)
+    attrs = parse_attributes(payload[RTMSG.size:])
+    if RTA_TABLE in attrs:
+        table = struct.unpack('=I', attrs[RTA_TABLE])[0]
+    route = {'family': family, 'dst_len': dst_len, 'table': table,
+             'scope': scope}
+    if RTA_OIF in attrs:
+        route['oif'] = struct.unpack('=i', attrs[RTA_OIF])[0]
+    if RTA_GATEWAY in attrs:
+        route['gateway'] = socket.inet_ntop(family, attrs[RTA_GATEWAY])
+    if RTA_PRIORITY in attrs:
+        route['metric'] = struct.unpack('=I', attrs[RTA_PRIORITY])[0]
+    return route
+
+
+def get_links(namespace=None):
+    """Return (ifindex, name, attributes) of the links of namespace."""
+    return [parse_link(payload) for payload in
+            _dump(RTM_GETLINK, IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0),
+                  namespace)]
+
+
+def _get_link(name, namespace=None):
+    for link in get_links(namespace):
+        if link[1] == name:
+            return link
+    raise RuntimeError(_('Device "%s" does not exist.') % name)
+
+
+def get_link_attributes(name, namespace=None):
+    """Return the ip link attributes of device name."""
+    return _get_link(name, namespace)[2]
+
+
+def get_addresses(name, namespace=None, scope=None, to=None):
+    """Return the addresses of device name, as ip_lib lists them."""
+    index = _get_link(name, namespace)[0]
+    addresses = []
+    for payload in _dump(RTM_GETADDR,
+                         IFADDRMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0),
+                         namespace):
+        address_index, address = parse_address(payload)
+        if address_index != index:
+            continue
+        if scope and address['scope'] != scope:
+            continue
+        if to and not _address_in(address['cidr'], to):
+            continue
+        addresses.append(address)
+    return addresses
+
+
+def _address_in(cidr, to):
+    address = netaddr.IPNetwork(cidr).ip
+    to = netaddr.IPNetwork(to)
+    return address.version == to.version and address in to
+
+
+def get_default_gateway(name, namespace=None, scope=None):
+    """Return the IPv4 default gateway through device name, if any."""
+    index = _get_link(name, namespace)[0]
+    for payload in _dump(RTM_GETROUTE,
+                         RTMSG.pack(socket.AF_INET, 0, 0, 0, 0, 0, 0, 0, 0),
+                         namespace):
+        route = parse_route(payload)
+        if (route['table'] != RT_TABLE_MAIN or route['dst_len'] or
+            route.get('oif') != index or 'gateway' not in route):
+            continue
+        if scope and route['scope'] != SCOPES.get(scope):
+            continue
+        gateway = dict(gateway=route['gateway'])
+        if 'metric' in route:
+            gateway['metric'] = route['metric']
+        return gateway
+
+
+def list_namespaces():
+    """Return the names of the namespaces created with ip netns add."""
+    try:
+        return os.listdir(NETNS_RUN_DIR)
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            return []
+        raise NetlinkError(str(e))
@@ -18,6 +18,8 @@
 # @author: Dan Wendlandt, Nicira Networks, Inc.
 # @author: Dave Lapsley, Nicira Networks, Inc.
 
+import contextlib
+import itertools
 import re
 
 from neutron.agent.linux import ip_lib
@@ -92,7 +94,9 @@ class OVSBridge(BaseOVS):
         self.br_name = br_name
         self.re_id = self.re_compile_id()
         self.defer_apply_flows = False
-        self.deferred_flows = {'add': '', 'mod': '', 'del': ''}
+        # (action, flow) and ovs-vsctl commands deferred, in call order
+        self.deferred_flows = []
+        self.deferred_vsctl = []
 
     def re_compile_id(self):
         external = 'external_ids\s*'
@@ -126,13 +130,47 @@ class OVSBridge(BaseOVS):
         self.run_vsctl(["--", "--if-exists", "del-port", self.br_name,
                         port_name])
 
+    def run_vsctl(self, args, check_error=False):
+        # Later commands may depend on the deferred ones, e.g. to read
+        # the ofport of a port whose type was just set.
+        self._apply_deferred_vsctl()
+        return super(OVSBridge, self).run_vsctl(args, check_error)
+
+    def _apply_deferred_vsctl(self):
+        if not self.deferred_vsctl:
+            return
+        commands = self.deferred_vsctl
+        self.deferred_vsctl = []
+        LOG.debug(_('Applying %(count)d deferred ovs-vsctl commands to '
+                    'bridge %(bridge)s'),
+                  {'count': len(commands), 'bridge': self.br_name})
+        if len(commands) > 1:
+            args = list(itertools.chain.from_iterable(
+                ['--'] + command for command in commands))
+            try:
+                super(OVSBridge, self).run_vsctl(args, check_error=True)
+                return
+            except Exception:
+                # One failing command, e.g. on a port which was removed
+                # meanwhile, aborts the whole transaction.
+                LOG.warning(_('Deferred ovs-vsctl commands failed, '
+                              'applying them one by one'))
+        for command in commands:
+            super(OVSBridge, self).run_vsctl(command)
+
+    def _run_or_defer_vsctl(self, args):
+        if self.defer_apply_flows:
+            self.deferred_vsctl.append(args)
+        else:
+            self.run_vsctl(args)
+
     def set_db_attribute(self, table_name, record, column, value):
         args = ["set", table_name, record, "%s=%s" % (column, value)]
-        self.run_vsctl(args)
+        self._run_or_defer_vsctl(args)
 
     def clear_db_attribute(self, table_name, record, column):
         args = ["clear", table_name, record, column]
-        self.run_vsctl(args)
+        self._run_or_defer_vsctl(args)
 
     def run_ofctl(self, cmd, args, process_input=None):
         full_args = ["ovs-ofctl", cmd, self.br_name] + args
@@ -205,14 +243,14 @@ class OVSBridge(BaseOVS):
     def add_flow(self, **kwargs):
         flow_str = self.add_or_mod_flow_str(**kwargs)
         if self.defer_apply_flows:
-            self.deferred_flows['add'] += flow_str + '\n'
+            self.deferred_flows.append(('add', flow_str))
         else:
             self.run_ofctl("add-flow", [flow_str])
 
     def mod_flow(self, **kwargs):
         flow_str = self.add_or_mod_flow_str(**kwargs)
         if self.defer_apply_flows:
-            self.deferred_flows['mod'] += flow_str + '\n'
+            self.deferred_flows.append(('mod', flow_str))
         else:
             self.run_ofctl("mod-flows", [flow_str])
 
@@ -223,26 +261,44 @@ class OVSBridge(BaseOVS):
             flow_expr_arr.append("actions=%s" % (kwargs["actions"]))
         flow_str = ",".join(flow_expr_arr)
         if self.defer_apply_flows:
-            self.deferred_flows['del'] += flow_str + '\n'
+            self.deferred_flows.append(('del', flow_str))
         else:
             self.run_ofctl("del-flows", [flow_str])
 
+    @contextlib.contextmanager
+    def defer_apply(self):
+        """Defer ovs-vsctl set/clear commands and flow changes.
+
+        Deferred ovs-vsctl commands are applied in one transaction and
+        consecutive flow changes of the same kind in one ovs-ofctl call.
+        """
+        self.defer_apply_on()
+        try:
+            yield
+        finally:
+            self.defer_apply_off()
+
     def defer_apply_on(self):
         LOG.debug(_('defer_apply_on'))
         self.defer_apply_flows = True
 
     def defer_apply_off(self):
         LOG.debug(_('defer_apply_off'))
-        for action, flows in self.deferred_flows.items():
-            if flows:
-                LOG.debug(_('Applying following deferred flows '
-                            'to bridge %s'), self.br_name)
-                for line in flows.splitlines():
-                    LOG.debug(_('%(action)s: %(flow)s'),
-                              {'action': action, 'flow': line})
-                self.run_ofctl('%s-flows' % action, ['-'], flows)
         self.defer_apply_flows = False
-        self.deferred_flows = {'add': '', 'mod': '', 'del': ''}
+        self._apply_deferred_vsctl()
+        deferred_flows = self.deferred_flows
+        self.deferred_flows = []
+        # Keep the order between the different kinds of changes
+        for action, group in itertools.groupby(deferred_flows,
+                                               lambda flow: flow[0]):
+            flows = [flow for action_, flow in group]
+            LOG.debug(_('Applying following deferred flows '
+                        'to bridge %s'), self.br_name)
+            for flow in flows:
+                LOG.debug(_('%(action)s: %(flow)s'),
+                          {'action': action, 'flow': flow})
+            self.run_ofctl('%s-flows' % action, ['-'],
+                           ''.join(flow + '\n' for flow in flows))
 
     def add_tunnel_port(self, port_name, remote_ip, local_ip,
                         tunnel_type=constants.TYPE_GRE,
@@ -375,6 +431,30 @@ class OVSBridge(BaseOVS):
             LOG.info(_("Unable to parse regex results. Exception: %s"), e)
             return
 
+    def get_vif_ports_by_ids(self, port_ids):
+        """Return the VIF objects of port_ids, by port id.
+
+        Unlike calling get_vif_port_by_id for each port, all the
+        interfaces are read with a single ovs-vsctl call.
+        """
+        vif_ports = {}
+        port_ids = set(port_ids)
+        args = ['--format=json', '--', '--columns=name,external_ids,ofport',
+                'list', 'Interface']
+        result = self.run_vsctl(args)
+        if not result:
+            return vif_ports
+        for name, external_ids, ofport in jsonutils.loads(result)['data']:
+            external_ids = dict(external_ids[1])
+            vif_id = external_ids.get('iface-id')
+            if (vif_id not in port_ids or
+                'attached-mac' not in external_ids or
+                not isinstance(ofport, int)):
+                continue
+            vif_ports[vif_id] = VifPort(name, ofport, vif_id,
+                                        external_ids['attached-mac'], self)
+        return vif_ports
+
     def delete_ports(self, all_ports=False):
         if all_ports:
             port_names = self.get_port_name_list()
@@ -17,6 +17,7 @@
 import eventlet
 
 from neutron.agent.linux import async_process
+from neutron.openstack.common import jsonutils
 from neutron.openstack.common import log as logging
 
 
@@ -67,17 +68,24 @@ class SimpleInterfaceMonitor(OvsdbMonitor):
     The has_updates() method indicates whether changes to the ovsdb
     Interface table have been detected since the monitor started or
     since the previous access.
+
+    The get_events() method returns the vif ports added and removed
+    according to the row deltas received.
     """
 
     def __init__(self, root_helper=None, respawn_interval=None):
         super(SimpleInterfaceMonitor, self).__init__(
             'Interface',
-            columns=['name'],
+            columns=['name', 'external_ids', 'ofport'],
             format='json',
             root_helper=root_helper,
             respawn_interval=respawn_interval,
         )
         self.data_received = False
+        # iface-id and name of the vif port of each Interface row uuid
+        self._vif_ports = {}
+        self._reset_events()
+        self._updates_pending = False
 
     @property
     def is_active(self):
@@ -94,7 +102,83 @@ class SimpleInterfaceMonitor(OvsdbMonitor):
         the absense of updates at the expense of potential false
         positives.
         """
-        return bool(list(self.iter_stdout())) or not self.is_active
+        self.process_events()
+        has_updates = self._updates_pending
+        self._updates_pending = False
+        return has_updates or not self.is_active
+
+    def get_events(self):
+        """Return the vif ports changed since the previous call.
+
+        The result is a dict with the names of the added ports by
+        iface-id under 'added' and the set of removed iface-ids under
+        'removed'. None is returned when the changes cannot be derived
+        from the deltas and all the ports must be listed instead.
+        """
+        self.process_events()
+        if self._events_unknown:
+            events = None
+        else:
+            events = {'added': self._added, 'removed': self._removed}
+        self._reset_events()
+        return events
+
+    def process_events(self):
+        for line in self.iter_stdout():
+            self._updates_pending = True
+            try:
+                self._process_update(jsonutils.loads(line))
+            except (ValueError, KeyError, IndexError, TypeError):
+                LOG.warning(_('Unable to parse ovsdb monitor output: %s'),
+                            line)
+                self._events_unknown = True
+
+    def _reset_events(self):
+        self._added = {}
+        self._removed = set()
+        self._events_unknown = False
+
+    def _process_update(self, update):
+        headings = update['headings']
+        rows = [dict(zip(headings, data)) for data in update['data']]
+        if rows and rows[0]['action'] == 'initial':
+            # The monitor (re)started and dumps the whole table, forget
+            # the rows deleted while it was not running.
+            for row_uuid in set(self._vif_ports) - set(
+                    row['row'] for row in rows):
+                self._update_vif_port(row_uuid, None)
+        for row in rows:
+            if row['action'] in ('initial', 'insert', 'new'):
+                self._update_vif_port(row['row'], self._get_vif_port(row))
+            elif row['action'] == 'delete':
+                self._update_vif_port(row['row'], None)
+
+    def _get_vif_port(self, row):
+        external_ids = dict(row['external_ids'][1])
+        if 'attached-mac' not in external_ids:
+            return
+        if 'iface-id' not in external_ids:
+            if 'xs-vif-uuid' in external_ids:
+                # The iface-id has to be looked up from XAPI
+                self._events_unknown = True
+            return
+        # ofport is an empty set until OVS assigns it and -1 on failure
+        if not isinstance(row['ofport'], int) or row['ofport'] < 0:
+            return
+        return external_ids['iface-id'], row['name']
+
+    def _update_vif_port(self, row_uuid, vif_port):
+        old_vif_port = self._vif_ports.pop(row_uuid, None)
+        if vif_port:
+            self._vif_ports[row_uuid] = vif_port
+        if old_vif_port == vif_port:
+            return
+        if old_vif_port:
+            self._added.pop(old_vif_port[0], None)
+            self._removed.add(old_vif_port[0])
+        if vif_port:
+            self._removed.discard(vif_port[0])
+            self._added[vif_port[0]] = vif_port[1]
 
     def start(self, block=False, timeout=5):
         super(SimpleInterfaceMonitor, self).start()
@@ -50,6 +50,14 @@ class BasePollingManager(object):
     def _is_polling_required(self):
         raise NotImplemented
 
+    def get_port_events(self):
+        """Return the port changes detected since the previous polling.
+
+        None means the changes are unknown and the ports have to be
+        listed.
+        """
+        return None
+
     @property
     def is_polling_required(self):
         # Always consume the updates to minimize polling.
@@ -90,6 +98,23 @@ class InterfacePollingMinimizer(BasePollingManager):
         super(InterfacePollingMinimizer, self).__init__()
         self._monitor = ovsdb_monitor.SimpleInterfaceMonitor(
             root_helper=root_helper)
+        # Port events can only be relied on once the ports have been
+        # listed after the last forced polling.
+        self._listing_required = True
+
+    def force_polling(self):
+        super(InterfacePollingMinimizer, self).force_polling()
+        self._listing_required = True
+
+    def polling_completed(self):
+        super(InterfacePollingMinimizer, self).polling_completed()
+        self._listing_required = False
+
+    def get_port_events(self):
+        events = self._monitor.get_events()
+        if self._listing_required or not self._monitor.is_active:
+            return None
+        return events
 
     def start(self):
         self._monitor.start()
@@ -0,0 +1,185 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Long-lived root wrapper
+
+   Filters commands exactly like neutron-rootwrap, using the same
+   configuration file and .filters files, but runs them on behalf of the
+   agent which started it until that agent goes away.  This saves the
+   sudo and Python interpreter startup of neutron-rootwrap for every
+   command.
+
+   The agent spawns it once, e.g. with root_helper_daemon set to
+   "sudo neutron-rootwrap-daemon /etc/neutron/rootwrap.conf" in the
+   [AGENT] section, and talks to it through its stdin and stdout: only
+   the process which started the daemon can send it commands.  Each
+   message is a JSON object prefixed by its length.  Requests hold the
+   command line and its input, replies its exit code and outputs.  The
+   daemon exits when its stdin is closed.
+
+   You also need to let the neutron user run neutron-rootwrap-daemon
+   as root in sudoers:
+   neutron ALL = (root) NOPASSWD: /usr/bin/neutron-rootwrap-daemon
+                                   /etc/neutron/rootwrap.conf
+"""
+
+import ConfigParser
+import json
+import logging
+import os
+import pwd
+import struct
+import subprocess
+import sys
+
+from neutron.openstack.common.rootwrap import cmd as rootwrap_cmd
+
+
+HEADER = struct.Struct('!I')
+# Outputs are not necessarily valid UTF-8, latin-1 maps every byte to a
+# code point and back.
+ENCODING = 'latin-1'
+
+
+def write_message(stream, message):
+    """Write the JSON serializable message to stream."""
+    data = json.dumps(message)
+    stream.write(HEADER.pack(len(data)) + data)
+    stream.flush()
+
+
+def _read_exactly(stream, size):
+    data = ''
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise EOFError()
+        data += chunk
+    return data
+
+
+def read_message(stream):
+    """Read a message from stream, None if stream was closed."""
+    try:
+        header = _read_exactly(stream, HEADER.size)
+    except EOFError:
+        return None
+    (size,) = HEADER.unpack(header)
+    return json.loads(_read_exactly(stream, size))
+
+
+def encode_data(data):
+    return data.decode(ENCODING) if data else ''
+
+
+def decode_data(data):
+    return data.encode(ENCODING) if data else ''
+
+
+def encode_arg(arg):
+    """Return the command line argument arg as a byte string."""
+    if isinstance(arg, unicode):
+        return arg.encode('utf-8')
+    return str(arg)
+
+
+def run_command(config, filters, userargs, process_input=None):
+    """Run userargs if a filter allows it.
+
+    Returns the exit code, standard output and standard error of the
+    command, or the neutron-rootwrap exit code and error message.
+    """
+    # Imported here as neutron-rootwrap does, to keep its import cost
+    # out of the agents.
+    from neutron.openstack.common.rootwrap import wrapper
+
+    try:
+        filtermatch = wrapper.match_filter(filters, userargs,
+                                           exec_dirs=config.exec_dirs)
+        command = filtermatch.get_command(userargs,
+                                          exec_dirs=config.exec_dirs)
+    except wrapper.FilterMatchNotExecutable as exc:
+        msg = ("Executable not found: %s (filter match = %s)"
+               % (exc.match.exec_path, exc.match.name))
+        if config.use_syslog:
+            logging.error(msg)
+        return rootwrap_cmd.RC_NOEXECFOUND, '', msg
+    except wrapper.NoFilterMatched:
+        msg = ("Unauthorized command: %s (no filter matched)"
+               % ' '.join(userargs))
+        if config.use_syslog:
+            logging.error(msg)
+        return rootwrap_cmd.RC_UNAUTHORIZED, '', msg
+
+    if config.use_syslog:
+        logging.info("(%s > %s) Executing %s (filter match = %s)" % (
+            rootwrap_cmd._getlogin(), pwd.getpwuid(os.getuid())[0],
+            command, filtermatch.name))
+    obj = subprocess.Popen(command,
+                           stdin=subprocess.PIPE,
+                           stdout=subprocess.PIPE,
+                           stderr=subprocess.PIPE,
+                           preexec_fn=rootwrap_cmd._subprocess_setup,
+                           env=filtermatch.get_environment(userargs))
+    stdout, stderr = obj.communicate(process_input)
+    return obj.returncode, stdout, stderr
+
+
+def serve(config, filters, stdin, stdout):
+    """Run the commands read from stdin until it is closed."""
+    while True:
+        request = read_message(stdin)
+        if request is None:
+            return
+        returncode, out, err = run_command(
+            config, filters, [encode_arg(arg) for arg in request['cmd']],
+            decode_data(request.get('stdin')) or None)
+        write_message(stdout, {'returncode': returncode,
+                               'stdout': encode_data(out),
+                               'stderr': encode_data(err)})
+
+
+def main():
+    execname = sys.argv.pop(0)
+    if len(sys.argv) != 1:
+        rootwrap_cmd._exit_error(execname, "No configuration file specified",
+                                 rootwrap_cmd.RC_BADCONFIG, log=False)
+    configfile = sys.argv.pop(0)
+
+    from neutron.openstack.common.rootwrap import wrapper
+
+    try:
+        rawconfig = ConfigParser.RawConfigParser()
+        rawconfig.read(configfile)
+        config = wrapper.RootwrapConfig(rawconfig)
+    except ValueError as exc:
+        msg = "Incorrect value in %s: %s" % (configfile, exc.message)
+        rootwrap_cmd._exit_error(execname, msg, rootwrap_cmd.RC_BADCONFIG,
+                                 log=False)
+    except ConfigParser.Error:
+        rootwrap_cmd._exit_error(execname,
+                                 "Incorrect configuration file: %s" %
+                                 configfile,
+                                 rootwrap_cmd.RC_BADCONFIG, log=False)
+
+    if config.use_syslog:
+        wrapper.setup_syslog(execname,
+                             config.syslog_log_facility,
+                             config.syslog_log_level)
+
+    filters = wrapper.load_filters(config.filters_path)
+    serve(config, filters, sys.stdin, sys.stdout)
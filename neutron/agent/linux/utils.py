@@ -26,13 +26,111 @@ import tempfile
 
 from eventlet.green import subprocess
 from eventlet import greenthread
+from eventlet import semaphore
+from oslo.config import cfg
 
+from neutron.agent.linux import rootwrap_daemon
 from neutron.common import utils
 from neutron.openstack.common import log as logging
 
 
 LOG = logging.getLogger(__name__)
 
+# root helper daemon clients, by daemon command line
+_root_helper_daemons = {}
+
+
+class _RootHelperDaemon(object):
+    """A neutron-rootwrap-daemon process, running one command at a time.
+
+    The daemon is started on the first command and restarted if it
+    exited.
+    """
+
+    def __init__(self, daemon_cmd):
+        self.daemon_cmd = daemon_cmd
+        self._process = None
+
+    def _start(self):
+        LOG.debug(_("Starting root helper daemon: %s"), self.daemon_cmd)
+        self._process = utils.subprocess_popen(self.daemon_cmd, shell=False,
+                                               stdin=subprocess.PIPE,
+                                               stdout=subprocess.PIPE)
+
+    def _stop(self):
+        if self._process is None:
+            return
+        # The daemon runs as root, closing its stdin makes it exit.
+        try:
+            self._process.stdin.close()
+        except IOError:
+            pass
+        self._process.wait()
+        self._process = None
+
+    def execute(self, cmd, process_input=None):
+        if self._process is None or self._process.poll() is not None:
+            self._start()
+        try:
+            rootwrap_daemon.write_message(
+                self._process.stdin,
+                {'cmd': cmd,
+                 'stdin': rootwrap_daemon.encode_data(process_input)})
+            reply = rootwrap_daemon.read_message(self._process.stdout)
+            if reply is None:
+                raise RuntimeError(_("Root helper daemon %s exited") %
+                                   self.daemon_cmd)
+            return (reply['returncode'],
+                    rootwrap_daemon.decode_data(reply['stdout']),
+                    rootwrap_daemon.decode_data(reply['stderr']))
+        except BaseException:
+            # Interrupted mid-request, e.g. by a timeout or a malformed
+            # reply, the daemon could hand its pending reply to the next
+            # command, it is stopped instead.
+            self._stop()
+            raise
+
+
+class RootHelperDaemonClient(object):
+    """Run commands through a pool of neutron-rootwrap-daemons.
+
+    Each daemon runs one command at a time, so up to pool_size commands
+    run concurrently.  A new daemon is only started when all the others
+    are busy.
+    """
+
+    def __init__(self, daemon_cmd, pool_size=1):
+        self.daemon_cmd = shlex.split(daemon_cmd)
+        self._semaphore = semaphore.Semaphore(pool_size)
+        self._idle = []
+
+    def execute(self, cmd, process_input=None):
+        """Run cmd, returns its exit code, stdout and stderr."""
+        with self._semaphore:
+            if self._idle:
+                daemon = self._idle.pop()
+            else:
+                daemon = _RootHelperDaemon(self.daemon_cmd)
+            # A daemon failing a command is stopped and dropped, only
+            # the daemons which sent a complete reply are reused.
+            result = daemon.execute(cmd, process_input)
+            self._idle.append(daemon)
+            return result
+
+
+def get_root_helper_daemon():
+    """Return the client of the configured root helper daemon, if any."""
+    try:
+        daemon_cmd = cfg.CONF.AGENT.root_helper_daemon
+    except cfg.NoSuchOptError:
+        return None
+    if not daemon_cmd:
+        return None
+    if daemon_cmd not in _root_helper_daemons:
+        _root_helper_daemons[daemon_cmd] = RootHelperDaemonClient(
+            daemon_cmd, cfg.CONF.AGENT.root_helper_daemon_pool_size)
+    return _root_helper_daemons[daemon_cmd]
+
 
 def create_process(cmd, root_helper=None, addl_env=None):
     """Create a process object for the given command.
@@ -61,17 +159,27 @@ def create_process(cmd, root_helper=None, addl_env=None):
 def execute(cmd, root_helper=None, process_input=None, addl_env=None,
             check_exit_code=True, return_stderr=False):
     try:
-        obj, cmd = create_process(cmd, root_helper=root_helper,
-                                  addl_env=addl_env)
-        _stdout, _stderr = (process_input and
-                            obj.communicate(process_input) or
-                            obj.communicate())
-        obj.stdin.close()
+        # sudo drops the environment anyway, commands which need one
+        # are still run through the root helper.
+        daemon = root_helper and not addl_env and get_root_helper_daemon()
+        if daemon:
+            cmd = map(rootwrap_daemon.encode_arg, cmd)
+            LOG.debug(_("Running command with root helper daemon: %s"), cmd)
+            returncode, _stdout, _stderr = daemon.execute(cmd,
+                                                          process_input)
+        else:
+            obj, cmd = create_process(cmd, root_helper=root_helper,
+                                      addl_env=addl_env)
+            _stdout, _stderr = (process_input and
+                                obj.communicate(process_input) or
+                                obj.communicate())
+            obj.stdin.close()
+            returncode = obj.returncode
         m = _("\nCommand: %(cmd)s\nExit code: %(code)s\nStdout: %(stdout)r\n"
-              "Stderr: %(stderr)r") % {'cmd': cmd, 'code': obj.returncode,
+              "Stderr: %(stderr)r") % {'cmd': cmd, 'code': returncode,
                                        'stdout': _stdout, 'stderr': _stderr}
         LOG.debug(m)
-        if obj.returncode and check_exit_code:
+        if returncode and check_exit_code:
             raise RuntimeError(m)
     finally:
         # NOTE(termie): this appears to be necessary to let the subprocess
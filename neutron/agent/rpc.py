@@ -21,6 +21,7 @@ from neutron.common import topics
 
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import rpc
+from neutron.openstack.common.rpc import common as rpc_common
 from neutron.openstack.common.rpc import proxy
 from neutron.openstack.common import timeutils
 
@@ -79,10 +80,12 @@ class PluginApi(proxy.RpcProxy):
 
     API version history:
         1.0 - Initial version.
+        1.3 - get_devices_details_list and update_device_list support.
 
     '''
 
     BASE_RPC_API_VERSION = '1.1'
+    DEVICE_LIST_RPC_API_VERSION = '1.3'
 
     def __init__(self, topic):
         super(PluginApi, self).__init__(
@@ -94,6 +97,63 @@ class PluginApi(proxy.RpcProxy):
                                        agent_id=agent_id),
                          topic=self.topic)
 
+    def _call_device_list(self, context, msg):
+        """Call a device list method, None if the plugin lacks it."""
+        try:
+            return self.call(context, msg, topic=self.topic,
+                             version=self.DEVICE_LIST_RPC_API_VERSION)
+        except rpc_common.RemoteError as e:
+            if e.exc_type != 'UnsupportedRpcVersion':
+                raise
+            LOG.debug(_("Plugin does not support %s, falling back to "
+                        "one call per device"), msg['method'])
+
+    def get_devices_details_list(self, context, devices, agent_id):
+        """Get the details of several devices in one call."""
+        details = self._call_device_list(
+            context, self.make_msg('get_devices_details_list',
+                                   devices=devices, agent_id=agent_id))
+        if details is None:
+            details = [self.get_device_details(context, device, agent_id)
+                       for device in devices]
+        return details
+
+    def update_device_list(self, context, devices_up, devices_down,
+                           agent_id, host=None):
+        """Report several devices up and down in one call.
+
+        Returns a dict with the devices which were set up, the entries
+        of the devices which were set down and the devices which could
+        not be updated.
+        """
+        result = self._call_device_list(
+            context, self.make_msg('update_device_list',
+                                   devices_up=devices_up,
+                                   devices_down=devices_down,
+                                   agent_id=agent_id, host=host))
+        if result is not None:
+            return result
+        result = {'devices_up': [], 'failed_devices_up': [],
+                  'devices_down': [], 'failed_devices_down': []}
+        for device in devices_up:
+            try:
+                self.update_device_up(context, device, agent_id, host)
+            except Exception as e:
+                LOG.debug(_("Unable to set %(device)s up: %(e)s"),
+                          {'device': device, 'e': e})
+                result['failed_devices_up'].append(device)
+            else:
+                result['devices_up'].append(device)
+        for device in devices_down:
+            try:
+                result['devices_down'].append(
+                    self.update_device_down(context, device, agent_id, host))
+            except Exception as e:
+                LOG.debug(_("Unable to set %(device)s down: %(e)s"),
+                          {'device': device, 'e': e})
+                result['failed_devices_down'].append(device)
+        return result
+
     def update_device_down(self, context, device, agent_id, host=None):
         return self.call(context,
                          self.make_msg('update_device_down', device=device,
@@ -16,20 +16,32 @@
 #    under the License.
 #
 
+import netaddr
 from oslo.config import cfg
 
 from neutron.common import topics
 from neutron.openstack.common import importutils
 from neutron.openstack.common import log as logging
+from neutron.openstack.common.rpc import common as rpc_common
 
 LOG = logging.getLogger(__name__)
 SG_RPC_VERSION = "1.1"
+# security_group_info_for_devices was added in 1.2
+SG_INFO_RPC_VERSION = "1.2"
+
+DIRECTION_IP_PREFIX = {'ingress': 'source_ip_prefix',
+                       'egress': 'dest_ip_prefix'}
 
 security_group_opts = [
     cfg.StrOpt(
         'firewall_driver',
         default='neutron.agent.firewall.NoopFirewallDriver',
-        help=_('Driver for Security Groups Firewall'))
+        help=_('Driver for Security Groups Firewall')),
+    cfg.BoolOpt(
+        'enable_ipset',
+        default=False,
+        help=_('Use ipset to match the members of remote security groups '
+               'instead of one iptables rule per member'))
 ]
 cfg.CONF.register_opts(security_group_opts, 'SECURITYGROUP')
 
@@ -57,6 +69,19 @@ class SecurityGroupServerRpcApiMixin(object):
                          version=SG_RPC_VERSION,
                          topic=self.topic)
 
+    def security_group_info_for_devices(self, context, devices):
+        """Get the security groups of the devices with their rules.
+
+        Raises RemoteError if the plugin does not support version 1.2.
+        """
+        LOG.debug(_("Get security group information "
+                    "for devices via rpc %r"), devices)
+        return self.call(context,
+                         self.make_msg('security_group_info_for_devices',
+                                       devices=devices),
+                         version=SG_INFO_RPC_VERSION,
+                         topic=self.topic)
+
 
 class SecurityGroupAgentRpcCallbackMixin(object):
     """A mix-in that enable SecurityGroup agent
@@ -107,17 +132,76 @@ class SecurityGroupAgentRpcMixin(object):
     support in agent implementations.
     """
 
+    # Whether the plugin supports security_group_info_for_devices,
+    # None until the first request tells
+    sg_info_supported = None
+
     def init_firewall(self):
         firewall_driver = cfg.CONF.SECURITYGROUP.firewall_driver
         LOG.debug(_("Init firewall settings (driver=%s)"), firewall_driver)
         self.firewall = importutils.import_object(firewall_driver)
 
+    def _security_group_rules_for_devices(self, device_ids):
+        if self.sg_info_supported is not False:
+            try:
+                sg_info = self.plugin_rpc.security_group_info_for_devices(
+                    self.context, device_ids)
+            except rpc_common.RemoteError as e:
+                if (self.sg_info_supported or
+                    e.exc_type != 'UnsupportedRpcVersion'):
+                    raise
+                LOG.info(_("Plugin does not support "
+                           "security_group_info_for_devices, "
+                           "falling back to "
+                           "security_group_rules_for_devices"))
+                self.sg_info_supported = False
+            else:
+                self.sg_info_supported = True
+                return self._expand_security_group_info(sg_info)
+        return self.plugin_rpc.security_group_rules_for_devices(
+            self.context, device_ids)
+
+    def _expand_security_group_info(self, sg_info):
+        """Build the rules of each device from security group information.
+
+        Returns the devices the way security_group_rules_for_devices
+        does, with remote_group_id rules converted to one rule per
+        member address.
+        """
+        devices = sg_info['devices']
+        sg_rules = sg_info['security_groups']
+        sg_member_ips = sg_info['sg_member_ips']
+        for device in devices.values():
+            fixed_ips = device.get('fixed_ips', [])
+            rules = []
+            for sg_id in device.get('security_groups', []):
+                for rule in sg_rules.get(sg_id, []):
+                    remote_group_id = rule.get('remote_group_id')
+                    if not remote_group_id:
+                        rules.append(rule)
+                        continue
+                    device['security_group_source_groups'].append(
+                        remote_group_id)
+                    direction_ip_prefix = DIRECTION_IP_PREFIX[
+                        rule['direction']]
+                    member_ips = sg_member_ips.get(remote_group_id, {})
+                    for ip in member_ips.get(rule['ethertype'], []):
+                        if ip in fixed_ips:
+                            continue
+                        ip_rule = rule.copy()
+                        ip_rule[direction_ip_prefix] = str(
+                            netaddr.IPNetwork(ip).cidr)
+                        rules.append(ip_rule)
+            # provider rules
+            rules.extend(device['security_group_rules'])
+            device['security_group_rules'] = rules
+        return devices
+
     def prepare_devices_filter(self, device_ids):
         if not device_ids:
             return
         LOG.info(_("Preparing filters for devices %s"), device_ids)
-        devices = self.plugin_rpc.security_group_rules_for_devices(
-            self.context, list(device_ids))
+        devices = self._security_group_rules_for_devices(list(device_ids))
         with self.firewall.defer_apply():
             for device in devices.values():
                 self.firewall.prepare_port_filter(device)
@@ -171,8 +255,7 @@ class SecurityGroupAgentRpcMixin(object):
         if not device_ids:
             LOG.info(_("No ports here to refresh firewall"))
             return
-        devices = self.plugin_rpc.security_group_rules_for_devices(
-            self.context, device_ids)
+        devices = self._security_group_rules_for_devices(device_ids)
         with self.firewall.defer_apply():
             for device in devices.values():
                 LOG.debug(_("Update port filter for %s"), device['device'])
@@ -144,14 +144,50 @@ class Controller(object):
         attr_val = self._attr_info.get(attr_name)
         return attr_val and attr_val['is_visible'] and authz_check
 
-    def _view(self, context, data, fields_to_strip=None):
+    def _get_visibility(self, context):
+        """Return the visibility of the attributes on any object.
+
+        The policy of each attribute is checked once for all the objects.
+        An attribute is mapped to None when it has to be checked on each
+        object by _is_visible.
+        """
+        action = self._plugin_handlers[self.SHOW]
+        resource = attributes.RESOURCE_ATTRIBUTE_MAP.get(self._collection, {})
+        visibility = {}
+        for attr_name, attr_val in self._attr_info.iteritems():
+            attr = resource.get(attr_name)
+            if not attr_val['is_visible']:
+                visibility[attr_name] = False
+            elif attr and attr.get('enforce_policy'):
+                try:
+                    visibility[attr_name] = (
+                        policy.check_if_exists_on_any_target(
+                            context, "%s:%s" % (action, attr_name)))
+                except exceptions.PolicyRuleNotFound:
+                    visibility[attr_name] = True
+            else:
+                visibility[attr_name] = True
+        return visibility
+
+    def _view(self, context, data, fields_to_strip=None, visibility=None):
         # make sure fields_to_strip is iterable
         if not fields_to_strip:
             fields_to_strip = []
 
-        return dict(item for item in data.iteritems()
-                    if (self._is_visible(context, item[0], data) and
-                        item[0] not in fields_to_strip))
+        if visibility is None:
+            return dict(item for item in data.iteritems()
+                        if (self._is_visible(context, item[0], data) and
+                            item[0] not in fields_to_strip))
+        result = {}
+        for attr_name, value in data.iteritems():
+            if attr_name in fields_to_strip:
+                continue
+            visible = visibility.get(attr_name, False)
+            if visible is None:
+                visible = self._is_visible(context, attr_name, data)
+            if visible:
+                result[attr_name] = value
+        return result
 
     def _do_field_list(self, original_fields):
         fields_to_add = None
@@ -237,9 +273,11 @@ class Controller(object):
                                         self._plugin_handlers[self.SHOW],
                                         obj,
                                         plugin=self._plugin)]
+        visibility = self._get_visibility(request.context)
         collection = {self._collection:
                       [self._view(request.context, obj,
-                                  fields_to_strip=fields_to_add)
+                                  fields_to_strip=fields_to_add,
+                                  visibility=visibility)
                        for obj in obj_list]}
         pagination_links = pagination_helper.get_links(obj_list)
         if pagination_links:
@@ -349,6 +387,8 @@ class Controller(object):
         else:
             items = [body]
             bulk = False
+        # The resources of a tenant are only counted once per request
+        counts = {}
         for item in items:
             self._validate_network_tenant_ownership(request,
                                                     item[self._resource])
@@ -357,9 +397,11 @@ class Controller(object):
                            item[self._resource])
             try:
                 tenant_id = item[self._resource]['tenant_id']
-                count = quota.QUOTAS.count(request.context, self._resource,
-                                           self._plugin, self._collection,
-                                           tenant_id)
+                if tenant_id not in counts:
+                    counts[tenant_id] = quota.QUOTAS.count(
+                        request.context, self._resource, self._plugin,
+                        self._collection, tenant_id)
+                count = counts[tenant_id]
                 if bulk:
                     delta = deltas.get(tenant_id, 0) + 1
                     deltas[tenant_id] = delta
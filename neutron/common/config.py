@@ -45,6 +45,10 @@ core_opts = [
                help=_("The path for API extensions")),
     cfg.StrOpt('policy_file', default="policy.json",
                help=_("The policy file to use")),
+    cfg.BoolOpt('policy_cache', default=False,
+                help=_("Compile the policy rules once per revision of the "
+                       "policy file and cache the results of the checks "
+                       "which do not depend on their target")),
     cfg.StrOpt('auth_strategy', default='keystone',
                help=_("The type of authentication to use")),
     cfg.StrOpt('core_plugin',
@@ -17,12 +17,25 @@
 
 from neutron import context
 from neutron.openstack.common import log as logging
+from neutron.openstack.common import rpc
 from neutron.openstack.common.rpc import dispatcher
 
 
 LOG = logging.getLogger(__name__)
 
 
+def reset_connection_pool():
+    """Drop the pooled messaging connections inherited from the parent.
+
+    To be called by a process right after it was forked: the pooled
+    connections share their sockets with the parent process, so they
+    are forgotten rather than closed.
+    """
+    connection_cls = getattr(rpc._get_impl(), 'Connection', None)
+    if getattr(connection_cls, 'pool', None) is not None:
+        connection_cls.pool = None
+
+
 class PluginRpcDispatcher(dispatcher.RpcDispatcher):
     """This class is used to convert RPC common context into
     Neutron Context.
@@ -42,3 +55,43 @@ class PluginRpcDispatcher(dispatcher.RpcDispatcher):
         neutron_ctxt = context.Context(user_id, tenant_id, **rpc_ctxt_dict)
         return super(PluginRpcDispatcher, self).dispatch(
             neutron_ctxt, version, method, namespace, **kwargs)
+
+
+class DeviceListRpcCallbackMixin(object):
+    """A mix-in that adds the device list calls to plugin rpc callbacks.
+
+    The callbacks must implement get_device_details, update_device_up
+    and update_device_down. Plugins able to fetch the details of several
+    devices at once should override get_devices_details_list.
+    """
+
+    def get_devices_details_list(self, rpc_context, **kwargs):
+        """Agent requests the details of several devices."""
+        devices = kwargs.pop('devices', [])
+        return [self.get_device_details(rpc_context, device=device,
+                                        **kwargs)
+                for device in devices]
+
+    def update_device_list(self, rpc_context, **kwargs):
+        """Devices are up or no longer exist on agent."""
+        devices_up = kwargs.pop('devices_up', [])
+        devices_down = kwargs.pop('devices_down', [])
+        result = {'devices_up': [], 'failed_devices_up': [],
+                  'devices_down': [], 'failed_devices_down': []}
+        for device in devices_up:
+            try:
+                self.update_device_up(rpc_context, device=device, **kwargs)
+            except Exception:
+                LOG.exception(_("Failed to set device %s up"), device)
+                result['failed_devices_up'].append(device)
+            else:
+                result['devices_up'].append(device)
+        for device in devices_down:
+            try:
+                result['devices_down'].append(
+                    self.update_device_down(rpc_context, device=device,
+                                            **kwargs))
+            except Exception:
+                LOG.exception(_("Failed to set device %s down"), device)
+                result['failed_devices_down'].append(device)
+        return result
@@ -15,24 +15,36 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import copy
+
 from eventlet import greenthread
 
 from oslo.config import cfg
 import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.orm import attributes
 from sqlalchemy.orm import exc
 
+from neutron.db import api as db_api
 from neutron.db import model_base
 from neutron.db import models_v2
 from neutron.extensions import agent as ext_agent
 from neutron import manager
 from neutron.openstack.common import jsonutils
 from neutron.openstack.common import log as logging
+from neutron.openstack.common import loopingcall
 from neutron.openstack.common import timeutils
 
 LOG = logging.getLogger(__name__)
 cfg.CONF.register_opt(
     cfg.IntOpt('agent_down_time', default=5,
                help=_("Seconds to regard the agent is down.")))
+cfg.CONF.register_opt(
+    cfg.IntOpt('agent_heartbeat_flush_interval', default=0,
+               help=_("Seconds between the writes of the agent heartbeats "
+                      "to the database. The heartbeats of the agents whose "
+                      "configurations did not change are kept in memory "
+                      "until then. 0 writes each heartbeat.")))
 
 
 class Agent(model_base.BASEV2, models_v2.HasId):
@@ -59,6 +71,122 @@ class Agent(model_base.BASEV2, models_v2.HasId):
     configurations = sa.Column(sa.String(4095), nullable=False)
 
 
+# The statistics reported in the configurations of the agents, which change
+# with nearly every report and are written along with the heartbeats
+VOLATILE_CONFIGURATIONS = frozenset(['update_queue_depth',
+                                     'update_queue_in_progress',
+                                     'update_latency_avg',
+                                     'update_latency_max'])
+
+
+def _stable_configurations(configurations):
+    return dict((k, v) for k, v in configurations.iteritems()
+                if k not in VOLATILE_CONFIGURATIONS)
+
+
+class AgentHeartbeats(object):
+    """Heartbeats of the agents written to the database periodically.
+
+    A heartbeat of an agent which is not starting and whose configurations
+    did not change since they were last written is only kept in memory,
+    the VOLATILE_CONFIGURATIONS statistics being ignored.  The heartbeats
+    kept are written every agent_heartbeat_flush_interval seconds by one
+    batched UPDATE, with their configurations.  Until then, the agents
+    loaded from the database by this process get their last heartbeat
+    from memory.
+    """
+
+    def __init__(self):
+        # (agent_type, host) -> (agent id, configurations)
+        self._agents = {}
+        # agent id -> last heartbeat received
+        self._heartbeats = {}
+        # agent id -> (heartbeat, configurations) not written yet
+        self._pending = {}
+        self._loop = None
+
+    def record(self, agent_state, heartbeat):
+        """Keep the heartbeat of an agent in memory if it can be.
+
+        Return False if the report must be written to the database.
+        """
+        key = (agent_state['agent_type'], agent_state['host'])
+        if agent_state.get('start_flag') or key not in self._agents:
+            return False
+        agent_id, configurations = self._agents[key]
+        reported = agent_state.get('configurations', {})
+        if _stable_configurations(reported) != configurations:
+            return False
+        self._heartbeats[agent_id] = heartbeat
+        self._pending[agent_id] = (heartbeat, jsonutils.dumps(reported))
+        if not self._loop:
+            self._loop = loopingcall.FixedIntervalLoopingCall(self.flush)
+            self._loop.start(
+                interval=cfg.CONF.agent_heartbeat_flush_interval)
+        return True
+
+    def stored(self, agent_db, configurations):
+        """Note that the report of an agent was written."""
+        if not agent_db.id:
+            # Not flushed yet by the enclosing transaction
+            return
+        self._agents[(agent_db.agent_type, agent_db.host)] = (
+            agent_db.id, copy.deepcopy(_stable_configurations(configurations)))
+        self._heartbeats[agent_db.id] = agent_db.heartbeat_timestamp
+        self._pending.pop(agent_db.id, None)
+
+    def forget(self, agent_id):
+        for key, (known_id, configurations) in self._agents.items():
+            if known_id == agent_id:
+                del self._agents[key]
+        self._heartbeats.pop(agent_id, None)
+        self._pending.pop(agent_id, None)
+
+    def get(self, agent_id):
+        return self._heartbeats.get(agent_id)
+
+    def flush(self):
+        """Write the heartbeats kept in memory to the database."""
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        table = Agent.__table__
+        statement = table.update().where(
+            table.c.id == sa.bindparam('agent_id')).values(
+                heartbeat_timestamp=sa.bindparam('heartbeat'),
+                configurations=sa.bindparam('configurations'))
+        try:
+            result = db_api.get_session().execute(
+                statement, [{'agent_id': agent_id, 'heartbeat': heartbeat,
+                             'configurations': configurations}
+                            for agent_id, (heartbeat, configurations)
+                            in pending.items()])
+        except Exception:
+            LOG.exception(_("Failed to write the heartbeats of %d agents"),
+                          len(pending))
+            for agent_id, report in pending.items():
+                self._pending.setdefault(agent_id, report)
+            return
+        if result.rowcount < len(pending):
+            # Agents deleted by another server are created again by their
+            # next report
+            LOG.debug(_("Some agents were not found, their next reports "
+                        "will be written"))
+            self._agents.clear()
+
+
+HEARTBEATS = AgentHeartbeats()
+
+
+@event.listens_for(Agent, 'load')
+def _load_heartbeat(agent_db, context):
+    heartbeat = HEARTBEATS.get(agent_db.id)
+    if heartbeat and heartbeat > agent_db.heartbeat_timestamp:
+        # Not a change of the agent, it must not be flushed
+        attributes.set_committed_value(agent_db, 'heartbeat_timestamp',
+                                       heartbeat)
+
+
 class AgentDbMixin(ext_agent.AgentPluginBase):
     """Mixin class to add agent extension to db_plugin_base_v2."""
 
@@ -99,6 +227,7 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
         with context.session.begin(subtransactions=True):
             agent = self._get_agent(context, id)
             context.session.delete(agent)
+        HEARTBEATS.forget(id)
 
     def update_agent(self, context, id, agent):
         agent_data = agent['agent']
@@ -135,13 +264,16 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
 
     def create_or_update_agent(self, context, agent):
         """Create or update agent according to report."""
+        current_time = timeutils.utcnow()
+        if (cfg.CONF.agent_heartbeat_flush_interval and
+                HEARTBEATS.record(agent, current_time)):
+            return
         with context.session.begin(subtransactions=True):
             res_keys = ['agent_type', 'binary', 'host', 'topic']
             res = dict((k, agent[k]) for k in res_keys)
 
             configurations_dict = agent.get('configurations', {})
             res['configurations'] = jsonutils.dumps(configurations_dict)
-            current_time = timeutils.utcnow()
             try:
                 agent_db = self._get_agent_by_type_and_host(
                     context, agent['agent_type'], agent['host'])
@@ -160,6 +292,8 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
                 greenthread.sleep(0)
                 context.session.add(agent_db)
             greenthread.sleep(0)
+        if cfg.CONF.agent_heartbeat_flush_interval:
+            HEARTBEATS.stored(agent_db, configurations_dict)
 
 
 class AgentExtRpcCallback(object):
@@ -16,7 +16,6 @@
 #    under the License.
 
 import datetime
-import itertools
 import random
 
 import netaddr
@@ -28,7 +27,9 @@ from neutron.api.v2 import attributes
 from neutron.common import constants
 from neutron.common import exceptions as q_exc
 from neutron.db import api as db
+from neutron.db import ipam
 from neutron.db import models_v2
+from neutron.db import revisions
 from neutron.db import sqlalchemyutils
 from neutron import neutron_plugin_base_v2
 from neutron.openstack.common import excutils
@@ -231,6 +232,16 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
         #                This connection is setup as memory for the tests.
         db.configure_db()
 
+    _ipam = None
+
+    @property
+    def ipam(self):
+        """The IPAM backend allocating the IP addresses of the ports."""
+        # Loaded on first use, as subclasses do not call __init__
+        if self._ipam is None:
+            self._ipam = ipam.load_backend()
+        return self._ipam
+
     @classmethod
     def register_dict_extend_funcs(cls, resource, funcs):
         cur_funcs = cls._dict_extend_functions.get(resource, [])
@@ -310,6 +321,46 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                   max_retries)
         raise q_exc.MacAddressGenerationFailure(net_id=network_id)
 
+    @staticmethod
+    def _generate_macs(context, network_id, count, excluded=()):
+        """Generate count MAC addresses unique on the network.
+
+        The candidates of each attempt are checked with one query.
+        """
+        base_mac = cfg.CONF.base_mac.split(':')
+        max_retries = cfg.CONF.mac_generation_retries
+        macs = set()
+        for i in range(max_retries):
+            candidates = set()
+            for j in range(count - len(macs)):
+                mac = [int(base_mac[0], 16), int(base_mac[1], 16),
+                       int(base_mac[2], 16), random.randint(0x00, 0xff),
+                       random.randint(0x00, 0xff), random.randint(0x00, 0xff)]
+                if base_mac[3] != '00':
+                    mac[3] = int(base_mac[3], 16)
+                candidates.add(':'.join(map(lambda x: "%02x" % x, mac)))
+            candidates -= macs
+            candidates.difference_update(excluded)
+            if candidates:
+                in_use = context.session.query(
+                    models_v2.Port.mac_address).filter(
+                        models_v2.Port.network_id == network_id,
+                        models_v2.Port.mac_address.in_(candidates))
+                candidates.difference_update(mac for mac, in in_use)
+            macs |= candidates
+            if len(macs) == count:
+                LOG.debug(_("Generated %(count)d macs for network "
+                            "%(network_id)s"),
+                          {'count': count, 'network_id': network_id})
+                return list(macs)
+            LOG.debug(_("%(missing)d generated macs exist. Remaining "
+                        "attempts %(max_retries)s."),
+                      {'missing': count - len(macs),
+                       'max_retries': max_retries - (i + 1)})
+        LOG.error(_("Unable to generate mac address after %s attempts"),
+                  max_retries)
+        raise q_exc.MacAddressGenerationFailure(net_id=network_id)
+
     @staticmethod
     def _check_unique_mac(context, network_id, mac_address):
         mac_qry = context.session.query(models_v2.Port)
@@ -320,99 +371,11 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
             return True
         return False
 
-    @staticmethod
-    def _recycle_ip(context, network_id, subnet_id, ip_address):
+    def _recycle_ip(self, context, network_id, subnet_id, ip_address):
         """Return an IP address to the pool of free IP's on the network
         subnet.
         """
-        # Grab all allocation pools for the subnet
-        allocation_pools = (context.session.query(
-            models_v2.IPAllocationPool).filter_by(subnet_id=subnet_id).
-            options(orm.joinedload('available_ranges', innerjoin=True)).
-            with_lockmode('update'))
-        # If there are no available ranges the previous query will return no
-        # results as it uses an inner join to avoid errors with the postgresql
-        # backend (see lp bug 1215350). In this case IP allocation pools must
-        # be loaded with a different query, which does not require lock for
-        # update as the allocation pools for a subnet are immutable.
-        # The 2nd query will be executed only if the first yields no results
-        unlocked_allocation_pools = (context.session.query(
-            models_v2.IPAllocationPool).filter_by(subnet_id=subnet_id))
-
-        # Find the allocation pool for the IP to recycle
-        pool_id = None
-
-        for allocation_pool in itertools.chain(allocation_pools,
-                                               unlocked_allocation_pools):
-            allocation_pool_range = netaddr.IPRange(
-                allocation_pool['first_ip'], allocation_pool['last_ip'])
-            if netaddr.IPAddress(ip_address) in allocation_pool_range:
-                pool_id = allocation_pool['id']
-                break
-        if not pool_id:
-            NeutronDbPluginV2._delete_ip_allocation(
-                context, network_id, subnet_id, ip_address)
-            return
-        # Two requests will be done on the database. The first will be to
-        # search if an entry starts with ip_address + 1 (r1). The second
-        # will be to see if an entry ends with ip_address -1 (r2).
-        # If 1 of the above holds true then the specific entry will be
-        # modified. If both hold true then the two ranges will be merged.
-        # If there are no entries then a single entry will be added.
-        range_qry = context.session.query(
-            models_v2.IPAvailabilityRange).with_lockmode('update')
-        ip_first = str(netaddr.IPAddress(ip_address) + 1)
-        ip_last = str(netaddr.IPAddress(ip_address) - 1)
-        LOG.debug(_("Recycle %s"), ip_address)
-        try:
-            r1 = range_qry.filter_by(allocation_pool_id=pool_id,
-                                     first_ip=ip_first).one()
-            LOG.debug(_("Recycle: first match for %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': r1['first_ip'], 'last_ip': r1['last_ip']})
-        except exc.NoResultFound:
-            r1 = []
-        try:
-            r2 = range_qry.filter_by(allocation_pool_id=pool_id,
-                                     last_ip=ip_last).one()
-            LOG.debug(_("Recycle: last match for %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': r2['first_ip'], 'last_ip': r2['last_ip']})
-        except exc.NoResultFound:
-            r2 = []
-
-        if r1 and r2:
-            # Merge the two ranges
-            ip_range = models_v2.IPAvailabilityRange(
-                allocation_pool_id=pool_id,
-                first_ip=r2['first_ip'],
-                last_ip=r1['last_ip'])
-            context.session.add(ip_range)
-            LOG.debug(_("Recycle: merged %(first_ip1)s-%(last_ip1)s and "
-                        "%(first_ip2)s-%(last_ip2)s"),
-                      {'first_ip1': r2['first_ip'], 'last_ip1': r2['last_ip'],
-                       'first_ip2': r1['first_ip'], 'last_ip2': r1['last_ip']})
-            context.session.delete(r1)
-            context.session.delete(r2)
-        elif r1:
-            # Update the range with matched first IP
-            r1['first_ip'] = ip_address
-            LOG.debug(_("Recycle: updated first %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': r1['first_ip'], 'last_ip': r1['last_ip']})
-        elif r2:
-            # Update the range with matched last IP
-            r2['last_ip'] = ip_address
-            LOG.debug(_("Recycle: updated last %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': r2['first_ip'], 'last_ip': r2['last_ip']})
-        else:
-            # Create a new range
-            ip_range = models_v2.IPAvailabilityRange(
-                allocation_pool_id=pool_id,
-                first_ip=ip_address,
-                last_ip=ip_address)
-            context.session.add(ip_range)
-            LOG.debug(_("Recycle: created new %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': ip_address, 'last_ip': ip_address})
-        NeutronDbPluginV2._delete_ip_allocation(context, network_id, subnet_id,
-                                                ip_address)
+        self.ipam.release_ip(context, network_id, subnet_id, ip_address)
 
     def update_fixed_ip_lease_expiration(self, context, network_id,
                                          ip_address, lease_remaining):
@@ -435,85 +398,7 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
 
     @staticmethod
     def _delete_ip_allocation(context, network_id, subnet_id, ip_address):
-
-        # Delete the IP address from the IPAllocate table
-        LOG.debug(_("Delete allocated IP %(ip_address)s "
-                    "(%(network_id)s/%(subnet_id)s)"),
-                  {'ip_address': ip_address,
-                   'network_id': network_id,
-                   'subnet_id': subnet_id})
-        alloc_qry = context.session.query(
-            models_v2.IPAllocation).with_lockmode('update')
-        alloc_qry.filter_by(network_id=network_id,
-                            ip_address=ip_address,
-                            subnet_id=subnet_id).delete()
-
-    @staticmethod
-    def _generate_ip(context, subnets):
-        """Generate an IP address.
-
-        The IP address will be generated from one of the subnets defined on
-        the network.
-        """
-        range_qry = context.session.query(
-            models_v2.IPAvailabilityRange).join(
-                models_v2.IPAllocationPool).with_lockmode('update')
-        for subnet in subnets:
-            range = range_qry.filter_by(subnet_id=subnet['id']).first()
-            if not range:
-                LOG.debug(_("All IPs from subnet %(subnet_id)s (%(cidr)s) "
-                            "allocated"),
-                          {'subnet_id': subnet['id'], 'cidr': subnet['cidr']})
-                continue
-            ip_address = range['first_ip']
-            LOG.debug(_("Allocated IP - %(ip_address)s from %(first_ip)s "
-                        "to %(last_ip)s"),
-                      {'ip_address': ip_address,
-                       'first_ip': range['first_ip'],
-                       'last_ip': range['last_ip']})
-            if range['first_ip'] == range['last_ip']:
-                # No more free indices on subnet => delete
-                LOG.debug(_("No more free IP's in slice. Deleting allocation "
-                            "pool."))
-                context.session.delete(range)
-            else:
-                # increment the first free
-                range['first_ip'] = str(netaddr.IPAddress(ip_address) + 1)
-            return {'ip_address': ip_address, 'subnet_id': subnet['id']}
-        raise q_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
-
-    @staticmethod
-    def _allocate_specific_ip(context, subnet_id, ip_address):
-        """Allocate a specific IP address on the subnet."""
-        ip = int(netaddr.IPAddress(ip_address))
-        range_qry = context.session.query(
-            models_v2.IPAvailabilityRange).join(
-                models_v2.IPAllocationPool).with_lockmode('update')
-        results = range_qry.filter_by(subnet_id=subnet_id)
-        for range in results:
-            first = int(netaddr.IPAddress(range['first_ip']))
-            last = int(netaddr.IPAddress(range['last_ip']))
-            if first <= ip <= last:
-                if first == last:
-                    context.session.delete(range)
-                    return
-                elif first == ip:
-                    range['first_ip'] = str(netaddr.IPAddress(ip_address) + 1)
-                    return
-                elif last == ip:
-                    range['last_ip'] = str(netaddr.IPAddress(ip_address) - 1)
-                    return
-                else:
-                    # Split into two ranges
-                    new_first = str(netaddr.IPAddress(ip_address) + 1)
-                    new_last = range['last_ip']
-                    range['last_ip'] = str(netaddr.IPAddress(ip_address) - 1)
-                    ip_range = models_v2.IPAvailabilityRange(
-                        allocation_pool_id=range['allocation_pool_id'],
-                        first_ip=new_first,
-                        last_ip=new_last)
-                    context.session.add(ip_range)
-                    return
+        ipam.delete_ip_allocation(context, network_id, subnet_id, ip_address)
 
     @staticmethod
     def _check_unique_ip(context, network_id, subnet_id, ip_address):
@@ -636,8 +521,9 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
         for fixed in fixed_ips:
             if 'ip_address' in fixed:
                 # Remove the IP address from the allocation pool
-                NeutronDbPluginV2._allocate_specific_ip(
-                    context, fixed['subnet_id'], fixed['ip_address'])
+                self.ipam.allocate_specific_ip(
+                    context, network['id'], fixed['subnet_id'],
+                    fixed['ip_address'])
                 ips.append({'ip_address': fixed['ip_address'],
                             'subnet_id': fixed['subnet_id']})
             # Only subnet ID is specified => need to generate IP
@@ -645,7 +531,7 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
             else:
                 subnets = [self._get_subnet(context, fixed['subnet_id'])]
                 # IP address allocation
-                result = self._generate_ip(context, subnets)
+                result = self.ipam.allocate_ip(context, subnets)
                 ips.append({'ip_address': result['ip_address'],
                             'subnet_id': result['subnet_id']})
         return ips
@@ -675,10 +561,8 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
         to_add = self._test_fixed_ips_for_port(context, network_id, new_ips)
         for ip in original_ips:
             LOG.debug(_("Port update. Hold %s"), ip)
-            NeutronDbPluginV2._recycle_ip(context,
-                                          network_id,
-                                          ip['subnet_id'],
-                                          ip['ip_address'])
+            self._recycle_ip(context, network_id, ip['subnet_id'],
+                             ip['ip_address'])
 
         if to_add:
             LOG.debug(_("Port update. Adding %s"), to_add)
@@ -716,7 +600,7 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
             version_subnets = [v4, v6]
             for subnets in version_subnets:
                 if subnets:
-                    result = NeutronDbPluginV2._generate_ip(context, subnets)
+                    result = self.ipam.allocate_ip(context, subnets)
                     ips.append({'ip_address': result['ip_address'],
                                 'subnet_id': result['subnet_id']})
         return ips
@@ -980,6 +864,8 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
             if 'shared' in n:
                 self._validate_shared_update(context, id, network, n)
             network.update(n)
+            revisions.bump_network_revision_on_update(
+                context.session, id, revisions.NETWORK_FIELDS, n)
             # also update shared in all the subnets for this network
             subnets = self._get_subnets_by_network(context, id)
             for subnet in subnets:
@@ -1029,6 +915,14 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
         return self._get_collection_count(context, models_v2.Network,
                                           filters=filters)
 
+    def get_network_revisions(self, context, network_ids):
+        """Return the revisions of the networks of network_ids by id."""
+        if not network_ids:
+            return {}
+        query = context.session.query(models_v2.Network.id,
+                                      models_v2.Network.revision)
+        return dict(query.filter(models_v2.Network.id.in_(network_ids)))
+
     def create_subnet_bulk(self, context, subnets):
         return self._create_bulk('subnet', context, subnets)
 
@@ -1173,6 +1067,8 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                     first_ip=pool['start'],
                     last_ip=pool['end'])
                 context.session.add(ip_range)
+            revisions.bump_network_revisions(context.session,
+                                             [s['network_id']])
 
         return self._make_subnet_dict(subnet)
 
@@ -1200,6 +1096,9 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
             self._validate_gw_out_of_pools(s["gateway_ip"], allocation_pools)
 
         with context.session.begin(subtransactions=True):
+            revisions.bump_network_revision_on_update(
+                context.session, db_subnet.network_id,
+                revisions.SUBNET_FIELDS, s)
             if "dns_nameservers" in s:
                 changed_dns = True
                 old_dns_list = self._get_dns_by_subnet(context, id)
@@ -1278,6 +1177,8 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
             # remove network owned ports
             allocated.delete()
 
+            revisions.bump_network_revisions(context.session,
+                                             [subnet.network_id])
             context.session.delete(subnet)
 
     def get_subnet(self, context, id, fields=None):
@@ -1301,11 +1202,112 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                                           filters=filters)
 
     def create_port_bulk(self, context, ports):
-        return self._create_bulk('port', context, ports)
+        # Plugins extending create_port without extending create_port_bulk
+        # need their create_port to be called for each port
+        if (type(self).create_port.__func__ is not
+                NeutronDbPluginV2.create_port.__func__):
+            return self._create_bulk('port', context, ports)
+        with context.session.begin(subtransactions=True):
+            return self._create_ports_db(context, ports['ports'])
+
+    def _add_port(self, context, p, tenant_id, mac_address, ips):
+        """Add the rows of a port and of its IP allocations."""
+        port_id = p.get('id') or uuidutils.generate_uuid()
+        network_id = p['network_id']
+        port = models_v2.Port(tenant_id=tenant_id,
+                              name=p['name'],
+                              id=port_id,
+                              network_id=network_id,
+                              mac_address=mac_address,
+                              admin_state_up=p['admin_state_up'],
+                              status=p.get('status',
+                                           constants.PORT_STATUS_ACTIVE),
+                              device_id=p['device_id'],
+                              device_owner=p['device_owner'])
+        context.session.add(port)
+        for ip in ips:
+            LOG.debug(_("Allocated IP %(ip_address)s "
+                        "(%(network_id)s/%(subnet_id)s/%(port_id)s)"),
+                      {'ip_address': ip['ip_address'],
+                       'network_id': network_id,
+                       'subnet_id': ip['subnet_id'],
+                       'port_id': port_id})
+            self.ipam.add_ip_allocation(context, network_id, port_id, ip)
+        return port
+
+    def _create_ports_db(self, context, ports):
+        """Create the ports of a bulk request in the current transaction.
+
+        The MAC addresses of the ports of a network are generated together,
+        and the IP addresses of the ports without fixed_ips are allocated
+        together for each IP version.  The rows of these ports are then
+        inserted by one flush.
+        """
+        port_dbs = [None] * len(ports)
+        tenant_ids = [self._get_tenant_id_for_create(context, port['port'])
+                      for port in ports]
+        by_network = {}
+        for index, port in enumerate(ports):
+            by_network.setdefault(port['port']['network_id'], []).append(index)
+
+        for network_id, indexes in by_network.items():
+            network = self._get_network(context, network_id)
+            requested_macs = set()
+            for index in indexes:
+                mac_address = ports[index]['port']['mac_address']
+                if mac_address is attributes.ATTR_NOT_SPECIFIED:
+                    continue
+                if (mac_address in requested_macs or
+                    not NeutronDbPluginV2._check_unique_mac(
+                        context, network_id, mac_address)):
+                    raise q_exc.MacAddressInUse(net_id=network_id,
+                                                mac=mac_address)
+                requested_macs.add(mac_address)
+            generated = [index for index in indexes
+                         if ports[index]['port']['mac_address'] is
+                         attributes.ATTR_NOT_SPECIFIED]
+            macs = dict(zip(generated, NeutronDbPluginV2._generate_macs(
+                context, network_id, len(generated), requested_macs)))
+
+            # The fixed IPs are allocated first, as the IP addresses
+            # allocated to the other ports are only stored at the end
+            unspecified = []
+            for index in indexes:
+                p = ports[index]['port']
+                if p['fixed_ips'] is attributes.ATTR_NOT_SPECIFIED:
+                    unspecified.append(index)
+                    continue
+                ips = self._allocate_ips_for_port(context, network,
+                                                  ports[index])
+                port_dbs[index] = self._add_port(
+                    context, p, tenant_ids[index],
+                    macs.get(index, p['mac_address']), ips)
+
+            ips = dict((index, []) for index in unspecified)
+            if unspecified:
+                subnets = self.get_subnets(
+                    context, filters={'network_id': [network_id]})
+                for ip_version in (4, 6):
+                    version_subnets = [subnet for subnet in subnets
+                                       if subnet['ip_version'] == ip_version]
+                    if version_subnets:
+                        allocated = self.ipam.allocate_ips(
+                            context, version_subnets, len(unspecified))
+                        for index, ip in zip(unspecified, allocated):
+                            ips[index].append(ip)
+            for index in unspecified:
+                p = ports[index]['port']
+                port_dbs[index] = self._add_port(
+                    context, p, tenant_ids[index],
+                    macs.get(index, p['mac_address']), ips[index])
+
+        revisions.bump_network_revisions(context.session, list(by_network))
+        context.session.flush()
+        return [self._make_port_dict(port, process_extensions=False)
+                for port in port_dbs]
 
     def create_port(self, context, port):
         p = port['port']
-        port_id = p.get('id') or uuidutils.generate_uuid()
         network_id = p['network_id']
         mac_address = p['mac_address']
         # NOTE(jkoelker) Get the tenant_id outside of the session to avoid
@@ -1330,41 +1332,8 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
 
             # Returns the IP's for the port
             ips = self._allocate_ips_for_port(context, network, port)
-
-            if 'status' not in p:
-                status = constants.PORT_STATUS_ACTIVE
-            else:
-                status = p['status']
-
-            port = models_v2.Port(tenant_id=tenant_id,
-                                  name=p['name'],
-                                  id=port_id,
-                                  network_id=network_id,
-                                  mac_address=mac_address,
-                                  admin_state_up=p['admin_state_up'],
-                                  status=status,
-                                  device_id=p['device_id'],
-                                  device_owner=p['device_owner'])
-            context.session.add(port)
-
-            # Update the allocated IP's
-            if ips:
-                for ip in ips:
-                    ip_address = ip['ip_address']
-                    subnet_id = ip['subnet_id']
-                    LOG.debug(_("Allocated IP %(ip_address)s "
-                                "(%(network_id)s/%(subnet_id)s/%(port_id)s)"),
-                              {'ip_address': ip_address,
-                               'network_id': network_id,
-                               'subnet_id': subnet_id,
-                               'port_id': port_id})
-                    allocated = models_v2.IPAllocation(
-                        network_id=network_id,
-                        port_id=port_id,
-                        ip_address=ip_address,
-                        subnet_id=subnet_id,
-                    )
-                    context.session.add(allocated)
+            port = self._add_port(context, p, tenant_id, mac_address, ips)
+            revisions.bump_network_revisions(context.session, [network_id])
 
         return self._make_port_dict(port, process_extensions=False)
 
@@ -1384,13 +1353,13 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
 
                 # Update ips if necessary
                 for ip in added_ips:
-                    allocated = models_v2.IPAllocation(
-                        network_id=port['network_id'], port_id=port.id,
-                        ip_address=ip['ip_address'], subnet_id=ip['subnet_id'])
-                    context.session.add(allocated)
+                    self.ipam.add_ip_allocation(context, port['network_id'],
+                                                port.id, ip)
             # Remove all attributes in p which are not in the port DB model
             # and then update the port
             port.update(self._filter_non_model_columns(p, models_v2.Port))
+            revisions.bump_network_revision_on_update(
+                context.session, port['network_id'], revisions.PORT_FIELDS, p)
 
         result = self._make_port_dict(port)
         # Keep up with fields that changed
@@ -1415,10 +1384,8 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
             if NeutronDbPluginV2._check_ip_in_allocation_pool(
                 context, a['subnet_id'], subnet['gateway_ip'],
                 a['ip_address']):
-                NeutronDbPluginV2._recycle_ip(context,
-                                              a['network_id'],
-                                              a['subnet_id'],
-                                              a['ip_address'])
+                self._recycle_ip(context, a['network_id'], a['subnet_id'],
+                                 a['ip_address'])
             else:
                 # IPs out of allocation pool will not be recycled, but
                 # we do need to delete the allocation from the DB
@@ -1431,6 +1398,7 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                         "recycled") % msg_dict
                 LOG.debug(msg)
 
+        revisions.bump_network_revisions(context.session, [port.network_id])
         context.session.delete(port)
 
     def get_port(self, context, id, fields=None):
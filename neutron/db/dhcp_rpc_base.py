@@ -56,17 +56,36 @@ class DhcpRpcCallbackMixin(object):
         return [net['id'] for net in nets]
 
     def get_active_networks_info(self, context, **kwargs):
-        """Returns all the networks/subnets/ports in system."""
+        """Returns all the networks/subnets/ports in system.
+
+        With network_revisions, the {network_id: revision} map of the
+        networks known to the agent, the networks whose revision did not
+        change are returned without their subnets and ports.
+        """
         host = kwargs.get('host')
+        known_revisions = kwargs.get('network_revisions') or {}
         LOG.debug(_('get_active_networks_info from %s'), host)
         networks = self._get_active_networks(context, **kwargs)
         plugin = manager.NeutronManager.get_plugin()
-        filters = {'network_id': [network['id'] for network in networks]}
+        # The revisions are read first, so that a change made while the
+        # subnets and ports are fetched is fetched again by the next sync
+        revisions = plugin.get_network_revisions(
+            context, [network['id'] for network in networks])
+        changed = []
+        for network in networks:
+            network['revision'] = revisions.get(network['id'])
+            if (network['revision'] is None or
+                known_revisions.get(network['id']) != network['revision']):
+                changed.append(network)
+        if not changed:
+            return networks
+
+        filters = {'network_id': [network['id'] for network in changed]}
         ports = plugin.get_ports(context, filters=filters)
         filters['enable_dhcp'] = [True]
         subnets = plugin.get_subnets(context, filters=filters)
 
-        for network in networks:
+        for network in changed:
             network['subnets'] = [subnet for subnet in subnets
                                   if subnet['network_id'] == network['id']]
             network['ports'] = [port for port in ports
@@ -83,6 +102,8 @@ class DhcpRpcCallbackMixin(object):
                                   'host': host})
         plugin = manager.NeutronManager.get_plugin()
         network = plugin.get_network(context, network_id)
+        network['revision'] = plugin.get_network_revisions(
+            context, [network_id]).get(network_id)
 
         filters = dict(network_id=[network_id])
         network['subnets'] = plugin.get_subnets(context, filters=filters)
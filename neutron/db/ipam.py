@@ -0,0 +1,427 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Allocation of the IP addresses of the allocation pools of subnets.
+
+NeutronDbPluginV2 allocates and releases the IP addresses of ports with
+the IPAM backend configured with ipam_driver.  The backend creates and
+deletes the IPAllocation rows of the addresses in the session of the
+request, the plugin checks the requested addresses before.
+"""
+
+import abc
+import itertools
+import random
+
+import netaddr
+from oslo.config import cfg
+from sqlalchemy import orm
+from sqlalchemy.orm import exc
+
+from neutron.common import exceptions as q_exc
+from neutron.db import models_v2
+from neutron.openstack.common.db import exception as db_exc
+from neutron.openstack.common import importutils
+from neutron.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+ipam_opts = [
+    cfg.StrOpt('ipam_driver',
+               default='neutron.db.ipam.AvailabilityRangeIpam',
+               help=_("IPAM backend allocating the IP addresses of ports. "
+                      "AvailabilityRangeIpam allocates the lowest free "
+                      "address of the locked availability ranges of the "
+                      "subnet, RandomIpam picks free addresses at random "
+                      "without locking a row shared by the allocations of "
+                      "the subnet. Changing it on an existing deployment "
+                      "is not supported.")),
+]
+
+cfg.CONF.register_opts(ipam_opts)
+
+# Random candidates tried by RandomIpam before it searches the allocation
+# pools of a subnet in order for a free IP address
+RANDOM_ATTEMPTS = 16
+
+
+def load_backend():
+    """Return an instance of the IPAM backend configured."""
+    LOG.debug(_("Loading IPAM backend %s"), cfg.CONF.ipam_driver)
+    return importutils.import_object(cfg.CONF.ipam_driver)
+
+
+def delete_ip_allocation(context, network_id, subnet_id, ip_address):
+    """Delete the IPAllocation row of an IP address."""
+    LOG.debug(_("Delete allocated IP %(ip_address)s "
+                "(%(network_id)s/%(subnet_id)s)"),
+              {'ip_address': ip_address,
+               'network_id': network_id,
+               'subnet_id': subnet_id})
+    alloc_qry = context.session.query(
+        models_v2.IPAllocation).with_lockmode('update')
+    alloc_qry.filter_by(network_id=network_id,
+                        ip_address=ip_address,
+                        subnet_id=subnet_id).delete()
+
+
+class IpamBackend(object):
+    """Base class of the IPAM backends.
+
+    The IP addresses are returned as {'ip_address': ..., 'subnet_id': ...}
+    dicts, and stored for a port with add_ip_allocation.
+    """
+
+    __metaclass__ = abc.ABCMeta
+
+    def allocate_ip(self, context, subnets):
+        """Allocate a free IP address of the first subnet having one.
+
+        :raises: IpAddressGenerationFailure
+        """
+        return self.allocate_ips(context, subnets, 1)[0]
+
+    @abc.abstractmethod
+    def allocate_ips(self, context, subnets, count):
+        """Allocate count free IP addresses of the subnets, in order.
+
+        Used for the bulk creation of ports.
+
+        :raises: IpAddressGenerationFailure
+        """
+        pass
+
+    @abc.abstractmethod
+    def allocate_specific_ip(self, context, network_id, subnet_id,
+                             ip_address):
+        """Allocate an IP address requested for a port.
+
+        The address was checked to be on the subnet and not to be
+        allocated, but it can be out of the allocation pools.
+
+        :raises: IpAddressInUse
+        """
+        pass
+
+    @abc.abstractmethod
+    def release_ip(self, context, network_id, subnet_id, ip_address):
+        """Return an IP address to the free ones and delete its allocation.
+        """
+        pass
+
+    def add_ip_allocation(self, context, network_id, port_id, ip):
+        """Store the allocation of an allocated IP address to a port."""
+        context.session.add(models_v2.IPAllocation(
+            network_id=network_id,
+            port_id=port_id,
+            ip_address=ip['ip_address'],
+            subnet_id=ip['subnet_id']))
+
+
+class AvailabilityRangeIpam(IpamBackend):
+    """Allocate the IP addresses from the availability ranges of subnets.
+
+    The free IP addresses of an allocation pool are stored as ranges, which
+    are locked, split and merged by the allocations.  The allocations of a
+    subnet are serialized by the lock of its first range.
+    """
+
+    def allocate_ip(self, context, subnets):
+        range_qry = context.session.query(
+            models_v2.IPAvailabilityRange).join(
+                models_v2.IPAllocationPool).with_lockmode('update')
+        for subnet in subnets:
+            range = range_qry.filter_by(subnet_id=subnet['id']).first()
+            if not range:
+                LOG.debug(_("All IPs from subnet %(subnet_id)s (%(cidr)s) "
+                            "allocated"),
+                          {'subnet_id': subnet['id'], 'cidr': subnet['cidr']})
+                continue
+            ip_address = range['first_ip']
+            LOG.debug(_("Allocated IP - %(ip_address)s from %(first_ip)s "
+                        "to %(last_ip)s"),
+                      {'ip_address': ip_address,
+                       'first_ip': range['first_ip'],
+                       'last_ip': range['last_ip']})
+            if range['first_ip'] == range['last_ip']:
+                # No more free indices on subnet => delete
+                LOG.debug(_("No more free IP's in slice. Deleting allocation "
+                            "pool."))
+                context.session.delete(range)
+            else:
+                # increment the first free
+                range['first_ip'] = str(netaddr.IPAddress(ip_address) + 1)
+            return {'ip_address': ip_address, 'subnet_id': subnet['id']}
+        raise q_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
+
+    def allocate_ips(self, context, subnets, count):
+        # The ranges of each subnet are locked once, and as many addresses
+        # as possible taken from each of them
+        ips = []
+        range_qry = context.session.query(
+            models_v2.IPAvailabilityRange).join(
+                models_v2.IPAllocationPool).with_lockmode('update')
+        for subnet in subnets:
+            for ip_range in range_qry.filter_by(subnet_id=subnet['id']):
+                first = netaddr.IPAddress(ip_range['first_ip'])
+                free = (int(netaddr.IPAddress(ip_range['last_ip'])) -
+                        int(first) + 1)
+                taken = min(count - len(ips), free)
+                ips.extend({'ip_address': str(first + i),
+                            'subnet_id': subnet['id']}
+                           for i in range(taken))
+                if taken == free:
+                    context.session.delete(ip_range)
+                else:
+                    ip_range['first_ip'] = str(first + taken)
+                if len(ips) == count:
+                    LOG.debug(_("Allocated IPs %s"),
+                              ', '.join(ip['ip_address'] for ip in ips))
+                    return ips
+        raise q_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
+
+    def allocate_specific_ip(self, context, network_id, subnet_id,
+                             ip_address):
+        ip = int(netaddr.IPAddress(ip_address))
+        range_qry = context.session.query(
+            models_v2.IPAvailabilityRange).join(
+                models_v2.IPAllocationPool).with_lockmode('update')
+        results = range_qry.filter_by(subnet_id=subnet_id)
+        for range in results:
+            first = int(netaddr.IPAddress(range['first_ip']))
+            last = int(netaddr.IPAddress(range['last_ip']))
+            if first <= ip <= last:
+                if first == last:
+                    context.session.delete(range)
+                    return
+                elif first == ip:
+                    range['first_ip'] = str(netaddr.IPAddress(ip_address) + 1)
+                    return
+                elif last == ip:
+                    range['last_ip'] = str(netaddr.IPAddress(ip_address) - 1)
+                    return
+                else:
+                    # Split into two ranges
+                    new_first = str(netaddr.IPAddress(ip_address) + 1)
+                    new_last = range['last_ip']
+                    range['last_ip'] = str(netaddr.IPAddress(ip_address) - 1)
+                    ip_range = models_v2.IPAvailabilityRange(
+                        allocation_pool_id=range['allocation_pool_id'],
+                        first_ip=new_first,
+                        last_ip=new_last)
+                    context.session.add(ip_range)
+                    return
+
+    def release_ip(self, context, network_id, subnet_id, ip_address):
+        # Grab all allocation pools for the subnet
+        allocation_pools = (context.session.query(
+            models_v2.IPAllocationPool).filter_by(subnet_id=subnet_id).
+            options(orm.joinedload('available_ranges', innerjoin=True)).
+            with_lockmode('update'))
+        # If there are no available ranges the previous query will return no
+        # results as it uses an inner join to avoid errors with the postgresql
+        # backend (see lp bug 1215350). In this case IP allocation pools must
+        # be loaded with a different query, which does not require lock for
+        # update as the allocation pools for a subnet are immutable.
+        # The 2nd query will be executed only if the first yields no results
+        unlocked_allocation_pools = (context.session.query(
+            models_v2.IPAllocationPool).filter_by(subnet_id=subnet_id))
+
+        # Find the allocation pool for the IP to recycle
+        pool_id = None
+
+        for allocation_pool in itertools.chain(allocation_pools,
+                                               unlocked_allocation_pools):
+            allocation_pool_range = netaddr.IPRange(
+                allocation_pool['first_ip'], allocation_pool['last_ip'])
+            if netaddr.IPAddress(ip_address) in allocation_pool_range:
+                pool_id = allocation_pool['id']
+                break
+        if not pool_id:
+            delete_ip_allocation(context, network_id, subnet_id, ip_address)
+            return
+        # Two requests will be done on the database. The first will be to
+        # search if an entry starts with ip_address + 1 (r1). The second
+        # will be to see if an entry ends with ip_address -1 (r2).
+        # If 1 of the above holds true then the specific entry will be
+        # modified. If both hold true then the two ranges will be merged.
+        # If there are no entries then a single entry will be added.
+        range_qry = context.session.query(
+            models_v2.IPAvailabilityRange).with_lockmode('update')
+        ip_first = str(netaddr.IPAddress(ip_address) + 1)
+        ip_last = str(netaddr.IPAddress(ip_address) - 1)
+        LOG.debug(_("Recycle %s"), ip_address)
+        try:
+            r1 = range_qry.filter_by(allocation_pool_id=pool_id,
+                                     first_ip=ip_first).one()
+            LOG.debug(_("Recycle: first match for %(first_ip)s-%(last_ip)s"),
+                      {'first_ip': r1['first_ip'], 'last_ip': r1['last_ip']})
+        except exc.NoResultFound:
+            r1 = []
+        try:
+            r2 = range_qry.filter_by(allocation_pool_id=pool_id,
+                                     last_ip=ip_last).one()
+            LOG.debug(_("Recycle: last match for %(first_ip)s-%(last_ip)s"),
+                      {'first_ip': r2['first_ip'], 'last_ip': r2['last_ip']})
+        except exc.NoResultFound:
+            r2 = []
+
+        if r1 and r2:
+            # Merge the two ranges
+            ip_range = models_v2.IPAvailabilityRange(
+                allocation_pool_id=pool_id,
+                first_ip=r2['first_ip'],
+                last_ip=r1['last_ip'])
+            context.session.add(ip_range)
+            LOG.debug(_("Recycle: merged %(first_ip1)s-%(last_ip1)s and "
+                        "%(first_ip2)s-%(last_ip2)s"),
+                      {'first_ip1': r2['first_ip'], 'last_ip1': r2['last_ip'],
+                       'first_ip2': r1['first_ip'], 'last_ip2': r1['last_ip']})
+            context.session.delete(r1)
+            context.session.delete(r2)
+        elif r1:
+            # Update the range with matched first IP
+            r1['first_ip'] = ip_address
+            LOG.debug(_("Recycle: updated first %(first_ip)s-%(last_ip)s"),
+                      {'first_ip': r1['first_ip'], 'last_ip': r1['last_ip']})
+        elif r2:
+            # Update the range with matched last IP
+            r2['last_ip'] = ip_address
+            LOG.debug(_("Recycle: updated last %(first_ip)s-%(last_ip)s"),
+                      {'first_ip': r2['first_ip'], 'last_ip': r2['last_ip']})
+        else:
+            # Create a new range
+            ip_range = models_v2.IPAvailabilityRange(
+                allocation_pool_id=pool_id,
+                first_ip=ip_address,
+                last_ip=ip_address)
+            context.session.add(ip_range)
+            LOG.debug(_("Recycle: created new %(first_ip)s-%(last_ip)s"),
+                      {'first_ip': ip_address, 'last_ip': ip_address})
+        delete_ip_allocation(context, network_id, subnet_id, ip_address)
+
+
+class RandomIpam(IpamBackend):
+    """Allocate IP addresses picked at random in the allocation pools.
+
+    The free addresses are not stored.  A candidate address is inserted in
+    ipallocations in a savepoint, the primary key of the table rejecting it
+    if another request allocated it, and another candidate is tried then.
+    The allocations of a subnet do not lock any shared row, and concurrent
+    allocations only wait for each other when they pick the same address.
+    The availability ranges of the subnets are not maintained.
+    """
+
+    def _insert(self, context, network_id, subnet_id, ip_address):
+        """Insert the allocation of an IP address, unless it exists."""
+        session = context.session
+        if (session.query(models_v2.IPAllocation.ip_address).
+                filter_by(subnet_id=subnet_id, ip_address=ip_address).
+                first()):
+            return False
+        allocation = models_v2.IPAllocation(network_id=network_id,
+                                            subnet_id=subnet_id,
+                                            ip_address=ip_address)
+        if session.get_bind().dialect.name == 'sqlite':
+            # pysqlite does not support savepoints, and SQLite serializes
+            # the transactions writing to a database anyway
+            session.add(allocation)
+            return True
+        try:
+            with session.begin_nested():
+                session.add(allocation)
+        except db_exc.DBDuplicateEntry:
+            LOG.debug(_("IP %(ip_address)s (%(subnet_id)s) allocated "
+                        "concurrently"),
+                      {'ip_address': ip_address, 'subnet_id': subnet_id})
+            return False
+        return True
+
+    def _allocate_from_subnet(self, context, subnet, count):
+        """Allocate up to count free IP addresses of a subnet."""
+        ips = []
+        pools = [netaddr.IPRange(pool['first_ip'], pool['last_ip'])
+                 for pool in context.session.query(
+                     models_v2.IPAllocationPool).filter_by(
+                         subnet_id=subnet['id'])]
+        size = sum(pool.size for pool in pools)
+        misses = 0
+        while size and len(ips) < count and misses < RANDOM_ATTEMPTS:
+            index = random.randrange(size)
+            for pool in pools:
+                if index < pool.size:
+                    break
+                index -= pool.size
+            ip_address = str(pool[index])
+            if self._insert(context, subnet['network_id'], subnet['id'],
+                            ip_address):
+                ips.append({'ip_address': ip_address,
+                            'subnet_id': subnet['id']})
+                misses = 0
+            else:
+                misses += 1
+        if len(ips) == count or not size:
+            return ips
+
+        # The subnet is nearly full, search its pools for the free addresses
+        LOG.debug(_("No free IP picked at random on subnet %s, searching "
+                    "the allocation pools"), subnet['id'])
+        allocated = set(ip_address for ip_address, in context.session.query(
+            models_v2.IPAllocation.ip_address).filter_by(
+                subnet_id=subnet['id']))
+        for ip in itertools.chain(*pools):
+            if (str(ip) not in allocated and
+                self._insert(context, subnet['network_id'], subnet['id'],
+                             str(ip))):
+                ips.append({'ip_address': str(ip), 'subnet_id': subnet['id']})
+                if len(ips) == count:
+                    break
+        return ips
+
+    def allocate_ips(self, context, subnets, count):
+        ips = []
+        for subnet in subnets:
+            ips.extend(self._allocate_from_subnet(context, subnet,
+                                                  count - len(ips)))
+            if len(ips) == count:
+                LOG.debug(_("Allocated IPs %s"),
+                          ', '.join(ip['ip_address'] for ip in ips))
+                return ips
+            LOG.debug(_("All IPs from subnet %(subnet_id)s (%(cidr)s) "
+                        "allocated"),
+                      {'subnet_id': subnet['id'], 'cidr': subnet['cidr']})
+        raise q_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
+
+    def allocate_specific_ip(self, context, network_id, subnet_id,
+                             ip_address):
+        if not self._insert(context, network_id, subnet_id, ip_address):
+            raise q_exc.IpAddressInUse(net_id=network_id,
+                                       ip_address=ip_address)
+
+    def release_ip(self, context, network_id, subnet_id, ip_address):
+        delete_ip_allocation(context, network_id, subnet_id, ip_address)
+
+    def add_ip_allocation(self, context, network_id, port_id, ip):
+        # The allocation was inserted when the address was allocated
+        allocation = context.session.query(models_v2.IPAllocation).get(
+            (ip['ip_address'], ip['subnet_id'], network_id))
+        if allocation:
+            allocation.port_id = port_id
+        else:
+            super(RandomIpam, self).add_ip_allocation(context, network_id,
+                                                      port_id, ip)
@@ -213,28 +213,43 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
 
     def get_l3_agent_candidates(self, sync_router, l3_agents):
         """Get the valid l3 agents for the router from a list of l3_agents."""
-        candidates = []
-        for l3_agent in l3_agents:
-            if not l3_agent.admin_state_up:
-                continue
-            agent_conf = self.get_configuration_dict(l3_agent)
-            router_id = agent_conf.get('router_id', None)
-            use_namespaces = agent_conf.get('use_namespaces', True)
-            handle_internal_only_routers = agent_conf.get(
-                'handle_internal_only_routers', True)
-            gateway_external_network_id = agent_conf.get(
-                'gateway_external_network_id', None)
-            if not use_namespaces and router_id != sync_router['id']:
-                continue
+        return self.get_l3_agents_candidates([sync_router],
+                                             l3_agents)[sync_router['id']]
+
+    def get_l3_agents_candidates(self, sync_routers, l3_agents):
+        """Get the valid l3 agents for each of the routers.
+
+        The configuration of each agent is loaded once, whatever the
+        number of routers.  A dict of the candidate agents by router id
+        is returned.
+        """
+        agent_confs = [(l3_agent, self.get_configuration_dict(l3_agent))
+                       for l3_agent in l3_agents if l3_agent.admin_state_up]
+        candidates = {}
+        for sync_router in sync_routers:
             ex_net_id = (sync_router['external_gateway_info'] or {}).get(
                 'network_id')
-            if ((not ex_net_id and not handle_internal_only_routers) or
-                (ex_net_id and gateway_external_network_id and
-                 ex_net_id != gateway_external_network_id)):
-                continue
-            candidates.append(l3_agent)
+            candidates[sync_router['id']] = [
+                l3_agent for l3_agent, agent_conf in agent_confs
+                if self._is_l3_agent_candidate(sync_router, ex_net_id,
+                                               agent_conf)]
         return candidates
 
+    def _is_l3_agent_candidate(self, sync_router, ex_net_id, agent_conf):
+        router_id = agent_conf.get('router_id', None)
+        use_namespaces = agent_conf.get('use_namespaces', True)
+        handle_internal_only_routers = agent_conf.get(
+            'handle_internal_only_routers', True)
+        gateway_external_network_id = agent_conf.get(
+            'gateway_external_network_id', None)
+        if not use_namespaces and router_id != sync_router['id']:
+            return False
+        if ((not ex_net_id and not handle_internal_only_routers) or
+            (ex_net_id and gateway_external_network_id and
+             ex_net_id != gateway_external_network_id)):
+            return False
+        return True
+
     def auto_schedule_routers(self, context, host, router_ids):
         if self.router_scheduler:
             return self.router_scheduler.auto_schedule_routers(
@@ -247,5 +262,13 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
 
     def schedule_routers(self, context, routers):
         """Schedule the routers to l3 agents."""
+        # Schedule all the routers in one go when the scheduler supports it
+        # and no subclass changes how a single router is scheduled
+        schedule_routers = getattr(self.router_scheduler, 'schedule_routers',
+                                   None)
+        if (schedule_routers and
+            type(self).schedule_router.__func__ is
+            L3AgentSchedulerDbMixin.schedule_router.__func__):
+            return schedule_routers(self, context, routers)
         for router in routers:
             self.schedule_router(context, router)
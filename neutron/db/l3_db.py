@@ -26,6 +26,7 @@ from neutron.api.rpc.agentnotifiers import l3_rpc_agent_api
 from neutron.api.v2 import attributes
 from neutron.common import constants as l3_constants
 from neutron.common import exceptions as q_exc
+from neutron.db import db_base_plugin_v2
 from neutron.db import model_base
 from neutron.db import models_v2
 from neutron.extensions import l3
@@ -775,47 +776,71 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
                            if it is None, all of routers will be queried.
         @return: a list of dicted routers with dicted gw_port populated if any
         """
-        filters = {'id': router_ids} if router_ids else {}
+        # The gateway ports are loaded with the routers by the same query
+        query = self._model_query(context, Router).options(
+            orm.joinedload('gw_port'))
+        if router_ids:
+            query = query.filter(Router.id.in_(router_ids))
         if active is not None:
-            filters['admin_state_up'] = [active]
-        router_dicts = self.get_routers(context, filters=filters)
-        gw_port_ids = []
-        if not router_dicts:
+            query = query.filter(Router.admin_state_up == active)
+        router_dbs = query.all()
+        if not router_dbs:
             return []
-        for router_dict in router_dicts:
-            gw_port_id = router_dict['gw_port_id']
-            if gw_port_id:
-                gw_port_ids.append(gw_port_id)
-        gw_ports = []
-        if gw_port_ids:
-            gw_ports = self.get_sync_gw_ports(context, gw_port_ids)
+        router_dicts = [self._make_router_dict(router_db)
+                        for router_db in router_dbs]
+        gw_ports = self._make_sync_port_dicts(
+            context, [router_db.gw_port for router_db in router_dbs
+                      if router_db.gw_port])
         return self._build_routers_list(router_dicts, gw_ports)
 
     def _get_sync_floating_ips(self, context, router_ids):
         """Query floating_ips that relate to list of router_ids."""
         if not router_ids:
             return []
-        return self.get_floatingips(context, {'router_id': router_ids})
+        query = self._model_query(context, FloatingIP).filter(
+            FloatingIP.router_id.in_(router_ids))
+        return [self._make_floatingip_dict(floatingip)
+                for floatingip in query]
+
+    def _make_sync_port_dicts(self, context, ports):
+        """Make the dicts of router ports loaded from the database.
+
+        Core plugins extending get_ports are asked for the dicts of the
+        ports, so that the ports have the same attributes as in the API.
+        """
+        if not ports:
+            return []
+        core_plugin = self._core_plugin
+        if (type(core_plugin).get_ports.__func__ is not
+                db_base_plugin_v2.NeutronDbPluginV2.get_ports.__func__):
+            return core_plugin.get_ports(
+                context, {'id': [port['id'] for port in ports]})
+        return [core_plugin._make_port_dict(port) for port in ports]
 
     def get_sync_gw_ports(self, context, gw_port_ids):
         if not gw_port_ids:
             return []
-        filters = {'id': gw_port_ids}
-        gw_ports = self._core_plugin.get_ports(context, filters)
-        if gw_ports:
-            self._populate_subnet_for_ports(context, gw_ports)
+        query = self._core_plugin._model_query(context, models_v2.Port)
+        gw_ports = self._make_sync_port_dicts(
+            context, query.filter(models_v2.Port.id.in_(gw_port_ids)).all())
+        self._populate_subnet_for_ports(context, gw_ports)
         return gw_ports
 
+    def _get_sync_interfaces(self, context, router_ids,
+                             device_owner=DEVICE_OWNER_ROUTER_INTF):
+        if not router_ids:
+            return []
+        query = self._core_plugin._model_query(context, models_v2.Port)
+        query = query.filter(models_v2.Port.device_id.in_(router_ids),
+                             models_v2.Port.device_owner == device_owner)
+        return self._make_sync_port_dicts(context, query.all())
+
     def get_sync_interfaces(self, context, router_ids,
                             device_owner=DEVICE_OWNER_ROUTER_INTF):
         """Query router interfaces that relate to list of router_ids."""
-        if not router_ids:
-            return []
-        filters = {'device_id': router_ids,
-                   'device_owner': [device_owner]}
-        interfaces = self._core_plugin.get_ports(context, filters)
-        if interfaces:
-            self._populate_subnet_for_ports(context, interfaces)
+        interfaces = self._get_sync_interfaces(context, router_ids,
+                                               device_owner)
+        self._populate_subnet_for_ports(context, interfaces)
         return interfaces
 
     def _populate_subnet_for_ports(self, context, ports):
@@ -844,17 +869,21 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             subnet_id_ports_dict[fixed_ip['subnet_id']] = my_ports
         if not subnet_id_ports_dict:
             return
-        filters = {'id': subnet_id_ports_dict.keys()}
-        fields = ['id', 'cidr', 'gateway_ip']
-        subnet_dicts = self._core_plugin.get_subnets(context, filters, fields)
-        for subnet_dict in subnet_dicts:
-            ports = subnet_id_ports_dict.get(subnet_dict['id'], [])
+        # Only the columns sent to the agent are queried, the subnets are
+        # not made into dicts with their pools, routes and DNS servers
+        query = context.session.query(models_v2.Subnet.id,
+                                      models_v2.Subnet.cidr,
+                                      models_v2.Subnet.gateway_ip)
+        query = query.filter(
+            models_v2.Subnet.id.in_(subnet_id_ports_dict.keys()))
+        for subnet_id, cidr, gateway_ip in query:
+            ports = subnet_id_ports_dict.get(subnet_id, [])
             for port in ports:
                 # TODO(gongysh) stash the subnet into fixed_ips
                 # to make the payload smaller.
-                port['subnet'] = {'id': subnet_dict['id'],
-                                  'cidr': subnet_dict['cidr'],
-                                  'gateway_ip': subnet_dict['gateway_ip']}
+                port['subnet'] = {'id': subnet_id,
+                                  'cidr': cidr,
+                                  'gateway_ip': gateway_ip}
 
     def _process_sync_data(self, routers, interfaces, floating_ips):
         routers_dict = {}
@@ -883,5 +912,10 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
                                              active=active)
             router_ids = [router['id'] for router in routers]
             floating_ips = self._get_sync_floating_ips(context, router_ids)
-            interfaces = self.get_sync_interfaces(context, router_ids)
+            interfaces = self._get_sync_interfaces(context, router_ids)
+            # The subnets of the gateway ports and of the interfaces are
+            # queried together
+            self._populate_subnet_for_ports(
+                context, [router['gw_port'] for router in routers
+                          if router.get('gw_port')] + interfaces)
         return self._process_sync_data(routers, interfaces, floating_ips)
@@ -175,3 +175,6 @@ class Network(model_base.BASEV2, HasId, HasTenant):
     status = sa.Column(sa.String(16))
     admin_state_up = sa.Column(sa.Boolean)
     shared = sa.Column(sa.Boolean)
+    # Bumped on every change of the network, its subnets or its ports
+    revision = sa.Column(sa.BigInteger, nullable=False, default=0,
+                         server_default='0')
@@ -0,0 +1,58 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Revision numbers of the networks.
+
+The revision of a network is bumped by the writes of the DB plugin which
+change what the DHCP agent is given of the network: its admin state, its
+subnets and their DHCP settings, and the addresses and DHCP options of its
+ports.  Agents remember the revisions of the networks they know to only
+fetch the ones which changed since.
+
+The bumps are explicit rather than done on every flush, so that the writes
+the agent does not care about, like port status or binding updates, neither
+run the extra UPDATE nor lock the network row.
+"""
+
+from neutron.db import models_v2
+
+# The attributes of each resource which the DHCP agent consumes
+NETWORK_FIELDS = frozenset(['admin_state_up'])
+SUBNET_FIELDS = frozenset(['enable_dhcp', 'gateway_ip', 'dns_nameservers',
+                           'host_routes'])
+PORT_FIELDS = frozenset(['mac_address', 'fixed_ips', 'device_id',
+                         'device_owner', 'extra_dhcp_opts'])
+
+
+def bump_network_revisions(session, network_ids):
+    """Bump the revisions of the networks of network_ids.
+
+    The update autoflushes the session, so it is run before any row is
+    marked for deletion: flushing a pending delete ahead of the rest of
+    the transaction can break foreign keys still referencing the row.
+    """
+    if network_ids:
+        session.query(models_v2.Network).filter(
+            models_v2.Network.id.in_(network_ids)).update(
+                {'revision': models_v2.Network.revision + 1},
+                synchronize_session=False)
+
+
+def bump_network_revision_on_update(session, network_id, fields, update):
+    """Bump the revision of network_id if update changes one of fields."""
+    if fields.intersection(update):
+        bump_network_revisions(session, [network_id])
@@ -507,6 +507,52 @@ class SecurityGroupDbMixin(ext_sg.SecurityGroupPluginBase):
             sgids = [default_sg]
         port['port'][ext_sg.SECURITYGROUPS] = sgids
 
+    def _get_security_groups_on_ports(self, context, ports):
+        """Check the security groups of the ports of a bulk request.
+
+        The security groups of the tenant are only fetched once.
+
+        :returns: the security groups IDs of each port, as
+        _get_security_groups_on_port does.
+        """
+        valid_group_ids = None
+        port_sgids = []
+        for port in ports:
+            p = port['port']
+            if (not attr.is_attr_set(p.get(ext_sg.SECURITYGROUPS)) or
+                (p.get('device_owner') and
+                 p['device_owner'].startswith('network:'))):
+                port_sgids.append(None)
+                continue
+            if valid_group_ids is None:
+                valid_group_ids = set(
+                    g['id'] for g in self.get_security_groups(context,
+                                                              fields=['id']))
+            sgids = set(p[ext_sg.SECURITYGROUPS])
+            for sg_id in sgids - valid_group_ids:
+                raise ext_sg.SecurityGroupNotFound(id=sg_id)
+            port_sgids.append(sgids)
+        return port_sgids
+
+    def _ensure_default_security_group_on_ports(self, context, ports):
+        """Ensure the default security group of the ports of a bulk request.
+
+        The default security group of each tenant is only looked up once.
+        """
+        default_sgs = {}
+        for port in ports:
+            p = port['port']
+            # we don't apply security groups for dhcp, router
+            if (p.get('device_owner') and
+                    p['device_owner'].startswith('network:')):
+                continue
+            tenant_id = self._get_tenant_id_for_create(context, p)
+            if tenant_id not in default_sgs:
+                default_sgs[tenant_id] = self._ensure_default_security_group(
+                    context, tenant_id)
+            if not attr.is_attr_set(p.get(ext_sg.SECURITYGROUPS)):
+                p[ext_sg.SECURITYGROUPS] = [default_sgs[tenant_id]]
+
     def _check_update_deletes_security_groups(self, port):
         """Return True if port has as a security group and it's value
         is either [] or not is_attr_set, otherwise return False
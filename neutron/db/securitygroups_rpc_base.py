@@ -120,6 +120,23 @@ class SecurityGroupServerRpcMixin(sg_db.SecurityGroupDbMixin):
             self.notifier.security_groups_member_updated(
                 context, port.get(ext_sg.SECURITYGROUPS))
 
+    def notify_security_groups_member_updated_bulk(self, context, ports):
+        """Notify update event of security group members of many ports.
+
+        Sends the notifications of all the ports of a bulk request at once.
+        """
+        security_groups = set()
+        provider_updated = False
+        for port in ports:
+            if port['device_owner'] == q_const.DEVICE_OWNER_DHCP:
+                provider_updated = True
+            else:
+                security_groups.update(port.get(ext_sg.SECURITYGROUPS) or [])
+        if provider_updated:
+            self.notifier.security_groups_provider_updated(context)
+        self.notifier.security_groups_member_updated(context,
+                                                     list(security_groups))
+
 
 class SecurityGroupServerRpcCallbackMixin(object):
     """A mix-in that enable SecurityGroup agent support in plugin
@@ -136,7 +153,29 @@ class SecurityGroupServerRpcCallbackMixin(object):
         :returns: port correspond to the devices with security group rules
         """
         devices = kwargs.get('devices')
+        ports = self._get_ports_for_devices(devices)
+        return self._security_group_rules_for_ports(context, ports)
+
+    def security_group_info_for_devices(self, context, **kwargs):
+        """Return security group information for the devices.
 
+        Rules and remote group members are returned once per security
+        group rather than expanded for every port, the agent expands
+        them locally.
+
+        :params devices: list of devices
+        :returns: dict with
+            devices: port correspond to the devices, with the ids of
+                     their security groups and their provider rules
+            security_groups: rules of each security group of the ports
+            sg_member_ips: ip addresses of the members of each remote
+                           group, by ethertype
+        """
+        devices = kwargs.get('devices')
+        ports = self._get_ports_for_devices(devices)
+        return self._security_group_info_for_ports(context, ports)
+
+    def _get_ports_for_devices(self, devices):
         ports = {}
         for device in devices:
             port = self.get_port_from_device(device)
@@ -145,7 +184,7 @@ class SecurityGroupServerRpcCallbackMixin(object):
             if port['device_owner'].startswith('network:'):
                 continue
             ports[port['id']] = port
-        return self._security_group_rules_for_ports(context, ports)
+        return ports
 
     def _select_rules_for_ports(self, context, ports):
         if not ports:
@@ -162,6 +201,28 @@ class SecurityGroupServerRpcCallbackMixin(object):
         query = query.filter(sg_binding_port.in_(ports.keys()))
         return query.all()
 
+    def _select_sg_ids_for_ports(self, context, ports):
+        sg_ids_by_port = dict((port_id, []) for port_id in ports)
+        if not ports:
+            return sg_ids_by_port
+        sg_binding_port = sg_db.SecurityGroupPortBinding.port_id
+        sg_binding_sgid = sg_db.SecurityGroupPortBinding.security_group_id
+
+        query = context.session.query(sg_binding_port, sg_binding_sgid)
+        query = query.filter(sg_binding_port.in_(ports.keys()))
+        for port_id, security_group_id in query:
+            sg_ids_by_port[port_id].append(security_group_id)
+        return sg_ids_by_port
+
+    def _select_rules_for_security_groups(self, context, sg_ids):
+        if not sg_ids:
+            return []
+        sgr_sgid = sg_db.SecurityGroupRule.security_group_id
+
+        query = context.session.query(sg_db.SecurityGroupRule)
+        query = query.filter(sgr_sgid.in_(sg_ids))
+        return query.all()
+
     def _select_ips_for_remote_group(self, context, remote_group_ids):
         ips_by_group = {}
         if not remote_group_ids:
@@ -286,25 +347,61 @@ class SecurityGroupServerRpcCallbackMixin(object):
             self._add_ingress_ra_rule(port, ips)
             self._add_ingress_dhcp_rule(port, ips)
 
+    def _make_rule_dict(self, rule_in_db):
+        direction = rule_in_db['direction']
+        rule_dict = {
+            'security_group_id': rule_in_db['security_group_id'],
+            'direction': direction,
+            'ethertype': rule_in_db['ethertype'],
+        }
+        for key in ('protocol', 'port_range_min', 'port_range_max',
+                    'remote_ip_prefix', 'remote_group_id'):
+            if rule_in_db.get(key):
+                if key == 'remote_ip_prefix':
+                    direction_ip_prefix = DIRECTION_IP_PREFIX[direction]
+                    rule_dict[direction_ip_prefix] = rule_in_db[key]
+                    continue
+                rule_dict[key] = rule_in_db[key]
+        return rule_dict
+
     def _security_group_rules_for_ports(self, context, ports):
         rules_in_db = self._select_rules_for_ports(context, ports)
         for (binding, rule_in_db) in rules_in_db:
             port_id = binding['port_id']
             port = ports[port_id]
-            direction = rule_in_db['direction']
-            rule_dict = {
-                'security_group_id': rule_in_db['security_group_id'],
-                'direction': direction,
-                'ethertype': rule_in_db['ethertype'],
-            }
-            for key in ('protocol', 'port_range_min', 'port_range_max',
-                        'remote_ip_prefix', 'remote_group_id'):
-                if rule_in_db.get(key):
-                    if key == 'remote_ip_prefix':
-                        direction_ip_prefix = DIRECTION_IP_PREFIX[direction]
-                        rule_dict[direction_ip_prefix] = rule_in_db[key]
-                        continue
-                    rule_dict[key] = rule_in_db[key]
-            port['security_group_rules'].append(rule_dict)
+            port['security_group_rules'].append(
+                self._make_rule_dict(rule_in_db))
         self._apply_provider_rule(context, ports)
         return self._convert_remote_group_id_to_ip_prefix(context, ports)
+
+    def _security_group_info_for_ports(self, context, ports):
+        sg_ids_by_port = self._select_sg_ids_for_ports(context, ports)
+        sg_rules = {}
+        for port_id, sg_ids in sg_ids_by_port.items():
+            ports[port_id]['security_groups'] = sg_ids
+            for sg_id in sg_ids:
+                sg_rules[sg_id] = []
+
+        remote_group_ids = set()
+        rules_in_db = self._select_rules_for_security_groups(
+            context, sg_rules.keys())
+        for rule_in_db in rules_in_db:
+            rule_dict = self._make_rule_dict(rule_in_db)
+            sg_rules[rule_dict['security_group_id']].append(rule_dict)
+            if rule_dict.get('remote_group_id'):
+                remote_group_ids.add(rule_dict['remote_group_id'])
+
+        sg_member_ips = {}
+        ips = self._select_ips_for_remote_group(context,
+                                                list(remote_group_ids))
+        for remote_group_id, remote_ips in ips.items():
+            member_ips = {q_const.IPv4: [], q_const.IPv6: []}
+            for ip in remote_ips:
+                ethertype = 'IPv%s' % netaddr.IPNetwork(ip).version
+                member_ips[ethertype].append(ip)
+            sg_member_ips[remote_group_id] = member_ips
+
+        self._apply_provider_rule(context, ports)
+        return {'devices': ports,
+                'security_groups': sg_rules,
+                'sg_member_ips': sg_member_ips}
@@ -86,10 +86,11 @@ class BridgeRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
                          sg_db_rpc.SecurityGroupServerRpcCallbackMixin):
     """Agent callback."""
 
-    RPC_API_VERSION = '1.1'
+    RPC_API_VERSION = '1.2'
     # Device names start with "tap"
     # history
     #   1.1 Support Security Group RPC
+    #   1.2 Support security_group_info_for_devices
     TAP_PREFIX_LEN = 3
 
     def create_rpc_dispatcher(self):
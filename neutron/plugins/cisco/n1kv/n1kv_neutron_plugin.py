@@ -64,8 +64,9 @@ class N1kvRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
 
     """Class to handle agent RPC calls."""
 
-    # Set RPC API version to 1.1 by default.
-    RPC_API_VERSION = '1.1'
+    # Set RPC API version to 1.2 by default.
+    # 1.2 supports security_group_info_for_devices
+    RPC_API_VERSION = '1.2'
 
     def __init__(self, notifier):
         self.notifier = notifier
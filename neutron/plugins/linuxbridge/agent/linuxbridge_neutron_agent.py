@@ -861,20 +861,20 @@ class LinuxBridgeNeutronAgentRPC(sg_rpc.SecurityGroupAgentRpcMixin):
         return (resync_a | resync_b)
 
     def treat_devices_added(self, devices):
-        resync = False
         self.prepare_devices_filter(devices)
-        for device in devices:
+        try:
+            devices_details_list = self.plugin_rpc.get_devices_details_list(
+                self.context, list(devices), self.agent_id)
+        except Exception as e:
+            LOG.debug(_("Unable to get port details for "
+                        "%(devices)s: %(e)s"),
+                      {'devices': devices, 'e': e})
+            return True
+        devices_up = []
+        devices_down = []
+        for details in devices_details_list:
+            device = details['device']
             LOG.debug(_("Port %s added"), device)
-            try:
-                details = self.plugin_rpc.get_device_details(self.context,
-                                                             device,
-                                                             self.agent_id)
-            except Exception as e:
-                LOG.debug(_("Unable to get port details for "
-                            "%(device)s: %(e)s"),
-                          {'device': device, 'e': e})
-                resync = True
-                continue
             if 'port_id' in details:
                 LOG.info(_("Port %(device)s updated. Details: %(details)s"),
                          {'device': device, 'details': details})
@@ -893,44 +893,52 @@ class LinuxBridgeNeutronAgentRPC(sg_rpc.SecurityGroupAgentRpcMixin):
                                                  details['physical_network'],
                                                  segmentation_id,
                                                  details['port_id']):
-
-                        # update plugin about port status
-                        self.plugin_rpc.update_device_up(self.context,
-                                                         device,
-                                                         self.agent_id,
-                                                         cfg.CONF.host)
+                        devices_up.append(device)
                     else:
-                        self.plugin_rpc.update_device_down(self.context,
-                                                           device,
-                                                           self.agent_id,
-                                                           cfg.CONF.host)
+                        devices_down.append(device)
                 else:
                     self.remove_port_binding(details['network_id'],
                                              details['port_id'])
             else:
                 LOG.info(_("Device %s not defined on plugin"), device)
-        return resync
+        if not (devices_up or devices_down):
+            return False
+        # update plugin about port status
+        try:
+            result = self.plugin_rpc.update_device_list(self.context,
+                                                        devices_up,
+                                                        devices_down,
+                                                        self.agent_id,
+                                                        cfg.CONF.host)
+        except Exception as e:
+            LOG.debug(_("Unable to update the status of %(devices)s: "
+                        "%(e)s"),
+                      {'devices': devices_up + devices_down, 'e': e})
+            return True
+        return bool(result['failed_devices_up'] or
+                    result['failed_devices_down'])
 
     def treat_devices_removed(self, devices):
-        resync = False
         self.remove_devices_filter(devices)
         for device in devices:
             LOG.info(_("Attachment %s removed"), device)
-            try:
-                details = self.plugin_rpc.update_device_down(self.context,
-                                                             device,
-                                                             self.agent_id,
-                                                             cfg.CONF.host)
-            except Exception as e:
-                LOG.debug(_("port_removed failed for %(device)s: %(e)s"),
-                          {'device': device, 'e': e})
-                resync = True
+        try:
+            result = self.plugin_rpc.update_device_list(self.context,
+                                                        [], list(devices),
+                                                        self.agent_id,
+                                                        cfg.CONF.host)
+        except Exception as e:
+            LOG.debug(_("port_removed failed for %(devices)s: %(e)s"),
+                      {'devices': devices, 'e': e})
+            return True
+        for details in result['devices_down']:
             if details['exists']:
-                LOG.info(_("Port %s updated."), device)
+                LOG.info(_("Port %s updated."), details['device'])
             else:
-                LOG.debug(_("Device %s not defined on plugin"), device)
-            self.br_mgr.remove_empty_bridges()
-        return resync
+                LOG.debug(_("Device %s not defined on plugin"),
+                          details['device'])
+        self.br_mgr.remove_empty_bridges()
+        return bool(result['failed_devices_down'])
 
     def daemon_loop(self):
         sync = True
@@ -57,12 +57,15 @@ LOG = logging.getLogger(__name__)
 
 class LinuxBridgeRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
                               l3_rpc_base.L3RpcCallbackMixin,
-                              sg_db_rpc.SecurityGroupServerRpcCallbackMixin
+                              sg_db_rpc.SecurityGroupServerRpcCallbackMixin,
+                              q_rpc.DeviceListRpcCallbackMixin
                               ):
 
     # history
     #   1.1 Support Security Group RPC
-    RPC_API_VERSION = '1.1'
+    #   1.2 Support security_group_info_for_devices
+    #   1.3 Support get_devices_details_list and update_device_list
+    RPC_API_VERSION = '1.3'
     # Device names start with "tap"
     TAP_PREFIX_LEN = 3
 
@@ -144,7 +147,7 @@ class LinuxBridgeRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
         agent_id = kwargs.get('agent_id')
         device = kwargs.get('device')
         host = kwargs.get('host')
-        port = self.get_port_from_device.get_port(device)
+        port = self.get_port_from_device(device)
         LOG.debug(_("Device %(device)s up on %(agent_id)s"),
                   {'device': device, 'agent_id': agent_id})
         plugin = manager.NeutronManager.get_plugin()
@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import sqlalchemy as sa
 from sqlalchemy.orm import exc
 
 from neutron.db import api as db_api
@@ -27,6 +28,8 @@ from neutron.plugins.ml2 import models
 
 LOG = log.getLogger(__name__)
 
+UUID_LEN = 36
+
 
 def initialize():
     db_api.configure_db()
@@ -60,6 +63,23 @@ def get_network_segments(session, network_id):
                 for record in records]
 
 
+def get_networks_segments(session, network_ids):
+    """Get the segments of several networks, by network id."""
+    segments = dict((network_id, []) for network_id in network_ids)
+    if not network_ids:
+        return segments
+    with session.begin(subtransactions=True):
+        records = (session.query(models.NetworkSegment).
+                   filter(models.NetworkSegment.network_id.in_(network_ids)))
+        for record in records:
+            segments[record.network_id].append(
+                {api.ID: record.id,
+                 api.NETWORK_TYPE: record.network_type,
+                 api.PHYSICAL_NETWORK: record.physical_network,
+                 api.SEGMENTATION_ID: record.segmentation_id})
+    return segments
+
+
 def ensure_port_binding(session, port_id):
     with session.begin(subtransactions=True):
         try:
@@ -67,15 +87,21 @@ def ensure_port_binding(session, port_id):
                       filter_by(port_id=port_id).
                       one())
         except exc.NoResultFound:
-            record = models.PortBinding(
-                port_id=port_id,
-                host='',
-                vif_type=portbindings.VIF_TYPE_UNBOUND,
-                cap_port_filter=False)
-            session.add(record)
+            record = add_port_binding(session, port_id)
         return record
 
 
+def add_port_binding(session, port_id):
+    """Add the unbound binding of a new port."""
+    record = models.PortBinding(
+        port_id=port_id,
+        host='',
+        vif_type=portbindings.VIF_TYPE_UNBOUND,
+        cap_port_filter=False)
+    session.add(record)
+    return record
+
+
 def get_port(session, port_id):
     """Get port record for update within transcation."""
 
@@ -93,6 +119,26 @@ def get_port(session, port_id):
             return
 
 
+def get_ports(session, port_ids):
+    """Get the port records whose id starts with one of port_ids.
+
+    Port bindings are loaded along with the ports.
+    """
+    if not port_ids:
+        return []
+    # Match complete ids exactly, only truncated ones need a prefix match
+    full_ids = [port_id for port_id in port_ids
+                if len(port_id) == UUID_LEN]
+    filters = [models_v2.Port.id.startswith(port_id)
+               for port_id in port_ids if len(port_id) != UUID_LEN]
+    if full_ids:
+        filters.append(models_v2.Port.id.in_(full_ids))
+    with session.begin(subtransactions=True):
+        return (session.query(models_v2.Port).
+                filter(sa.or_(*filters)).
+                all())
+
+
 def get_port_and_sgs(port_id):
     """Get port from database with security group info."""
 
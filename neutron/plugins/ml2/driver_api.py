@@ -499,6 +499,36 @@ class MechanismDriver(object):
         """
         pass
 
+    def create_port_bulk_precommit(self, contexts):
+        """Allocate resources for the ports of a bulk request.
+
+        :param contexts: list of PortContext instances describing the
+        ports.
+
+        Called once per bulk request inside transaction context on
+        session, instead of create_port_precommit. Drivers able to
+        handle the ports together override it, the default calls
+        create_port_precommit for each port. Call cannot block.
+        Raising an exception will result in a rollback of the current
+        transaction.
+        """
+        for context in contexts:
+            self.create_port_precommit(context)
+
+    def create_port_bulk_postcommit(self, contexts):
+        """Create the ports of a bulk request.
+
+        :param contexts: list of PortContext instances describing the
+        ports.
+
+        Called once per bulk request after the transaction completes,
+        instead of create_port_postcommit. The default calls
+        create_port_postcommit for each port. Raising an exception will
+        result in the deletion of all the ports of the request.
+        """
+        for context in contexts:
+            self.create_port_postcommit(context)
+
     def update_port_precommit(self, context):
         """Update resources of a port.
 
@@ -30,12 +30,14 @@ class MechanismDriverContext(object):
 class NetworkContext(MechanismDriverContext, api.NetworkContext):
 
     def __init__(self, plugin, plugin_context, network,
-                 original_network=None):
+                 original_network=None, segments=None):
         super(NetworkContext, self).__init__(plugin, plugin_context)
         self._network = network
         self._original_network = original_network
-        self._segments = db.get_network_segments(plugin_context.session,
-                                                 network['id'])
+        if segments is None:
+            segments = db.get_network_segments(plugin_context.session,
+                                               network['id'])
+        self._segments = segments
 
     @property
     def current(self):
@@ -69,14 +71,16 @@ class SubnetContext(MechanismDriverContext, api.SubnetContext):
 class PortContext(MechanismDriverContext, api.PortContext):
 
     def __init__(self, plugin, plugin_context, port, network,
-                 original_port=None):
+                 original_port=None, binding=None, segments=None):
         super(PortContext, self).__init__(plugin, plugin_context)
         self._port = port
         self._original_port = original_port
         self._network_context = NetworkContext(plugin, plugin_context,
-                                               network)
-        self._binding = db.ensure_port_binding(plugin_context.session,
-                                               port['id'])
+                                               network, segments=segments)
+        if binding is None:
+            binding = db.ensure_port_binding(plugin_context.session,
+                                             port['id'])
+        self._binding = binding
 
     @property
     def current(self):
@@ -0,0 +1,218 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Allocation of segmentation IDs from ranges of IDs.
+
+With the range allocator, the VLAN, GRE and VXLAN type drivers only store
+the allocated segmentation IDs in their allocation tables, and their
+configured ranges in ml2_segment_ranges.  Starting the server writes one
+row per range instead of one per ID, and a free ID is the first gap of
+the allocated IDs of a range, searched by the database on the primary key
+of the allocation table.  The allocations from a range are serialized by
+locking its row.
+"""
+
+import sys
+
+from oslo.config import cfg
+import sqlalchemy as sa
+from sqlalchemy import orm
+
+from neutron.db import api as db_api
+from neutron.db import model_base
+from neutron.openstack.common import log
+
+LOG = log.getLogger(__name__)
+
+TABLE_ALLOCATOR = 'table'
+RANGE_ALLOCATOR = 'range'
+
+segment_opts = [
+    cfg.StrOpt('segment_allocator',
+               default=TABLE_ALLOCATOR,
+               help=_("How the vlan, gre and vxlan type drivers allocate "
+                      "segmentation IDs. 'table' stores a row for each ID "
+                      "of the configured ranges, 'range' only stores the "
+                      "allocated IDs and the ranges, which keeps the "
+                      "server startup fast with large ranges.")),
+]
+
+cfg.CONF.register_opts(segment_opts, "ml2")
+
+
+class SegmentRange(model_base.BASEV2):
+    """Represent a configured range of segmentation IDs of a network type.
+
+    The physical_network of tunnel network types is empty.
+    """
+
+    __tablename__ = 'ml2_segment_ranges'
+
+    network_type = sa.Column(sa.String(32), nullable=False,
+                             primary_key=True)
+    physical_network = sa.Column(sa.String(64), nullable=False,
+                                 primary_key=True)
+    minimum = sa.Column(sa.Integer, nullable=False, primary_key=True,
+                        autoincrement=False)
+    maximum = sa.Column(sa.Integer, nullable=False)
+
+
+def get_allocator(network_type, model, id_attribute):
+    """Return the range allocator of network_type, if configured."""
+    allocator = cfg.CONF.ml2.segment_allocator
+    if allocator == RANGE_ALLOCATOR:
+        return RangeAllocator(network_type, model, id_attribute)
+    if allocator != TABLE_ALLOCATOR:
+        LOG.error(_("Invalid segment_allocator '%s'. Service terminated!"),
+                  allocator)
+        sys.exit(1)
+
+
+class RangeAllocator(object):
+    """Allocate the segmentation IDs of a network type from its ranges.
+
+    model is the allocation table of the network type, in which
+    id_attribute is the segmentation ID.  The physical networks are only
+    used if the table has a physical_network column.
+    """
+
+    def __init__(self, network_type, model, id_attribute):
+        self.network_type = network_type
+        self.model = model
+        self.id_attribute = id_attribute
+        self.has_physical_network = hasattr(model, 'physical_network')
+
+    def _query(self, session, model, physical_network, *entities):
+        query = session.query(*(entities or [model]))
+        if self.has_physical_network:
+            query = query.filter(model.physical_network == physical_network)
+        return query
+
+    def _get_allocation(self, session, physical_network, segmentation_id):
+        id_column = getattr(self.model, self.id_attribute)
+        return (self._query(session, self.model, physical_network).
+                filter(id_column == segmentation_id).
+                with_lockmode('update').
+                first())
+
+    def _lock_range(self, session, physical_network, segmentation_id):
+        return (session.query(SegmentRange).
+                filter_by(network_type=self.network_type,
+                          physical_network=physical_network or '').
+                filter(SegmentRange.minimum <= segmentation_id,
+                       SegmentRange.maximum >= segmentation_id).
+                with_lockmode('update').
+                first())
+
+    def sync(self, ranges):
+        """Store ranges, the [(min, max)] lists by physical network.
+
+        The rows of free IDs stored by the table allocator are deleted.
+        """
+        configured = {}
+        for physical_network, id_ranges in ranges.iteritems():
+            for minimum, maximum in id_ranges:
+                configured[(physical_network or '', minimum)] = maximum
+
+        session = db_api.get_session()
+        with session.begin(subtransactions=True):
+            stored = (session.query(SegmentRange).
+                      filter_by(network_type=self.network_type).
+                      with_lockmode('update'))
+            for segment_range in stored:
+                key = (segment_range.physical_network, segment_range.minimum)
+                if key not in configured:
+                    session.delete(segment_range)
+                else:
+                    segment_range.maximum = configured.pop(key)
+            for (physical_network, minimum), maximum in configured.items():
+                session.add(SegmentRange(network_type=self.network_type,
+                                         physical_network=physical_network,
+                                         minimum=minimum,
+                                         maximum=maximum))
+            (session.query(self.model).
+             filter_by(allocated=False).
+             delete(synchronize_session=False))
+
+    def _first_free_id(self, session, physical_network, minimum, maximum):
+        id_column = getattr(self.model, self.id_attribute)
+        if not (self._query(session, self.model, physical_network).
+                filter(id_column == minimum).first()):
+            return minimum
+
+        # The first allocated ID of the range not followed by another one
+        following = orm.aliased(self.model)
+        following_id = getattr(following, self.id_attribute)
+        join_on = [following_id == id_column + 1]
+        if self.has_physical_network:
+            join_on.append(following.physical_network == physical_network)
+        gap = (self._query(session, self.model, physical_network,
+                           sa.func.min(id_column)).
+               outerjoin(following, sa.and_(*join_on)).
+               filter(id_column >= minimum,
+                      id_column < maximum,
+                      following_id == sa.null()).
+               scalar())
+        if gap is not None:
+            return gap + 1
+
+    def allocate(self, session):
+        """Allocate a free ID, return its (physical_network, id)."""
+        with session.begin(subtransactions=True):
+            segment_ranges = (session.query(SegmentRange).
+                              filter_by(network_type=self.network_type).
+                              order_by(SegmentRange.physical_network,
+                                       SegmentRange.minimum).all())
+            for segment_range in segment_ranges:
+                physical_network = segment_range.physical_network or None
+                # Refresh the range as it is locked
+                session.refresh(segment_range, lockmode='update')
+                segmentation_id = self._first_free_id(
+                    session, physical_network,
+                    segment_range.minimum, segment_range.maximum)
+                if segmentation_id is not None:
+                    self._add(session, physical_network, segmentation_id)
+                    return physical_network, segmentation_id
+
+    def _add(self, session, physical_network, segmentation_id):
+        alloc = self.model(allocated=True)
+        setattr(alloc, self.id_attribute, segmentation_id)
+        if self.has_physical_network:
+            alloc.physical_network = physical_network
+        session.add(alloc)
+
+    def reserve(self, session, physical_network, segmentation_id):
+        """Reserve an ID, return False if it is already allocated."""
+        with session.begin(subtransactions=True):
+            self._lock_range(session, physical_network, segmentation_id)
+            alloc = self._get_allocation(session, physical_network,
+                                         segmentation_id)
+            if alloc:
+                if alloc.allocated:
+                    return False
+                alloc.allocated = True
+            else:
+                self._add(session, physical_network, segmentation_id)
+            return True
+
+    def release(self, session, physical_network, segmentation_id):
+        """Release an ID, return False if it was not allocated."""
+        with session.begin(subtransactions=True):
+            alloc = self._get_allocation(session, physical_network,
+                                         segmentation_id)
+            if not alloc:
+                return False
+            session.delete(alloc)
+            return True
@@ -22,6 +22,7 @@ from neutron.db import api as db_api
 from neutron.db import model_base
 from neutron.openstack.common import log
 from neutron.plugins.ml2 import driver_api as api
+from neutron.plugins.ml2.drivers import segment_ranges
 from neutron.plugins.ml2.drivers import type_tunnel
 
 LOG = log.getLogger(__name__)
@@ -60,6 +61,9 @@ class GreEndpoints(model_base.BASEV2):
 
 class GreTypeDriver(type_tunnel.TunnelTypeDriver):
 
+    # The segment_ranges.RangeAllocator, if configured
+    allocator = None
+
     def get_type(self):
         return TYPE_GRE
 
@@ -70,10 +74,19 @@ class GreTypeDriver(type_tunnel.TunnelTypeDriver):
             self.gre_id_ranges,
             TYPE_GRE
         )
-        self._sync_gre_allocations()
+        self.allocator = segment_ranges.get_allocator(
+            TYPE_GRE, GreAllocation, 'gre_id')
+        if self.allocator:
+            self.allocator.sync({None: self.gre_id_ranges})
+        else:
+            self._sync_gre_allocations()
 
     def reserve_provider_segment(self, session, segment):
         segmentation_id = segment.get(api.SEGMENTATION_ID)
+        if self.allocator:
+            if not self.allocator.reserve(session, None, segmentation_id):
+                raise exc.TunnelIdInUse(tunnel_id=segmentation_id)
+            return
         with session.begin(subtransactions=True):
             try:
                 alloc = (session.query(GreAllocation).
@@ -93,6 +106,13 @@ class GreTypeDriver(type_tunnel.TunnelTypeDriver):
                 session.add(alloc)
 
     def allocate_tenant_segment(self, session):
+        if self.allocator:
+            allocation = self.allocator.allocate(session)
+            if allocation:
+                return {api.NETWORK_TYPE: TYPE_GRE,
+                        api.PHYSICAL_NETWORK: None,
+                        api.SEGMENTATION_ID: allocation[1]}
+            return
         with session.begin(subtransactions=True):
             alloc = (session.query(GreAllocation).
                      filter_by(allocated=False).
@@ -108,6 +128,10 @@ class GreTypeDriver(type_tunnel.TunnelTypeDriver):
 
     def release_segment(self, session, segment):
         gre_id = segment[api.SEGMENTATION_ID]
+        if self.allocator:
+            if not self.allocator.release(session, None, gre_id):
+                LOG.warning(_("gre_id %s not found"), gre_id)
+            return
         with session.begin(subtransactions=True):
             try:
                 alloc = (session.query(GreAllocation).
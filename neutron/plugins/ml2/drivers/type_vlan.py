@@ -26,6 +26,7 @@ from neutron.db import model_base
 from neutron.openstack.common import log
 from neutron.plugins.common import utils as plugin_utils
 from neutron.plugins.ml2 import driver_api as api
+from neutron.plugins.ml2.drivers import segment_ranges
 
 LOG = log.getLogger(__name__)
 
@@ -78,6 +79,9 @@ class VlanTypeDriver(api.TypeDriver):
     available physical_network.
     """
 
+    # The segment_ranges.RangeAllocator, if configured
+    allocator = None
+
     def __init__(self):
         self._parse_network_vlan_ranges()
 
@@ -157,7 +161,12 @@ class VlanTypeDriver(api.TypeDriver):
         return TYPE_VLAN
 
     def initialize(self):
-        self._sync_vlan_allocations()
+        self.allocator = segment_ranges.get_allocator(
+            TYPE_VLAN, VlanAllocation, 'vlan_id')
+        if self.allocator:
+            self.allocator.sync(self.network_vlan_ranges)
+        else:
+            self._sync_vlan_allocations()
         LOG.info(_("VlanTypeDriver initialization complete"))
 
     def validate_provider_segment(self, segment):
@@ -191,6 +200,12 @@ class VlanTypeDriver(api.TypeDriver):
     def reserve_provider_segment(self, session, segment):
         physical_network = segment[api.PHYSICAL_NETWORK]
         vlan_id = segment[api.SEGMENTATION_ID]
+        if self.allocator:
+            if not self.allocator.reserve(session, physical_network,
+                                          vlan_id):
+                raise exc.VlanIdInUse(vlan_id=vlan_id,
+                                      physical_network=physical_network)
+            return
         with session.begin(subtransactions=True):
             try:
                 alloc = (session.query(VlanAllocation).
@@ -217,6 +232,13 @@ class VlanTypeDriver(api.TypeDriver):
                 session.add(alloc)
 
     def allocate_tenant_segment(self, session):
+        if self.allocator:
+            allocation = self.allocator.allocate(session)
+            if allocation:
+                return {api.NETWORK_TYPE: TYPE_VLAN,
+                        api.PHYSICAL_NETWORK: allocation[0],
+                        api.SEGMENTATION_ID: allocation[1]}
+            return
         with session.begin(subtransactions=True):
             alloc = (session.query(VlanAllocation).
                      filter_by(allocated=False).
@@ -235,6 +257,14 @@ class VlanTypeDriver(api.TypeDriver):
     def release_segment(self, session, segment):
         physical_network = segment[api.PHYSICAL_NETWORK]
         vlan_id = segment[api.SEGMENTATION_ID]
+        if self.allocator:
+            if not self.allocator.release(session, physical_network,
+                                          vlan_id):
+                LOG.warning(_("No vlan_id %(vlan_id)s found on physical "
+                              "network %(physical_network)s"),
+                            {'vlan_id': vlan_id,
+                             'physical_network': physical_network})
+            return
         with session.begin(subtransactions=True):
             try:
                 alloc = (session.query(VlanAllocation).
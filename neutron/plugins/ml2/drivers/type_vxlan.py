@@ -23,6 +23,7 @@ from neutron.db import api as db_api
 from neutron.db import model_base
 from neutron.openstack.common import log
 from neutron.plugins.ml2 import driver_api as api
+from neutron.plugins.ml2.drivers import segment_ranges
 from neutron.plugins.ml2.drivers import type_tunnel
 
 LOG = log.getLogger(__name__)
@@ -68,6 +69,9 @@ class VxlanEndpoints(model_base.BASEV2):
 
 class VxlanTypeDriver(type_tunnel.TunnelTypeDriver):
 
+    # The segment_ranges.RangeAllocator, if configured
+    allocator = None
+
     def get_type(self):
         return TYPE_VXLAN
 
@@ -78,10 +82,19 @@ class VxlanTypeDriver(type_tunnel.TunnelTypeDriver):
             self.vxlan_vni_ranges,
             TYPE_VXLAN
         )
-        self._sync_vxlan_allocations()
+        self.allocator = segment_ranges.get_allocator(
+            TYPE_VXLAN, VxlanAllocation, 'vxlan_vni')
+        if self.allocator:
+            self.allocator.sync({None: self.vxlan_vni_ranges})
+        else:
+            self._sync_vxlan_allocations()
 
     def reserve_provider_segment(self, session, segment):
         segmentation_id = segment.get(api.SEGMENTATION_ID)
+        if self.allocator:
+            if not self.allocator.reserve(session, None, segmentation_id):
+                raise exc.TunnelIdInUse(tunnel_id=segmentation_id)
+            return
         with session.begin(subtransactions=True):
             try:
                 alloc = (session.query(VxlanAllocation).
@@ -101,6 +114,13 @@ class VxlanTypeDriver(type_tunnel.TunnelTypeDriver):
                 session.add(alloc)
 
     def allocate_tenant_segment(self, session):
+        if self.allocator:
+            allocation = self.allocator.allocate(session)
+            if allocation:
+                return {api.NETWORK_TYPE: TYPE_VXLAN,
+                        api.PHYSICAL_NETWORK: None,
+                        api.SEGMENTATION_ID: allocation[1]}
+            return
         with session.begin(subtransactions=True):
             alloc = (session.query(VxlanAllocation).
                      filter_by(allocated=False).
@@ -116,6 +136,10 @@ class VxlanTypeDriver(type_tunnel.TunnelTypeDriver):
 
     def release_segment(self, session, segment):
         vxlan_vni = segment[api.SEGMENTATION_ID]
+        if self.allocator:
+            if not self.allocator.release(session, None, vxlan_vni):
+                LOG.warning(_("vxlan_vni %s not found"), vxlan_vni)
+            return
         with session.begin(subtransactions=True):
             try:
                 alloc = (session.query(VxlanAllocation).
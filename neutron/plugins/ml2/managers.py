@@ -366,6 +366,33 @@ class MechanismManager(stevedore.named.NamedExtensionManager):
         """
         self._call_on_drivers("create_port_postcommit", context)
 
+    def create_port_bulk_precommit(self, contexts):
+        """Notify all mechanism drivers once during bulk port creation.
+
+        :raises: neutron.plugins.ml2.common.MechanismDriverError
+        if any mechanism driver create_port_bulk_precommit call fails.
+
+        Called within the database transaction. If a mechanism driver
+        raises an exception, then a MechanismDriverError is propogated
+        to the caller, triggering a rollback. There is no guarantee
+        that all mechanism drivers are called in this case.
+        """
+        self._call_on_drivers("create_port_bulk_precommit", contexts)
+
+    def create_port_bulk_postcommit(self, contexts):
+        """Notify all mechanism drivers once of bulk port creation.
+
+        :raises: neutron.plugins.ml2.common.MechanismDriverError
+        if any mechanism driver create_port_bulk_postcommit call fails.
+
+        Called after the database transaction. Errors raised by
+        mechanism drivers are left to propogate to the caller, where
+        all the ports will be deleted, triggering any required
+        cleanup. There is no guarantee that all mechanism drivers are
+        called in this case.
+        """
+        self._call_on_drivers("create_port_bulk_postcommit", contexts)
+
     def update_port_precommit(self, context):
         """Notify all mechanism drivers during port update.
 
@@ -29,6 +29,7 @@ from neutron.db import external_net_db
 from neutron.db import extradhcpopt_db
 from neutron.db import models_v2
 from neutron.db import quota_db  # noqa
+from neutron.db import revisions
 from neutron.db import securitygroups_rpc_base as sg_db_rpc
 from neutron.extensions import allowedaddresspairs as addr_pair
 from neutron.extensions import extra_dhcp_opt as edo_ext
@@ -118,12 +119,14 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
             dhcp_rpc_agent_api.DhcpAgentNotifyAPI()
         )
         self.callbacks = rpc.RpcCallbacks(self.notifier, self.type_manager)
+
+    def start_rpc_listener(self):
         self.topic = topics.PLUGIN
         self.conn = c_rpc.create_connection(new=True)
         self.dispatcher = self.callbacks.create_rpc_dispatcher()
         self.conn.create_consumer(self.topic, self.dispatcher,
                                   fanout=False)
-        self.conn.consume_in_thread()
+        return self.conn.consume_in_thread()
 
     def _process_provider_segment(self, segment):
         network_type = self._get_attribute(segment, provider.NETWORK_TYPE)
@@ -516,6 +519,8 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
 
                     LOG.debug(_("Deleting subnet record"))
                     record = self._get_subnet(context, id)
+                    revisions.bump_network_revisions(session,
+                                                     [record.network_id])
                     session.delete(record)
 
                     LOG.debug(_("Committing transaction"))
@@ -572,6 +577,54 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
         self.notify_security_groups_member_updated(context, result)
         return result
 
+    def create_port_bulk(self, context, ports):
+        items = ports['ports']
+        for item in items:
+            item['port']['status'] = const.PORT_STATUS_DOWN
+
+        session = context.session
+        with session.begin(subtransactions=True):
+            self._ensure_default_security_group_on_ports(context, items)
+            port_sgids = self._get_security_groups_on_ports(context, items)
+            results = self._create_ports_db(context, items)
+            networks = {}
+            mech_contexts = []
+            for item, result, sgids in zip(items, results, port_sgids):
+                attrs = item['port']
+                self._process_port_create_security_group(context, result,
+                                                         sgids)
+                network_id = result['network_id']
+                if network_id not in networks:
+                    networks[network_id] = (
+                        self.get_network(context, network_id),
+                        db.get_network_segments(session, network_id))
+                network, segments = networks[network_id]
+                mech_context = driver_context.PortContext(
+                    self, context, result, network,
+                    binding=db.add_port_binding(session, result['id']),
+                    segments=segments)
+                self._process_port_binding(mech_context, attrs)
+                result[addr_pair.ADDRESS_PAIRS] = (
+                    self._process_create_allowed_address_pairs(
+                        context, result,
+                        attrs.get(addr_pair.ADDRESS_PAIRS)))
+                self._process_port_create_extra_dhcp_opts(
+                    context, result, attrs.get(edo_ext.EXTRADHCPOPTS, []))
+                mech_contexts.append(mech_context)
+            self.mechanism_manager.create_port_bulk_precommit(mech_contexts)
+
+        try:
+            self.mechanism_manager.create_port_bulk_postcommit(mech_contexts)
+        except ml2_exc.MechanismDriverError:
+            with excutils.save_and_reraise_exception():
+                LOG.error(_("mechanism_manager.create_port_bulk_postcommit "
+                            "failed, deleting ports %s"),
+                          ', '.join(result['id'] for result in results))
+                for result in results:
+                    self.delete_port(context, result['id'])
+        self.notify_security_groups_member_updated_bulk(context, results)
+        return results
+
     def update_port(self, context, id, port):
         attrs = port['port']
         need_port_update_notify = False
@@ -651,7 +704,6 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
         self.notify_security_groups_member_updated(context, port)
 
     def update_port_status(self, context, port_id, status):
-        updated = False
         session = context.session
         with session.begin(subtransactions=True):
             port = db.get_port(session, port_id)
@@ -659,23 +711,37 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
                 LOG.warning(_("Port %(port)s updated up by agent not found"),
                             {'port': port_id})
                 return False
-            if port.status != status:
-                original_port = self._make_port_dict(port)
-                port.status = status
-                updated_port = self._make_port_dict(port)
-                network = self.get_network(context,
-                                           original_port['network_id'])
-                mech_context = driver_context.PortContext(
-                    self, context, updated_port, network,
-                    original_port=original_port)
-                self.mechanism_manager.update_port_precommit(mech_context)
-                updated = True
+            mech_context = self.set_port_status(context, port, status)
 
-        if updated:
+        if mech_context:
             self.mechanism_manager.update_port_postcommit(mech_context)
 
         return True
 
+    def set_port_status(self, context, port, status, networks=None):
+        """Set the status of a port record within the current transaction.
+
+        Returns the mechanism driver context to pass to
+        update_port_postcommit once the transaction is committed, None if
+        the status did not change.  networks caches the network dicts by
+        id across calls.
+        """
+        if port.status == status:
+            return
+        original_port = self._make_port_dict(port)
+        port.status = status
+        updated_port = self._make_port_dict(port)
+        if networks is None:
+            networks = {}
+        network_id = original_port['network_id']
+        if network_id not in networks:
+            networks[network_id] = self.get_network(context, network_id)
+        mech_context = driver_context.PortContext(
+            self, context, updated_port, networks[network_id],
+            original_port=original_port)
+        self.mechanism_manager.update_port_precommit(mech_context)
+        return mech_context
+
     def port_bound_to_host(self, port_id, host):
         port_host = db.get_port_binding_host(port_id)
         return (port_host == host)
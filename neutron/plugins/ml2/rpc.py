@@ -38,12 +38,15 @@ TAP_DEVICE_PREFIX_LENGTH = 3
 
 class RpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
                    sg_db_rpc.SecurityGroupServerRpcCallbackMixin,
-                   type_tunnel.TunnelRpcCallbackMixin):
+                   type_tunnel.TunnelRpcCallbackMixin,
+                   q_rpc.DeviceListRpcCallbackMixin):
 
-    RPC_API_VERSION = '1.1'
+    RPC_API_VERSION = '1.3'
     # history
     #   1.0 Initial version (from openvswitch/linuxbridge)
     #   1.1 Support Security Group RPC
+    #   1.2 Support security_group_info_for_devices
+    #   1.3 Support get_devices_details_list and update_device_list
 
     def __init__(self, notifier, type_manager):
         # REVISIT(kmestery): This depends on the first three super classes
@@ -91,57 +94,109 @@ class RpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
         session = db_api.get_session()
         with session.begin(subtransactions=True):
             port = db.get_port(session, port_id)
-            if not port:
-                LOG.warning(_("Device %(device)s requested by agent "
-                              "%(agent_id)s not found in database"),
-                            {'device': device, 'agent_id': agent_id})
-                return {'device': device}
-
-            segments = db.get_network_segments(session, port.network_id)
-            if not segments:
-                LOG.warning(_("Device %(device)s requested by agent "
-                              "%(agent_id)s has network %(network_id)s with "
-                              "no segments"),
-                            {'device': device,
-                             'agent_id': agent_id,
-                             'network_id': port.network_id})
-                return {'device': device}
+            segments = None
+            if port:
+                segments = db.get_network_segments(session, port.network_id)
+            return self._get_device_details(session, device, agent_id,
+                                            port, segments)
 
+    def get_devices_details_list(self, rpc_context, **kwargs):
+        """Agent requests the details of several devices."""
+        agent_id = kwargs.get('agent_id')
+        devices = kwargs.get('devices', [])
+        LOG.debug(_("Devices %(devices)s details requested by agent "
+                    "%(agent_id)s"),
+                  {'devices': devices, 'agent_id': agent_id})
+        session = db_api.get_session()
+        with session.begin(subtransactions=True):
+            ports = self._get_devices_ports(session, devices)
+            segments = db.get_networks_segments(
+                session, list(set(port.network_id for port in ports if port)))
+            return [self._get_device_details(
+                session, device, agent_id, port,
+                port and segments[port.network_id])
+                for device, port in zip(devices, ports)]
+
+    def _get_devices_ports(self, session, devices):
+        """Return the port record of each of devices, None if not found.
+
+        The ports of all the devices are fetched by one query.
+        """
+        port_ids = [self._device_to_port_id(device) for device in devices]
+        ports = db.get_ports(session, port_ids)
+        # Index the ports by every requested id length, device names
+        # may hold truncated port ids
+        ports_by_id = {}
+        for length in set(len(port_id) for port_id in port_ids):
+            for port in ports:
+                ports_by_id.setdefault(port.id[:length], []).append(port)
+
+        devices_ports = []
+        for port_id in port_ids:
+            matches = ports_by_id.get(port_id, [])
+            port = None
+            if len(matches) == 1:
+                port = matches[0]
+            elif matches:
+                LOG.error(_("Multiple ports have port_id starting "
+                            "with %s"), port_id)
+            devices_ports.append(port)
+        return devices_ports
+
+    def _get_device_details(self, session, device, agent_id, port,
+                            segments):
+        if not port:
+            LOG.warning(_("Device %(device)s requested by agent "
+                          "%(agent_id)s not found in database"),
+                        {'device': device, 'agent_id': agent_id})
+            return {'device': device}
+
+        if not segments:
+            LOG.warning(_("Device %(device)s requested by agent "
+                          "%(agent_id)s has network %(network_id)s with "
+                          "no segments"),
+                        {'device': device,
+                         'agent_id': agent_id,
+                         'network_id': port.network_id})
+            return {'device': device}
+
+        binding = port.port_binding
+        if not binding:
             binding = db.ensure_port_binding(session, port.id)
-            if not binding.segment:
-                LOG.warning(_("Device %(device)s requested by agent "
-                              "%(agent_id)s on network %(network_id)s not "
-                              "bound, vif_type: %(vif_type)s"),
-                            {'device': device,
-                             'agent_id': agent_id,
-                             'network_id': port.network_id,
-                             'vif_type': binding.vif_type})
-                return {'device': device}
-
-            segment = self._find_segment(segments, binding.segment)
-            if not segment:
-                LOG.warning(_("Device %(device)s requested by agent "
-                              "%(agent_id)s on network %(network_id)s "
-                              "invalid segment, vif_type: %(vif_type)s"),
-                            {'device': device,
-                             'agent_id': agent_id,
-                             'network_id': port.network_id,
-                             'vif_type': binding.vif_type})
-                return {'device': device}
-
-            new_status = (q_const.PORT_STATUS_BUILD if port.admin_state_up
-                          else q_const.PORT_STATUS_DOWN)
-            if port.status != new_status:
-                port.status = new_status
-            entry = {'device': device,
-                     'network_id': port.network_id,
-                     'port_id': port.id,
-                     'admin_state_up': port.admin_state_up,
-                     'network_type': segment[api.NETWORK_TYPE],
-                     'segmentation_id': segment[api.SEGMENTATION_ID],
-                     'physical_network': segment[api.PHYSICAL_NETWORK]}
-            LOG.debug(_("Returning: %s"), entry)
-            return entry
+        if not binding.segment:
+            LOG.warning(_("Device %(device)s requested by agent "
+                          "%(agent_id)s on network %(network_id)s not "
+                          "bound, vif_type: %(vif_type)s"),
+                        {'device': device,
+                         'agent_id': agent_id,
+                         'network_id': port.network_id,
+                         'vif_type': binding.vif_type})
+            return {'device': device}
+
+        segment = self._find_segment(segments, binding.segment)
+        if not segment:
+            LOG.warning(_("Device %(device)s requested by agent "
+                          "%(agent_id)s on network %(network_id)s "
+                          "invalid segment, vif_type: %(vif_type)s"),
+                        {'device': device,
+                         'agent_id': agent_id,
+                         'network_id': port.network_id,
+                         'vif_type': binding.vif_type})
+            return {'device': device}
+
+        new_status = (q_const.PORT_STATUS_BUILD if port.admin_state_up
+                      else q_const.PORT_STATUS_DOWN)
+        if port.status != new_status:
+            port.status = new_status
+        entry = {'device': device,
+                 'network_id': port.network_id,
+                 'port_id': port.id,
+                 'admin_state_up': port.admin_state_up,
+                 'network_type': segment[api.NETWORK_TYPE],
+                 'segmentation_id': segment[api.SEGMENTATION_ID],
+                 'physical_network': segment[api.PHYSICAL_NETWORK]}
+        LOG.debug(_("Returning: %s"), entry)
+        return entry
 
     def _find_segment(self, segments, segment_id):
         for segment in segments:
@@ -173,6 +228,80 @@ class RpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
         return {'device': device,
                 'exists': port_exists}
 
+    def update_device_list(self, rpc_context, **kwargs):
+        """Devices are up or no longer exist on agent.
+
+        The ports of all the devices are fetched by one query and their
+        status set in one transaction, the mechanism drivers being called
+        once it is committed.  Should that transaction fail, the devices
+        are updated one at a time to only report the failed ones.
+        """
+        agent_id = kwargs.get('agent_id')
+        host = kwargs.get('host')
+        devices_up = kwargs.get('devices_up', [])
+        devices_down = kwargs.get('devices_down', [])
+        LOG.debug(_("Devices %(devices_up)s up and %(devices_down)s no "
+                    "longer existing at agent %(agent_id)s"),
+                  {'devices_up': devices_up, 'devices_down': devices_down,
+                   'agent_id': agent_id})
+        plugin = manager.NeutronManager.get_plugin()
+        result = {'devices_up': [], 'failed_devices_up': [],
+                  'devices_down': [], 'failed_devices_down': []}
+        updates = ([(device, q_const.PORT_STATUS_ACTIVE)
+                    for device in devices_up] +
+                   [(device, q_const.PORT_STATUS_DOWN)
+                    for device in devices_down])
+        mech_contexts = []
+        networks = {}
+        session = rpc_context.session
+        try:
+            with session.begin(subtransactions=True):
+                ports = self._get_devices_ports(
+                    session, [device for device, status in updates])
+                for (device, status), port in zip(updates, ports):
+                    if not port:
+                        LOG.warning(_("Port %(port)s updated up by agent "
+                                      "not found"),
+                                    {'port': self._device_to_port_id(device)})
+                    elif (host and not (port.port_binding and
+                                        port.port_binding.host == host)):
+                        LOG.debug(_("Device %(device)s not bound to the"
+                                    " agent host %(host)s"),
+                                  {'device': device, 'host': host})
+                    else:
+                        mech_contexts.append((device, status,
+                                              plugin.set_port_status(
+                                                  rpc_context, port, status,
+                                                  networks)))
+                    if status == q_const.PORT_STATUS_ACTIVE:
+                        result['devices_up'].append(device)
+                    else:
+                        # Only the ports not found no longer exist
+                        result['devices_down'].append(
+                            {'device': device, 'exists': bool(port)})
+        except Exception:
+            LOG.exception(_("Failed to update the status of the devices, "
+                            "updating them one at a time"))
+            return super(RpcCallbacks, self).update_device_list(rpc_context,
+                                                                **kwargs)
+
+        for device, status, mech_context in mech_contexts:
+            if not mech_context:
+                continue
+            try:
+                plugin.mechanism_manager.update_port_postcommit(mech_context)
+            except Exception:
+                if status == q_const.PORT_STATUS_ACTIVE:
+                    LOG.exception(_("Failed to set device %s up"), device)
+                    result['devices_up'].remove(device)
+                    result['failed_devices_up'].append(device)
+                else:
+                    LOG.exception(_("Failed to set device %s down"), device)
+                    result['devices_down'].remove({'device': device,
+                                                   'exists': True})
+                    result['failed_devices_down'].append(device)
+        return result
+
     def update_device_up(self, rpc_context, **kwargs):
         """Device is up on agent."""
         agent_id = kwargs.get('agent_id')
@@ -821,8 +821,12 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                 int_veth.link.set_mtu(self.veth_mtu)
                 phys_veth.link.set_mtu(self.veth_mtu)
 
-    def update_ports(self, registered_ports):
-        ports = self.int_br.get_vif_port_set()
+    def update_ports(self, registered_ports, port_events=None):
+        if port_events is None:
+            ports = self.int_br.get_vif_port_set()
+        else:
+            ports = self._get_ports_from_events(registered_ports,
+                                                port_events)
         if ports == registered_ports:
             return
         self.int_br_device_count = len(ports)
@@ -832,6 +836,16 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                 'added': added,
                 'removed': removed}
 
+    def _get_ports_from_events(self, registered_ports, port_events):
+        ports = registered_ports - port_events['removed']
+        if port_events['added']:
+            # The monitor reports the vif ports of all the bridges
+            port_names = set(self.int_br.get_port_name_list())
+            ports |= set(port_id for port_id, port_name
+                         in port_events['added'].iteritems()
+                         if port_name in port_names)
+        return ports
+
     def update_ancillary_ports(self, registered_ports):
         ports = set()
         for bridge in self.ancillary_brs:
@@ -903,106 +917,114 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                     self.tun_br_ofports[tunnel_type].pop(remote_ip, None)
 
     def treat_devices_added(self, devices):
-        resync = False
         self.sg_agent.prepare_devices_filter(devices)
-        for device in devices:
-            LOG.info(_("Port %s added"), device)
-            try:
-                details = self.plugin_rpc.get_device_details(self.context,
-                                                             device,
-                                                             self.agent_id)
-            except Exception as e:
-                LOG.debug(_("Unable to get port details for "
-                            "%(device)s: %(e)s"),
-                          {'device': device, 'e': e})
-                resync = True
-                continue
-            port = self.int_br.get_vif_port_by_id(details['device'])
-            if 'port_id' in details:
-                LOG.info(_("Port %(device)s updated. Details: %(details)s"),
-                         {'device': device, 'details': details})
-                self.treat_vif_port(port, details['port_id'],
-                                    details['network_id'],
-                                    details['network_type'],
-                                    details['physical_network'],
-                                    details['segmentation_id'],
-                                    details['admin_state_up'])
+        try:
+            devices_details_list = self.plugin_rpc.get_devices_details_list(
+                self.context, list(devices), self.agent_id)
+        except Exception as e:
+            LOG.debug(_("Unable to get port details for "
+                        "%(devices)s: %(e)s"),
+                      {'devices': devices, 'e': e})
+            return True
+        devices_up = []
+        vif_ports = self.int_br.get_vif_ports_by_ids(
+            [details['device'] for details in devices_details_list])
+        # Apply the tags and flows of all the ports in a few calls
+        with self.int_br.defer_apply():
+            for details in devices_details_list:
+                device = details['device']
+                LOG.info(_("Port %s added"), device)
+                port = vif_ports.get(device)
+                if 'port_id' in details:
+                    LOG.info(_("Port %(device)s updated. "
+                               "Details: %(details)s"),
+                             {'device': device, 'details': details})
+                    self.treat_vif_port(port, details['port_id'],
+                                        details['network_id'],
+                                        details['network_type'],
+                                        details['physical_network'],
+                                        details['segmentation_id'],
+                                        details['admin_state_up'])
+                    devices_up.append(device)
+                else:
+                    LOG.debug(_("Device %s not defined on plugin"), device)
+                    if (port and int(port.ofport) != -1):
+                        self.port_dead(port)
+        # update plugin about port status
+        return self._update_devices_up(devices_up)
+
+    def _update_devices_up(self, devices_up):
+        if not devices_up:
+            return False
+        try:
+            result = self.plugin_rpc.update_device_list(self.context,
+                                                        devices_up, [],
+                                                        self.agent_id,
+                                                        cfg.CONF.host)
+        except Exception as e:
+            LOG.debug(_("Unable to set %(devices)s up: %(e)s"),
+                      {'devices': devices_up, 'e': e})
+            return True
+        return bool(result['failed_devices_up'])
 
-                # update plugin about port status
-                self.plugin_rpc.update_device_up(self.context,
-                                                 device,
-                                                 self.agent_id,
-                                                 cfg.CONF.host)
-            else:
-                LOG.debug(_("Device %s not defined on plugin"), device)
-                if (port and int(port.ofport) != -1):
-                    self.port_dead(port)
-        return resync
+    def _update_devices_down(self, devices_down):
+        """Report devices removed, returns None if the plugin failed."""
+        try:
+            return self.plugin_rpc.update_device_list(self.context,
+                                                      [], devices_down,
+                                                      self.agent_id,
+                                                      cfg.CONF.host)
+        except Exception as e:
+            LOG.debug(_("port_removed failed for %(devices)s: %(e)s"),
+                      {'devices': devices_down, 'e': e})
 
     def treat_ancillary_devices_added(self, devices):
-        resync = False
         for device in devices:
             LOG.info(_("Ancillary Port %s added"), device)
-            try:
-                self.plugin_rpc.get_device_details(self.context, device,
-                                                   self.agent_id)
-            except Exception as e:
-                LOG.debug(_("Unable to get port details for "
-                            "%(device)s: %(e)s"),
-                          {'device': device, 'e': e})
-                resync = True
-                continue
+        try:
+            self.plugin_rpc.get_devices_details_list(self.context,
+                                                     list(devices),
+                                                     self.agent_id)
+        except Exception as e:
+            LOG.debug(_("Unable to get port details for "
+                        "%(devices)s: %(e)s"),
+                      {'devices': devices, 'e': e})
+            return True
 
-            # update plugin about port status
-            self.plugin_rpc.update_device_up(self.context,
-                                             device,
-                                             self.agent_id,
-                                             cfg.CONF.host)
-        return resync
+        # update plugin about port status
+        return self._update_devices_up(list(devices))
 
     def treat_devices_removed(self, devices):
-        resync = False
         self.sg_agent.remove_devices_filter(devices)
         for device in devices:
             LOG.info(_("Attachment %s removed"), device)
-            try:
-                details = self.plugin_rpc.update_device_down(self.context,
-                                                             device,
-                                                             self.agent_id,
-                                                             cfg.CONF.host)
-            except Exception as e:
-                LOG.debug(_("port_removed failed for %(device)s: %(e)s"),
-                          {'device': device, 'e': e})
-                resync = True
-                continue
+        result = self._update_devices_down(list(devices))
+        if result is None:
+            return True
+        for details in result['devices_down']:
+            device = details['device']
             if details['exists']:
                 LOG.info(_("Port %s updated."), device)
                 # Nothing to do regarding local networking
             else:
                 LOG.debug(_("Device %s not defined on plugin"), device)
                 self.port_unbound(device)
-        return resync
+        return bool(result['failed_devices_down'])
 
     def treat_ancillary_devices_removed(self, devices):
-        resync = False
         for device in devices:
             LOG.info(_("Attachment %s removed"), device)
-            try:
-                details = self.plugin_rpc.update_device_down(self.context,
-                                                             device,
-                                                             self.agent_id,
-                                                             cfg.CONF.host)
-            except Exception as e:
-                LOG.debug(_("port_removed failed for %(device)s: %(e)s"),
-                          {'device': device, 'e': e})
-                resync = True
-                continue
+        result = self._update_devices_down(list(devices))
+        if result is None:
+            return True
+        for details in result['devices_down']:
             if details['exists']:
-                LOG.info(_("Port %s updated."), device)
+                LOG.info(_("Port %s updated."), details['device'])
                 # Nothing to do regarding local networking
             else:
-                LOG.debug(_("Device %s not defined on plugin"), device)
-        return resync
+                LOG.debug(_("Device %s not defined on plugin"),
+                          details['device'])
+        return bool(result['failed_devices_down'])
 
     def process_network_ports(self, port_info):
         resync_a = False
@@ -1072,7 +1094,8 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                     tunnel_sync = self.tunnel_sync()
 
                 if polling_manager.is_polling_required:
-                    port_info = self.update_ports(ports)
+                    port_info = self.update_ports(
+                        ports, polling_manager.get_port_events())
 
                     # notify plugin about port deltas
                     if port_info:
@@ -37,6 +37,7 @@ from neutron.common import utils
 from neutron.db import agents_db
 from neutron.db import agentschedulers_db
 from neutron.db import allowedaddresspairs_db as addr_pair_db
+from neutron.db import api as db_api
 from neutron.db import db_base_plugin_v2
 from neutron.db import dhcp_rpc_base
 from neutron.db import external_net_db
@@ -69,13 +70,16 @@ LOG = logging.getLogger(__name__)
 
 class OVSRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
                       l3_rpc_base.L3RpcCallbackMixin,
-                      sg_db_rpc.SecurityGroupServerRpcCallbackMixin):
+                      sg_db_rpc.SecurityGroupServerRpcCallbackMixin,
+                      q_rpc.DeviceListRpcCallbackMixin):
 
     # history
     #   1.0 Initial version
     #   1.1 Support Security Group RPC
+    #   1.2 Support security_group_info_for_devices
+    #   1.3 Support get_devices_details_list and update_device_list
 
-    RPC_API_VERSION = '1.1'
+    RPC_API_VERSION = '1.3'
 
     def __init__(self, notifier, tunnel_type):
         self.notifier = notifier
@@ -106,15 +110,8 @@ class OVSRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
         port = ovs_db_v2.get_port(device)
         if port:
             binding = ovs_db_v2.get_network_binding(None, port['network_id'])
-            entry = {'device': device,
-                     'network_id': port['network_id'],
-                     'port_id': port['id'],
-                     'admin_state_up': port['admin_state_up'],
-                     'network_type': binding.network_type,
-                     'segmentation_id': binding.segmentation_id,
-                     'physical_network': binding.physical_network}
-            new_status = (q_const.PORT_STATUS_ACTIVE if port['admin_state_up']
-                          else q_const.PORT_STATUS_DOWN)
+            entry = self._make_device_entry(device, port, binding)
+            new_status = self._get_new_port_status(port)
             if port['status'] != new_status:
                 ovs_db_v2.set_port_status(port['id'], new_status)
         else:
@@ -122,6 +119,46 @@ class OVSRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
             LOG.debug(_("%s can not be found in database"), device)
         return entry
 
+    def get_devices_details_list(self, rpc_context, **kwargs):
+        """Agent requests the details of several devices."""
+        agent_id = kwargs.get('agent_id')
+        devices = kwargs.get('devices', [])
+        LOG.debug(_("Devices %(devices)s details requested from "
+                    "%(agent_id)s"),
+                  {'devices': devices, 'agent_id': agent_id})
+        session = db_api.get_session()
+        with session.begin(subtransactions=True):
+            ports = ovs_db_v2.get_ports(session, devices)
+            bindings = ovs_db_v2.get_network_bindings(
+                session, list(set(port['network_id']
+                                  for port in ports.values())))
+            entries = []
+            for device in devices:
+                port = ports.get(device)
+                if port:
+                    entries.append(self._make_device_entry(
+                        device, port, bindings[port['network_id']]))
+                    new_status = self._get_new_port_status(port)
+                    if port['status'] != new_status:
+                        port['status'] = new_status
+                else:
+                    entries.append({'device': device})
+                    LOG.debug(_("%s can not be found in database"), device)
+        return entries
+
+    def _make_device_entry(self, device, port, binding):
+        return {'device': device,
+                'network_id': port['network_id'],
+                'port_id': port['id'],
+                'admin_state_up': port['admin_state_up'],
+                'network_type': binding.network_type,
+                'segmentation_id': binding.segmentation_id,
+                'physical_network': binding.physical_network}
+
+    def _get_new_port_status(self, port):
+        return (q_const.PORT_STATUS_ACTIVE if port['admin_state_up']
+                else q_const.PORT_STATUS_DOWN)
+
     def update_device_down(self, rpc_context, **kwargs):
         """Device no longer exists on agent."""
         agent_id = kwargs.get('agent_id')
@@ -20,6 +20,7 @@ Policy engine for neutron.  Largely copied from nova.
 """
 import itertools
 import re
+import time
 
 from oslo.config import cfg
 
@@ -35,6 +36,17 @@ from neutron.openstack.common import policy
 LOG = logging.getLogger(__name__)
 _POLICY_PATH = None
 _POLICY_CACHE = {}
+# With the policy cache, the policy file is checked for changes at most
+# once every _POLICY_CHECK_INTERVAL seconds instead of on every check
+_POLICY_CHECKED_AT = None
+_POLICY_CHECK_INTERVAL = 1
+# The rules compiled, the credentials they depend on and the results which
+# do not depend on the target by action, for the rules in _COMPILED_FROM
+_COMPILED_FROM = None
+_COMPILED_RULES = {}
+_DECISIONS = {}
+_MAX_DECISIONS = 10000
+_MISSING = object()
 ADMIN_CTX_POLICY = 'context_is_admin'
 # Maps deprecated 'extension' policies to new-style policies
 DEPRECATED_POLICY_MAP = {
@@ -54,19 +66,38 @@ DEPRECATED_ACTION_MAP = {
 }
 
 cfg.CONF.import_opt('policy_file', 'neutron.common.config')
+cfg.CONF.import_opt('policy_cache', 'neutron.common.config')
 
 
 def reset():
     global _POLICY_PATH
     global _POLICY_CACHE
+    global _POLICY_CHECKED_AT
     _POLICY_PATH = None
     _POLICY_CACHE = {}
+    _POLICY_CHECKED_AT = None
+    _reset_compiled_rules()
     policy.reset()
 
 
+def _reset_compiled_rules():
+    global _COMPILED_FROM
+    global _COMPILED_RULES
+    global _DECISIONS
+    _COMPILED_FROM = None
+    _COMPILED_RULES = {}
+    _DECISIONS = {}
+
+
 def init():
     global _POLICY_PATH
     global _POLICY_CACHE
+    global _POLICY_CHECKED_AT
+    now = time.time()
+    if (cfg.CONF.policy_cache and _POLICY_CHECKED_AT is not None and
+            policy._rules is not None and
+            0 <= now - _POLICY_CHECKED_AT < _POLICY_CHECK_INTERVAL):
+        return
     if not _POLICY_PATH:
         _POLICY_PATH = utils.find_config_file({}, cfg.CONF.policy_file)
         if not _POLICY_PATH:
@@ -75,6 +106,7 @@ def init():
     # is reset only if the file has changed
     utils.read_cached_file(_POLICY_PATH, _POLICY_CACHE,
                            reload_func=_set_rules)
+    _POLICY_CHECKED_AT = now
 
 
 def get_resource_and_action(action):
@@ -314,6 +346,117 @@ class FieldCheck(policy.Check):
         return target_value == self.value
 
 
+def _compile_rule(rule):
+    """Return rule with the rules it references replaced by their checks."""
+    if isinstance(rule, policy.RuleCheck):
+        try:
+            return _compile_rule(policy._rules[rule.match])
+        except KeyError:
+            # We don't have any matching rule; fail closed
+            return policy.FalseCheck()
+    elif isinstance(rule, policy.NotCheck):
+        return policy.NotCheck(_compile_rule(rule.rule))
+    elif isinstance(rule, (policy.AndCheck, policy.OrCheck)):
+        return type(rule)([_compile_rule(sub_rule)
+                           for sub_rule in rule.rules])
+    return rule
+
+
+def _is_target_independent(rule):
+    return (isinstance(rule, (policy.TrueCheck, policy.FalseCheck,
+                              policy.RoleCheck)) or
+            (type(rule) is policy.GenericCheck and '%' not in rule.match))
+
+
+def _extract_credentials(rule, kinds):
+    """Add the credentials the target independent checks use to kinds."""
+    if isinstance(rule, policy.RoleCheck):
+        kinds.add('roles')
+    elif _is_target_independent(rule) and hasattr(rule, 'kind'):
+        kinds.add(rule.kind)
+    elif isinstance(rule, policy.NotCheck):
+        _extract_credentials(rule.rule, kinds)
+    elif hasattr(rule, 'rules'):
+        for sub_rule in rule.rules:
+            _extract_credentials(sub_rule, kinds)
+
+
+def _check_without_target(rule, credentials):
+    """Return the result of rule, or None if it depends on the target."""
+    if _is_target_independent(rule):
+        return rule({}, credentials)
+    elif isinstance(rule, policy.NotCheck):
+        result = _check_without_target(rule.rule, credentials)
+        return None if result is None else not result
+    elif isinstance(rule, (policy.AndCheck, policy.OrCheck)):
+        decisive = isinstance(rule, policy.OrCheck)
+        results = [_check_without_target(sub_rule, credentials)
+                   for sub_rule in rule.rules]
+        if any(result is not None and bool(result) == decisive
+               for result in results):
+            return decisive
+        if None in results:
+            return None
+        return not decisive
+    return None
+
+
+def _get_compiled_rule(action):
+    """Return the compiled rule of action and the credentials it uses."""
+    global _COMPILED_FROM
+    if _COMPILED_FROM is not policy._rules:
+        # The rules were replaced since they were compiled
+        _reset_compiled_rules()
+        _COMPILED_FROM = policy._rules
+    try:
+        return _COMPILED_RULES[action]
+    except KeyError:
+        rule = _compile_rule(policy.RuleCheck('rule', action))
+        kinds = set()
+        _extract_credentials(rule, kinds)
+        _COMPILED_RULES[action] = rule, sorted(kinds)
+        return _COMPILED_RULES[action]
+
+
+def _decide(action, credentials):
+    """Return the result of action on any target, or None if unknown.
+
+    The results are cached by action and by the values of the credentials
+    the target independent checks of the action use, like the roles.
+    """
+    global _DECISIONS
+    rule, kinds = _get_compiled_rule(action)
+    key = [action]
+    for kind in kinds:
+        value = credentials.get(kind, _MISSING)
+        key.append(tuple(value) if isinstance(value, list) else value)
+    key = tuple(key)
+    try:
+        return _DECISIONS[key]
+    except TypeError:
+        # The credentials can not be part of a key
+        return _check_without_target(rule, credentials)
+    except KeyError:
+        if len(_DECISIONS) >= _MAX_DECISIONS:
+            _DECISIONS = {}
+        _DECISIONS[key] = _check_without_target(rule, credentials)
+        return _DECISIONS[key]
+
+
+def _check_compiled(match_rule, target, credentials):
+    """Evaluate match_rule with the compiled rules of the actions."""
+    if isinstance(match_rule, policy.RuleCheck):
+        result = _decide(match_rule.match, credentials)
+        if result is None:
+            rule = _get_compiled_rule(match_rule.match)[0]
+            result = rule(target, credentials)
+        return result
+    elif isinstance(match_rule, policy.AndCheck):
+        return all(_check_compiled(rule, target, credentials)
+                   for rule in match_rule.rules)
+    return match_rule(target, credentials)
+
+
 def _prepare_check(context, action, target):
     """Prepare rule, target, and credentials for the policy engine."""
     init()
@@ -325,6 +468,17 @@ def _prepare_check(context, action, target):
     return match_rule, target, credentials
 
 
+def _check(context, action, target, exc=None):
+    match_rule, target, credentials = _prepare_check(context, action, target)
+    if not cfg.CONF.policy_cache:
+        return policy.check(match_rule, target, credentials,
+                            exc=exc, action=action)
+    result = _check_compiled(match_rule, target, credentials)
+    if exc and not result:
+        raise exc(action=action)
+    return result
+
+
 def check(context, action, target, plugin=None):
     """Verifies that the action is valid on the target in this context.
 
@@ -339,7 +493,7 @@ def check(context, action, target, plugin=None):
 
     :return: Returns True if access is permitted else False.
     """
-    return policy.check(*(_prepare_check(context, action, target)))
+    return _check(context, action, target)
 
 
 def check_if_exists(context, action, target):
@@ -355,7 +509,27 @@ def check_if_exists(context, action, target):
     # Raise if there's no match for requested action in the policy engine
     if not policy._rules or action not in policy._rules:
         raise exceptions.PolicyRuleNotFound(rule=action)
-    return policy.check(*(_prepare_check(context, action, target)))
+    return _check(context, action, target)
+
+
+def check_if_exists_on_any_target(context, action):
+    """Return the result of check_if_exists on any target if known.
+
+    A PolicyRuleNotFound exception is raised if the action is not defined
+    in the policy engine.  None is returned when the result depends on the
+    target, or when the policy cache is disabled, for check_if_exists to
+    be called on each target.
+    """
+    init()
+    if not policy._rules or action not in policy._rules:
+        raise exceptions.PolicyRuleNotFound(rule=action)
+    if not cfg.CONF.policy_cache:
+        return None
+    resource, is_write = get_resource_and_action(action)
+    if is_write:
+        # The attributes set in the target are part of the match rule
+        return None
+    return _decide(action, context.to_dict())
 
 
 def enforce(context, action, target, plugin=None):
@@ -373,10 +547,8 @@ def enforce(context, action, target, plugin=None):
     :raises neutron.exceptions.PolicyNotAllowed: if verification fails.
     """
 
-    init()
-    rule, target, credentials = _prepare_check(context, action, target)
-    return policy.check(rule, target, credentials,
-                        exc=exceptions.PolicyNotAuthorized, action=action)
+    return _check(context, action, target,
+                  exc=exceptions.PolicyNotAuthorized)
 
 
 def check_is_admin(context):
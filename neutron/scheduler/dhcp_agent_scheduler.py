@@ -18,10 +18,14 @@
 import random
 
 from oslo.config import cfg
+from sqlalchemy import func
+from sqlalchemy import orm
+from sqlalchemy import sql
 
 from neutron.common import constants
 from neutron.db import agents_db
 from neutron.db import agentschedulers_db
+from neutron.db import models_v2
 from neutron.openstack.common import log as logging
 
 
@@ -78,11 +82,52 @@ class ChanceScheduler(object):
                 LOG.warn(_('No more DHCP agents'))
                 return
             n_agents = min(len(active_dhcp_agents), n_agents)
-            chosen_agents = random.sample(active_dhcp_agents, n_agents)
+            chosen_agents = self._choose_agents(context, active_dhcp_agents,
+                                                n_agents)
             for agent in chosen_agents:
                 self._schedule_bind_network(context, agent, network['id'])
         return chosen_agents
 
+    def _choose_agents(self, context, agents, n_agents):
+        """Return n_agents of the active DHCP agents given."""
+        return random.sample(agents, n_agents)
+
+    def _get_non_hosted_network_ids(self, context, dhcp_agent,
+                                    agents_per_network):
+        """Return the ids of the networks dhcp_agent should host.
+
+        These are the networks with a DHCP enabled subnet which are not
+        hosted by dhcp_agent, nor by agents_per_network active agents.
+        They are found with one query, whatever the number of networks.
+        """
+        query = context.session.query(agents_db.Agent)
+        query = query.filter(agents_db.Agent.agent_type ==
+                             constants.AGENT_TYPE_DHCP)
+        active_agent_ids = [
+            agent.id for agent in query
+            if not agents_db.AgentDbMixin.is_agent_down(
+                agent.heartbeat_timestamp)]
+        binding = agentschedulers_db.NetworkDhcpAgentBinding
+        hosted = context.session.query(
+            binding.network_id,
+            func.count(binding.dhcp_agent_id).label('agents'))
+        hosted = hosted.filter(binding.dhcp_agent_id.in_(active_agent_ids))
+        hosted = hosted.group_by(binding.network_id).subquery()
+        own_binding = orm.aliased(binding)
+        query = context.session.query(models_v2.Subnet.network_id).distinct()
+        query = query.outerjoin(
+            hosted, hosted.c.network_id == models_v2.Subnet.network_id)
+        query = query.outerjoin(
+            own_binding,
+            sql.and_(own_binding.network_id == models_v2.Subnet.network_id,
+                     own_binding.dhcp_agent_id == dhcp_agent.id))
+        query = query.filter(
+            models_v2.Subnet.enable_dhcp == True,
+            own_binding.network_id == None,
+            sql.or_(hosted.c.agents == None,
+                    hosted.c.agents < agents_per_network))
+        return [network_id for network_id, in query]
+
     def auto_schedule_networks(self, plugin, context, host):
         """Schedule non-hosted networks to the DHCP agent on
         the specified host.
@@ -100,22 +145,31 @@ class ChanceScheduler(object):
                     dhcp_agent.heartbeat_timestamp):
                     LOG.warn(_('DHCP agent %s is not active'), dhcp_agent.id)
                     continue
-                fields = ['network_id', 'enable_dhcp']
-                subnets = plugin.get_subnets(context, fields=fields)
-                net_ids = set(s['network_id'] for s in subnets
-                              if s['enable_dhcp'])
+                net_ids = self._get_non_hosted_network_ids(
+                    context, dhcp_agent, agents_per_network)
                 if not net_ids:
                     LOG.debug(_('No non-hosted networks'))
                     return False
                 for net_id in net_ids:
-                    agents = plugin.get_dhcp_agents_hosting_networks(
-                        context, [net_id], active=True)
-                    if len(agents) >= agents_per_network:
-                        continue
-                    if any(dhcp_agent.id == agent.id for agent in agents):
-                        continue
-                    binding = agentschedulers_db.NetworkDhcpAgentBinding()
-                    binding.dhcp_agent = dhcp_agent
-                    binding.network_id = net_id
-                    context.session.add(binding)
+                    self._schedule_bind_network(context, dhcp_agent, net_id)
         return True
+
+
+class LeastNetworksScheduler(ChanceScheduler):
+    """Allocate the DHCP agents hosting the fewest networks to a network.
+
+    The networks hosted by the candidate agents are counted with one
+    query.  Agents hosting as many networks are chosen in a random order.
+    """
+
+    def _choose_agents(self, context, agents, n_agents):
+        binding = agentschedulers_db.NetworkDhcpAgentBinding
+        query = context.session.query(
+            binding.dhcp_agent_id, func.count(binding.network_id))
+        query = query.filter(
+            binding.dhcp_agent_id.in_([agent.id for agent in agents]))
+        query = query.group_by(binding.dhcp_agent_id)
+        hosted = dict(query)
+        agents = random.sample(agents, len(agents))
+        agents.sort(key=lambda agent: hosted.get(agent.id, 0))
+        return agents[:n_agents]
@@ -17,7 +17,9 @@
 
 import random
 
+from sqlalchemy import func
 from sqlalchemy.orm import exc
+from sqlalchemy.orm import joinedload
 from sqlalchemy.sql import exists
 
 from neutron.common import constants
@@ -36,6 +38,23 @@ class ChanceScheduler(object):
     can be introduced later.
     """
 
+    def _get_hosting_l3_agents(self, context, router_ids):
+        """Return the L3 agents hosting the routers by router id.
+
+        A disabled agent still hosts its routers: it may be enabled again
+        at any time, as the routers of no agent are the ones scheduled.
+        """
+        if not router_ids:
+            return {}
+        query = context.session.query(
+            l3_agentschedulers_db.RouterL3AgentBinding)
+        query = query.options(joinedload('l3_agent'))
+        query = query.filter(
+            l3_agentschedulers_db.RouterL3AgentBinding.router_id.in_(
+                router_ids))
+        return dict((binding.router_id, binding.l3_agent)
+                    for binding in query)
+
     def auto_schedule_routers(self, plugin, context, host, router_ids):
         """Schedule non-hosted routers to L3 Agent running on host.
         If router_ids is given, each router in router_ids is scheduled
@@ -62,15 +81,16 @@ class ChanceScheduler(object):
                 LOG.warn(_('L3 agent %s is not active'), l3_agent.id)
             # check if each of the specified routers is hosted
             if router_ids:
+                hosting_l3_agents = self._get_hosting_l3_agents(
+                    context, router_ids)
                 unscheduled_router_ids = []
                 for router_id in router_ids:
-                    l3_agents = plugin.get_l3_agents_hosting_routers(
-                        context, [router_id], admin_state_up=True)
-                    if l3_agents:
+                    if router_id in hosting_l3_agents:
                         LOG.debug(_('Router %(router_id)s has already been'
                                     ' hosted by L3 agent %(agent_id)s'),
                                   {'router_id': router_id,
-                                   'agent_id': l3_agents[0]['id']})
+                                   'agent_id':
+                                   hosting_l3_agents[router_id]['id']})
                     else:
                         unscheduled_router_ids.append(router_id)
                 if not unscheduled_router_ids:
@@ -93,12 +113,9 @@ class ChanceScheduler(object):
             # with the router
             routers = plugin.get_routers(
                 context, filters={'id': unscheduled_router_ids})
-            to_removed_ids = []
-            for router in routers:
-                candidates = plugin.get_l3_agent_candidates(router, [l3_agent])
-                if not candidates:
-                    to_removed_ids.append(router['id'])
-            router_ids = set([r['id'] for r in routers]) - set(to_removed_ids)
+            candidates = plugin.get_l3_agents_candidates(routers, [l3_agent])
+            router_ids = [router['id'] for router in routers
+                          if candidates[router['id']]]
             if not router_ids:
                 LOG.warn(_('No routers compatible with L3 agent configuration'
                            ' on host %s'), host)
@@ -113,43 +130,92 @@ class ChanceScheduler(object):
                 context.session.add(binding)
         return True
 
-    def schedule(self, plugin, context, router_id):
-        """Schedule the router to an active L3 agent if there
-        is no enable L3 agent hosting it.
+    def _choose_agents(self, context, candidates):
+        """Return the agent chosen among candidates by router id."""
+        return dict((router_id, random.choice(agents))
+                    for router_id, agents in candidates.iteritems())
+
+    def schedule_routers(self, plugin, context, router_ids):
+        """Schedule the routers to active L3 agents in one transaction.
+
+        The routers hosted by an L3 agent already are skipped.  The agents
+        chosen are returned by router id.
         """
         with context.session.begin(subtransactions=True):
             # allow one router is hosted by just
-            # one enabled l3 agent hosting since active is just a
+            # one l3 agent hosting since active is just a
             # timing problem. Non-active l3 agent can return to
             # active any time
-            l3_agents = plugin.get_l3_agents_hosting_routers(
-                context, [router_id], admin_state_up=True)
-            if l3_agents:
+            hosting_l3_agents = self._get_hosting_l3_agents(context,
+                                                            router_ids)
+            for router_id, l3_agent in hosting_l3_agents.iteritems():
                 LOG.debug(_('Router %(router_id)s has already been hosted'
                             ' by L3 agent %(agent_id)s'),
                           {'router_id': router_id,
-                           'agent_id': l3_agents[0]['id']})
-                return
+                           'agent_id': l3_agent['id']})
+            router_ids = [router_id for router_id in router_ids
+                          if router_id not in hosting_l3_agents]
+            if not router_ids:
+                return {}
 
-            sync_router = plugin.get_router(context, router_id)
+            sync_routers = plugin.get_routers(context,
+                                              filters={'id': router_ids})
             active_l3_agents = plugin.get_l3_agents(context, active=True)
             if not active_l3_agents:
                 LOG.warn(_('No active L3 agents'))
-                return
-            candidates = plugin.get_l3_agent_candidates(sync_router,
-                                                        active_l3_agents)
-            if not candidates:
-                LOG.warn(_('No L3 agents can host the router %s'),
-                         sync_router['id'])
-                return
-
-            chosen_agent = random.choice(candidates)
-            binding = l3_agentschedulers_db.RouterL3AgentBinding()
-            binding.l3_agent = chosen_agent
-            binding.router_id = sync_router['id']
-            context.session.add(binding)
-            LOG.debug(_('Router %(router_id)s is scheduled to '
-                        'L3 agent %(agent_id)s'),
-                      {'router_id': sync_router['id'],
-                       'agent_id': chosen_agent['id']})
-            return chosen_agent
+                return {}
+            candidates = plugin.get_l3_agents_candidates(sync_routers,
+                                                         active_l3_agents)
+            for router_id, agents in candidates.items():
+                if not agents:
+                    LOG.warn(_('No L3 agents can host the router %s'),
+                             router_id)
+                    del candidates[router_id]
+
+            chosen_agents = self._choose_agents(context, candidates)
+            for router_id, chosen_agent in chosen_agents.iteritems():
+                binding = l3_agentschedulers_db.RouterL3AgentBinding()
+                binding.l3_agent = chosen_agent
+                binding.router_id = router_id
+                context.session.add(binding)
+                LOG.debug(_('Router %(router_id)s is scheduled to '
+                            'L3 agent %(agent_id)s'),
+                          {'router_id': router_id,
+                           'agent_id': chosen_agent['id']})
+            return chosen_agents
+
+    def schedule(self, plugin, context, router_id):
+        """Schedule the router to an active L3 agent if there
+        is no enable L3 agent hosting it.
+        """
+        return self.schedule_routers(plugin, context,
+                                     [router_id]).get(router_id)
+
+
+class LeastRoutersScheduler(ChanceScheduler):
+    """Allocate the L3 agent hosting the fewest routers to a router.
+
+    The routers hosted by the candidate agents are counted with one
+    query.  The count of an agent goes up with each router it is chosen
+    for, so that a list of routers is spread over the agents.
+    """
+
+    def _choose_agents(self, context, candidates):
+        agent_ids = set(agent['id'] for agents in candidates.itervalues()
+                        for agent in agents)
+        if not agent_ids:
+            return {}
+        binding = l3_agentschedulers_db.RouterL3AgentBinding
+        query = context.session.query(binding.l3_agent_id,
+                                      func.count(binding.router_id))
+        query = query.filter(binding.l3_agent_id.in_(agent_ids))
+        query = query.group_by(binding.l3_agent_id)
+        hosted = dict(query)
+        chosen_agents = {}
+        for router_id, agents in candidates.iteritems():
+            agents = random.sample(agents, len(agents))
+            chosen_agent = min(agents,
+                               key=lambda agent: hosted.get(agent['id'], 0))
+            hosted[chosen_agent['id']] = hosted.get(chosen_agent['id'], 0) + 1
+            chosen_agents[router_id] = chosen_agent
+        return chosen_agents
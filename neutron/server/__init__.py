@@ -28,8 +28,11 @@ from neutron.common import config
 from neutron import service
 
 from neutron.openstack.common import gettextutils
+from neutron.openstack.common import log as logging
 gettextutils.install('neutron', lazy=False)
 
+LOG = logging.getLogger(__name__)
+
 
 def main():
     eventlet.monkey_patch()
@@ -41,8 +44,27 @@ def main():
                    " search paths (~/.neutron/, ~/, /etc/neutron/, /etc/) and"
                    " the '--config-file' option!"))
     try:
-        neutron_service = service.serve_wsgi(service.NeutronApiService)
-        neutron_service.wait()
+        pool = eventlet.GreenPool()
+
+        neutron_api = service.serve_wsgi(service.NeutronApiService)
+        api_thread = pool.spawn(neutron_api.wait)
+
+        # The RPC workers join the API workers' launcher, if any, so
+        # that a single one waits on all the child processes.
+        launcher = neutron_api.wsgi_app.launcher
+        try:
+            neutron_rpc = service.serve_rpc(launcher)
+        except NotImplementedError:
+            LOG.info(_("RPC was already started in parent process by "
+                       "plugin."))
+        else:
+            if neutron_rpc is not launcher:
+                rpc_thread = pool.spawn(neutron_rpc.wait)
+                # The server stops when either of them does
+                rpc_thread.link(lambda gt: api_thread.kill())
+                api_thread.link(lambda gt: rpc_thread.kill())
+
+        pool.waitall()
     except RuntimeError as e:
         sys.exit(_("ERROR: %s") % e)
 
@@ -20,15 +20,21 @@ import logging as std_logging
 import os
 import random
 
+import eventlet
 from oslo.config import cfg
 
 from neutron.common import config
 from neutron.common import legacy
+from neutron.common import rpc as q_rpc
 from neutron import context
+from neutron import manager
+from neutron.openstack.common.db.sqlalchemy import session
+from neutron.openstack.common import excutils
 from neutron.openstack.common import importutils
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import loopingcall
 from neutron.openstack.common.rpc import service
+from neutron.openstack.common import service as common_service
 from neutron import wsgi
 
 
@@ -41,6 +47,15 @@ service_opts = [
                help=_('Range of seconds to randomly delay when starting the '
                       'periodic task scheduler to reduce stampeding. '
                       '(Disable by setting to 0)')),
+    cfg.IntOpt('api_workers',
+               default=0,
+               help=_('Number of separate API worker processes, 0 serves '
+                      'the API in the server process')),
+    cfg.IntOpt('rpc_workers',
+               default=0,
+               help=_('Number of separate RPC worker processes consuming '
+                      'the plugin topics, 0 consumes them in the server '
+                      'process')),
 ]
 CONF = cfg.CONF
 CONF.register_opts(service_opts)
@@ -111,7 +126,8 @@ def _run_wsgi(app_name):
         LOG.error(_('No known API applications configured.'))
         return
     server = wsgi.Server("Neutron")
-    server.start(app, cfg.CONF.bind_port, cfg.CONF.bind_host)
+    server.start(app, cfg.CONF.bind_port, cfg.CONF.bind_host,
+                 workers=cfg.CONF.api_workers)
     # Dump all option values here after all options are parsed
     cfg.CONF.log_opt_values(LOG, std_logging.DEBUG)
     LOG.info(_("Neutron service started, listening on %(host)s:%(port)s"),
@@ -120,6 +136,66 @@ def _run_wsgi(app_name):
     return server
 
 
+class RpcWorker(object):
+    """Wraps the plugin RPC listener to be handled by ProcessLauncher."""
+
+    def __init__(self, plugin):
+        self._plugin = plugin
+        self._server = None
+        self._parent_pid = os.getpid()
+
+    def start(self):
+        if os.getpid() != self._parent_pid:
+            # Forked by ProcessLauncher: the database and messaging
+            # connections are shared with the parent and must not be used.
+            session.get_engine(sqlite_fk=True).pool.dispose()
+            q_rpc.reset_connection_pool()
+        self._server = self._plugin.start_rpc_listener()
+
+    def wait(self):
+        if isinstance(self._server, eventlet.greenthread.GreenThread):
+            self._server.wait()
+
+    def stop(self):
+        if isinstance(self._server, eventlet.greenthread.GreenThread):
+            self._server.kill()
+        self._server = None
+
+
+def serve_rpc(launcher=None):
+    """Start the plugin RPC listener, in rpc_workers processes if set.
+
+    The worker processes are added to launcher if given, so that the API
+    and RPC workers are handled by a single ProcessLauncher.  Returns the
+    RpcWorker or the ProcessLauncher to wait on, and raises
+    NotImplementedError if the plugin starts its RPC listener itself.
+    """
+    plugin = manager.NeutronManager.get_plugin()
+
+    # In rpc_workers processes, start_rpc_listener would raise its
+    # NotImplementedError in a child process, so check it up front.
+    if not plugin.rpc_workers_supported():
+        LOG.debug(_("Active plugin doesn't implement start_rpc_listener"))
+        if cfg.CONF.rpc_workers > 0:
+            LOG.error(_("'rpc_workers = %d' ignored because "
+                        "start_rpc_listener is not implemented."),
+                      cfg.CONF.rpc_workers)
+        raise NotImplementedError
+
+    try:
+        rpc = RpcWorker(plugin)
+        if cfg.CONF.rpc_workers < 1:
+            rpc.start()
+            return rpc
+        launcher = launcher or common_service.ProcessLauncher()
+        launcher.launch_service(rpc, workers=cfg.CONF.rpc_workers)
+        return launcher
+    except Exception:
+        with excutils.save_and_reraise_exception():
+            LOG.exception(_('Unrecoverable error: please check log '
+                            'for details.'))
+
+
 class Service(service.Service):
     """Service object for binaries running on hosts.
 
@@ -132,13 +132,14 @@ class VPNAgent(l3_agent.L3NATAgentWithStateReport):
         for device in self.devices:
             device.destroy_router(router_id)
 
-    def _process_routers(self, routers, all_routers=False):
+    def _routers_processed(self, routers):
         """Router sync event.
 
-        This method overwrites parent class method.
+        This method overwrites parent class method.  It is called once
+        the router update queue is drained, so that the devices are
+        synced once per full sync instead of once per router.
         :param routers: list of routers
         """
-        super(VPNAgent, self)._process_routers(routers, all_routers)
         for device in self.devices:
             device.sync(self.context, routers)
 
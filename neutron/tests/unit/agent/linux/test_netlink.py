@@ -0,0 +1,162 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import errno
+import socket
+import struct
+
+import mock
+
+from neutron.agent.linux import netlink
+from neutron.tests import base
+
+
+def _attr(rta_type, data):
+    length = netlink.RTATTR.size + len(data)
+    return (netlink.RTATTR.pack(length, rta_type) + data +
+            '\0' * (netlink._align(length) - length))
+
+
+def _message(msg_type, payload):
+    length = netlink.NLMSG.size + len(payload)
+    return (netlink.NLMSG.pack(length, msg_type, 0, 1, 0) + payload +
+            '\0' * (netlink._align(length) - length))
+
+
+def _link(index, name, mac='\xcc\xdd\xee\xff\xab\xcd'):
+    return (netlink.IFINFOMSG.pack(socket.AF_UNSPEC, netlink.ARPHRD_ETHER,
+                                   index, 0, 0) +
+            _attr(netlink.IFLA_IFNAME, name + '\0') +
+            _attr(netlink.IFLA_MTU, struct.pack('=I', 1500)) +
+            _attr(netlink.IFLA_QDISC, 'mq\0') +
+            _attr(netlink.IFLA_OPERSTATE, chr(6)) +
+            _attr(netlink.IFLA_TXQLEN, struct.pack('=I', 1000)) +
+            _attr(netlink.IFLA_ADDRESS, mac))
+
+
+def _address(index, family, address, prefixlen, scope=0, flags=0x80):
+    return (netlink.IFADDRMSG.pack(family, prefixlen, flags, scope, index) +
+            _attr(netlink.IFA_LOCAL, socket.inet_pton(family, address)))
+
+
+def _route(index, gateway, dst_len=0, table=netlink.RT_TABLE_MAIN):
+    return (netlink.RTMSG.pack(socket.AF_INET, dst_len, 0, 0, table, 0, 0,
+                               1, 0) +
+            _attr(netlink.RTA_OIF, struct.pack('=i', index)) +
+            _attr(netlink.RTA_GATEWAY, socket.inet_aton(gateway)) +
+            _attr(netlink.RTA_PRIORITY, struct.pack('=I', 10)))
+
+
+class TestParse(base.BaseTestCase):
+
+    def test_parse_messages(self):
+        data = (_message(netlink.RTM_NEWLINK, _link(1, 'eth0')) +
+                _message(netlink.NLMSG_DONE, struct.pack('=i', 0)))
+        messages, done = netlink.parse_messages(data)
+        self.assertTrue(done)
+        self.assertEqual([(netlink.RTM_NEWLINK, _link(1, 'eth0'))], messages)
+
+    def test_parse_messages_not_done(self):
+        messages, done = netlink.parse_messages(
+            _message(netlink.RTM_NEWLINK, _link(1, 'eth0')))
+        self.assertFalse(done)
+        self.assertEqual(1, len(messages))
+
+    def test_parse_messages_error(self):
+        data = _message(netlink.NLMSG_ERROR, struct.pack('=i', -errno.EPERM))
+        self.assertRaises(netlink.NetlinkError, netlink.parse_messages, data)
+
+    def test_parse_link(self):
+        self.assertEqual(
+            (2, 'eth0', {'mtu': 1500, 'qdisc': 'mq', 'state': 'UP',
+                         'qlen': 1000, 'link/ether': 'cc:dd:ee:ff:ab:cd'}),
+            netlink.parse_link(_link(2, 'eth0')))
+
+    def test_parse_address_ipv4(self):
+        self.assertEqual(
+            (2, dict(cidr='172.16.77.240/24', broadcast='172.16.77.255',
+                     scope='global', ip_version=4, dynamic=False)),
+            netlink.parse_address(_address(2, socket.AF_INET,
+                                           '172.16.77.240', 24)))
+
+    def test_parse_address_ipv6_dynamic(self):
+        self.assertEqual(
+            (2, dict(cidr='fe80::1/64', broadcast='::', scope='link',
+                     ip_version=6, dynamic=True)),
+            netlink.parse_address(_address(2, socket.AF_INET6, 'fe80::1',
+                                           64, scope=253, flags=0)))
+
+    def test_parse_route(self):
+        self.assertEqual({'family': socket.AF_INET, 'dst_len': 0,
+                          'table': netlink.RT_TABLE_MAIN, 'scope': 0,
+                          'oif': 2, 'gateway': '10.0.0.1', 'metric': 10},
+                         netlink.parse_route(_route(2, '10.0.0.1')))
+
+
+class TestQueries(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestQueries, self).setUp()
+        self.dump_p = mock.patch.object(netlink, '_dump')
+        self.dump = self.dump_p.start()
+        self.addCleanup(self.dump_p.stop)
+        self.links = [_link(1, 'lo'), _link(2, 'eth0')]
+
+    def _dump(self, other):
+        def dump(msg_type, payload, namespace=None):
+            if msg_type == netlink.RTM_GETLINK:
+                return self.links
+            return other
+        self.dump.side_effect = dump
+
+    def test_get_link_attributes_missing_device(self):
+        self._dump([])
+        self.assertRaises(RuntimeError, netlink.get_link_attributes, 'eth1')
+
+    def test_get_addresses(self):
+        self._dump([_address(1, socket.AF_INET, '127.0.0.1', 8, scope=254),
+                    _address(2, socket.AF_INET, '10.0.0.2', 24),
+                    _address(2, socket.AF_INET, '10.1.0.2', 24),
+                    _address(2, socket.AF_INET6, 'fe80::2', 64, scope=253)])
+        addresses = netlink.get_addresses('eth0', 'ns', scope='global',
+                                          to='10.0.0.0/24')
+        self.assertEqual(['10.0.0.2/24'], [a['cidr'] for a in addresses])
+        for call in self.dump.call_args_list:
+            self.assertEqual('ns', call[0][2])
+
+    def test_get_default_gateway(self):
+        self._dump([_route(2, '10.0.0.254', dst_len=24),
+                    _route(2, '10.0.0.1', table=255),
+                    _route(1, '10.0.0.2'),
+                    _route(2, '10.0.0.1')])
+        self.assertEqual({'gateway': '10.0.0.1', 'metric': 10},
+                         netlink.get_default_gateway('eth0'))
+
+    def test_get_default_gateway_none(self):
+        self._dump([])
+        self.assertIsNone(netlink.get_default_gateway('eth0'))
+
+
+class TestListNamespaces(base.BaseTestCase):
+
+    def test_list_namespaces(self):
+        with mock.patch('os.listdir', return_value=['qrouter-1']):
+            self.assertEqual(['qrouter-1'], netlink.list_namespaces())
+
+    def test_list_namespaces_no_directory(self):
+        with mock.patch('os.listdir',
+                        side_effect=OSError(errno.ENOENT, 'missing')):
+            self.assertEqual([], netlink.list_namespaces())
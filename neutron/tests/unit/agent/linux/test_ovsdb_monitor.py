@@ -14,10 +14,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+
 import eventlet.event
 import mock
 
 from neutron.agent.linux import ovsdb_monitor
+from neutron.openstack.common import jsonutils
 from neutron.tests import base
 
 
@@ -110,3 +113,68 @@ class TestSimpleInterfaceMonitor(base.BaseTestCase):
                 return_value=output):
             self.monitor._read_stdout()
         self.assertFalse(self.monitor.data_received)
+
+    def _output(self, *rows):
+        return jsonutils.dumps({
+            'headings': ['row', 'action', 'name', 'external_ids', 'ofport'],
+            'data': list(rows)})
+
+    def _row(self, uuid, action, name, iface_id=None, ofport=1):
+        external_ids = [['attached-mac', 'fa:16:3e:00:00:01']]
+        if iface_id:
+            external_ids.append(['iface-id', iface_id])
+        return [uuid, action, name, ['map', external_ids], ofport]
+
+    def _get_events(self, *outputs):
+        with mock.patch.object(self.monitor, 'iter_stdout',
+                               return_value=iter(outputs)):
+            return self.monitor.get_events()
+
+    def test_get_events_reports_inserted_vif_ports(self):
+        events = self._get_events(
+            self._output(self._row('uuid1', 'initial', 'tap1', 'port1'),
+                         self._row('uuid2', 'initial', 'tap2')),
+            self._output(self._row('uuid3', 'insert', 'tap3', 'port3',
+                                   ofport=['set', []])))
+        self.assertEqual(events, {'added': {'port1': 'tap1'},
+                                  'removed': set()})
+
+    def test_get_events_reports_modified_and_deleted_vif_ports(self):
+        self._get_events(
+            self._output(self._row('uuid1', 'initial', 'tap1', 'port1'),
+                         self._row('uuid3', 'initial', 'tap3', 'port3',
+                                   ofport=['set', []])))
+        events = self._get_events(
+            self._output(self._row('uuid1', 'delete', 'tap1', 'port1')),
+            self._output(self._row('uuid3', 'old', '', ofport=['set', []]),
+                         self._row('uuid3', 'new', 'tap3', 'port3')))
+        self.assertEqual(events, {'added': {'port3': 'tap3'},
+                                  'removed': set(['port1'])})
+
+    def test_get_events_reports_rows_missing_after_restart(self):
+        self._get_events(
+            self._output(self._row('uuid1', 'initial', 'tap1', 'port1'),
+                         self._row('uuid2', 'initial', 'tap2', 'port2')))
+        events = self._get_events(
+            self._output(self._row('uuid2', 'initial', 'tap2', 'port2')))
+        self.assertEqual(events, {'added': {}, 'removed': set(['port1'])})
+
+    def test_get_events_returns_none_for_unparsable_output(self):
+        self.assertIsNone(self._get_events('foo'))
+        self.assertEqual(self._get_events(),
+                         {'added': {}, 'removed': set()})
+
+    def test_has_updates_keeps_events(self):
+        output = self._output(self._row('uuid1', 'insert', 'tap1', 'port1'))
+        target = ('neutron.agent.linux.ovsdb_monitor.SimpleInterfaceMonitor'
+                  '.is_active')
+        with contextlib.nested(
+            mock.patch.object(self.monitor, 'iter_stdout',
+                              return_value=iter([output])),
+            mock.patch(target,
+                       new_callable=mock.PropertyMock(return_value=True))
+        ):
+            self.assertTrue(self.monitor.has_updates)
+            self.assertFalse(self.monitor.has_updates)
+        self.assertEqual(self._get_events(),
+                         {'added': {'port1': 'tap1'}, 'removed': set()})
@@ -14,6 +14,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+
 import mock
 
 from neutron.agent.linux import polling
@@ -114,3 +116,23 @@ class TestInterfacePollingMinimizer(base.BaseTestCase):
     def test__is_polling_required_returns_when_updates_are_present(self):
         with self.mock_has_updates(True):
             self.assertTrue(self.pm._is_polling_required())
+
+    def test_get_port_events_returns_none_until_ports_listed(self):
+        events = {'added': {}, 'removed': set()}
+        target = ('neutron.agent.linux.ovsdb_monitor.SimpleInterfaceMonitor'
+                  '.is_active')
+        with contextlib.nested(
+            mock.patch.object(self.pm._monitor, 'get_events',
+                              return_value=events),
+            mock.patch(target,
+                       new_callable=mock.PropertyMock(return_value=True))
+        ) as (get_events, is_active):
+            self.assertIsNone(self.pm.get_port_events())
+            self.pm.polling_completed()
+            self.assertEqual(self.pm.get_port_events(), events)
+            self.pm.force_polling()
+            self.assertIsNone(self.pm.get_port_events())
+
+    def test_get_port_events_returns_none_if_monitor_inactive(self):
+        self.pm.polling_completed()
+        self.assertIsNone(self.pm.get_port_events())
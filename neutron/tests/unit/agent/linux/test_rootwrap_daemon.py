@@ -0,0 +1,100 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import StringIO
+
+import mock
+
+from neutron.agent.linux import rootwrap_daemon
+from neutron.openstack.common.rootwrap import cmd as rootwrap_cmd
+from neutron.openstack.common.rootwrap import filters
+from neutron.tests import base
+
+
+class TestMessages(base.BaseTestCase):
+
+    def test_write_read_message(self):
+        stream = StringIO.StringIO()
+        rootwrap_daemon.write_message(stream, {'cmd': ['ls']})
+        rootwrap_daemon.write_message(stream, {'cmd': ['cat']})
+        stream.seek(0)
+        self.assertEqual({'cmd': ['ls']},
+                         rootwrap_daemon.read_message(stream))
+        self.assertEqual({'cmd': ['cat']},
+                         rootwrap_daemon.read_message(stream))
+        self.assertIsNone(rootwrap_daemon.read_message(stream))
+
+    def test_read_truncated_message(self):
+        stream = StringIO.StringIO()
+        rootwrap_daemon.write_message(stream, {'cmd': ['ls']})
+        stream = StringIO.StringIO(stream.getvalue()[:-1])
+        self.assertRaises(EOFError, rootwrap_daemon.read_message, stream)
+
+    def test_encode_decode_data(self):
+        data = ''.join(chr(i) for i in range(256))
+        self.assertEqual(data, rootwrap_daemon.decode_data(
+            rootwrap_daemon.encode_data(data)))
+
+
+class TestServe(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestServe, self).setUp()
+        self.config = mock.Mock(exec_dirs=['/bin', '/usr/bin'],
+                                use_syslog=False)
+        self.filters = [filters.CommandFilter('cat', 'root'),
+                        filters.CommandFilter('/bin/neutron-missing',
+                                              'root')]
+
+    def _serve(self, requests):
+        stdin = StringIO.StringIO()
+        for request in requests:
+            rootwrap_daemon.write_message(stdin, request)
+        stdin.seek(0)
+        stdout = StringIO.StringIO()
+        rootwrap_daemon.serve(self.config, self.filters, stdin, stdout)
+        stdout.seek(0)
+        replies = []
+        reply = rootwrap_daemon.read_message(stdout)
+        while reply is not None:
+            replies.append(reply)
+            reply = rootwrap_daemon.read_message(stdout)
+        return replies
+
+    def test_serve_runs_commands(self):
+        replies = self._serve([{'cmd': ['cat'], 'stdin': 'first'},
+                               {'cmd': ['cat'], 'stdin': 'second'}])
+        self.assertEqual([{'returncode': 0, 'stdout': 'first',
+                           'stderr': ''},
+                          {'returncode': 0, 'stdout': 'second',
+                           'stderr': ''}], replies)
+
+    def test_serve_encodes_unicode_arguments(self):
+        with mock.patch.object(rootwrap_daemon, 'run_command',
+                               return_value=(0, '', '')) as run_command:
+            self._serve([{'cmd': ['cat', u'\xe9']}])
+        run_command.assert_called_once_with(self.config, self.filters,
+                                            ['cat', '\xc3\xa9'], None)
+
+    def test_serve_unauthorized_command(self):
+        [reply] = self._serve([{'cmd': ['rm', '-rf', '/']}])
+        self.assertEqual(rootwrap_cmd.RC_UNAUTHORIZED, reply['returncode'])
+        self.assertIn('Unauthorized command', reply['stderr'])
+
+    def test_serve_executable_not_found(self):
+        [reply] = self._serve([{'cmd': ['neutron-missing']}])
+        self.assertEqual(rootwrap_cmd.RC_NOEXECFOUND, reply['returncode'])
+        self.assertIn('Executable not found', reply['stderr'])
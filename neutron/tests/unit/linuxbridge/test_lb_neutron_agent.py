@@ -157,6 +157,41 @@ class TestLinuxBridgeAgent(base.BaseTestCase):
                 agent.daemon_loop()
             self.assertEqual(3, log.call_count)
 
+    def test_treat_devices_added_updates_device_list(self):
+        agent = linuxbridge_neutron_agent.LinuxBridgeNeutronAgentRPC({},
+                                                                     0,
+                                                                     None)
+        details = [{'device': device, 'port_id': device, 'network_id': 'net',
+                    'network_type': 'vlan', 'physical_network': 'physnet',
+                    'segmentation_id': 1, 'admin_state_up': True}
+                   for device in ('tap1', 'tap2')]
+        agent.br_mgr.add_interface.side_effect = [True, False]
+        with contextlib.nested(
+            mock.patch.object(agent, 'prepare_devices_filter'),
+            mock.patch.object(agent.plugin_rpc, 'get_devices_details_list',
+                              return_value=details),
+            mock.patch.object(agent.plugin_rpc, 'update_device_list',
+                              return_value={'failed_devices_up': [],
+                                            'failed_devices_down': []})
+        ) as (prepare_filter, get_details, update_list):
+            self.assertFalse(agent.treat_devices_added(['tap1', 'tap2']))
+        get_details.assert_called_once_with(agent.context, ['tap1', 'tap2'],
+                                            agent.agent_id)
+        update_list.assert_called_once_with(agent.context, ['tap1'],
+                                            ['tap2'], agent.agent_id,
+                                            cfg.CONF.host)
+
+    def test_treat_devices_removed_failed(self):
+        agent = linuxbridge_neutron_agent.LinuxBridgeNeutronAgentRPC({},
+                                                                     0,
+                                                                     None)
+        with contextlib.nested(
+            mock.patch.object(agent, 'remove_devices_filter'),
+            mock.patch.object(agent.plugin_rpc, 'update_device_list',
+                              side_effect=rpc_common.Timeout)
+        ) as (remove_filter, update_list):
+            self.assertTrue(agent.treat_devices_removed(['tap1']))
+
 
 class TestLinuxBridgeManager(base.BaseTestCase):
     def setUp(self):
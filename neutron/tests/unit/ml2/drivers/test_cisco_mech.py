@@ -230,9 +230,9 @@ class TestCiscoPortsV2(CiscoML2MechanismTestCase,
         with mock.patch('__builtin__.hasattr',
                         new=fakehasattr):
             plugin_obj = NeutronManager.get_plugin()
-            orig = plugin_obj.create_port
+            orig = plugin_obj._add_port
             with mock.patch.object(plugin_obj,
-                                   'create_port') as patched_plugin:
+                                   '_add_port') as patched_plugin:
 
                 def side_effect(*args, **kwargs):
                     return self._do_side_effect(patched_plugin, orig,
@@ -264,9 +264,9 @@ class TestCiscoPortsV2(CiscoML2MechanismTestCase,
         ctx = context.get_admin_context()
         with self.network() as net:
             plugin_obj = NeutronManager.get_plugin()
-            orig = plugin_obj.create_port
+            orig = plugin_obj._add_port
             with mock.patch.object(plugin_obj,
-                                   'create_port') as patched_plugin:
+                                   '_add_port') as patched_plugin:
 
                 def side_effect(*args, **kwargs):
                     return self._do_side_effect(patched_plugin, orig,
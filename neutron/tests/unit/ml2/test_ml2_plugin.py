@@ -13,11 +13,23 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+
+import mock
+import webob.exc
+
+from neutron.common import topics
 from neutron.extensions import multiprovidernet as mpnet
 from neutron.extensions import portbindings
 from neutron.extensions import providernet as pnet
+from neutron import manager
+from neutron.plugins.ml2.common import exceptions as ml2_exc
 from neutron.plugins.ml2 import config
+from neutron.plugins.ml2 import driver_context
+from neutron.plugins.ml2 import managers
+from neutron.plugins.ml2 import plugin as plugin_module
 from neutron.tests.unit import _test_extension_portbindings as test_bindings
+from neutron.tests.unit.ml2.drivers import mechanism_test
 from neutron.tests.unit import test_db_plugin as test_plugin
 from neutron.tests.unit import test_extension_extradhcpopts as test_dhcpopts
 from neutron.tests.unit import test_security_groups_rpc as test_sg_rpc
@@ -52,6 +64,23 @@ class Ml2PluginV2TestCase(test_plugin.NeutronDbPluginV2TestCase):
         self.port_create_status = 'DOWN'
 
 
+class TestMl2RpcListener(Ml2PluginV2TestCase):
+
+    def test_rpc_workers_supported(self):
+        self.assertTrue(manager.NeutronManager.get_plugin().
+                        rpc_workers_supported())
+
+    def test_start_rpc_listener(self):
+        plugin = manager.NeutronManager.get_plugin()
+        with mock.patch.object(plugin_module.c_rpc,
+                               'create_connection') as create_connection:
+            conn = create_connection.return_value
+            self.assertEqual(conn.consume_in_thread.return_value,
+                             plugin.start_rpc_listener())
+        conn.create_consumer.assert_called_once_with(
+            topics.PLUGIN, plugin.dispatcher, fanout=False)
+
+
 class TestMl2BasicGet(test_plugin.TestBasicGet,
                       Ml2PluginV2TestCase):
     pass
@@ -74,6 +103,55 @@ class TestMl2PortsV2(test_plugin.TestPortsV2, Ml2PluginV2TestCase):
             self.assertEqual(port['port']['status'], 'DOWN')
             self.assertEqual(self.port_create_status, 'DOWN')
 
+    def test_create_ports_bulk_calls_drivers_once(self):
+        with contextlib.nested(
+            mock.patch.object(managers.MechanismManager,
+                              'create_port_bulk_precommit'),
+            mock.patch.object(managers.MechanismManager,
+                              'create_port_bulk_postcommit'),
+            self.network()) as (precommit, postcommit, net):
+            res = self._create_port_bulk(self.fmt, 2, net['network']['id'],
+                                         'test', True)
+            self._validate_behavior_on_bulk_success(res, 'ports')
+            ports = self.deserialize(self.fmt, res)['ports']
+            for method in (precommit, postcommit):
+                self.assertEqual(1, method.call_count)
+                contexts = method.call_args[0][0]
+                self.assertEqual([port['id'] for port in ports],
+                                 [context.current['id']
+                                  for context in contexts])
+                for context in contexts:
+                    self.assertIsInstance(context,
+                                          driver_context.PortContext)
+            for port in ports:
+                self.assertEqual('DOWN', port['status'])
+                self._delete('ports', port['id'])
+
+    def test_create_ports_bulk_postcommit_failure(self):
+        with contextlib.nested(
+            mock.patch.object(managers.MechanismManager,
+                              'create_port_bulk_postcommit',
+                              side_effect=ml2_exc.MechanismDriverError(
+                                  method='create_port_bulk_postcommit')),
+            self.network()) as (postcommit, net):
+            res = self._create_port_bulk(self.fmt, 2, net['network']['id'],
+                                         'test', True)
+            self._validate_behavior_on_bulk_failure(
+                res, 'ports', webob.exc.HTTPServerError.code)
+
+    def test_bulk_methods_default_to_port_methods(self):
+        driver = mechanism_test.TestMechanismDriver()
+        contexts = [mock.sentinel.context1, mock.sentinel.context2]
+        with contextlib.nested(
+            mock.patch.object(driver, 'create_port_precommit'),
+            mock.patch.object(driver, 'create_port_postcommit')
+        ) as (precommit, postcommit):
+            driver.create_port_bulk_precommit(contexts)
+            driver.create_port_bulk_postcommit(contexts)
+        calls = [mock.call(context) for context in contexts]
+        self.assertEqual(calls, precommit.call_args_list)
+        self.assertEqual(calls, postcommit.call_args_list)
+
 
 class TestMl2PortBinding(Ml2PluginV2TestCase,
                          test_bindings.PortBindingsTestCase):
@@ -13,9 +13,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import mock
+
+from neutron import context
 from neutron.extensions import portbindings
 from neutron import manager
 from neutron.plugins.ml2 import config as config
+from neutron.plugins.ml2 import db as ml2_db
 from neutron.tests.unit import test_db_plugin as test_plugin
 
 
@@ -57,6 +61,15 @@ class PortBindingTestCase(test_plugin.NeutronDbPluginV2TestCase):
             else:
                 self.assertNotIn('network_type', details)
 
+            tap_device = 'tap' + port_id[:11]
+            devices_details = self.plugin.callbacks.get_devices_details_list(
+                None, agent_id="theAgentId",
+                devices=[port_id, tap_device, 'tapnotaport'])
+            tap_details = dict(details, device=tap_device)
+            self.assertEqual(devices_details,
+                             [details, tap_details,
+                              {'device': 'tapnotaport'}])
+
     def test_unbound(self):
         self._test_port_binding("",
                                 portbindings.VIF_TYPE_UNBOUND,
@@ -76,3 +89,48 @@ class PortBindingTestCase(test_plugin.NeutronDbPluginV2TestCase):
         self._test_port_binding("host-bridge-filter",
                                 portbindings.VIF_TYPE_BRIDGE,
                                 True, True)
+
+    def _update_device_list(self, host, devices_up=(), devices_down=()):
+        return self.plugin.callbacks.update_device_list(
+            context.get_admin_context(), agent_id="theAgentId", host=host,
+            devices_up=list(devices_up), devices_down=list(devices_down))
+
+    def test_update_device_list(self):
+        host_arg = {portbindings.HOST_ID: 'host-ovs-no_filter'}
+        with self.port(arg_list=(portbindings.HOST_ID,),
+                       **host_arg) as port:
+            port_id = port['port']['id']
+            with mock.patch.object(ml2_db, 'get_ports',
+                                   wraps=ml2_db.get_ports) as get_ports:
+                result = self._update_device_list(
+                    'host-ovs-no_filter', devices_up=[port_id],
+                    devices_down=['tapnotaport'])
+            self.assertEqual(1, get_ports.call_count)
+            self.assertEqual({'devices_up': [port_id],
+                              'failed_devices_up': [],
+                              'devices_down': [{'device': 'tapnotaport',
+                                                'exists': False}],
+                              'failed_devices_down': []}, result)
+            self.assertEqual('ACTIVE', self._show(
+                'ports', port_id)['port']['status'])
+
+            # A port bound to another host is left alone
+            result = self._update_device_list('other-host',
+                                              devices_down=[port_id])
+            self.assertEqual([{'device': port_id, 'exists': True}],
+                             result['devices_down'])
+            self.assertEqual('ACTIVE', self._show(
+                'ports', port_id)['port']['status'])
+
+    def test_update_device_list_postcommit_failure(self):
+        host_arg = {portbindings.HOST_ID: 'host-ovs-no_filter'}
+        with self.port(arg_list=(portbindings.HOST_ID,),
+                       **host_arg) as port:
+            port_id = port['port']['id']
+            with mock.patch.object(self.plugin.mechanism_manager,
+                                   'update_port_postcommit',
+                                   side_effect=Exception):
+                result = self._update_device_list('host-ovs-no_filter',
+                                                  devices_up=[port_id])
+            self.assertEqual([], result['devices_up'])
+            self.assertEqual([port_id], result['failed_devices_up'])
@@ -0,0 +1,225 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo.config import cfg
+import testtools
+
+from neutron.common import exceptions as exc
+from neutron.db import api as db
+from neutron.plugins.ml2 import db as ml2_db
+from neutron.plugins.ml2 import driver_api as api
+from neutron.plugins.ml2.drivers import segment_ranges
+from neutron.plugins.ml2.drivers import type_gre
+from neutron.plugins.ml2.drivers import type_vlan
+from neutron.plugins.ml2.drivers import type_vxlan
+from neutron.tests import base
+
+TUN_MIN = 100
+TUN_MAX = 109
+PHYS_NET = 'physnet1'
+
+
+class SegmentRangesTestCase(base.BaseTestCase):
+    def setUp(self):
+        super(SegmentRangesTestCase, self).setUp()
+        ml2_db.initialize()
+        cfg.CONF.set_override('segment_allocator',
+                              segment_ranges.RANGE_ALLOCATOR, group='ml2')
+        self.session = db.get_session()
+        self.addCleanup(cfg.CONF.reset)
+        self.addCleanup(db.clear_db)
+
+    def _get_ranges(self, network_type):
+        return sorted((r.physical_network, r.minimum, r.maximum)
+                      for r in self.session.query(
+                          segment_ranges.SegmentRange).filter_by(
+                              network_type=network_type))
+
+
+class TestGetAllocator(base.BaseTestCase):
+    def setUp(self):
+        super(TestGetAllocator, self).setUp()
+        self.addCleanup(cfg.CONF.reset)
+
+    def test_table_allocator(self):
+        self.assertIsNone(segment_ranges.get_allocator(
+            'gre', type_gre.GreAllocation, 'gre_id'))
+
+    def test_range_allocator(self):
+        cfg.CONF.set_override('segment_allocator',
+                              segment_ranges.RANGE_ALLOCATOR, group='ml2')
+        allocator = segment_ranges.get_allocator(
+            'gre', type_gre.GreAllocation, 'gre_id')
+        self.assertIsInstance(allocator, segment_ranges.RangeAllocator)
+        self.assertFalse(allocator.has_physical_network)
+
+    def test_invalid_allocator(self):
+        cfg.CONF.set_override('segment_allocator', 'bitmap', group='ml2')
+        self.assertRaises(SystemExit, segment_ranges.get_allocator,
+                          'gre', type_gre.GreAllocation, 'gre_id')
+
+
+class TestTunnelRangeAllocator(SegmentRangesTestCase):
+    def setUp(self):
+        super(TestTunnelRangeAllocator, self).setUp()
+        cfg.CONF.set_override('tunnel_id_ranges',
+                              ['%d:%d' % (TUN_MIN, TUN_MAX)],
+                              group='ml2_type_gre')
+        self.driver = type_gre.GreTypeDriver()
+        self.driver.initialize()
+
+    def _segment(self, segmentation_id):
+        return {api.NETWORK_TYPE: 'gre',
+                api.PHYSICAL_NETWORK: None,
+                api.SEGMENTATION_ID: segmentation_id}
+
+    def test_initialize_only_stores_ranges(self):
+        self.assertEqual([('', TUN_MIN, TUN_MAX)], self._get_ranges('gre'))
+        self.assertEqual(
+            0, self.session.query(type_gre.GreAllocation).count())
+
+    def test_sync_updates_ranges(self):
+        self.driver.allocator.sync({None: [(TUN_MIN, TUN_MAX + 5),
+                                           (200, 300)]})
+        self.assertEqual([('', TUN_MIN, TUN_MAX + 5), ('', 200, 300)],
+                         self._get_ranges('gre'))
+        self.driver.allocator.sync({None: [(200, 300)]})
+        self.assertEqual([('', 200, 300)], self._get_ranges('gre'))
+
+    def test_sync_deletes_free_table_rows(self):
+        self.session.add(type_gre.GreAllocation(gre_id=TUN_MIN,
+                                                allocated=False))
+        self.session.add(type_gre.GreAllocation(gre_id=TUN_MIN + 1,
+                                                allocated=True))
+        self.session.flush()
+        self.driver.allocator.sync({None: [(TUN_MIN, TUN_MAX)]})
+        self.assertIsNone(self.driver.get_gre_allocation(self.session,
+                                                         TUN_MIN))
+        self.assertTrue(self.driver.get_gre_allocation(
+            self.session, TUN_MIN + 1).allocated)
+
+    def test_allocate_tenant_segment(self):
+        ids = [self.driver.allocate_tenant_segment(
+            self.session)[api.SEGMENTATION_ID]
+            for i in range(TUN_MIN, TUN_MAX + 1)]
+        self.assertEqual(range(TUN_MIN, TUN_MAX + 1), ids)
+        self.assertIsNone(self.driver.allocate_tenant_segment(self.session))
+
+    def test_allocate_fills_gaps(self):
+        for i in range(TUN_MIN, TUN_MAX + 1):
+            self.driver.allocate_tenant_segment(self.session)
+        self.driver.release_segment(self.session, self._segment(TUN_MIN))
+        self.driver.release_segment(self.session, self._segment(TUN_MIN + 5))
+
+        segment = self.driver.allocate_tenant_segment(self.session)
+        self.assertEqual(TUN_MIN, segment[api.SEGMENTATION_ID])
+        segment = self.driver.allocate_tenant_segment(self.session)
+        self.assertEqual(TUN_MIN + 5, segment[api.SEGMENTATION_ID])
+        self.assertIsNone(self.driver.allocate_tenant_segment(self.session))
+
+    def test_allocate_next_range(self):
+        self.driver.allocator.sync({None: [(TUN_MIN, TUN_MIN),
+                                           (TUN_MAX, TUN_MAX)]})
+        ids = [self.driver.allocate_tenant_segment(
+            self.session)[api.SEGMENTATION_ID] for i in range(2)]
+        self.assertEqual([TUN_MIN, TUN_MAX], ids)
+
+    def test_allocate_skips_provider_segment(self):
+        self.driver.reserve_provider_segment(self.session,
+                                             self._segment(TUN_MIN))
+        segment = self.driver.allocate_tenant_segment(self.session)
+        self.assertEqual(TUN_MIN + 1, segment[api.SEGMENTATION_ID])
+
+    def test_reserve_provider_segment(self):
+        segment = self._segment(TUN_MIN + 1)
+        self.driver.reserve_provider_segment(self.session, segment)
+        self.assertTrue(self.driver.get_gre_allocation(
+            self.session, TUN_MIN + 1).allocated)
+
+        with testtools.ExpectedException(exc.TunnelIdInUse):
+            self.driver.reserve_provider_segment(self.session, segment)
+
+        self.driver.release_segment(self.session, segment)
+        self.assertIsNone(self.driver.get_gre_allocation(self.session,
+                                                         TUN_MIN + 1))
+
+    def test_reserve_provider_segment_outside_pool(self):
+        segment = self._segment(1000)
+        self.driver.reserve_provider_segment(self.session, segment)
+        self.assertTrue(self.driver.get_gre_allocation(self.session,
+                                                       1000).allocated)
+        self.driver.release_segment(self.session, segment)
+        self.assertIsNone(self.driver.get_gre_allocation(self.session,
+                                                         1000))
+
+    def test_release_unknown_segment(self):
+        self.assertFalse(self.driver.allocator.release(self.session, None,
+                                                       TUN_MIN))
+
+
+class TestVxlanRangeAllocator(SegmentRangesTestCase):
+    def test_large_range(self):
+        cfg.CONF.set_override('vni_ranges', ['1:16777215'],
+                              group='ml2_type_vxlan')
+        driver = type_vxlan.VxlanTypeDriver()
+        driver.initialize()
+        self.assertEqual([('', 1, 16777215)], self._get_ranges('vxlan'))
+        segment = driver.allocate_tenant_segment(self.session)
+        self.assertEqual(1, segment[api.SEGMENTATION_ID])
+
+
+class TestVlanRangeAllocator(SegmentRangesTestCase):
+    def setUp(self):
+        super(TestVlanRangeAllocator, self).setUp()
+        cfg.CONF.set_override('network_vlan_ranges',
+                              ['%s:1:2' % PHYS_NET, 'physnet2:1:1'],
+                              group='ml2_type_vlan')
+        self.driver = type_vlan.VlanTypeDriver()
+        self.driver.initialize()
+
+    def _segment(self, physical_network, vlan_id):
+        return {api.NETWORK_TYPE: 'vlan',
+                api.PHYSICAL_NETWORK: physical_network,
+                api.SEGMENTATION_ID: vlan_id}
+
+    def test_initialize_only_stores_ranges(self):
+        self.assertEqual([(PHYS_NET, 1, 2), ('physnet2', 1, 1)],
+                         self._get_ranges('vlan'))
+
+    def test_allocate_tenant_segment(self):
+        segments = [self.driver.allocate_tenant_segment(self.session)
+                    for i in range(3)]
+        self.assertEqual([(PHYS_NET, 1), (PHYS_NET, 2), ('physnet2', 1)],
+                         [(s[api.PHYSICAL_NETWORK], s[api.SEGMENTATION_ID])
+                          for s in segments])
+        self.assertIsNone(self.driver.allocate_tenant_segment(self.session))
+
+    def test_gap_search_per_physical_network(self):
+        self.driver.reserve_provider_segment(self.session,
+                                             self._segment('physnet2', 1))
+        segment = self.driver.allocate_tenant_segment(self.session)
+        self.assertEqual((PHYS_NET, 1), (segment[api.PHYSICAL_NETWORK],
+                                         segment[api.SEGMENTATION_ID]))
+        self.driver.reserve_provider_segment(self.session,
+                                             self._segment(PHYS_NET, 2))
+        self.assertIsNone(self.driver.allocate_tenant_segment(self.session))
+
+    def test_reserve_provider_segment_in_use(self):
+        segment = self._segment(PHYS_NET, 2)
+        self.driver.reserve_provider_segment(self.session, segment)
+        with testtools.ExpectedException(exc.VlanIdInUse):
+            self.driver.reserve_provider_segment(self.session, segment)
+        self.driver.release_segment(self.session, segment)
+        self.driver.reserve_provider_segment(self.session, segment)
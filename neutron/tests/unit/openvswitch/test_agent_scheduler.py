@@ -26,6 +26,7 @@ from neutron.api.v2 import attributes
 from neutron.common import constants
 from neutron import context
 from neutron.db import agents_db
+from neutron.db import api as db_api
 from neutron.db import dhcp_rpc_base
 from neutron.db import l3_rpc_base
 from neutron.extensions import agent
@@ -35,6 +36,8 @@ from neutron import manager
 from neutron.openstack.common import timeutils
 from neutron.openstack.common import uuidutils
 from neutron.plugins.common import constants as service_constants
+from neutron.scheduler import dhcp_agent_scheduler
+from neutron.scheduler import l3_agent_scheduler
 from neutron.tests.unit import test_agent_ext_plugin
 from neutron.tests.unit import test_db_plugin as test_plugin
 from neutron.tests.unit import test_extensions
@@ -384,6 +387,66 @@ class OvsAgentSchedulerTestCase(OvsAgentSchedulerTestCaseBase):
         self.assertEqual(DHCP_HOSTA, dhcp_agents_1['agents'][0]['host'])
         self.assertEqual(DHCP_HOSTC, dhcp_agents_2['agents'][0]['host'])
 
+    def _auto_schedule_select_statements(self, host):
+        plugin = manager.NeutronManager.get_plugin()
+        dialect = db_api.get_session().get_bind().dialect
+        with mock.patch.object(dialect, 'do_execute',
+                               wraps=dialect.do_execute) as do_execute:
+            plugin.auto_schedule_networks(self.adminContext, host)
+        return len([call for call in do_execute.call_args_list
+                    if call[0][1].lstrip().upper().startswith('SELECT')])
+
+    def test_network_auto_schedule_query_statements(self):
+        cfg.CONF.set_override('dhcp_agents_per_network', 2)
+        cfg.CONF.set_override('allow_overlapping_ips', True)
+        with self.subnet():
+            self._register_agent_states()
+            one_network = self._auto_schedule_select_statements(DHCP_HOSTA)
+            with contextlib.nested(self.subnet(), self.subnet(),
+                                   self.subnet()):
+                four_networks = self._auto_schedule_select_statements(
+                    DHCP_HOSTC)
+                hosta_id = self._get_agent_id(constants.AGENT_TYPE_DHCP,
+                                              DHCP_HOSTA)
+                hostc_id = self._get_agent_id(constants.AGENT_TYPE_DHCP,
+                                              DHCP_HOSTC)
+                hosta_nets = self._list_networks_hosted_by_dhcp_agent(
+                    hosta_id)
+                hostc_nets = self._list_networks_hosted_by_dhcp_agent(
+                    hostc_id)
+        # The number of queries does not depend on the networks
+        self.assertEqual(one_network, four_networks)
+        self.assertEqual(1, len(hosta_nets['networks']))
+        self.assertEqual(4, len(hostc_nets['networks']))
+
+    def test_network_scheduling_least_networks(self):
+        plugin = manager.NeutronManager.get_plugin()
+        scheduler = dhcp_agent_scheduler.LeastNetworksScheduler()
+        cfg.CONF.set_override('allow_overlapping_ips', True)
+        with contextlib.nested(
+            mock.patch.object(plugin, 'network_scheduler', scheduler),
+            self.network(), self.network()) as (m, net1, net2):
+            self._register_agent_states()
+            hosta_id = self._get_agent_id(constants.AGENT_TYPE_DHCP,
+                                          DHCP_HOSTA)
+            hostc_id = self._get_agent_id(constants.AGENT_TYPE_DHCP,
+                                          DHCP_HOSTC)
+            for net in (net1, net2):
+                self._add_network_to_dhcp_agent(hosta_id,
+                                                net['network']['id'])
+            # hostc hosts fewer networks than hosta for both subnets
+            with contextlib.nested(self.subnet(), self.subnet()) as subnets:
+                for subnet in subnets:
+                    with self.port(subnet=subnet,
+                                   device_owner='compute:test:' +
+                                   DHCP_HOSTA):
+                        pass
+                hostc_nets = self._list_networks_hosted_by_dhcp_agent(
+                    hostc_id)
+        self.assertEqual(sorted(subnet['subnet']['network_id']
+                                for subnet in subnets),
+                         sorted(net['id'] for net in hostc_nets['networks']))
+
     def test_network_scheduling_on_port_creation(self):
         with self.subnet() as subnet:
             dhcp_agents = self._list_dhcp_agents_hosting_network(
@@ -833,6 +896,52 @@ class OvsAgentSchedulerTestCase(OvsAgentSchedulerTestCaseBase):
         self.assertEqual(1, len(l3_agents_1['agents']))
         self.assertEqual(0, len(l3_agents_2['agents']))
 
+    def test_router_schedule_least_routers(self):
+        plugin = self.l3agentscheduler_dbMinxin
+        scheduler = l3_agent_scheduler.LeastRoutersScheduler()
+        with contextlib.nested(
+            mock.patch.object(plugin, 'router_scheduler', scheduler),
+            self.router(), self.router(), self.router(),
+            self.router()) as (m, router1, router2, router3, router4):
+            self._register_agent_states()
+            hosta_id = self._get_agent_id(constants.AGENT_TYPE_L3,
+                                          L3_HOSTA)
+            hostb_id = self._get_agent_id(constants.AGENT_TYPE_L3,
+                                          L3_HOSTB)
+            for router in (router1, router2):
+                self._add_router_to_l3_agent(hosta_id,
+                                             router['router']['id'])
+            router_ids = [router3['router']['id'], router4['router']['id']]
+            # hostb hosts fewer routers than hosta for both routers
+            plugin.schedule_routers(self.adminContext, router_ids)
+            hostb_routers = self._list_routers_hosted_by_l3_agent(hostb_id)
+        self.assertEqual(sorted(router_ids),
+                         sorted(r['id'] for r in hostb_routers['routers']))
+
+    def test_router_schedule_routers_loads_agent_configurations_once(self):
+        plugin = self.l3agentscheduler_dbMinxin
+        with contextlib.nested(self.router(), self.router(),
+                               self.router()) as routers:
+            self._register_agent_states()
+            router_ids = [router['router']['id'] for router in routers]
+            with mock.patch.object(
+                plugin, 'get_configuration_dict',
+                wraps=plugin.get_configuration_dict) as get_conf:
+                chosen_agents = plugin.schedule_routers(self.adminContext,
+                                                        router_ids)
+        self.assertEqual(sorted(router_ids), sorted(chosen_agents))
+        # one call for each of the two L3 agents
+        self.assertEqual(2, get_conf.call_count)
+
+    def test_router_schedule_routers_without_bulk_scheduler(self):
+        plugin = self.l3agentscheduler_dbMinxin
+        scheduler = mock.Mock(spec=['schedule', 'auto_schedule_routers'])
+        with mock.patch.object(plugin, 'router_scheduler', scheduler):
+            plugin.schedule_routers(self.adminContext, ['r1', 'r2'])
+        scheduler.schedule.assert_has_calls(
+            [mock.call(plugin, self.adminContext, 'r1'),
+             mock.call(plugin, self.adminContext, 'r2')])
+
     def test_router_without_l3_agents(self):
         with self.subnet() as s:
             self._set_net_external(s['subnet']['network_id'])
@@ -13,7 +13,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
+
 from neutron.extensions import portbindings
+from neutron import manager
 from neutron.tests.unit import _test_extension_portbindings as test_bindings
 from neutron.tests.unit import test_db_plugin as test_plugin
 from neutron.tests.unit import test_security_groups_rpc as test_sg_rpc
@@ -47,6 +50,25 @@ class TestOpenvswitchPortsV2(test_plugin.TestPortsV2,
             self.assertEqual(port['port']['status'], 'DOWN')
             self.assertEqual(self.port_create_status, 'DOWN')
 
+    def test_get_devices_details_list(self):
+        plugin = manager.NeutronManager.get_plugin()
+        with self.subnet() as subnet:
+            with contextlib.nested(self.port(subnet=subnet),
+                                   self.port(subnet=subnet)) as (port1,
+                                                                 port2):
+                port_ids = [port1['port']['id'], port2['port']['id']]
+                devices_details = plugin.callbacks.get_devices_details_list(
+                    None, agent_id='fake_agent_id',
+                    devices=port_ids + ['bad_device_id'])
+                self.assertEqual(
+                    [details['port_id'] for details in devices_details[:2]],
+                    port_ids)
+                self.assertEqual(devices_details[2],
+                                 {'device': 'bad_device_id'})
+                for port_id in port_ids:
+                    port = self._show('ports', port_id)['port']
+                    self.assertEqual(port['status'], 'ACTIVE')
+
 
 class TestOpenvswitchNetworksV2(test_plugin.TestNetworksV2,
                                 OpenvswitchPluginV2TestCase):
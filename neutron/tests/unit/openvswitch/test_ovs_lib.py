@@ -297,6 +297,65 @@ class OVS_Lib_Test(base.BaseTestCase):
         self.br.defer_apply_off()
         self.mox.VerifyAll()
 
+    def test_defer_apply_flows_keeps_order(self):
+        self.mox.StubOutWithMock(self.br, 'run_ofctl')
+        self.br.run_ofctl('del-flows', ['-'], 'in_port=1\n')
+        self.br.run_ofctl('add-flows', ['-'],
+                          'hard_timeout=0,idle_timeout=0,priority=2,'
+                          'in_port=1,actions=drop\n')
+        self.br.run_ofctl('del-flows', ['-'], 'in_port=2\nin_port=3\n')
+        self.mox.ReplayAll()
+
+        with self.br.defer_apply():
+            self.br.delete_flows(in_port=1)
+            self.br.add_flow(priority=2, in_port=1, actions='drop')
+            self.br.delete_flows(in_port=2)
+            self.br.delete_flows(in_port=3)
+        self.mox.VerifyAll()
+
+    def test_defer_apply_db_attributes(self):
+        utils.execute(["ovs-vsctl", self.TO,
+                       "--", "set", "Port", "tap1", "tag=1",
+                       "--", "clear", "Port", "tap2", "tag",
+                       "--", "set", "Port", "tap3", "tag=3"],
+                      root_helper=self.root_helper)
+        self.mox.ReplayAll()
+
+        with self.br.defer_apply():
+            self.br.set_db_attribute("Port", "tap1", "tag", "1")
+            self.br.clear_db_attribute("Port", "tap2", "tag")
+            self.br.set_db_attribute("Port", "tap3", "tag", "3")
+        self.mox.VerifyAll()
+
+    def test_defer_apply_db_attributes_transaction_error(self):
+        utils.execute(["ovs-vsctl", self.TO,
+                       "--", "set", "Port", "tap1", "tag=1",
+                       "--", "set", "Port", "tap2", "tag=2"],
+                      root_helper=self.root_helper).AndRaise(RuntimeError())
+        utils.execute(["ovs-vsctl", self.TO, "set", "Port", "tap1", "tag=1"],
+                      root_helper=self.root_helper)
+        utils.execute(["ovs-vsctl", self.TO, "set", "Port", "tap2", "tag=2"],
+                      root_helper=self.root_helper).AndRaise(RuntimeError())
+        self.mox.ReplayAll()
+
+        with self.br.defer_apply():
+            self.br.set_db_attribute("Port", "tap1", "tag", "1")
+            self.br.set_db_attribute("Port", "tap2", "tag", "2")
+        self.mox.VerifyAll()
+
+    def test_defer_apply_db_attributes_applied_before_read(self):
+        utils.execute(["ovs-vsctl", self.TO, "set", "Interface", "tap1",
+                       "type=gre"], root_helper=self.root_helper)
+        utils.execute(["ovs-vsctl", self.TO, "get", "Interface", "tap1",
+                       "ofport"],
+                      root_helper=self.root_helper).AndReturn("6\n")
+        self.mox.ReplayAll()
+
+        with self.br.defer_apply():
+            self.br.set_db_attribute("Interface", "tap1", "type", "gre")
+            self.assertEqual(self.br.get_port_ofport("tap1"), "6")
+        self.mox.VerifyAll()
+
     def test_add_tunnel_port(self):
         pname = "tap99"
         local_ip = "1.1.1.1"
@@ -398,6 +457,9 @@ class OVS_Lib_Test(base.BaseTestCase):
                     ovs_row.append(cell)
                 elif isinstance(cell, dict):
                     ovs_row.append(["map", cell.items()])
+                elif isinstance(cell, (int, list)):
+                    # integers and already encoded sets
+                    ovs_row.append(cell)
                 else:
                     raise TypeError('%r not str or dict' % type(cell))
         return jsonutils.dumps(r)
@@ -472,6 +534,43 @@ class OVS_Lib_Test(base.BaseTestCase):
         self.assertEqual(set(), self.br.get_vif_port_set())
         self.mox.VerifyAll()
 
+    def test_get_vif_ports_by_ids(self):
+        headings = ['name', 'external_ids', 'ofport']
+        data = [
+            ['tap99', {'iface-id': 'tap99id', 'attached-mac': 'tap99mac'}, 1],
+            # not requested
+            ['tap88', {'iface-id': 'tap88id', 'attached-mac': 'tap88mac'}, 2],
+            # no ofport assigned yet
+            ['tap77', {'iface-id': 'tap77id', 'attached-mac': 'tap77mac'},
+             ['set', []]],
+            # not a vif
+            ['tun22', {}, 3],
+        ]
+        utils.execute(["ovs-vsctl", self.TO, "--format=json",
+                       "--", "--columns=name,external_ids,ofport",
+                       "list", "Interface"],
+                      root_helper=self.root_helper).AndReturn(
+                          self._encode_ovs_json(headings, data))
+        self.mox.ReplayAll()
+
+        vif_ports = self.br.get_vif_ports_by_ids(['tap99id', 'tap77id',
+                                                  'tap66id'])
+        self.assertEqual(['tap99id'], vif_ports.keys())
+        vif_port = vif_ports['tap99id']
+        self.assertEqual('tap99', vif_port.port_name)
+        self.assertEqual(1, vif_port.ofport)
+        self.assertEqual('tap99mac', vif_port.vif_mac)
+        self.mox.VerifyAll()
+
+    def test_get_vif_ports_by_ids_list_interface_error(self):
+        utils.execute(["ovs-vsctl", self.TO, "--format=json",
+                       "--", "--columns=name,external_ids,ofport",
+                       "list", "Interface"],
+                      root_helper=self.root_helper).AndRaise(RuntimeError())
+        self.mox.ReplayAll()
+        self.assertEqual({}, self.br.get_vif_ports_by_ids(['tap99id']))
+        self.mox.VerifyAll()
+
     def test_clear_db_attribute(self):
         pname = "tap77"
         utils.execute(["ovs-vsctl", self.TO, "clear", "Port",
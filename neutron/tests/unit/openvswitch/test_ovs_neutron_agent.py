@@ -168,8 +168,31 @@ class TestOvsNeutronAgent(base.BaseTestCase):
         actual = self.mock_update_ports(vif_port_set, registered_ports)
         self.assertEqual(expected, actual)
 
+    def test_update_ports_from_port_events(self):
+        port_events = {'added': {'3': 'tap3', '4': 'qg-4'},
+                       'removed': set(['2'])}
+        with contextlib.nested(
+            mock.patch.object(self.agent.int_br, 'get_vif_port_set'),
+            mock.patch.object(self.agent.int_br, 'get_port_name_list',
+                              return_value=['tap1', 'tap3'])
+        ) as (get_vif_port_set, get_port_name_list):
+            actual = self.agent.update_ports(set(['1', '2']), port_events)
+        self.assertFalse(get_vif_port_set.called)
+        self.assertEqual(actual, {'current': set(['1', '3']),
+                                  'added': set(['3']),
+                                  'removed': set(['2'])})
+
+    def test_update_ports_from_port_events_without_additions(self):
+        port_events = {'added': {}, 'removed': set(['2'])}
+        with mock.patch.object(self.agent.int_br,
+                               'get_port_name_list') as get_port_name_list:
+            actual = self.agent.update_ports(set(['1', '2']), port_events)
+        self.assertFalse(get_port_name_list.called)
+        self.assertEqual(actual['current'], set(['1']))
+
     def test_treat_devices_added_returns_true_for_missing_device(self):
-        with mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
+        with mock.patch.object(self.agent.plugin_rpc,
+                               'get_devices_details_list',
                                side_effect=Exception()):
             self.assertTrue(self.agent.treat_devices_added([{}]))
 
@@ -177,18 +200,20 @@ class TestOvsNeutronAgent(base.BaseTestCase):
         """Mock treat devices added.
 
         :param details: the details to return for the device
-        :param port: the port that get_vif_port_by_id should return
+        :param port: the port that get_vif_ports_by_ids should return
         :param func_name: the function that should be called
         :returns: whether the named function was called
         """
         with contextlib.nested(
-            mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
-                              return_value=details),
-            mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
-                              return_value=port),
-            mock.patch.object(self.agent.plugin_rpc, 'update_device_up'),
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
+                              return_value=[details]),
+            mock.patch.object(self.agent.int_br, 'get_vif_ports_by_ids',
+                              return_value={details['device']: port}),
+            mock.patch.object(self.agent.plugin_rpc, 'update_device_list',
+                              return_value={'failed_devices_up': []}),
             mock.patch.object(self.agent, func_name)
-        ) as (get_dev_fn, get_vif_func, upd_dev_up, func):
+        ) as (get_dev_fn, get_vif_func, upd_dev_list, func):
             self.assertFalse(self.agent.treat_devices_added([{}]))
         return func.called
 
@@ -211,17 +236,49 @@ class TestOvsNeutronAgent(base.BaseTestCase):
                                                        mock.Mock(),
                                                        'treat_vif_port'))
 
+    def test_treat_devices_added_updates_devices_up_once(self):
+        details = [{'device': device, 'port_id': device, 'network_id': 'net',
+                    'network_type': 'vlan', 'physical_network': 'physnet',
+                    'segmentation_id': 1, 'admin_state_up': True}
+                   for device in ('dev1', 'dev2')]
+        with contextlib.nested(
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
+                              return_value=details),
+            mock.patch.object(self.agent.int_br, 'get_vif_ports_by_ids',
+                              return_value={}),
+            mock.patch.object(self.agent.int_br, 'defer_apply_on'),
+            mock.patch.object(self.agent.int_br, 'defer_apply_off'),
+            mock.patch.object(self.agent.plugin_rpc, 'update_device_list',
+                              return_value={'failed_devices_up': ['dev2']}),
+            mock.patch.object(self.agent, 'treat_vif_port')
+        ) as (get_dev_fn, get_vif_func, defer_on, defer_off, upd_dev_list,
+              treat_vif_port):
+            self.assertTrue(self.agent.treat_devices_added(['dev1', 'dev2']))
+        get_dev_fn.assert_called_once_with(self.agent.context,
+                                           ['dev1', 'dev2'],
+                                           self.agent.agent_id)
+        get_vif_func.assert_called_once_with(['dev1', 'dev2'])
+        defer_on.assert_called_once_with()
+        defer_off.assert_called_once_with()
+        upd_dev_list.assert_called_once_with(self.agent.context,
+                                             ['dev1', 'dev2'], [],
+                                             self.agent.agent_id,
+                                             cfg.CONF.host)
+        self.assertEqual(treat_vif_port.call_count, 2)
+
     def test_treat_devices_removed_returns_true_for_missing_device(self):
-        with mock.patch.object(self.agent.plugin_rpc, 'update_device_down',
+        with mock.patch.object(self.agent.plugin_rpc, 'update_device_list',
                                side_effect=Exception()):
             self.assertTrue(self.agent.treat_devices_removed([{}]))
 
     def _mock_treat_devices_removed(self, port_exists):
-        details = dict(exists=port_exists)
-        with mock.patch.object(self.agent.plugin_rpc, 'update_device_down',
-                               return_value=details):
+        details = dict(device='dev1', exists=port_exists)
+        result = {'devices_down': [details], 'failed_devices_down': []}
+        with mock.patch.object(self.agent.plugin_rpc, 'update_device_list',
+                               return_value=result):
             with mock.patch.object(self.agent, 'port_unbound') as port_unbound:
-                self.assertFalse(self.agent.treat_devices_removed([{}]))
+                self.assertFalse(self.agent.treat_devices_removed(['dev1']))
         self.assertEqual(port_unbound.called, not port_exists)
 
     def test_treat_devices_removed_unbinds_port(self):
@@ -440,9 +440,10 @@ class TunnelTest(base.BaseTestCase):
 
         self.mox.StubOutWithMock(
             ovs_neutron_agent.OVSNeutronAgent, 'update_ports')
-        ovs_neutron_agent.OVSNeutronAgent.update_ports(set()).AndReturn(reply2)
         ovs_neutron_agent.OVSNeutronAgent.update_ports(
-            set(['tap0'])).AndReturn(reply3)
+            set(), None).AndReturn(reply2)
+        ovs_neutron_agent.OVSNeutronAgent.update_ports(
+            set(['tap0']), None).AndReturn(reply3)
         self.mox.StubOutWithMock(
             ovs_neutron_agent.OVSNeutronAgent, 'process_network_ports')
         ovs_neutron_agent.OVSNeutronAgent.process_network_ports(
@@ -181,15 +181,22 @@ class TestVPNAgent(base.BaseTestCase):
         self.agent._router_removed(router_id)
         device.destroy_router.assert_called_once_with(router_id)
 
-    def test_process_routers(self):
+    def test_routers_processed(self):
         self.plugin_api.get_external_network_id.return_value = None
         routers = [
             {'id': _uuid(),
              'admin_state_up': True,
              'routes': [],
-             'external_gateway_info': {}}]
+             'external_gateway_info': {}} for i in range(3)]
+        for router in routers:
+            self.agent._queue.add(l3_agent.RouterUpdate(
+                router['id'], l3_agent.PRIORITY_SYNC_ROUTERS_TASK,
+                router=router))
 
         device = mock.Mock()
         self.agent.devices = [device]
-        self.agent._process_routers(routers, False)
-        device.sync.assert_called_once_with(mock.ANY, routers)
+        for i in range(3):
+            self.agent._process_router_update(self.agent._queue.get())
+        device.sync.assert_called_once_with(mock.ANY, mock.ANY)
+        self.assertEqual(
+            sorted(routers), sorted(device.sync.call_args[0][1]))
@@ -18,6 +18,7 @@
 import copy
 import time
 
+import mock
 from oslo.config import cfg
 from webob import exc
 
@@ -29,6 +30,8 @@ from neutron import context
 from neutron.db import agents_db
 from neutron.db import db_base_plugin_v2
 from neutron.extensions import agent
+from neutron.manager import NeutronManager
+from neutron.openstack.common import jsonutils
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import timeutils
 from neutron.openstack.common import uuidutils
@@ -241,6 +244,95 @@ class AgentDBTestCase(AgentDBTestMixIn,
             query_string='binary=neutron-l3-agent&host=' + L3_HOSTB)
         self.assertFalse(agents['agents'][0]['alive'])
 
+    def _setup_heartbeats(self):
+        cfg.CONF.set_override('agent_heartbeat_flush_interval', 30)
+        heartbeats = agents_db.AgentHeartbeats()
+        for patcher in (mock.patch.object(agents_db, 'HEARTBEATS',
+                                          new=heartbeats),
+                        mock.patch.object(agents_db.loopingcall,
+                                          'FixedIntervalLoopingCall')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        timeutils.set_time_override(timeutils.utcnow().replace(microsecond=0))
+        self.addCleanup(timeutils.clear_time_override)
+        return heartbeats
+
+    def _report_state(self, agent_state):
+        callback = agents_db.AgentExtRpcCallback()
+        callback.report_state(self.adminContext,
+                              agent_state={'agent_state': agent_state},
+                              time=timeutils.strtime())
+
+    def _get_agent_row(self, host):
+        # A query of columns does not get the heartbeats kept in memory
+        return self.adminContext.session.query(
+            agents_db.Agent.heartbeat_timestamp,
+            agents_db.Agent.configurations).filter_by(
+                host=host, agent_type=constants.AGENT_TYPE_L3).one()
+
+    def test_heartbeat_kept_in_memory(self):
+        heartbeats = self._setup_heartbeats()
+        l3_hosta = self._register_agent_states()[0]
+        written = self._get_agent_row(L3_HOSTA).heartbeat_timestamp
+        timeutils.advance_time_seconds(10)
+        self._report_state(l3_hosta)
+        self.assertEqual(written,
+                         self._get_agent_row(L3_HOSTA).heartbeat_timestamp)
+        # The agents loaded from the database get the last heartbeat
+        agent_db = NeutronManager.get_plugin()._get_agent_by_type_and_host(
+            context.get_admin_context(), constants.AGENT_TYPE_L3, L3_HOSTA)
+        self.assertEqual(timeutils.utcnow(), agent_db.heartbeat_timestamp)
+        heartbeats.flush()
+        self.assertEqual(timeutils.utcnow(),
+                         self._get_agent_row(L3_HOSTA).heartbeat_timestamp)
+
+    def test_heartbeat_with_new_configurations_written(self):
+        self._setup_heartbeats()
+        l3_hosta = self._register_agent_states()[0]
+        timeutils.advance_time_seconds(10)
+        l3_hosta['configurations']['routers'] = 3
+        self._report_state(l3_hosta)
+        row = self._get_agent_row(L3_HOSTA)
+        self.assertEqual(timeutils.utcnow(), row.heartbeat_timestamp)
+        self.assertEqual(3, jsonutils.loads(row.configurations)['routers'])
+
+    def test_heartbeat_with_new_statistics_kept_in_memory(self):
+        heartbeats = self._setup_heartbeats()
+        l3_hosta = self._register_agent_states()[0]
+        written = self._get_agent_row(L3_HOSTA).heartbeat_timestamp
+        timeutils.advance_time_seconds(10)
+        l3_hosta['configurations']['update_queue_depth'] = 5
+        self._report_state(l3_hosta)
+        row = self._get_agent_row(L3_HOSTA)
+        self.assertEqual(written, row.heartbeat_timestamp)
+        self.assertNotIn('update_queue_depth',
+                         jsonutils.loads(row.configurations))
+        heartbeats.flush()
+        row = self._get_agent_row(L3_HOSTA)
+        self.assertEqual(timeutils.utcnow(), row.heartbeat_timestamp)
+        self.assertEqual(
+            5, jsonutils.loads(row.configurations)['update_queue_depth'])
+
+    def test_heartbeat_of_starting_agent_written(self):
+        self._setup_heartbeats()
+        l3_hosta = self._register_agent_states()[0]
+        timeutils.advance_time_seconds(10)
+        l3_hosta['start_flag'] = True
+        self._report_state(l3_hosta)
+        self.assertEqual(timeutils.utcnow(),
+                         self._get_agent_row(L3_HOSTA).heartbeat_timestamp)
+
+    def test_heartbeat_of_deleted_agent(self):
+        heartbeats = self._setup_heartbeats()
+        l3_hosta = self._register_agent_states()[0]
+        agents = self._list_agents(
+            query_string='binary=neutron-l3-agent&host=' + L3_HOSTA)
+        self._delete('agents', agents['agents'][0]['id'])
+        self._report_state(l3_hosta)
+        self.assertFalse(heartbeats._pending)
+        self.assertEqual(timeutils.utcnow(),
+                         self._get_agent_row(L3_HOSTA).heartbeat_timestamp)
+
 
 class AgentDBTestCaseXML(AgentDBTestCase):
     fmt = 'xml'
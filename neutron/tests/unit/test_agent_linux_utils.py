@@ -15,10 +15,16 @@
 #    under the License.
 # @author: Dan Wendlandt, Nicira, Inc.
 
+import StringIO
+
+import eventlet
 import fixtures
 import mock
+from oslo.config import cfg
 import testtools
 
+from neutron.agent.common import config
+from neutron.agent.linux import rootwrap_daemon
 from neutron.agent.linux import utils
 from neutron.tests import base
 
@@ -80,6 +86,156 @@ class AgentUtilsExecuteTest(base.BaseTestCase):
         self.assertEqual(result, expected)
 
 
+class AgentUtilsExecuteRootHelperDaemonTest(base.BaseTestCase):
+    def setUp(self):
+        super(AgentUtilsExecuteRootHelperDaemonTest, self).setUp()
+        config.register_root_helper(cfg.CONF)
+        cfg.CONF.set_override('root_helper_daemon', 'sudo rootwrap-daemon',
+                              'AGENT')
+        self.addCleanup(utils._root_helper_daemons.clear)
+        self.client = utils.get_root_helper_daemon()
+        self.execute_p = mock.patch.object(self.client, 'execute')
+        self.daemon_execute = self.execute_p.start()
+        self.create_process_p = mock.patch.object(utils, 'create_process')
+        self.create_process = self.create_process_p.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_get_root_helper_daemon(self):
+        self.assertEqual(['sudo', 'rootwrap-daemon'], self.client.daemon_cmd)
+        self.assertIs(self.client, utils.get_root_helper_daemon())
+
+    def test_get_root_helper_daemon_pool_size(self):
+        cfg.CONF.set_override('root_helper_daemon', 'sudo other-daemon',
+                              'AGENT')
+        cfg.CONF.set_override('root_helper_daemon_pool_size', 2, 'AGENT')
+        self.assertEqual(2, utils.get_root_helper_daemon()._semaphore.balance)
+
+    def test_get_root_helper_daemon_not_configured(self):
+        cfg.CONF.set_override('root_helper_daemon', None, 'AGENT')
+        self.assertIsNone(utils.get_root_helper_daemon())
+
+    def test_execute_with_helper(self):
+        self.daemon_execute.return_value = (0, 'out', '')
+        result = utils.execute(['ip', 'link', 'show', 1], 'sudo',
+                               process_input='in')
+        self.assertEqual('out', result)
+        self.daemon_execute.assert_called_once_with(
+            ['ip', 'link', 'show', '1'], 'in')
+        self.assertFalse(self.create_process.called)
+
+    def test_execute_with_helper_unicode_argument(self):
+        self.daemon_execute.return_value = (0, '', '')
+        utils.execute(['ip', 'link', 'set', u'\xe9'], 'sudo')
+        self.daemon_execute.assert_called_once_with(
+            ['ip', 'link', 'set', '\xc3\xa9'], None)
+
+    def test_execute_with_helper_raises(self):
+        self.daemon_execute.return_value = (1, '', 'error')
+        self.assertRaises(RuntimeError, utils.execute, ['ip', 'link'],
+                          'sudo')
+
+    def test_execute_without_helper(self):
+        process = mock.Mock(returncode=0)
+        process.communicate.return_value = ('out', '')
+        self.create_process.return_value = (process, ['ls'])
+        self.assertEqual('out', utils.execute(['ls']))
+        self.assertFalse(self.daemon_execute.called)
+
+    def test_execute_with_addl_env(self):
+        process = mock.Mock(returncode=0)
+        process.communicate.return_value = ('out', '')
+        self.create_process.return_value = (process, ['ls'])
+        utils.execute(['ls'], 'sudo', addl_env={'foo': 'bar'})
+        self.assertFalse(self.daemon_execute.called)
+
+
+class RootHelperDaemonClientTest(base.BaseTestCase):
+    def setUp(self):
+        super(RootHelperDaemonClientTest, self).setUp()
+        self.client = utils.RootHelperDaemonClient('sudo rootwrap-daemon')
+        self.popen_p = mock.patch.object(utils.utils, 'subprocess_popen')
+        self.popen = self.popen_p.start()
+        self.addCleanup(self.popen_p.stop)
+        self.process = self.popen.return_value
+        self.process.poll.return_value = None
+
+    def _reply(self, *replies):
+        stdout = StringIO.StringIO()
+        for reply in replies:
+            rootwrap_daemon.write_message(stdout, reply)
+        stdout.seek(0)
+        self.process.stdout = stdout
+        self.process.stdin = StringIO.StringIO()
+
+    def test_execute_starts_daemon_once(self):
+        self._reply({'returncode': 0, 'stdout': 'out1', 'stderr': ''},
+                    {'returncode': 2, 'stdout': '', 'stderr': 'err2'})
+        self.assertEqual((0, 'out1', ''), self.client.execute(['ls']))
+        self.assertEqual((2, '', 'err2'),
+                         self.client.execute(['cat'], 'in'))
+        self.assertEqual(1, self.popen.call_count)
+        self.assertEqual(['sudo', 'rootwrap-daemon'],
+                         self.popen.call_args[0][0])
+        requests = StringIO.StringIO(self.process.stdin.getvalue())
+        self.assertEqual({'cmd': ['ls'], 'stdin': ''},
+                         rootwrap_daemon.read_message(requests))
+        self.assertEqual({'cmd': ['cat'], 'stdin': 'in'},
+                         rootwrap_daemon.read_message(requests))
+
+    def test_execute_restarts_exited_daemon(self):
+        self._reply({'returncode': 0, 'stdout': '', 'stderr': ''})
+        self.client.execute(['ls'])
+        self.process.poll.return_value = 1
+        self._reply({'returncode': 0, 'stdout': '', 'stderr': ''})
+        self.client.execute(['ls'])
+        self.assertEqual(2, self.popen.call_count)
+
+    def test_execute_daemon_exits(self):
+        self._reply()
+        self.assertRaises(RuntimeError, self.client.execute, ['ls'])
+        self.process.wait.assert_called_once_with()
+        self.assertEqual([], self.client._idle)
+
+    def test_execute_malformed_reply_drops_daemon(self):
+        self._reply({'returncode': 0})
+        self.assertRaises(KeyError, self.client.execute, ['ls'])
+        self.process.wait.assert_called_once_with()
+        self.assertEqual([], self.client._idle)
+        self._reply({'returncode': 0, 'stdout': 'out', 'stderr': ''})
+        self.assertEqual((0, 'out', ''), self.client.execute(['ls']))
+        self.assertEqual(2, self.popen.call_count)
+
+    def test_execute_interrupted_drops_daemon(self):
+        self._reply({'returncode': 0, 'stdout': 'late', 'stderr': ''})
+        with mock.patch.object(rootwrap_daemon, 'read_message',
+                               side_effect=eventlet.Timeout):
+            self.assertRaises(eventlet.Timeout, self.client.execute, ['ls'])
+        self.process.wait.assert_called_once_with()
+        self.assertEqual([], self.client._idle)
+
+    def test_execute_runs_pool_size_commands_concurrently(self):
+        client = utils.RootHelperDaemonClient('sudo rootwrap-daemon',
+                                              pool_size=2)
+        running = []
+        concurrency = []
+
+        def execute(cmd, process_input):
+            running.append(cmd)
+            concurrency.append(len(running))
+            eventlet.sleep(0.01)
+            running.remove(cmd)
+            return 0, '', ''
+
+        with mock.patch.object(utils._RootHelperDaemon, 'execute',
+                               side_effect=execute):
+            pool = eventlet.GreenPool()
+            for i in range(4):
+                pool.spawn_n(client.execute, ['ls', str(i)])
+            pool.waitall()
+        self.assertEqual(2, max(concurrency))
+        self.assertEqual(2, len(client._idle))
+
+
 class AgentUtilsGetInterfaceMAC(base.BaseTestCase):
     def test_get_interface_mac(self):
         expect_val = '01:02:03:04:05:06'
@@ -19,6 +19,7 @@ import mock
 
 from neutron.agent import rpc
 from neutron.openstack.common import context
+from neutron.openstack.common.rpc import common as rpc_common
 from neutron.tests import base
 
 
@@ -45,6 +46,44 @@ class AgentRPCPluginApi(base.BaseTestCase):
     def test_tunnel_sync(self):
         self._test_rpc_call('tunnel_sync')
 
+    def test_get_devices_details_list(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        with mock.patch.object(agent, 'call') as rpc_call:
+            rpc_call.return_value = ['details']
+            self.assertEqual(agent.get_devices_details_list(
+                ctxt, ['fake_device'], 'fake_agent_id'), ['details'])
+        self.assertEqual(rpc_call.call_args[0][1]['method'],
+                         'get_devices_details_list')
+        self.assertEqual(rpc_call.call_args[1]['version'], '1.3')
+
+    def test_get_devices_details_list_unsupported(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        with mock.patch.object(agent, 'call') as rpc_call:
+            rpc_call.side_effect = [
+                rpc_common.RemoteError('UnsupportedRpcVersion'),
+                'details1', 'details2']
+            self.assertEqual(agent.get_devices_details_list(
+                ctxt, ['dev1', 'dev2'], 'fake_agent_id'),
+                ['details1', 'details2'])
+        self.assertEqual(rpc_call.call_args[0][1]['method'],
+                         'get_device_details')
+
+    def test_update_device_list_unsupported(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        with mock.patch.object(agent, 'call') as rpc_call:
+            rpc_call.side_effect = [
+                rpc_common.RemoteError('UnsupportedRpcVersion'),
+                None, rpc_common.Timeout(), {'device': 'dev3'}]
+            result = agent.update_device_list(
+                ctxt, ['dev1', 'dev2'], ['dev3'], 'fake_agent_id')
+        self.assertEqual(result, {'devices_up': ['dev1'],
+                                  'failed_devices_up': ['dev2'],
+                                  'devices_down': [{'device': 'dev3'}],
+                                  'failed_devices_down': []})
+
 
 class AgentPluginReportState(base.BaseTestCase):
     def test_plugin_report_state_use_call(self):
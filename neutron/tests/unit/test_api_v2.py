@@ -36,6 +36,7 @@ from neutron.manager import NeutronManager
 from neutron.openstack.common.notifier import api as notifer_api
 from neutron.openstack.common import policy as common_policy
 from neutron.openstack.common import uuidutils
+from neutron import policy
 from neutron import quota
 from neutron.tests import base
 from neutron.tests.unit import testlib_api
@@ -1069,6 +1070,33 @@ class JSONV2TestCase(APIv2TestBase, testlib_api.WebTestCase):
         finally:
             del common_policy._rules['get_network:name']
 
+    def test_list_keystone_strip_admin_only_attribute_with_policy_cache(self):
+        cfg.CONF.set_override('policy_cache', True)
+        tenant_id = _uuid()
+        env = {'neutron.context': context.Context('', tenant_id)}
+        instance = self.plugin.return_value
+        instance.get_networks.return_value = [
+            {'id': _uuid(), 'name': 'net%d' % i, 'admin_state_up': True,
+             'status': "ACTIVE", 'tenant_id': tenant_id, 'shared': False,
+             'subnets': []} for i in range(3)]
+        policy.reset()
+        self.addCleanup(policy.reset)
+        policy.init()
+        # Inject rule in policy engine
+        common_policy._rules['get_network:shared'] = (
+            common_policy.parse_rule("rule:admin_only"))
+        with mock.patch.object(policy, 'check_if_exists',
+                               wraps=policy.check_if_exists) as check:
+            res = self.api.get(_get_path('networks', fmt=self.fmt),
+                               extra_environ=env)
+        networks = self.deserialize(res)['networks']
+        self.assertEqual(3, len(networks))
+        for network in networks:
+            self.assertIn('name', network)
+            self.assertNotIn('shared', network)
+        # The attribute was checked once for all the networks
+        self.assertFalse(check.called)
+
     def _test_update(self, req_tenant_id, real_tenant_id, expected_code,
                      expect_errors=False):
         env = {}
@@ -39,8 +39,10 @@ from neutron.common.test_lib import test_config
 from neutron import context
 from neutron.db import api as db
 from neutron.db import db_base_plugin_v2
+from neutron.db import ipam
 from neutron.db import models_v2
 from neutron.manager import NeutronManager
+from neutron.openstack.common.db import exception as db_exc
 from neutron.openstack.common import importutils
 from neutron.openstack.common import timeutils
 from neutron.tests import base
@@ -901,9 +903,11 @@ class TestPortsV2(NeutronDbPluginV2TestCase):
 
         with mock.patch('__builtin__.hasattr',
                         new=fakehasattr):
-            orig = NeutronManager.get_plugin().create_port
+            # _add_port is called for each port, whether the plugin calls
+            # create_port for each of them or creates them together
+            orig = NeutronManager.get_plugin()._add_port
             with mock.patch.object(NeutronManager.get_plugin(),
-                                   'create_port') as patched_plugin:
+                                   '_add_port') as patched_plugin:
 
                 def side_effect(*args, **kwargs):
                     return self._do_side_effect(patched_plugin, orig,
@@ -925,9 +929,11 @@ class TestPortsV2(NeutronDbPluginV2TestCase):
             self.skipTest("Plugin does not support native bulk port create")
         ctx = context.get_admin_context()
         with self.network() as net:
-            orig = NeutronManager._instance.plugin.create_port
+            # _add_port is called for each port, whether the plugin calls
+            # create_port for each of them or creates them together
+            orig = NeutronManager._instance.plugin._add_port
             with mock.patch.object(NeutronManager._instance.plugin,
-                                   'create_port') as patched_plugin:
+                                   '_add_port') as patched_plugin:
 
                 def side_effect(*args, **kwargs):
                     return self._do_side_effect(patched_plugin, orig,
@@ -940,6 +946,57 @@ class TestPortsV2(NeutronDbPluginV2TestCase):
                 self._validate_behavior_on_bulk_failure(
                     res, 'ports', webob.exc.HTTPServerError.code)
 
+    def test_create_ports_bulk_native_unique_addresses(self):
+        if self._skip_native_bulk:
+            self.skipTest("Plugin does not support native bulk port create")
+        with self.subnet() as subnet:
+            res = self._create_port_bulk(self.fmt, 5,
+                                         subnet['subnet']['network_id'],
+                                         'test', True)
+            self.assertEqual(webob.exc.HTTPCreated.code, res.status_int)
+            ports = self.deserialize(self.fmt, res)['ports']
+            self.assertEqual(['test_%d' % i for i in range(5)],
+                             [p['name'] for p in ports])
+            macs = set(p['mac_address'] for p in ports)
+            ips = set(p['fixed_ips'][0]['ip_address'] for p in ports)
+            self.assertEqual(5, len(macs))
+            self.assertEqual(5, len(ips))
+            for p in ports:
+                self.assertEqual(subnet['subnet']['id'],
+                                 p['fixed_ips'][0]['subnet_id'])
+                self._delete('ports', p['id'])
+
+    def test_create_ports_bulk_native_with_fixed_ips(self):
+        if self._skip_native_bulk:
+            self.skipTest("Plugin does not support native bulk port create")
+        with self.subnet() as subnet:
+            fixed_ips = [{'subnet_id': subnet['subnet']['id'],
+                          'ip_address': '10.0.0.2'}]
+            res = self._create_port_bulk(self.fmt, 2,
+                                         subnet['subnet']['network_id'],
+                                         'test', True,
+                                         override={0: {'fixed_ips':
+                                                       fixed_ips}})
+            self._validate_behavior_on_bulk_success(res, 'ports')
+            ports = self.deserialize(self.fmt, res)['ports']
+            self.assertEqual(fixed_ips, ports[0]['fixed_ips'])
+            self.assertNotEqual('10.0.0.2',
+                                ports[1]['fixed_ips'][0]['ip_address'])
+            for p in ports:
+                self._delete('ports', p['id'])
+
+    def test_create_ports_bulk_native_duplicate_mac(self):
+        if self._skip_native_bulk:
+            self.skipTest("Plugin does not support native bulk port create")
+        with self.network() as net:
+            mac = '00:16:3e:00:00:01'
+            res = self._create_port_bulk(self.fmt, 2, net['network']['id'],
+                                         'test', True,
+                                         override={0: {'mac_address': mac},
+                                                   1: {'mac_address': mac}})
+            self._validate_behavior_on_bulk_failure(
+                res, 'ports', webob.exc.HTTPConflict.code)
+
     def test_list_ports(self):
         # for this test we need to enable overlapping ips
         cfg.CONF.set_default('allow_overlapping_ips', True)
@@ -1300,6 +1357,39 @@ fixed_ips=ip_address%%3D%s&fixed_ips=ip_address%%3D%s&fixed_ips=subnet_id%%3D%s
             self.assertEqual(res.status_int,
                              webob.exc.HTTPServiceUnavailable.code)
 
+    def test_mac_exhaustion_bulk(self):
+        @staticmethod
+        def fake_gen_mac(context, net_id, *args):
+            raise q_exc.MacAddressGenerationFailure(net_id=net_id)
+
+        plugin = neutron.db.db_base_plugin_v2.NeutronDbPluginV2
+        with contextlib.nested(
+            mock.patch.object(plugin, '_generate_mac', new=fake_gen_mac),
+            mock.patch.object(plugin, '_generate_macs', new=fake_gen_mac),
+            self.network()) as (gen_mac, gen_macs, net):
+            res = self._create_port_bulk(self.fmt, 2, net['network']['id'],
+                                         'test', True)
+            self._validate_behavior_on_bulk_failure(
+                res, 'ports', webob.exc.HTTPServiceUnavailable.code)
+
+    def test_generate_macs(self):
+        cfg.CONF.set_override('base_mac', 'fa:16:3e:00:00:00')
+        with self.port() as port:
+            in_use = port['port']['mac_address']
+            # Candidates of the first attempt: the MAC of the port, an
+            # excluded MAC and a free one.  Second attempt: two free ones.
+            candidates = [in_use, 'fa:16:3e:00:00:01', 'fa:16:3e:00:00:02',
+                          'fa:16:3e:00:00:03', 'fa:16:3e:00:00:04']
+            random_bytes = [int(byte, 16) for mac in candidates
+                            for byte in mac.split(':')[3:]]
+            with mock.patch.object(db_base_plugin_v2.random, 'randint',
+                                   side_effect=random_bytes):
+                macs = db_base_plugin_v2.NeutronDbPluginV2._generate_macs(
+                    context.get_admin_context(), port['port']['network_id'],
+                    3, excluded=['fa:16:3e:00:00:01'])
+            self.assertEqual(['fa:16:3e:00:00:02', 'fa:16:3e:00:00:03',
+                              'fa:16:3e:00:00:04'], sorted(macs))
+
     def test_requested_duplicate_ip(self):
         with self.subnet() as subnet:
             with self.port(subnet=subnet) as port:
@@ -3586,6 +3676,228 @@ class TestSubnetsV2(NeutronDbPluginV2TestCase):
             q_exc.HostRoutesExhausted)
 
 
+class TestNetworkRevisions(NeutronDbPluginV2TestCase):
+
+    def _get_revision(self, network_id):
+        plugin = NeutronManager.get_plugin()
+        return plugin.get_network_revisions(
+            context.get_admin_context(), [network_id])[network_id]
+
+    def _assert_bumped(self, network_id, action):
+        revision = self._get_revision(network_id)
+        action()
+        self.assertTrue(self._get_revision(network_id) > revision)
+
+    def test_network_update_bumps_revision(self):
+        with self.network() as network:
+            net_id = network['network']['id']
+            self._assert_bumped(net_id, lambda: self._update(
+                'networks', net_id, {'network': {'admin_state_up': False}}))
+
+    def test_subnet_changes_bump_revision(self):
+        with self.network() as network:
+            net_id = network['network']['id']
+            with self.subnet(network=network, do_delete=False) as subnet:
+                subnet_id = subnet['subnet']['id']
+                self._assert_bumped(net_id, lambda: self._update(
+                    'subnets', subnet_id,
+                    {'subnet': {'dns_nameservers': ['1.2.3.4']}}))
+                self._assert_bumped(net_id, lambda: self._delete(
+                    'subnets', subnet_id))
+
+    def test_port_changes_bump_revision(self):
+        with self.subnet() as subnet:
+            net_id = subnet['subnet']['network_id']
+            revision = self._get_revision(net_id)
+            with self.port(subnet=subnet, no_delete=True) as port:
+                self.assertTrue(self._get_revision(net_id) > revision)
+                port_id = port['port']['id']
+                self._assert_bumped(net_id, lambda: self._update(
+                    'ports', port_id,
+                    {'port': {'fixed_ips': [
+                        {'subnet_id': subnet['subnet']['id'],
+                         'ip_address': '10.0.0.10'}]}}))
+                self._assert_bumped(net_id, lambda: self._delete(
+                    'ports', port_id))
+
+    def test_port_name_update_keeps_revision(self):
+        with self.port() as port:
+            net_id = port['port']['network_id']
+            revision = self._get_revision(net_id)
+            self._update('ports', port['port']['id'],
+                         {'port': {'name': 'other'}})
+            self.assertEqual(revision, self._get_revision(net_id))
+
+    def test_other_network_revision_unchanged(self):
+        with contextlib.nested(self.network(),
+                               self.network()) as (network, other):
+            revision = self._get_revision(other['network']['id'])
+            self._update('networks', network['network']['id'],
+                         {'network': {'admin_state_up': False}})
+            self.assertEqual(revision,
+                             self._get_revision(other['network']['id']))
+
+    def test_get_network_revisions_no_networks(self):
+        plugin = NeutronManager.get_plugin()
+        self.assertEqual({}, plugin.get_network_revisions(
+            context.get_admin_context(), []))
+
+
+class IpamTestCase(NeutronDbPluginV2TestCase):
+    ipam_driver = None
+
+    def setUp(self):
+        super(IpamTestCase, self).setUp()
+        if self.ipam_driver:
+            cfg.CONF.set_override('ipam_driver', self.ipam_driver)
+        self.plugin = NeutronManager.get_plugin()
+        self.ctx = context.get_admin_context()
+
+    def _get_allocated_ips(self, subnet_id):
+        return sorted(
+            ip_address for ip_address, in self.ctx.session.query(
+                models_v2.IPAllocation.ip_address).filter_by(
+                    subnet_id=subnet_id))
+
+
+class TestAvailabilityRangeIpam(IpamTestCase):
+
+    def test_default_backend(self):
+        self.assertIsInstance(self.plugin.ipam, ipam.AvailabilityRangeIpam)
+
+    def test_allocate_ips(self):
+        with self.subnet(cidr='10.0.0.0/24') as subnet:
+            ips = self.plugin.ipam.allocate_ips(
+                self.ctx, [subnet['subnet']], 3)
+            self.assertEqual(['10.0.0.2', '10.0.0.3', '10.0.0.4'],
+                             [ip['ip_address'] for ip in ips])
+            ip_range = self.ctx.session.query(
+                models_v2.IPAvailabilityRange).one()
+            self.assertEqual('10.0.0.5', ip_range['first_ip'])
+
+    def test_allocate_ips_from_next_subnet(self):
+        with contextlib.nested(
+            self.subnet(cidr='10.0.0.0/29'),
+            self.subnet(cidr='10.0.1.0/24')) as (subnet, other):
+            ips = self.plugin.ipam.allocate_ips(
+                self.ctx, [subnet['subnet'], other['subnet']], 7)
+            self.assertEqual(['10.0.0.2', '10.0.0.3', '10.0.0.4',
+                              '10.0.0.5', '10.0.0.6', '10.0.1.2',
+                              '10.0.1.3'],
+                             [ip['ip_address'] for ip in ips])
+            self.assertIsNone(self.ctx.session.query(
+                models_v2.IPAvailabilityRange).join(
+                    models_v2.IPAllocationPool).filter_by(
+                        subnet_id=subnet['subnet']['id']).first())
+
+    def test_allocate_ips_exhausted(self):
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            self.assertRaises(q_exc.IpAddressGenerationFailure,
+                              self.plugin.ipam.allocate_ips,
+                              self.ctx, [subnet['subnet']], 6)
+
+
+class TestRandomIpam(IpamTestCase):
+    ipam_driver = 'neutron.db.ipam.RandomIpam'
+
+    def test_create_and_delete_port(self):
+        with self.subnet(cidr='10.0.0.0/24') as subnet:
+            with self.port(subnet=subnet) as port:
+                ip_address = port['port']['fixed_ips'][0]['ip_address']
+                self.assertIn(netaddr.IPAddress(ip_address),
+                              netaddr.IPRange('10.0.0.2', '10.0.0.254'))
+                allocation = self.ctx.session.query(
+                    models_v2.IPAllocation).one()
+                self.assertEqual(port['port']['id'], allocation['port_id'])
+            self.assertEqual([], self._get_allocated_ips(
+                subnet['subnet']['id']))
+
+    def test_create_port_with_fixed_ip(self):
+        with self.subnet(cidr='10.0.0.0/24') as subnet:
+            fixed_ips = [{'subnet_id': subnet['subnet']['id'],
+                          'ip_address': '10.0.0.10'}]
+            with self.port(subnet=subnet, fixed_ips=fixed_ips) as port:
+                self.assertEqual('10.0.0.10',
+                                 port['port']['fixed_ips'][0]['ip_address'])
+                allocation = self.ctx.session.query(
+                    models_v2.IPAllocation).one()
+                self.assertEqual(port['port']['id'], allocation['port_id'])
+
+    def test_update_port_fixed_ips(self):
+        with self.subnet(cidr='10.0.0.0/24') as subnet:
+            subnet_id = subnet['subnet']['id']
+            with self.port(subnet=subnet) as port:
+                data = {'port': {'fixed_ips': [{'subnet_id': subnet_id,
+                                                'ip_address': '10.0.0.10'}]}}
+                req = self.new_update_request('ports', data,
+                                              port['port']['id'])
+                res = self.deserialize(self.fmt, req.get_response(self.api))
+                self.assertEqual('10.0.0.10',
+                                 res['port']['fixed_ips'][0]['ip_address'])
+                self.assertEqual(['10.0.0.10'],
+                                 self._get_allocated_ips(subnet_id))
+
+    def test_allocate_ips_exhausts_pools(self):
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            subnet_id = subnet['subnet']['id']
+            ips = self.plugin.ipam.allocate_ips(
+                self.ctx, [subnet['subnet']], 5)
+            expected = ['10.0.0.2', '10.0.0.3', '10.0.0.4', '10.0.0.5',
+                        '10.0.0.6']
+            self.assertEqual(expected,
+                             sorted(ip['ip_address'] for ip in ips))
+            self.assertEqual(expected, self._get_allocated_ips(subnet_id))
+            self.assertRaises(q_exc.IpAddressGenerationFailure,
+                              self.plugin.ipam.allocate_ip,
+                              self.ctx, [subnet['subnet']])
+
+    def test_allocate_ips_searches_pools_after_random_misses(self):
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            with mock.patch.object(ipam.random, 'randrange',
+                                   return_value=0) as randrange:
+                ips = self.plugin.ipam.allocate_ips(
+                    self.ctx, [subnet['subnet']], 3)
+            self.assertEqual(['10.0.0.2', '10.0.0.3', '10.0.0.4'],
+                             [ip['ip_address'] for ip in ips])
+            self.assertEqual(ipam.RANDOM_ATTEMPTS + 1, randrange.call_count)
+
+    def test_allocate_ips_from_next_subnet(self):
+        with contextlib.nested(
+            self.subnet(cidr='10.0.0.0/29'),
+            self.subnet(cidr='10.0.1.0/24')) as (subnet, other):
+            ips = self.plugin.ipam.allocate_ips(
+                self.ctx, [subnet['subnet'], other['subnet']], 6)
+            self.assertEqual(5, len(self._get_allocated_ips(
+                subnet['subnet']['id'])))
+            self.assertEqual([ips[-1]['ip_address']],
+                             self._get_allocated_ips(other['subnet']['id']))
+
+    def test_allocate_specific_ip_in_use(self):
+        with self.subnet(cidr='10.0.0.0/24') as subnet:
+            args = (self.ctx, subnet['subnet']['network_id'],
+                    subnet['subnet']['id'], '10.0.0.10')
+            self.plugin.ipam.allocate_specific_ip(*args)
+            self.assertRaises(q_exc.IpAddressInUse,
+                              self.plugin.ipam.allocate_specific_ip, *args)
+
+    def test_concurrent_allocation_tries_another_ip(self):
+        with self.subnet(cidr='10.0.0.0/24') as subnet:
+            # The first insert conflicts with another transaction
+            begin_nested = mock.MagicMock()
+            begin_nested.side_effect = [db_exc.DBDuplicateEntry(),
+                                        mock.MagicMock()]
+            with contextlib.nested(
+                mock.patch.object(self.ctx.session.get_bind().dialect,
+                                  'name', 'mysql'),
+                mock.patch.object(self.ctx.session, 'begin_nested',
+                                  new=begin_nested)):
+                ip = self.plugin.ipam.allocate_ip(self.ctx,
+                                                  [subnet['subnet']])
+            self.assertEqual(2, begin_nested.call_count)
+            self.assertEqual([ip['ip_address']], self._get_allocated_ips(
+                subnet['subnet']['id']))
+
+
 class DbModelTestCase(base.BaseTestCase):
     """DB model tests."""
     def test_repr(self):
@@ -3597,7 +3909,8 @@ class DbModelTestCase(base.BaseTestCase):
         exp_middle = "[object at %x]" % id(network)
         exp_end_with = (" {tenant_id=None, id=None, "
                         "name='net_net', status='OK', "
-                        "admin_state_up=True, shared=None}>")
+                        "admin_state_up=True, shared=None, "
+                        "revision=None}>")
         final_exp = exp_start_with + exp_middle + exp_end_with
         self.assertEqual(actual_repr_output, final_exp)
 
@@ -3637,6 +3950,38 @@ class NeutronDbPluginV2AsMixinTestCase(base.BaseTestCase):
         net = self.plugin.create_network(self.context, self.net_data)
         self.assertEqual(net['status'], 'BUILD')
 
+    def _make_port_data(self, name, **kwargs):
+        port = {'name': name,
+                'network_id': 'fake-id',
+                'tenant_id': 'test-tenant',
+                'admin_state_up': True,
+                'device_id': '',
+                'device_owner': '',
+                'mac_address': ATTR_NOT_SPECIFIED,
+                'fixed_ips': ATTR_NOT_SPECIFIED}
+        port.update(kwargs)
+        return {'port': port}
+
+    def test_create_port_bulk_with_fixed_ip_of_later_port(self):
+        self.plugin.create_network(self.context, self.net_data)
+        subnet = self.plugin.create_subnet(self.context, {'subnet': {
+            'name': 'subnet1', 'network_id': 'fake-id',
+            'tenant_id': 'test-tenant', 'ip_version': 4,
+            'cidr': '10.0.0.0/24', 'enable_dhcp': True,
+            'gateway_ip': ATTR_NOT_SPECIFIED,
+            'allocation_pools': ATTR_NOT_SPECIFIED,
+            'dns_nameservers': ATTR_NOT_SPECIFIED,
+            'host_routes': ATTR_NOT_SPECIFIED}})
+        fixed_ips = [{'subnet_id': subnet['id'], 'ip_address': '10.0.0.2'}]
+        with mock.patch.object(self.plugin, 'create_port') as create_port:
+            ports = self.plugin.create_port_bulk(self.context, {'ports': [
+                self._make_port_data('port1'),
+                self._make_port_data('port2', fixed_ips=fixed_ips)]})
+        self.assertFalse(create_port.called)
+        self.assertEqual(['port1', 'port2'], [p['name'] for p in ports])
+        self.assertEqual('10.0.0.3', ports[0]['fixed_ips'][0]['ip_address'])
+        self.assertEqual(fixed_ips, ports[1]['fixed_ips'])
+
 
 class TestBasicGetXML(TestBasicGet):
     fmt = 'xml'
@@ -49,6 +49,50 @@ class TestDhcpRpcCallackMixin(base.BaseTestCase):
 
         self.assertEqual(len(self.log.mock_calls), 1)
 
+    def test_get_active_networks_info(self):
+        self.plugin.get_networks.return_value = [dict(id='a'), dict(id='b')]
+        self.plugin.get_network_revisions.return_value = {'a': 1, 'b': 2}
+        self.plugin.get_subnets.return_value = [dict(id='s',
+                                                     network_id='a')]
+        self.plugin.get_ports.return_value = [dict(id='p', network_id='b')]
+
+        networks = self.callbacks.get_active_networks_info(mock.Mock(),
+                                                           host='host')
+
+        self.assertEqual([dict(id='a', revision=1,
+                               subnets=[dict(id='s', network_id='a')],
+                               ports=[]),
+                          dict(id='b', revision=2, subnets=[],
+                               ports=[dict(id='p', network_id='b')])],
+                         networks)
+
+    def test_get_active_networks_info_known_revisions(self):
+        self.plugin.get_networks.return_value = [dict(id='a'), dict(id='b')]
+        self.plugin.get_network_revisions.return_value = {'a': 1, 'b': 3}
+        self.plugin.get_subnets.return_value = []
+        self.plugin.get_ports.return_value = [dict(id='p', network_id='b')]
+
+        networks = self.callbacks.get_active_networks_info(
+            mock.Mock(), host='host', network_revisions={'a': 1, 'b': 2})
+
+        self.assertEqual([dict(id='a', revision=1),
+                          dict(id='b', revision=3, subnets=[],
+                               ports=[dict(id='p', network_id='b')])],
+                         networks)
+        filters = self.plugin.get_ports.call_args[1]['filters']
+        self.assertEqual(['b'], filters['network_id'])
+
+    def test_get_active_networks_info_unchanged(self):
+        self.plugin.get_networks.return_value = [dict(id='a')]
+        self.plugin.get_network_revisions.return_value = {'a': 1}
+
+        networks = self.callbacks.get_active_networks_info(
+            mock.Mock(), host='host', network_revisions={'a': 1})
+
+        self.assertEqual([dict(id='a', revision=1)], networks)
+        self.assertFalse(self.plugin.get_ports.called)
+        self.assertFalse(self.plugin.get_subnets.called)
+
     def test_get_network_info(self):
         network_retval = dict(id='a')
 
@@ -59,10 +103,13 @@ class TestDhcpRpcCallackMixin(base.BaseTestCase):
         self.plugin.get_subnets.return_value = subnet_retval
         self.plugin.get_ports.return_value = port_retval
 
+        self.plugin.get_network_revisions.return_value = {'a': 4}
+
         retval = self.callbacks.get_network_info(mock.Mock(), network_id='a')
         self.assertEqual(retval, network_retval)
         self.assertEqual(retval['subnets'], subnet_retval)
         self.assertEqual(retval['ports'], port_retval)
+        self.assertEqual(retval['revision'], 4)
 
     def _test_get_dhcp_port_helper(self, port_retval, other_expectations=[],
                                    update_port=None, create_port=None):
@@ -15,6 +15,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
 import copy
 import os
 import sys
@@ -169,6 +170,9 @@ class TestDhcpAgent(base.BaseTestCase):
                             [mock.call(mock.ANY),
                              mock.call().report_state(mock.ANY, mock.ANY,
                                                       mock.ANY)])
+                        state = state_rpc().report_state.call_args[0][1]
+                        self.assertEqual(
+                            0, state['configurations']['update_queue_depth'])
 
     def test_dhcp_agent_main_agent_manager(self):
         logging_str = 'neutron.agent.common.config.setup_logging'
@@ -219,6 +223,7 @@ class TestDhcpAgent(base.BaseTestCase):
                                                 mock.ANY)
             self.assertEqual(log.call_count, 1)
             self.assertTrue(dhcp.needs_resync)
+            self.assertIsNone(network.revision)
 
     def _test_sync_state_helper(self, known_networks, active_networks):
         with mock.patch(DHCP_PLUGIN) as plug:
@@ -255,6 +260,63 @@ class TestDhcpAgent(base.BaseTestCase):
     def test_sync_state_disabled_net(self):
         self._test_sync_state_helper(['b'], ['a'])
 
+    def test_sync_state_unchanged_networks(self):
+        changed = dhcp.NetModel(True, dict(id='a', revision=2, subnets=[],
+                                           ports=[]))
+        unchanged = dhcp.NetModel(True, dict(id='b', revision=1))
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_networks_info.return_value = [changed,
+                                                                 unchanged]
+            plug.return_value = mock_plugin
+
+            dhcp_agent_ = dhcp_agent.DhcpAgent(HOSTNAME)
+            attrs_to_mock = dict(
+                [(a, mock.DEFAULT) for a in
+                 ['configure_dhcp_for_network', '_check_dhcp_for_network',
+                  'cache']])
+            with contextlib.nested(
+                mock.patch.multiple(dhcp_agent_, **attrs_to_mock),
+                mock.patch.object(dhcp_agent.eventlet, 'GreenPool')
+            ) as (mocks, pool):
+                pool.return_value.spawn_n.side_effect = (
+                    lambda func, *args: func(*args))
+                mocks['cache'].get_network_ids.return_value = ['a', 'b']
+                mocks['cache'].get_network_revisions.return_value = {'a': 1,
+                                                                     'b': 1}
+                dhcp_agent_.sync_state()
+
+                mock_plugin.get_active_networks_info.assert_called_once_with(
+                    network_revisions={'a': 1, 'b': 1})
+                mocks['configure_dhcp_for_network'].assert_called_once_with(
+                    changed)
+                mocks['_check_dhcp_for_network'].assert_called_once_with('b')
+
+    def _test_check_dhcp_for_network(self, active):
+        dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+        dhcp.cache.put(fake_network)
+        self.driver.return_value.active = active
+        with mock.patch.object(dhcp,
+                               'configure_dhcp_for_network') as configure:
+            dhcp._check_dhcp_for_network(fake_network.id)
+            return configure
+
+    def test_check_dhcp_for_network_active(self):
+        configure = self._test_check_dhcp_for_network(True)
+        self.assertFalse(configure.called)
+
+    def test_check_dhcp_for_network_not_active(self):
+        configure = self._test_check_dhcp_for_network(False)
+        configure.assert_called_once_with(fake_network)
+
+    def test_check_dhcp_for_network_not_cached(self):
+        dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+        with mock.patch.object(dhcp,
+                               'configure_dhcp_for_network') as configure:
+            dhcp._check_dhcp_for_network(fake_network.id)
+            self.assertFalse(configure.called)
+            self.assertFalse(self.driver.called)
+
     def test_sync_state_plugin_error(self):
         with mock.patch(DHCP_PLUGIN) as plug:
             mock_plugin = mock.Mock()
@@ -417,6 +479,7 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
                               'neutron.agent.linux.interface.NullDriver')
         config.register_root_helper(cfg.CONF)
         cfg.CONF.register_opts(dhcp_agent.DhcpAgent.OPTS)
+        cfg.CONF.set_override('network_update_delay', 0)
 
         self.plugin_p = mock.patch(DHCP_PLUGIN)
         plugin_cls = self.plugin_p.start()
@@ -445,6 +508,10 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         )
         self.external_process = self.external_process_p.start()
 
+    def _process_updates(self):
+        while len(self.dhcp.update_queue):
+            self.dhcp._process_update(self.dhcp.update_queue.get())
+
     def tearDown(self):
         self.external_process_p.stop()
         self.call_driver_p.stop()
@@ -632,28 +699,33 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
     def test_network_create_end(self):
         payload = dict(network=dict(id=fake_network.id))
 
+        self.dhcp.network_create_end(None, payload)
+        self.cache.get_network_by_id.return_value = None
         with mock.patch.object(self.dhcp, 'enable_dhcp_helper') as enable:
-            self.dhcp.network_create_end(None, payload)
-            enable.assertCalledOnceWith(fake_network.id)
+            self._process_updates()
+            enable.assert_called_once_with(fake_network.id)
 
     def test_network_update_end_admin_state_up(self):
         payload = dict(network=dict(id=fake_network.id, admin_state_up=True))
-        with mock.patch.object(self.dhcp, 'enable_dhcp_helper') as enable:
-            self.dhcp.network_update_end(None, payload)
-            enable.assertCalledOnceWith(fake_network.id)
+        self.dhcp.network_update_end(None, payload)
+        with mock.patch.object(self.dhcp, 'refresh_dhcp_helper') as refresh:
+            self._process_updates()
+            refresh.assert_called_once_with(fake_network.id)
 
     def test_network_update_end_admin_state_down(self):
         payload = dict(network=dict(id=fake_network.id, admin_state_up=False))
+        self.dhcp.network_update_end(None, payload)
         with mock.patch.object(self.dhcp, 'disable_dhcp_helper') as disable:
-            self.dhcp.network_update_end(None, payload)
-            disable.assertCalledOnceWith(fake_network.id)
+            self._process_updates()
+            disable.assert_called_once_with(fake_network.id)
 
     def test_network_delete_end(self):
         payload = dict(network_id=fake_network.id)
 
+        self.dhcp.network_delete_end(None, payload)
         with mock.patch.object(self.dhcp, 'disable_dhcp_helper') as disable:
-            self.dhcp.network_delete_end(None, payload)
-            disable.assertCalledOnceWith(fake_network.id)
+            self._process_updates()
+            disable.assert_called_once_with(fake_network.id)
 
     def test_refresh_dhcp_helper_no_dhcp_enabled_networks(self):
         network = dhcp.NetModel(True, dict(id='net-id',
@@ -695,6 +767,7 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.plugin.get_network_info.return_value = fake_network
 
         self.dhcp.subnet_update_end(None, payload)
+        self._process_updates()
 
         self.cache.assert_has_calls([mock.call.put(fake_network)])
         self.call_driver.assert_called_once_with('reload_allocations',
@@ -712,6 +785,7 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.plugin.get_network_info.return_value = new_state
 
         self.dhcp.subnet_update_end(None, payload)
+        self._process_updates()
 
         self.cache.assert_has_calls([mock.call.put(new_state)])
         self.call_driver.assert_called_once_with('restart',
@@ -730,6 +804,7 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.plugin.get_network_info.return_value = fake_network
 
         self.dhcp.subnet_delete_end(None, payload)
+        self._process_updates()
 
         self.cache.assert_has_calls([
             mock.call.get_network_by_subnet_id(
@@ -744,6 +819,7 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.cache.get_network_by_id.return_value = fake_network
         self.cache.get_port_by_id.return_value = fake_port2
         self.dhcp.port_update_end(None, payload)
+        self._process_updates()
         self.cache.assert_has_calls(
             [mock.call.get_network_by_id(fake_port2.network_id),
              mock.call.get_port_by_id(fake_port2.id),
@@ -758,6 +834,7 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         updated_fake_port1.fixed_ips[0].ip_address = '172.9.9.99'
         self.cache.get_port_by_id.return_value = updated_fake_port1
         self.dhcp.port_update_end(None, payload)
+        self._process_updates()
         self.cache.assert_has_calls(
             [mock.call.get_network_by_id(fake_port1.network_id),
              mock.call.get_port_by_id(fake_port1.id),
@@ -777,6 +854,7 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.cache.get_port_by_id.return_value = fake_port2
 
         self.dhcp.port_delete_end(None, payload)
+        self._process_updates()
         removed_ips = [fixed_ip.ip_address
                        for fixed_ip in fake_port2.fixed_ips]
         self.cache.assert_has_calls(
@@ -795,10 +873,168 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.cache.get_port_by_id.return_value = None
 
         self.dhcp.port_delete_end(None, payload)
+        self._process_updates()
 
         self.cache.assert_has_calls([mock.call.get_port_by_id('unknown')])
         self.assertEqual(self.call_driver.call_count, 0)
 
+    def test_port_events_coalesced(self):
+        self.cache.get_network_by_id.return_value = fake_network
+        prev_fake_port1 = copy.deepcopy(fake_port1)
+        prev_fake_port1.fixed_ips[0].ip_address = '172.9.9.99'
+        self.cache.get_port_by_id.return_value = prev_fake_port1
+        self.dhcp.port_update_end(None, dict(port=vars(fake_port1)))
+        self.dhcp.port_delete_end(None, dict(port_id=fake_port1.id))
+        self.assertEqual(1, len(self.dhcp.update_queue))
+        self.assertEqual(0, self.call_driver.call_count)
+
+        self._process_updates()
+        self.assertEqual(
+            [mock.call('reload_allocations', fake_network),
+             mock.call('release_lease',
+                       fake_network,
+                       mac_address=fake_port1.mac_address,
+                       removed_ips=set(['172.9.9.99'])),
+             mock.call('release_lease',
+                       fake_network,
+                       mac_address=fake_port1.mac_address,
+                       removed_ips=['172.9.9.99'])],
+            self.call_driver.call_args_list)
+
+    def test_port_event_after_network_disabled(self):
+        self.cache.get_network_by_id.return_value = fake_network
+        self.cache.get_port_by_id.return_value = None
+        self.dhcp.network_delete_end(None, dict(network_id=fake_network.id))
+        self.dhcp.port_update_end(None, dict(port=vars(fake_port1)))
+        with mock.patch.object(self.dhcp, 'disable_dhcp_helper') as disable:
+            self._process_updates()
+        disable.assert_called_once_with(fake_network.id)
+        self.assertEqual(0, self.call_driver.call_count)
+
+    def test_port_event_during_refresh_applied_again(self):
+        self.cache.get_network_by_id.return_value = fake_network
+        self.cache.get_port_by_id.return_value = None
+        self.dhcp.network_create_end(None,
+                                     dict(network=dict(id=fake_network.id)))
+        refresh = self.dhcp.update_queue.get()
+        self.dhcp.port_update_end(None, dict(port=vars(fake_port1)))
+        with mock.patch.object(self.dhcp, 'refresh_dhcp_helper'):
+            # The refresh puts a network fetched before the port event
+            self.dhcp._process_update(refresh)
+        self.cache.reset_mock()
+        self._process_updates()
+        self.assertEqual(fake_port1.id,
+                         self.cache.put_port.call_args[0][0].id)
+        self.call_driver.assert_called_once_with('reload_allocations',
+                                                 fake_network)
+
+    def test_process_update_failure(self):
+        self.dhcp.network_create_end(None,
+                                     dict(network=dict(id=fake_network.id)))
+        with contextlib.nested(
+            mock.patch.object(self.dhcp, 'refresh_dhcp_helper',
+                              side_effect=Exception),
+            mock.patch.object(dhcp_agent.LOG, 'exception')
+        ) as (refresh, log):
+            self._process_updates()
+        self.assertTrue(log.called)
+        self.assertTrue(self.dhcp.needs_resync)
+        self.assertEqual(0, self.dhcp.update_queue.get_state()[
+            'update_queue_in_progress'])
+
+
+class TestNetworkUpdateQueue(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestNetworkUpdateQueue, self).setUp()
+        self.queue = dhcp_agent.NetworkUpdateQueue()
+
+    def test_merge_reload_into_refresh(self):
+        self.queue.add(dhcp_agent.NetworkUpdate(
+            'net1', dhcp_agent.REFRESH_NETWORK, timestamp=1))
+        self.queue.add(dhcp_agent.NetworkUpdate(
+            'net1', dhcp_agent.RELOAD_ALLOCATIONS, [('mac', ['ip'])],
+            timestamp=2))
+        self.assertEqual(1, len(self.queue))
+        update = self.queue.get()
+        self.assertEqual(dhcp_agent.REFRESH_NETWORK, update.action)
+        self.assertEqual([('mac', ['ip'])], update.releases)
+        self.assertEqual(1, update.timestamp)
+
+    def test_merge_disable_drops_releases(self):
+        self.queue.add(dhcp_agent.NetworkUpdate(
+            'net1', dhcp_agent.RELOAD_ALLOCATIONS, [('mac', ['ip'])],
+            port_events=[('port', True)]))
+        self.queue.add(dhcp_agent.NetworkUpdate(
+            'net1', dhcp_agent.DISABLE_NETWORK))
+        update = self.queue.get()
+        self.assertEqual(dhcp_agent.DISABLE_NETWORK, update.action)
+        self.assertEqual([], update.releases)
+        self.assertEqual([], update.port_events)
+
+    def test_merge_keeps_port_events_in_order(self):
+        self.queue.add(dhcp_agent.NetworkUpdate(
+            'net1', dhcp_agent.RELOAD_ALLOCATIONS,
+            port_events=[('port', False)]))
+        self.queue.add(dhcp_agent.NetworkUpdate(
+            'net1', dhcp_agent.RELOAD_ALLOCATIONS,
+            port_events=[('port', True)]))
+        self.assertEqual([('port', False), ('port', True)],
+                         self.queue.get().port_events)
+
+    def test_networks_in_order(self):
+        self.queue.add(dhcp_agent.NetworkUpdate(
+            'net1', dhcp_agent.REFRESH_NETWORK, timestamp=1))
+        self.queue.add(dhcp_agent.NetworkUpdate(
+            'net2', dhcp_agent.REFRESH_NETWORK, timestamp=2))
+        self.assertEqual('net1', self.queue.get().id)
+        self.assertEqual('net2', self.queue.get().id)
+
+    def test_network_in_progress_held_back(self):
+        self.queue.add(dhcp_agent.NetworkUpdate(
+            'net1', dhcp_agent.REFRESH_NETWORK))
+        first = self.queue.get()
+        self.queue.add(dhcp_agent.NetworkUpdate(
+            'net1', dhcp_agent.RELOAD_ALLOCATIONS))
+        self.assertEqual((None, None), self.queue._pop())
+        self.queue.done(first)
+        self.assertEqual(dhcp_agent.RELOAD_ALLOCATIONS,
+                         self.queue.get().action)
+
+    def test_delay(self):
+        self.queue.delay = 10
+        with mock.patch('time.time', return_value=100):
+            self.queue.add(dhcp_agent.NetworkUpdate(
+                'net1', dhcp_agent.REFRESH_NETWORK))
+            self.assertEqual((None, 10), self.queue._pop())
+        with mock.patch('time.time', return_value=110):
+            self.assertEqual('net1', self.queue.get().id)
+
+    def test_get_state(self):
+        with mock.patch('time.time', return_value=100):
+            self.queue.add(dhcp_agent.NetworkUpdate(
+                'net1', dhcp_agent.REFRESH_NETWORK))
+            self.queue.add(dhcp_agent.NetworkUpdate(
+                'net2', dhcp_agent.REFRESH_NETWORK))
+            update = self.queue.get()
+        with mock.patch('time.time', return_value=102):
+            self.queue.done(update)
+        self.assertEqual({'update_queue_depth': 1,
+                          'update_queue_in_progress': 0,
+                          'update_latency_avg': 2,
+                          'update_latency_max': 2},
+                         self.queue.get_state())
+        self.assertEqual(0, self.queue.get_state()['update_latency_max'])
+
+    def test_latencies_capped(self):
+        with mock.patch.object(dhcp_agent, 'MAX_LATENCIES', 2):
+            self.queue = dhcp_agent.NetworkUpdateQueue()
+        for network_id in ('net1', 'net2', 'net3'):
+            self.queue.add(dhcp_agent.NetworkUpdate(
+                network_id, dhcp_agent.REFRESH_NETWORK))
+            self.queue.done(self.queue.get())
+        self.assertEqual(2, len(self.queue._latencies))
+
 
 class TestDhcpPluginApiProxy(base.BaseTestCase):
     def setUp(self):
@@ -838,7 +1074,14 @@ class TestDhcpPluginApiProxy(base.BaseTestCase):
     def test_get_active_networks_info(self):
         self.proxy.get_active_networks_info()
         self.make_msg.assert_called_once_with('get_active_networks_info',
-                                              host='foo')
+                                              host='foo',
+                                              network_revisions=None)
+
+    def test_get_active_networks_info_revisions(self):
+        self.proxy.get_active_networks_info(network_revisions={'a': 1})
+        self.make_msg.assert_called_once_with('get_active_networks_info',
+                                              host='foo',
+                                              network_revisions={'a': 1})
 
     def test_create_dhcp_port(self):
         port_body = (
@@ -893,6 +1136,15 @@ class TestNetworkCache(base.BaseTestCase):
         self.assertEqual(nc.port_lookup,
                          {fake_port1.id: fake_network.id})
 
+    def test_get_network_revisions(self):
+        nc = dhcp_agent.NetworkCache()
+        nc.put(dhcp.NetModel(True, dict(id='a', revision=3, subnets=[],
+                                        ports=[])))
+        nc.put(dhcp.NetModel(True, dict(id='b', revision=None, subnets=[],
+                                        ports=[])))
+        nc.put(fake_network)
+        self.assertEqual({'a': 3}, nc.get_network_revisions())
+
     def test_put_network_existing(self):
         prev_network_info = mock.Mock()
         nc = dhcp_agent.NetworkCache()
@@ -985,11 +1237,67 @@ class TestNetworkCache(base.BaseTestCase):
         self.assertEqual(len(nc.port_lookup), 1)
         self.assertNotIn(fake_port2, fake_net.ports)
 
+    def test_remove_port_moves_last_port(self):
+        fake_port3 = dhcp.PortModel(dict(id='port3',
+                                         mac_address='aa:bb:cc:dd:ee:33',
+                                         network_id=fake_network.id,
+                                         fixed_ips=[]))
+        fake_net = dhcp.NetModel(True,
+                                 dict(id=fake_network.id,
+                                      subnets=[],
+                                      ports=[fake_port1, fake_port2,
+                                             fake_port3]))
+        nc = dhcp_agent.NetworkCache()
+        nc.put(fake_net)
+        nc.remove_port(fake_port1)
+
+        self.assertEqual([fake_port3, fake_port2], fake_net.ports)
+        self.assertEqual(nc.get_port_by_id(fake_port3.id), fake_port3)
+        self.assertEqual(nc.get_port_by_id(fake_port2.id), fake_port2)
+        self.assertIsNone(nc.get_port_by_id(fake_port1.id))
+        self.assertIsNone(nc.get_port_by_mac(fake_net.id,
+                                             fake_port1.mac_address))
+
+    def test_remove_port_unknown(self):
+        nc = dhcp_agent.NetworkCache()
+        nc.put(fake_network)
+        nc.remove_port(fake_port2)
+        self.assertEqual([fake_port1], fake_network.ports)
+
+    def test_put_port_replaces_mac(self):
+        fake_net = dhcp.NetModel(True,
+                                 dict(id=fake_network.id,
+                                      subnets=[],
+                                      ports=[fake_port1, fake_port2]))
+        nc = dhcp_agent.NetworkCache()
+        nc.put(fake_net)
+        updated_port = dhcp.PortModel(dict(id=fake_port2.id,
+                                           mac_address='aa:bb:cc:dd:ee:00',
+                                           network_id=fake_net.id,
+                                           fixed_ips=[]))
+        nc.put_port(updated_port)
+
+        self.assertEqual([fake_port1, updated_port], fake_net.ports)
+        self.assertEqual(nc.get_port_by_mac(fake_net.id,
+                                            'aa:bb:cc:dd:ee:00'),
+                         updated_port)
+        self.assertIsNone(nc.get_port_by_mac(fake_net.id,
+                                             fake_port2.mac_address))
+
     def test_get_port_by_id(self):
         nc = dhcp_agent.NetworkCache()
         nc.put(fake_network)
         self.assertEqual(nc.get_port_by_id(fake_port1.id), fake_port1)
 
+    def test_get_port_by_mac(self):
+        nc = dhcp_agent.NetworkCache()
+        nc.put(fake_network)
+        self.assertEqual(nc.get_port_by_mac(fake_network.id,
+                                            fake_port1.mac_address),
+                         fake_port1)
+        self.assertIsNone(nc.get_port_by_mac('other',
+                                             fake_port1.mac_address))
+
 
 class FakePort1:
     id = 'eeeeeeee-eeee-eeee-eeee-eeeeeeeeeeee'
@@ -1401,7 +1709,44 @@ class TestDictModel(base.BaseTestCase):
         self.assertEqual(m.a[1].c, 3)
 
 
+class TestPortModel(base.BaseTestCase):
+    def test_slots(self):
+        m = dhcp.PortModel(dict(id='a', mac_address='aa:bb:cc:dd:ee:ff'))
+        self.assertEqual(m.id, 'a')
+        self.assertEqual(m.mac_address, 'aa:bb:cc:dd:ee:ff')
+        self.assertFalse(hasattr(m, '__dict__'))
+        self.assertIsNone(m._extra)
+
+    def test_missing_attribute(self):
+        m = dhcp.PortModel(dict(id='a'))
+        self.assertRaises(AttributeError, getattr, m, 'extra_dhcp_opts')
+        self.assertRaises(AttributeError, getattr, m, 'foo')
+        self.assertFalse(getattr(m, 'extra_dhcp_opts', False))
+
+    def test_extra_attributes(self):
+        m = dhcp.PortModel({'id': 'a', 'binding:host_id': 'host'})
+        self.assertEqual(getattr(m, 'binding:host_id'), 'host')
+        m.foo = 'bar'
+        self.assertEqual(m.foo, 'bar')
+
+    def test_fixed_ips(self):
+        m = dhcp.PortModel(dict(fixed_ips=[dict(subnet_id='s',
+                                                ip_address='10.0.0.2')]))
+        self.assertIsInstance(m.fixed_ips[0], dhcp.FixedIpModel)
+        self.assertEqual(m.fixed_ips[0].ip_address, '10.0.0.2')
+
+    def test_dict_values(self):
+        m = dhcp.PortModel(dict(extra_dhcp_opts=[dict(opt_name='a',
+                                                      opt_value='b')]))
+        self.assertEqual(m.extra_dhcp_opts[0].opt_name, 'a')
+
+
 class TestNetModel(base.BaseTestCase):
+    def test_ports(self):
+        network = dhcp.NetModel(True, {'id': 'foo', 'ports': [{'id': 'a'}]})
+        self.assertIsInstance(network.ports[0], dhcp.PortModel)
+        self.assertEqual(network.ports[0].id, 'a')
+
     def test_ns_name(self):
         network = dhcp.NetModel(True, {'id': 'foo'})
         self.assertEqual(network.namespace, 'qdhcp-foo')
@@ -0,0 +1,73 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from neutron.agent.linux import ipset_manager
+from neutron.tests import base
+
+FAKE_SG_ID = 'fake_sgid'
+
+
+class IpsetManagerTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(IpsetManagerTestCase, self).setUp()
+        self.execute = mock.Mock()
+        self.ipset = ipset_manager.IpsetManager(_execute=self.execute,
+                                                root_helper='sudo')
+
+    def _assert_restore(self, lines):
+        self.execute.assert_called_once_with(
+            ['ipset', 'restore', '-exist'],
+            process_input='\n'.join(lines + ['']),
+            root_helper='sudo')
+        self.execute.reset_mock()
+
+    def test_get_set_name(self):
+        name = ipset_manager.get_set_name('0123456789' * 4, 'IPv6')
+        self.assertEqual(name, 'IPv6' + ('0123456789' * 3)[:27])
+
+    def test_set_members_creates_set(self):
+        self.ipset.set_members(FAKE_SG_ID, 'IPv4', ['10.0.0.2', '10.0.0.1'])
+        self._assert_restore(['create IPv4fake_sgid hash:ip family inet',
+                              'flush IPv4fake_sgid',
+                              'add IPv4fake_sgid 10.0.0.1',
+                              'add IPv4fake_sgid 10.0.0.2'])
+
+    def test_set_members_only_sends_changes(self):
+        self.ipset.set_members(FAKE_SG_ID, 'IPv6', ['fe80::1', 'fe80::2'])
+        self.execute.reset_mock()
+
+        self.ipset.set_members(FAKE_SG_ID, 'IPv6', ['fe80::2', 'fe80::3'])
+        self._assert_restore(['add IPv6fake_sgid fe80::3',
+                              'del IPv6fake_sgid fe80::1'])
+
+        self.ipset.set_members(FAKE_SG_ID, 'IPv6', ['fe80::2', 'fe80::3'])
+        self.assertFalse(self.execute.called)
+
+    def test_destroy(self):
+        self.ipset.set_members(FAKE_SG_ID, 'IPv4', ['10.0.0.1'])
+        self.execute.reset_mock()
+
+        self.ipset.destroy(FAKE_SG_ID, 'IPv4')
+        self.execute.assert_called_once_with(
+            ['ipset', 'destroy', 'IPv4fake_sgid'], root_helper='sudo')
+        self.assertEqual(self.ipset.sets, {})
+
+    def test_destroy_unknown_set(self):
+        self.ipset.destroy(FAKE_SG_ID, 'IPv4')
+        self.assertFalse(self.execute.called)
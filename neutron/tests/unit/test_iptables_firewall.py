@@ -1126,3 +1126,85 @@ class IptablesFirewallTestCase(base.BaseTestCase):
                  call.add_rule('ofake_dev', '-j $sg-fallback'),
                  call.add_rule('sg-chain', '-j ACCEPT')]
         self.v4filter_inst.assert_has_calls(calls)
+
+
+class IptablesFirewallIpsetTestCase(IptablesFirewallTestCase):
+    def setUp(self):
+        cfg.CONF.set_override('enable_ipset', True, 'SECURITYGROUP')
+        self.addCleanup(cfg.CONF.reset)
+        self.ipset_cls_p = mock.patch(
+            'neutron.agent.linux.ipset_manager.IpsetManager')
+        self.ipset_cls = self.ipset_cls_p.start()
+        self.addCleanup(self.ipset_cls_p.stop)
+        super(IptablesFirewallIpsetTestCase, self).setUp()
+        self.ipset_inst = self.ipset_cls.return_value
+
+    def _fake_port_with_remote_group(self, member_ips):
+        port = self._fake_port()
+        port['security_group_rules'] = [
+            {'ethertype': 'IPv4',
+             'direction': 'ingress',
+             'protocol': 'tcp',
+             'port_range_min': 22,
+             'port_range_max': 22,
+             'remote_group_id': 'fake_sgid',
+             'source_ip_prefix': '%s/32' % ip} for ip in member_ips]
+        return port
+
+    def test_filter_ipv4_ingress_remote_group(self):
+        rule = {'ethertype': 'IPv4',
+                'direction': 'ingress',
+                'remote_group_id': 'fake_sgid'}
+        ingress = call.add_rule('ifake_dev',
+                                '-m set --match-set IPv4fake_sgid src '
+                                '-j RETURN')
+        egress = None
+        self._test_prepare_port_filter(rule, ingress, egress)
+
+    def test_filter_ipv4_egress_tcp_remote_group(self):
+        rule = {'ethertype': 'IPv4',
+                'direction': 'egress',
+                'protocol': 'tcp',
+                'remote_group_id': 'fake_sgid'}
+        ingress = None
+        egress = call.add_rule('ofake_dev',
+                               '-p tcp -m set --match-set IPv4fake_sgid dst '
+                               '-m tcp -j RETURN')
+        self._test_prepare_port_filter(rule, ingress, egress)
+
+    def test_prepare_port_filter_merges_remote_group_members(self):
+        port = self._fake_port_with_remote_group(['10.0.0.2', '10.0.0.3'])
+        self.firewall.prepare_port_filter(port)
+
+        rule = ('-p tcp -m set --match-set IPv4fake_sgid src '
+                '-m tcp --dport 22 -j RETURN')
+        rules = [c for c in self.v4filter_inst.mock_calls
+                 if c == call.add_rule('ifake_dev', rule)]
+        self.assertEqual(len(rules), 1)
+        self.ipset_inst.set_members.assert_called_once_with(
+            'fake_sgid', 'IPv4', set(['10.0.0.2', '10.0.0.3']))
+
+    def test_prepare_port_filter_keeps_remote_group_prefix_rules(self):
+        port = self._fake_port_with_remote_group(['10.0.0.2'])
+        # an allowed address pair of a member of the remote group
+        port['security_group_rules'].append(
+            dict(port['security_group_rules'][0],
+                 source_ip_prefix='10.1.0.0/24'))
+        self.firewall.prepare_port_filter(port)
+
+        set_rule = ('-p tcp -m set --match-set IPv4fake_sgid src '
+                    '-m tcp --dport 22 -j RETURN')
+        prefix_rule = '-s 10.1.0.0/24 -p tcp -m tcp --dport 22 -j RETURN'
+        self.v4filter_inst.assert_has_calls(
+            [call.add_rule('ifake_dev', set_rule),
+             call.add_rule('ifake_dev', prefix_rule)])
+        self.ipset_inst.set_members.assert_called_once_with(
+            'fake_sgid', 'IPv4', set(['10.0.0.2']))
+
+    def test_remove_port_filter_destroys_unused_ipsets(self):
+        port = self._fake_port_with_remote_group(['10.0.0.2'])
+        self.firewall.prepare_port_filter(port)
+        self.assertFalse(self.ipset_inst.destroy.called)
+
+        self.firewall.remove_port_filter(port)
+        self.ipset_inst.destroy.assert_called_once_with('fake_sgid', 'IPv4')
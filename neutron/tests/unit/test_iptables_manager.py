@@ -101,23 +101,6 @@ class IptablesManagerStateFulTestCase(base.BaseTestCase):
 
         iptables_args = {'bn': bn[:16]}
 
-        filter_dump = ('# Generated by iptables_manager\n'
-                       '*filter\n'
-                       ':neutron-filter-top - [0:0]\n'
-                       ':%(bn)s-FORWARD - [0:0]\n'
-                       ':%(bn)s-INPUT - [0:0]\n'
-                       ':%(bn)s-local - [0:0]\n'
-                       ':%(bn)s-filter - [0:0]\n'
-                       ':%(bn)s-OUTPUT - [0:0]\n'
-                       '[0:0] -A FORWARD -j neutron-filter-top\n'
-                       '[0:0] -A OUTPUT -j neutron-filter-top\n'
-                       '[0:0] -A neutron-filter-top -j %(bn)s-local\n'
-                       '[0:0] -A INPUT -j %(bn)s-INPUT\n'
-                       '[0:0] -A OUTPUT -j %(bn)s-OUTPUT\n'
-                       '[0:0] -A FORWARD -j %(bn)s-FORWARD\n'
-                       'COMMIT\n'
-                       '# Completed by iptables_manager\n' % iptables_args)
-
         filter_dump_mod = ('# Generated by iptables_manager\n'
                            '*filter\n'
                            ':neutron-filter-top - [0:0]\n'
@@ -158,13 +141,6 @@ class IptablesManagerStateFulTestCase(base.BaseTestCase):
                               process_input=nat_dump + filter_dump_mod,
                               root_helper=self.root_helper).AndReturn(None)
 
-        self.iptables.execute(['iptables-save', '-c'],
-                              root_helper=self.root_helper).AndReturn('')
-
-        self.iptables.execute(['iptables-restore', '-c'],
-                              process_input=nat_dump + filter_dump,
-                              root_helper=self.root_helper).AndReturn(None)
-
         self.mox.ReplayAll()
 
         self.iptables.ipv4['filter'].add_chain('filter')
@@ -190,17 +166,8 @@ class IptablesManagerStateFulTestCase(base.BaseTestCase):
 
         filter_dump = ('# Generated by iptables_manager\n'
                        '*filter\n'
-                       ':neutron-filter-top - [0:0]\n'
-                       ':%(bn)s-FORWARD - [0:0]\n'
-                       ':%(bn)s-INPUT - [0:0]\n'
-                       ':%(bn)s-local - [0:0]\n'
-                       ':%(bn)s-OUTPUT - [0:0]\n'
-                       '[0:0] -A FORWARD -j neutron-filter-top\n'
-                       '[0:0] -A OUTPUT -j neutron-filter-top\n'
-                       '[0:0] -A neutron-filter-top -j %(bn)s-local\n'
-                       '[0:0] -A INPUT -j %(bn)s-INPUT\n'
-                       '[0:0] -A OUTPUT -j %(bn)s-OUTPUT\n'
-                       '[0:0] -A FORWARD -j %(bn)s-FORWARD\n'
+                       ':%(bn)s-filter - [0:0]\n'
+                       '-X %(bn)s-filter\n'
                        'COMMIT\n'
                        '# Completed by iptables_manager\n' % iptables_args)
 
@@ -245,11 +212,11 @@ class IptablesManagerStateFulTestCase(base.BaseTestCase):
                               process_input=nat_dump + filter_dump_mod,
                               root_helper=self.root_helper).AndReturn(None)
 
-        self.iptables.execute(['iptables-save', '-c'],
+        self.iptables.execute(['iptables-save', '-c', '-t', 'filter'],
                               root_helper=self.root_helper).AndReturn('')
 
-        self.iptables.execute(['iptables-restore', '-c'],
-                              process_input=nat_dump + filter_dump,
+        self.iptables.execute(['iptables-restore', '-c', '--noflush'],
+                              process_input=filter_dump,
                               root_helper=self.root_helper).AndReturn(None)
 
         self.mox.ReplayAll()
@@ -290,11 +257,18 @@ class IptablesManagerStateFulTestCase(base.BaseTestCase):
                               process_input=NAT_DUMP + filter_dump_mod,
                               root_helper=self.root_helper).AndReturn(None)
 
-        self.iptables.execute(['iptables-save', '-c'],
+        filter_dump = ('# Generated by iptables_manager\n'
+                       '*filter\n'
+                       ':%(bn)s-filter - [0:0]\n'
+                       '-X %(bn)s-filter\n'
+                       'COMMIT\n'
+                       '# Completed by iptables_manager\n' % IPTABLES_ARG)
+
+        self.iptables.execute(['iptables-save', '-c', '-t', 'filter'],
                               root_helper=self.root_helper).AndReturn('')
 
-        self.iptables.execute(['iptables-restore', '-c'],
-                              process_input=NAT_DUMP + FILTER_DUMP,
+        self.iptables.execute(['iptables-restore', '-c', '--noflush'],
+                              process_input=filter_dump,
                               root_helper=self.root_helper).AndReturn(None)
 
         self.mox.ReplayAll()
@@ -336,13 +310,20 @@ class IptablesManagerStateFulTestCase(base.BaseTestCase):
                               process_input=NAT_DUMP + filter_dump_mod,
                               root_helper=self.root_helper).AndReturn(None)
 
-        self.iptables.execute(['iptables-save', '-c'],
+        filter_dump = ('# Generated by iptables_manager\n'
+                       '*filter\n'
+                       ':%(bn)s-INPUT - [0:0]\n'
+                       ':%(bn)s-filter - [0:0]\n'
+                       '-X %(bn)s-filter\n'
+                       'COMMIT\n'
+                       '# Completed by iptables_manager\n' % IPTABLES_ARG)
+
+        self.iptables.execute(['iptables-save', '-c', '-t', 'filter'],
                               root_helper=self.root_helper).AndReturn('')
 
-        self.iptables.execute(['iptables-restore', '-c'],
-                              process_input=NAT_DUMP + FILTER_DUMP,
-                              root_helper=self.root_helper
-                              ).AndReturn(None)
+        self.iptables.execute(['iptables-restore', '-c', '--noflush'],
+                              process_input=filter_dump,
+                              root_helper=self.root_helper).AndReturn(None)
 
         self.mox.ReplayAll()
 
@@ -366,21 +347,11 @@ class IptablesManagerStateFulTestCase(base.BaseTestCase):
     def test_add_nat_rule(self):
         nat_dump = ('# Generated by iptables_manager\n'
                     '*nat\n'
-                    ':neutron-postrouting-bottom - [0:0]\n'
-                    ':%(bn)s-float-snat - [0:0]\n'
-                    ':%(bn)s-POSTROUTING - [0:0]\n'
                     ':%(bn)s-PREROUTING - [0:0]\n'
-                    ':%(bn)s-OUTPUT - [0:0]\n'
-                    ':%(bn)s-snat - [0:0]\n'
-                    '[0:0] -A PREROUTING -j %(bn)s-PREROUTING\n'
-                    '[0:0] -A OUTPUT -j %(bn)s-OUTPUT\n'
-                    '[0:0] -A POSTROUTING -j %(bn)s-POSTROUTING\n'
-                    '[0:0] -A POSTROUTING -j neutron-postrouting-bottom\n'
-                    '[0:0] -A neutron-postrouting-bottom -j %(bn)s-snat\n'
-                    '[0:0] -A %(bn)s-snat -j %(bn)s-float-snat\n'
+                    ':%(bn)s-nat - [0:0]\n'
+                    '-X %(bn)s-nat\n'
                     'COMMIT\n'
-                    '# Completed by iptables_manager\n'
-                    % IPTABLES_ARG)
+                    '# Completed by iptables_manager\n' % IPTABLES_ARG)
 
         nat_dump_mod = ('# Generated by iptables_manager\n'
                         '*nat\n'
@@ -412,11 +383,11 @@ class IptablesManagerStateFulTestCase(base.BaseTestCase):
                               process_input=nat_dump_mod + FILTER_DUMP,
                               root_helper=self.root_helper).AndReturn(None)
 
-        self.iptables.execute(['iptables-save', '-c'],
+        self.iptables.execute(['iptables-save', '-c', '-t', 'nat'],
                               root_helper=self.root_helper).AndReturn('')
 
-        self.iptables.execute(['iptables-restore', '-c'],
-                              process_input=nat_dump + FILTER_DUMP,
+        self.iptables.execute(['iptables-restore', '-c', '--noflush'],
+                              process_input=nat_dump,
                               root_helper=self.root_helper).AndReturn(None)
 
         self.mox.ReplayAll()
@@ -441,6 +412,153 @@ class IptablesManagerStateFulTestCase(base.BaseTestCase):
         self.iptables.apply()
         self.mox.VerifyAll()
 
+    def test_apply_preserves_counters(self):
+        iptables_save = ('# Generated by iptables-save v1.4.12\n'
+                         '*filter\n'
+                         ':INPUT ACCEPT [1:10]\n'
+                         ':FORWARD ACCEPT [0:0]\n'
+                         ':OUTPUT ACCEPT [2:20]\n'
+                         ':neutron-filter-top - [0:0]\n'
+                         ':%(bn)s-FORWARD - [0:0]\n'
+                         ':%(bn)s-INPUT - [3:30]\n'
+                         ':%(bn)s-OUTPUT - [0:0]\n'
+                         ':%(bn)s-local - [0:0]\n'
+                         ':%(bn)s-stale - [0:0]\n'
+                         '[5:50] -A INPUT -j %(bn)s-INPUT\n'
+                         '[0:0] -A FORWARD -j neutron-filter-top\n'
+                         '[0:0] -A FORWARD -j %(bn)s-FORWARD\n'
+                         '[0:0] -A OUTPUT -j neutron-filter-top\n'
+                         '[0:0] -A OUTPUT -j %(bn)s-OUTPUT\n'
+                         '[0:0] -A neutron-filter-top -j %(bn)s-local\n'
+                         '[7:70] -A %(bn)s-INPUT -s 1.2.3.4 -j DROP\n'
+                         '[0:0] -A %(bn)s-stale -j DROP\n'
+                         '[9:90] -A FORWARD -j ACCEPT\n'
+                         '[4:40] -A OUTPUT -j ACCEPT\n'
+                         'COMMIT\n'
+                         '# Completed by iptables-save\n' % IPTABLES_ARG)
+
+        filter_restore = ('# Generated by iptables-save v1.4.12\n'
+                          '*filter\n'
+                          ':INPUT ACCEPT [1:10]\n'
+                          ':FORWARD ACCEPT [0:0]\n'
+                          ':OUTPUT ACCEPT [2:20]\n'
+                          ':neutron-filter-top - [0:0]\n'
+                          ':%(bn)s-FORWARD - [0:0]\n'
+                          ':%(bn)s-INPUT - [3:30]\n'
+                          ':%(bn)s-local - [0:0]\n'
+                          ':%(bn)s-OUTPUT - [0:0]\n'
+                          '[0:0] -A FORWARD -j neutron-filter-top\n'
+                          '[0:0] -A OUTPUT -j neutron-filter-top\n'
+                          '[0:0] -A neutron-filter-top -j %(bn)s-local\n'
+                          '[5:50] -A INPUT -j %(bn)s-INPUT\n'
+                          '[0:0] -A OUTPUT -j %(bn)s-OUTPUT\n'
+                          '[0:0] -A FORWARD -j %(bn)s-FORWARD\n'
+                          '[7:70] -A %(bn)s-INPUT -s 1.2.3.4 -j DROP\n'
+                          '[9:90] -A FORWARD -j ACCEPT\n'
+                          'COMMIT\n'
+                          '# Completed by iptables-save\n' % IPTABLES_ARG)
+
+        self.iptables.execute(['iptables-save', '-c'],
+                              root_helper=self.root_helper
+                              ).AndReturn(iptables_save)
+
+        self.iptables.execute(['iptables-restore', '-c'],
+                              process_input=NAT_DUMP + filter_restore,
+                              root_helper=self.root_helper).AndReturn(None)
+
+        self.mox.ReplayAll()
+
+        self.iptables.ipv4['filter'].add_rule('INPUT', '-s 1.2.3.4 -j DROP')
+        self.iptables.ipv4['filter'].add_rule('OUTPUT', '-j ACCEPT',
+                                              wrap=False)
+        self.iptables.ipv4['filter'].remove_rule('OUTPUT', '-j ACCEPT',
+                                                 wrap=False)
+        self.iptables.apply()
+
+        self.mox.VerifyAll()
+
+    def _expect_initial_apply(self):
+        self.iptables.execute(['iptables-save', '-c'],
+                              root_helper=self.root_helper).AndReturn('')
+        self.iptables.execute(['iptables-restore', '-c'],
+                              process_input=mox.IgnoreArg(),
+                              root_helper=self.root_helper).AndReturn(None)
+
+    def test_apply_unchanged_tables(self):
+        self._expect_initial_apply()
+        self.mox.ReplayAll()
+
+        self.iptables.apply()
+        self.iptables.apply()
+        self.iptables.ipv4['filter'].add_chain('filter')
+        self.iptables.ipv4['filter'].add_rule('filter', '-j DROP')
+        self.iptables.ipv4['filter'].remove_chain('filter')
+        self.iptables.ipv4['filter'].remove_rule('local', '-j DROP')
+        self.iptables.apply()
+
+        self.mox.VerifyAll()
+
+    def test_apply_changed_chains(self):
+        iptables_save = ('# Generated by iptables-save v1.4.12\n'
+                         '*filter\n'
+                         ':INPUT ACCEPT [1:10]\n'
+                         ':%(bn)s-INPUT - [0:0]\n'
+                         ':%(bn)s-local - [0:0]\n'
+                         '[5:50] -A INPUT -j %(bn)s-INPUT\n'
+                         '[7:70] -A %(bn)s-local -s 1.2.3.4 -j DROP\n'
+                         'COMMIT\n'
+                         '# Completed by iptables-save\n' % IPTABLES_ARG)
+
+        filter_restore = ('# Generated by iptables_manager\n'
+                          '*filter\n'
+                          ':%(bn)s-filter - [0:0]\n'
+                          ':%(bn)s-local - [0:0]\n'
+                          '[0:0] -A %(bn)s-filter -j DROP\n'
+                          '[7:70] -A %(bn)s-local -s 1.2.3.4 -j DROP\n'
+                          '[0:0] -A %(bn)s-local -j %(bn)s-filter\n'
+                          'COMMIT\n'
+                          '# Completed by iptables_manager\n' % IPTABLES_ARG)
+
+        self.iptables.ipv4['filter'].add_rule('local', '-s 1.2.3.4 -j DROP')
+        self._expect_initial_apply()
+        self.iptables.execute(['iptables-save', '-c', '-t', 'filter'],
+                              root_helper=self.root_helper
+                              ).AndReturn(iptables_save)
+        self.iptables.execute(['iptables-restore', '-c', '--noflush'],
+                              process_input=filter_restore,
+                              root_helper=self.root_helper).AndReturn(None)
+        self.mox.ReplayAll()
+
+        self.iptables.apply()
+        self.iptables.ipv4['filter'].add_chain('filter')
+        self.iptables.ipv4['filter'].add_rule('filter', '-j DROP')
+        self.iptables.ipv4['filter'].add_rule('local', '-j $filter')
+        self.iptables.apply()
+
+        self.mox.VerifyAll()
+
+    def test_apply_changed_chains_failure_rewrites_tables(self):
+        self._expect_initial_apply()
+        self.iptables.execute(['iptables-save', '-c', '-t', 'filter'],
+                              root_helper=self.root_helper).AndReturn('')
+        self.iptables.execute(['iptables-restore', '-c', '--noflush'],
+                              process_input=mox.IgnoreArg(),
+                              root_helper=self.root_helper
+                              ).AndRaise(RuntimeError())
+        self.iptables.execute(['iptables-save', '-c', '-t', 'filter'],
+                              root_helper=self.root_helper).AndReturn('')
+        self.iptables.execute(['iptables-restore', '-c'],
+                              process_input=mox.IgnoreArg(),
+                              root_helper=self.root_helper).AndReturn(None)
+        self.mox.ReplayAll()
+
+        self.iptables.apply()
+        self.iptables.ipv4['filter'].add_rule('local', '-j DROP')
+        self.iptables.apply()
+        self.iptables.apply()
+
+        self.mox.VerifyAll()
+
     def test_add_rule_to_a_nonexistent_chain(self):
         self.assertRaises(LookupError, self.iptables.ipv4['filter'].add_rule,
                           'nonexistent', '-j DROP')
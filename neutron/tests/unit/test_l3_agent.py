@@ -15,8 +15,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
 import copy
 
+import eventlet
+from eventlet import event
 import mock
 from oslo.config import cfg
 
@@ -526,29 +529,43 @@ class TestBasicRouterOperations(base.BaseTestCase):
         agent._process_routers(routers)
         self.assertNotIn(routers[0]['id'], agent.router_info)
 
+    def test_process_routers_refetches_replaced_external_network(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        agent.target_ex_net_id = 'old_ext_net'
+        self.plugin_api.get_external_network_id.return_value = 'new_ext_net'
+        routers = [
+            {'id': _uuid(),
+             'admin_state_up': True,
+             'external_gateway_info': {'network_id': 'new_ext_net'}}]
+        with mock.patch.object(agent, 'process_router'):
+            agent._process_routers(routers)
+        self.assertIn(routers[0]['id'], agent.router_info)
+        self.assertEqual('new_ext_net', agent.target_ex_net_id)
+
+    def _assert_queued(self, agent, router_id, action=None):
+        update = agent._queue._pending[router_id]
+        self.assertEqual(l3_agent.PRIORITY_RPC, update.priority)
+        self.assertEqual(action, update.action)
+
     def test_router_deleted(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         agent.router_deleted(None, FAKE_ID)
-        # verify that will set fullsync
-        self.assertIn(FAKE_ID, agent.removed_routers)
+        self._assert_queued(agent, FAKE_ID, l3_agent.DELETE_ROUTER)
 
     def test_routers_updated(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         agent.routers_updated(None, [FAKE_ID])
-        # verify that will set fullsync
-        self.assertIn(FAKE_ID, agent.updated_routers)
+        self._assert_queued(agent, FAKE_ID)
 
     def test_removed_from_agent(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         agent.router_removed_from_agent(None, {'router_id': FAKE_ID})
-        # verify that will set fullsync
-        self.assertIn(FAKE_ID, agent.removed_routers)
+        self._assert_queued(agent, FAKE_ID, l3_agent.DELETE_ROUTER)
 
     def test_added_to_agent(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         agent.router_added_to_agent(None, [FAKE_ID])
-        # verify that will set fullsync
-        self.assertIn(FAKE_ID, agent.updated_routers)
+        self._assert_queued(agent, FAKE_ID)
 
     def test_process_router_delete(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
@@ -565,8 +582,121 @@ class TestBasicRouterOperations(base.BaseTestCase):
             'gw_port': ex_gw_port}
         agent._router_added(router['id'], router)
         agent.router_deleted(None, router['id'])
-        agent._process_router_delete()
-        self.assertFalse(list(agent.removed_routers))
+        agent._process_router_update(agent._queue.get())
+        self.assertNotIn(router['id'], agent.router_info)
+        self.assertEqual(0, len(agent._queue))
+
+    def test_process_router_update_fetches_router(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        router = {'id': FAKE_ID}
+        self.plugin_api.get_routers.return_value = [router]
+        with mock.patch.object(agent, '_process_routers') as process:
+            agent._process_router_update(
+                l3_agent.RouterUpdate(FAKE_ID, l3_agent.PRIORITY_RPC))
+        self.plugin_api.get_routers.assert_called_once_with(agent.context,
+                                                            [FAKE_ID])
+        process.assert_called_once_with([router])
+
+    def test_process_router_update_with_router(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        router = {'id': FAKE_ID}
+        with mock.patch.object(agent, '_process_routers') as process:
+            agent._process_router_update(
+                l3_agent.RouterUpdate(FAKE_ID,
+                                      l3_agent.PRIORITY_SYNC_ROUTERS_TASK,
+                                      router=router))
+        self.assertFalse(self.plugin_api.get_routers.called)
+        process.assert_called_once_with([router])
+
+    def test_process_router_update_router_gone(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        agent.router_info[FAKE_ID] = mock.Mock()
+        self.plugin_api.get_routers.return_value = []
+        with mock.patch.object(agent, '_router_removed') as removed:
+            agent._process_router_update(
+                l3_agent.RouterUpdate(FAKE_ID, l3_agent.PRIORITY_RPC))
+        removed.assert_called_once_with(FAKE_ID)
+
+    def test_process_router_update_failure_sets_fullsync(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        agent.fullsync = False
+        self.plugin_api.get_routers.side_effect = Exception()
+        update = l3_agent.RouterUpdate(FAKE_ID, l3_agent.PRIORITY_RPC)
+        agent._queue.add(update)
+        agent._process_router_update(agent._queue.get())
+        self.assertTrue(agent.fullsync)
+        self.assertNotIn(FAKE_ID, agent._queue._in_progress)
+
+    def test_process_routers_loop_waits_for_free_worker(self):
+        self.conf.set_override('router_workers', 1)
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        processed = []
+        proceed = event.Event()
+
+        def process_router_update(update):
+            processed.append(update.id)
+            if len(processed) == 1:
+                proceed.wait()
+            agent._queue.done(update)
+
+        for router_id in ('r1', 'r2'):
+            agent._queue.add(l3_agent.RouterUpdate(
+                router_id, l3_agent.PRIORITY_SYNC_ROUTERS_TASK))
+        with mock.patch.object(agent, '_process_router_update',
+                               side_effect=process_router_update):
+            loop = eventlet.spawn(agent._process_routers_loop)
+            for i in range(3):
+                eventlet.sleep(0)
+            # r2 is still queued while r1 holds the only worker
+            self.assertEqual(['r1'], processed)
+            self.assertIn('r2', agent._queue._pending)
+            agent._queue.add(l3_agent.RouterUpdate('r3',
+                                                   l3_agent.PRIORITY_RPC))
+            proceed.send()
+            for i in range(6):
+                eventlet.sleep(0)
+            loop.kill()
+        self.assertEqual(['r1', 'r3', 'r2'], processed)
+
+    def test_routers_processed_once_queue_drained(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        routers = [{'id': _uuid()} for i in range(2)]
+        for router in routers:
+            agent._queue.add(l3_agent.RouterUpdate(
+                router['id'], l3_agent.PRIORITY_SYNC_ROUTERS_TASK,
+                router=router))
+        with contextlib.nested(
+            mock.patch.object(agent, '_process_routers'),
+            mock.patch.object(agent, '_routers_processed')
+        ) as (process, processed):
+            agent._process_router_update(agent._queue.get())
+            self.assertFalse(processed.called)
+            agent._process_router_update(agent._queue.get())
+        self.assertEqual(1, processed.call_count)
+        self.assertEqual(sorted(routers),
+                         sorted(processed.call_args[0][0]))
+        self.assertEqual({}, agent._processed_routers)
+
+    def test_sync_routers_task(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        stale_id = _uuid()
+        agent.router_info[stale_id] = mock.Mock()
+        self.plugin_api.get_routers.return_value = [{'id': FAKE_ID}]
+        agent._sync_routers_task(agent.context)
+        self.assertFalse(agent.fullsync)
+        update = agent._queue._pending[FAKE_ID]
+        self.assertEqual(l3_agent.PRIORITY_SYNC_ROUTERS_TASK,
+                         update.priority)
+        self.assertEqual({'id': FAKE_ID}, update.router)
+        self.assertEqual(l3_agent.DELETE_ROUTER,
+                         agent._queue._pending[stale_id].action)
+
+    def test_sync_routers_task_failure(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        self.plugin_api.get_routers.side_effect = Exception()
+        agent._sync_routers_task(agent.context)
+        self.assertTrue(agent.fullsync)
+        self.assertEqual(0, len(agent._queue))
 
     def test_destroy_namespace(self):
 
@@ -763,3 +893,75 @@ class TestL3AgentEventHandler(base.BaseTestCase):
                 ])
         finally:
             self.external_process_p.start()
+
+
+class TestRouterUpdateQueue(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestRouterUpdateQueue, self).setUp()
+        self.queue = l3_agent.RouterUpdateQueue()
+
+    def _update(self, router_id, priority=l3_agent.PRIORITY_RPC, **kwargs):
+        update = l3_agent.RouterUpdate(router_id, priority, **kwargs)
+        self.queue.add(update)
+        return update
+
+    def test_rpc_updates_first(self):
+        self._update('r1', l3_agent.PRIORITY_SYNC_ROUTERS_TASK)
+        self._update('r2', l3_agent.PRIORITY_SYNC_ROUTERS_TASK)
+        self._update('r3')
+        self.assertEqual(['r3', 'r1', 'r2'],
+                         [self.queue.get().id for i in range(3)])
+
+    def test_updates_coalesced(self):
+        self._update('r1', l3_agent.PRIORITY_SYNC_ROUTERS_TASK,
+                     router={'id': 'r1'})
+        self._update('r2')
+        latest = self._update('r1', l3_agent.PRIORITY_SYNC_ROUTERS_TASK)
+        self._update('r1', action=l3_agent.DELETE_ROUTER)
+        self.assertEqual(2, len(self.queue))
+        self.assertEqual('r2', self.queue.get().id)
+        update = self.queue.get()
+        self.assertEqual('r1', update.id)
+        self.assertEqual(l3_agent.DELETE_ROUTER, update.action)
+        self.assertEqual(0, len(self.queue))
+        self.assertIsNone(latest.action)
+
+    def test_coalesced_update_keeps_priority(self):
+        self._update('r1')
+        self._update('r2', l3_agent.PRIORITY_SYNC_ROUTERS_TASK)
+        self._update('r1', l3_agent.PRIORITY_SYNC_ROUTERS_TASK)
+        self.assertEqual('r1', self.queue.get().id)
+
+    def test_router_in_progress_held_back(self):
+        self._update('r1')
+        first = self.queue.get()
+        self._update('r1')
+        self._update('r2', l3_agent.PRIORITY_SYNC_ROUTERS_TASK)
+        self.assertEqual('r2', self.queue.get().id)
+        self.assertIsNone(self.queue._pop())
+        self.queue.done(first)
+        self.assertEqual('r1', self.queue.get().id)
+
+    def test_outdated_update_dropped(self):
+        timestamp = self.queue.start_sync()
+        self._update('r1', action=l3_agent.DELETE_ROUTER,
+                     timestamp=timestamp + 1)
+        self.queue.done(self.queue.get())
+        self._update('r1', l3_agent.PRIORITY_SYNC_ROUTERS_TASK,
+                     router={'id': 'r1'}, timestamp=timestamp)
+        self.queue.end_sync()
+        self.assertEqual(0, len(self.queue))
+
+    def test_latest_forgotten_when_processed(self):
+        self._update('r1')
+        self.queue.done(self.queue.get())
+        self.assertEqual({}, self.queue._latest)
+
+    def test_latest_forgotten_after_sync(self):
+        self.queue.start_sync()
+        self._update('r1')
+        self._update('r2')
+        self.queue.done(self.queue.get())
+        self.queue.end_sync()
+        self.assertEqual(['r2'], list(self.queue._latest))
@@ -1663,6 +1663,42 @@ class L3AgentDbTestCaseBase(L3NatTestCaseMixin):
             self.assertIsNotNone(floatingips[0]['fixed_ip_address'])
             self.assertIsNotNone(floatingips[0]['router_id'])
 
+    def _get_sync_data_statements(self, router_ids):
+        dialect = qdbapi.get_session().get_bind().dialect
+        with mock.patch.object(dialect, 'do_execute',
+                               wraps=dialect.do_execute) as do_execute:
+            routers = self.plugin.get_sync_data(
+                context.get_admin_context(), router_ids)
+        return routers, do_execute.call_count
+
+    def test_l3_agent_routers_query_statements(self):
+        with contextlib.nested(
+            self.router(), self.router(), self.subnet(cidr='10.0.0.0/24'),
+            self.subnet(cidr='10.0.1.0/24'),
+            self.subnet(cidr='10.0.2.0/24')) as (r1, r2, ext, s1, s2):
+            self._set_net_external(ext['subnet']['network_id'])
+            for r, s in ((r1, s1), (r2, s2)):
+                self._add_external_gateway_to_router(
+                    r['router']['id'], ext['subnet']['network_id'])
+                self._router_interface_action('add', r['router']['id'],
+                                              s['subnet']['id'], None)
+            routers, one_router = self._get_sync_data_statements(
+                [r1['router']['id']])
+            self.assertEqual(1, len(routers))
+            routers, two_routers = self._get_sync_data_statements(None)
+            self.assertEqual(2, len(routers))
+            # The number of statements does not depend on the routers
+            self.assertEqual(one_router, two_routers)
+            for router in routers:
+                self.assertEqual(ext['subnet']['id'],
+                                 router['gw_port']['subnet']['id'])
+                self.assertEqual(1, len(router[l3_constants.INTERFACE_KEY]))
+            for r, s in ((r1, s1), (r2, s2)):
+                self._router_interface_action('remove', r['router']['id'],
+                                              s['subnet']['id'], None)
+                self._remove_external_gateway_from_router(
+                    r['router']['id'], ext['subnet']['network_id'])
+
     def _test_notify_op_agent(self, target_func, *args):
         l3_rpc_agent_api_str = (
             'neutron.api.rpc.agentnotifiers.l3_rpc_agent_api.L3AgentNotifyAPI')
@@ -15,6 +15,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
 import os
 
 import mock
@@ -320,6 +321,7 @@ class TestBase(base.BaseTestCase):
         self.addCleanup(self.execute_p.stop)
         self.safe = self.replace_p.start()
         self.execute = self.execute_p.start()
+        self.addCleanup(dhcp.Dnsmasq._config_files.clear)
 
 
 class TestDhcpBase(TestBase):
@@ -917,6 +919,44 @@ tag:tag1,249,%s,%s""".lstrip() % (fake_v6,
                                         mock.call(exp_opt_name, exp_opt_data)])
             mock_open.assert_called_once_with('/proc/5/cmdline', 'r')
 
+    def test_reload_allocations_unchanged(self):
+        with contextlib.nested(
+            mock.patch('os.path.isdir', return_value=True),
+            mock.patch('os.path.exists', return_value=True),
+            mock.patch.object(dhcp.Dnsmasq, 'active'),
+            mock.patch.object(dhcp.Dnsmasq, 'pid'),
+            mock.patch.object(dhcp.Dnsmasq, '_make_subnet_interface_ip_map',
+                              return_value={})
+        ) as (isdir, exists, active, pid, ip_map):
+            active.__get__ = mock.Mock(return_value=True)
+            pid.__get__ = mock.Mock(return_value=5)
+            dm = dhcp.Dnsmasq(self.conf, FakeDualNetwork(),
+                              version=float(2.59))
+            dm.reload_allocations()
+            self.assertEqual(2, self.safe.call_count)
+            self.assertEqual(1, self.execute.call_count)
+
+            dm = dhcp.Dnsmasq(self.conf, FakeDualNetwork(),
+                              version=float(2.59))
+            dm.reload_allocations()
+            self.assertEqual(2, self.safe.call_count)
+            self.assertEqual(1, self.execute.call_count)
+
+            dm.network.ports = [FakePort1()]
+            dm.reload_allocations()
+            self.assertEqual(3, self.safe.call_count)
+            self.assertEqual(2, self.execute.call_count)
+
+    def test_remove_config_files_forgets_content(self):
+        with mock.patch('os.path.isdir', return_value=True):
+            dm = dhcp.Dnsmasq(self.conf, FakeDualNetwork(),
+                              version=float(2.59))
+            with mock.patch('shutil.rmtree'):
+                dm._output_hosts_file()
+                self.assertEqual(1, len(dhcp.Dnsmasq._config_files))
+                dm._remove_config_files()
+        self.assertEqual({}, dhcp.Dnsmasq._config_files)
+
     def test_make_subnet_interface_ip_map(self):
         with mock.patch('neutron.agent.linux.ip_lib.IPDevice') as ip_dev:
             ip_dev.return_value.addr.list.return_value = [
@@ -16,8 +16,10 @@
 #    under the License.
 
 import mock
+from oslo.config import cfg
 
 from neutron.agent.linux import ip_lib
+from neutron.agent.linux import netlink
 from neutron.common import exceptions
 from neutron.tests import base
 
@@ -692,3 +694,101 @@ class TestDeviceExists(base.BaseTestCase):
             _execute.return_value = ''
             _execute.side_effect = RuntimeError
             self.assertFalse(ip_lib.device_exists('eth0'))
+
+
+class TestNetlinkBackend(base.BaseTestCase):
+    def setUp(self):
+        super(TestNetlinkBackend, self).setUp()
+        cfg.CONF.register_opts(ip_lib.OPTS)
+        cfg.CONF.set_override('ip_lib_backend', 'netlink')
+        self.execute_p = mock.patch.object(ip_lib.SubProcessBase, '_execute')
+        self.execute = self.execute_p.start()
+        self.supported_p = mock.patch.object(netlink, 'is_supported',
+                                             return_value=True)
+        self.supported_p.start()
+        self.root_p = mock.patch.object(netlink, 'can_enter_namespace',
+                                        return_value=True)
+        self.can_enter_namespace = self.root_p.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_device_exists(self):
+        with mock.patch.object(netlink, 'get_link_attributes',
+                               return_value={'link/ether': 'cc:dd'}) as get:
+            self.assertTrue(ip_lib.device_exists('eth0', namespace='ns'))
+        get.assert_called_once_with('eth0', 'ns')
+        self.assertFalse(self.execute.called)
+
+    def test_device_does_not_exist(self):
+        with mock.patch.object(netlink, 'get_link_attributes',
+                               side_effect=RuntimeError):
+            self.assertFalse(ip_lib.device_exists('eth0'))
+
+    def test_namespace_requires_root(self):
+        self.can_enter_namespace.return_value = False
+        self.execute.return_value = LINK_SAMPLE[1]
+        with mock.patch.object(netlink, 'get_link_attributes') as get:
+            self.assertTrue(ip_lib.device_exists('eth0', 'sudo', 'ns'))
+        self.assertFalse(get.called)
+        self.assertTrue(self.execute.called)
+
+    def test_not_selected(self):
+        cfg.CONF.set_override('ip_lib_backend', 'subprocess')
+        self.execute.return_value = LINK_SAMPLE[1]
+        with mock.patch.object(netlink, 'get_link_attributes') as get:
+            self.assertTrue(ip_lib.device_exists('eth0'))
+        self.assertFalse(get.called)
+
+    def test_netlink_error_runs_ip(self):
+        self.execute.return_value = LINK_SAMPLE[1]
+        with mock.patch.object(netlink, 'get_link_attributes',
+                               side_effect=netlink.NetlinkError()):
+            self.assertTrue(ip_lib.device_exists('eth0'))
+        self.assertTrue(self.execute.called)
+
+    def test_get_devices(self):
+        links = [(1, 'lo', {}), (2, 'eth0', {})]
+        with mock.patch.object(netlink, 'get_links', return_value=links):
+            devices = ip_lib.IPWrapper('sudo', 'ns').get_devices(
+                exclude_loopback=True)
+        self.assertEqual(['eth0'], [device.name for device in devices])
+        self.assertEqual('ns', devices[0].namespace)
+
+    def test_addr_list(self):
+        addresses = [dict(cidr='172.16.77.240/24', broadcast='172.16.77.255',
+                          scope='global', ip_version=4, dynamic=False)]
+        with mock.patch.object(netlink, 'get_addresses',
+                               return_value=addresses) as get:
+            device = ip_lib.IPDevice('tap0', 'sudo', 'ns')
+            self.assertEqual(addresses, device.addr.list(scope='global',
+                                                         to='172.16.77.0/24'))
+        get.assert_called_once_with('tap0', 'ns', scope='global',
+                                    to='172.16.77.0/24')
+
+    def test_addr_list_with_filters_runs_ip(self):
+        self.execute.return_value = ''
+        with mock.patch.object(netlink, 'get_addresses') as get:
+            ip_lib.IPDevice('tap0').addr.list(filters=['permanent'])
+        self.assertFalse(get.called)
+        self.assertTrue(self.execute.called)
+
+    def test_get_gateway(self):
+        with mock.patch.object(netlink, 'get_default_gateway',
+                               return_value={'gateway': '10.0.0.1'}) as get:
+            device = ip_lib.IPDevice('eth0', 'sudo', 'ns')
+            self.assertEqual({'gateway': '10.0.0.1'},
+                             device.route.get_gateway())
+        get.assert_called_once_with('eth0', 'ns', scope=None)
+
+    def test_netns_exists(self):
+        with mock.patch.object(netlink, 'list_namespaces',
+                               return_value=NETNS_SAMPLE):
+            ip = ip_lib.IPWrapper('sudo')
+            self.assertTrue(ip.netns.exists(NETNS_SAMPLE[0]))
+            self.assertFalse(ip.netns.exists('other'))
+        self.assertFalse(self.execute.called)
+
+    def test_get_namespaces(self):
+        with mock.patch.object(netlink, 'list_namespaces',
+                               return_value=NETNS_SAMPLE):
+            self.assertEqual(NETNS_SAMPLE,
+                             ip_lib.IPWrapper.get_namespaces('sudo'))
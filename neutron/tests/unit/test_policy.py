@@ -15,12 +15,14 @@
 
 """Test of Policy Engine For Neutron"""
 
+import contextlib
 import json
 import StringIO
 import urllib2
 
 import fixtures
 import mock
+from oslo.config import cfg
 
 import neutron
 from neutron.api.v2 import attributes
@@ -166,6 +168,87 @@ class PolicyTestCase(base.BaseTestCase):
         policy.enforce(admin_context, uppercase_action, self.target)
 
 
+class PolicyCacheTestCase(PolicyTestCase):
+    def setUp(self):
+        super(PolicyCacheTestCase, self).setUp()
+        cfg.CONF.set_override('policy_cache', True)
+
+    def test_check_on_any_target(self):
+        common_policy.set_rules(common_policy.Rules(dict(
+            (k, common_policy.parse_rule(v)) for k, v in {
+                "get_example": "role:compute_admin or tenant_id:%(tenant_id)s",
+                "get_example:attr": "not role:member and role:compute_admin",
+                "get_example:denied": "!"}.items())))
+        admin_context = context.Context('admin', 'fake',
+                                        roles=['compute_admin'])
+        self.assertIsNone(policy.check_if_exists_on_any_target(
+            self.context, "get_example"))
+        self.assertTrue(policy.check_if_exists_on_any_target(
+            admin_context, "get_example"))
+        self.assertTrue(policy.check_if_exists_on_any_target(
+            admin_context, "get_example:attr"))
+        self.assertFalse(policy.check_if_exists_on_any_target(
+            self.context, "get_example:denied"))
+
+    def test_check_on_any_target_non_existent_action_raises(self):
+        self.assertRaises(exceptions.PolicyRuleNotFound,
+                          policy.check_if_exists_on_any_target,
+                          self.context, "example:idonotexist")
+
+    def test_check_on_any_target_without_cache(self):
+        cfg.CONF.set_override('policy_cache', False)
+        self.assertIsNone(policy.check_if_exists_on_any_target(
+            self.context, "example:denied"))
+
+    def test_decision_cached_by_roles(self):
+        action = "example:lowercase_admin"
+        admin_context = context.Context('admin', 'fake', roles=['admin'])
+        role_check = common_policy.RoleCheck.__call__
+        with mock.patch.object(common_policy.RoleCheck, '__call__',
+                               autospec=True,
+                               side_effect=role_check) as check:
+            self.assertFalse(policy.check(self.context, action, {}))
+            self.assertTrue(policy.check(admin_context, action, {}))
+            call_count = check.call_count
+            for i in range(3):
+                self.assertFalse(policy.check(self.context, action, {}))
+                self.assertTrue(policy.check(admin_context, action, {}))
+        self.assertEqual(call_count, check.call_count)
+
+    def test_rules_compiled_again_when_replaced(self):
+        action = "example:allowed"
+        self.assertTrue(policy.check(self.context, action, self.target))
+        common_policy.set_rules(common_policy.Rules(
+            {action: common_policy.parse_rule('!')}))
+        self.assertFalse(policy.check(self.context, action, self.target))
+
+    def test_enforce_raises_on_falsy_result(self):
+        with mock.patch.object(policy, '_check_compiled', return_value=None):
+            self.assertRaises(exceptions.PolicyNotAuthorized, policy.enforce,
+                              self.context, "example:allowed", self.target)
+
+    def test_policy_file_checked_once_per_interval(self):
+        with contextlib.nested(
+            mock.patch.object(neutron.common.utils, 'read_cached_file'),
+            mock.patch.object(policy.time, 'time', return_value=1000)
+        ) as (read, time):
+            policy._POLICY_CHECKED_AT = None
+            for i in range(3):
+                policy.check(self.context, "example:allowed", self.target)
+            self.assertEqual(read.call_count, 1)
+            time.return_value += policy._POLICY_CHECK_INTERVAL
+            policy.check(self.context, "example:allowed", self.target)
+            self.assertEqual(read.call_count, 2)
+
+    def test_policy_file_checked_on_every_check_without_cache(self):
+        cfg.CONF.set_override('policy_cache', False)
+        with mock.patch.object(neutron.common.utils,
+                               'read_cached_file') as read:
+            for i in range(3):
+                policy.check(self.context, "example:allowed", self.target)
+        self.assertEqual(read.call_count, 3)
+
+
 class DefaultPolicyTestCase(base.BaseTestCase):
 
     def setUp(self):
@@ -548,3 +631,10 @@ class NeutronPolicyTestCase(base.BaseTestCase):
             {'extension:provider_network:set': 'rule:admin_only'},
             dict((policy, 'rule:admin_only') for policy in
                  expected_policies))
+
+
+class NeutronPolicyCacheTestCase(NeutronPolicyTestCase):
+
+    def setUp(self):
+        super(NeutronPolicyCacheTestCase, self).setUp()
+        cfg.CONF.set_override('policy_cache', True)
@@ -33,6 +33,7 @@ from neutron.db import securitygroups_rpc_base as sg_db_rpc
 from neutron.extensions import allowedaddresspairs as addr_pair
 from neutron.extensions import securitygroup as ext_sg
 from neutron.manager import NeutronManager
+from neutron.openstack.common.rpc import common as rpc_common
 from neutron.openstack.common.rpc import proxy
 from neutron.tests import base
 from neutron.tests.unit import test_extension_security_group as test_sg
@@ -285,6 +286,66 @@ class SGServerRpcCallBackMixinTestCase(test_sg.SecurityGroupDBTestCase):
                 self._delete('ports', port_id1)
                 self._delete('ports', port_id2)
 
+    def test_security_group_info_for_devices_ipv4_source_group(self):
+
+        with self.network() as n:
+            with nested(self.subnet(n),
+                        self.security_group(),
+                        self.security_group()) as (subnet_v4,
+                                                   sg1,
+                                                   sg2):
+                sg1_id = sg1['security_group']['id']
+                sg2_id = sg2['security_group']['id']
+                rule1 = self._build_security_group_rule(
+                    sg1_id,
+                    'ingress', const.PROTO_NAME_TCP, '24',
+                    '25', remote_group_id=sg2['security_group']['id'])
+                rules = {
+                    'security_group_rules': [rule1['security_group_rule']]}
+                res = self._create_security_group_rule(self.fmt, rules)
+                self.deserialize(self.fmt, res)
+                self.assertEqual(res.status_int, webob.exc.HTTPCreated.code)
+
+                res1 = self._create_port(
+                    self.fmt, n['network']['id'],
+                    security_groups=[sg1_id])
+                ports_rest1 = self.deserialize(self.fmt, res1)
+                port_id1 = ports_rest1['port']['id']
+                self.rpc.devices = {port_id1: ports_rest1['port']}
+                devices = [port_id1, 'no_exist_device']
+
+                res2 = self._create_port(
+                    self.fmt, n['network']['id'],
+                    security_groups=[sg2_id])
+                ports_rest2 = self.deserialize(self.fmt, res2)
+                port_id2 = ports_rest2['port']['id']
+                port_ip2 = ports_rest2['port']['fixed_ips'][0]['ip_address']
+                ctx = context.get_admin_context()
+                sg_info = self.rpc.security_group_info_for_devices(
+                    ctx, devices=devices)
+                self.assertEqual(sg_info['devices'].keys(), [port_id1])
+                port_rpc = sg_info['devices'][port_id1]
+                self.assertEqual(port_rpc['security_groups'], [sg1_id])
+                self.assertEqual(port_rpc['security_group_rules'], [])
+                expected = [{'direction': 'egress', 'ethertype': const.IPv4,
+                             'security_group_id': sg1_id},
+                            {'direction': 'egress', 'ethertype': const.IPv6,
+                             'security_group_id': sg1_id},
+                            {'direction': u'ingress',
+                             'protocol': const.PROTO_NAME_TCP,
+                             'ethertype': const.IPv4,
+                             'port_range_max': 25, 'port_range_min': 24,
+                             'remote_group_id': sg2_id,
+                             'security_group_id': sg1_id},
+                            ]
+                self.assertEqual(sg_info['security_groups'],
+                                 {sg1_id: expected})
+                self.assertEqual(sg_info['sg_member_ips'],
+                                 {sg2_id: {const.IPv4: [port_ip2],
+                                           const.IPv6: []}})
+                self._delete('ports', port_id1)
+                self._delete('ports', port_id2)
+
     def test_security_group_rules_for_devices_ipv6_ingress(self):
         fake_prefix = test_fw.FAKE_PREFIX[const.IPv6]
         with self.network() as n:
@@ -514,6 +575,8 @@ class SecurityGroupAgentRpcTestCase(base.BaseTestCase):
         self.firewall.defer_apply.side_effect = firewall_object.defer_apply
         self.agent.firewall = self.firewall
         rpc = mock.Mock()
+        rpc.security_group_info_for_devices.side_effect = (
+            rpc_common.RemoteError('UnsupportedRpcVersion'))
         self.agent.plugin_rpc = rpc
         self.fake_device = {'device': 'fake_device',
                             'security_groups': ['fake_sgid1', 'fake_sgid2'],
@@ -592,6 +655,63 @@ class SecurityGroupAgentRpcTestCase(base.BaseTestCase):
         self.agent.refresh_firewall([])
         self.firewall.assert_has_calls([])
 
+    def test_security_group_info_not_supported(self):
+        rpc = self.agent.plugin_rpc
+        self.agent.prepare_devices_filter(['fake_device'])
+        self.agent.refresh_firewall()
+        self.assertFalse(self.agent.sg_info_supported)
+        rpc.security_group_info_for_devices.assert_called_once_with(
+            None, ['fake_device'])
+        self.assertEqual(rpc.security_group_rules_for_devices.call_count, 2)
+
+    def test_security_group_info_error(self):
+        rpc = self.agent.plugin_rpc
+        rpc.security_group_info_for_devices.side_effect = (
+            rpc_common.RemoteError('DBError'))
+        self.assertRaises(rpc_common.RemoteError,
+                          self.agent.prepare_devices_filter, ['fake_device'])
+        self.assertIsNone(self.agent.sg_info_supported)
+
+    def test_security_group_info_expanded(self):
+        rpc = self.agent.plugin_rpc
+        rpc.security_group_info_for_devices.side_effect = None
+        dhcp_rule = {'direction': 'ingress', 'ethertype': const.IPv4,
+                     'protocol': 'udp', 'port_range_min': 68,
+                     'port_range_max': 68,
+                     'source_ip_prefix': '10.0.0.2/32'}
+        device = {'device': 'fake_device',
+                  'fixed_ips': ['10.0.0.3'],
+                  'security_groups': ['fake_sgid1'],
+                  'security_group_source_groups': [],
+                  'security_group_rules': [dhcp_rule]}
+        ingress_rule = {'direction': 'ingress', 'ethertype': const.IPv4,
+                        'security_group_id': 'fake_sgid1',
+                        'remote_group_id': 'fake_sgid1'}
+        egress_rule = {'direction': 'egress', 'ethertype': const.IPv6,
+                       'security_group_id': 'fake_sgid1',
+                       'remote_group_id': 'fake_sgid2'}
+        rpc.security_group_info_for_devices.return_value = {
+            'devices': {'fake_device': device},
+            'security_groups': {'fake_sgid1': [ingress_rule, egress_rule]},
+            'sg_member_ips': {
+                'fake_sgid1': {const.IPv4: ['10.0.0.3', '10.0.0.4'],
+                               const.IPv6: ['fe80::1']},
+                'fake_sgid2': {const.IPv4: ['10.0.0.5'],
+                               const.IPv6: ['fe80::2', 'fe80::3']}}}
+        self.agent.prepare_devices_filter(['fake_device'])
+
+        self.assertTrue(self.agent.sg_info_supported)
+        self.assertFalse(rpc.security_group_rules_for_devices.called)
+        expected_rules = [
+            dict(ingress_rule, source_ip_prefix='10.0.0.4/32'),
+            dict(egress_rule, dest_ip_prefix='fe80::2/128'),
+            dict(egress_rule, dest_ip_prefix='fe80::3/128'),
+            dhcp_rule]
+        self.assertEqual(device['security_group_rules'], expected_rules)
+        self.assertEqual(device['security_group_source_groups'],
+                         ['fake_sgid1', 'fake_sgid2'])
+        self.firewall.prepare_port_filter.assert_called_once_with(device)
+
 
 class FakeSGRpcApi(agent_rpc.PluginApi,
                    sg_rpc.SecurityGroupServerRpcApiMixin):
@@ -615,6 +735,17 @@ class SecurityGroupServerRpcApiTestCase(base.BaseTestCase):
              version=sg_rpc.SG_RPC_VERSION,
              topic='fake_topic')])
 
+    def test_security_group_info_for_devices(self):
+        self.rpc.security_group_info_for_devices(None, ['fake_device'])
+        self.rpc.call.assert_has_calls(
+            [call(None,
+             {'args':
+                 {'devices': ['fake_device']},
+             'method': 'security_group_info_for_devices',
+             'namespace': None},
+             version=sg_rpc.SG_INFO_RPC_VERSION,
+             topic='fake_topic')])
+
 
 class FakeSGNotifierAPI(proxy.RpcProxy,
                         sg_rpc.SecurityGroupAgentRpcApiMixin):
@@ -1047,6 +1178,31 @@ COMMIT
 # Completed by iptables_manager
 """ % IPTABLES_ARG
 
+# Only the ingress chains of the ports change from IPTABLES_FILTER_2
+IPTABLES_FILTER_2_3_NOFLUSH = """# Generated by iptables_manager
+*filter
+:%(bn)s-i_port1 - [0:0]
+:%(bn)s-i_port2 - [0:0]
+[0:0] -A %(bn)s-i_port1 -m state --state INVALID -j DROP
+[0:0] -A %(bn)s-i_port1 -m state --state RELATED,ESTABLISHED -j RETURN
+[0:0] -A %(bn)s-i_port1 -s 10.0.0.2 -p udp -m udp --sport 67 --dport 68 -j \
+RETURN
+[0:0] -A %(bn)s-i_port1 -p tcp -m tcp --dport 22 -j RETURN
+[0:0] -A %(bn)s-i_port1 -s 10.0.0.4 -j RETURN
+[0:0] -A %(bn)s-i_port1 -p icmp -j RETURN
+[0:0] -A %(bn)s-i_port1 -j %(bn)s-sg-fallback
+[0:0] -A %(bn)s-i_port2 -m state --state INVALID -j DROP
+[0:0] -A %(bn)s-i_port2 -m state --state RELATED,ESTABLISHED -j RETURN
+[0:0] -A %(bn)s-i_port2 -s 10.0.0.2 -p udp -m udp --sport 67 --dport 68 -j \
+RETURN
+[0:0] -A %(bn)s-i_port2 -p tcp -m tcp --dport 22 -j RETURN
+[0:0] -A %(bn)s-i_port2 -s 10.0.0.3 -j RETURN
+[0:0] -A %(bn)s-i_port2 -p icmp -j RETURN
+[0:0] -A %(bn)s-i_port2 -j %(bn)s-sg-fallback
+COMMIT
+# Completed by iptables_manager
+""" % IPTABLES_ARG
+
 
 IPTABLES_ARG['chains'] = CHAINS_EMPTY
 IPTABLES_FILTER_EMPTY = """# Generated by iptables_manager
@@ -1229,9 +1385,16 @@ class TestSecurityGroupAgentWithIptables(base.BaseTestCase):
 
         self.iptables = self.agent.firewall.iptables
         self.mox.StubOutWithMock(self.iptables, "execute")
+        # Check the whole filter tables are rendered on every apply instead
+        # of only the chains which changed.
+        self.dirty_chains_p = mock.patch.object(
+            self.iptables, '_get_dirty_chains', return_value=None)
+        self.dirty_chains_p.start()
+        self.nat_applied = False
 
         self.rpc = mock.Mock()
         self.agent.plugin_rpc = self.rpc
+        self.agent.sg_info_supported = False
         rule1 = [{'direction': 'ingress',
                   'protocol': const.PROTO_NAME_UDP,
                   'ethertype': const.IPv4,
@@ -1303,17 +1466,25 @@ class TestSecurityGroupAgentWithIptables(base.BaseTestCase):
         return mox.Regex(value)
 
     def _replay_iptables(self, v4_filter, v6_filter):
-        self.iptables.execute(
-            ['iptables-save', '-c'],
-            root_helper=self.root_helper).AndReturn('')
+        # The nat table only changes when it is first applied.
+        if self.nat_applied:
+            self.iptables.execute(
+                ['iptables-save', '-c', '-t', 'filter'],
+                root_helper=self.root_helper).AndReturn('')
+        else:
+            self.iptables.execute(
+                ['iptables-save', '-c'],
+                root_helper=self.root_helper).AndReturn('')
+            v4_filter = IPTABLES_NAT + v4_filter
+            self.nat_applied = True
 
         self.iptables.execute(
             ['iptables-restore', '-c'],
-            process_input=(self._regex(IPTABLES_NAT + v4_filter)),
+            process_input=(self._regex(v4_filter)),
             root_helper=self.root_helper).AndReturn('')
 
         self.iptables.execute(
-            ['ip6tables-save', '-c'],
+            ['ip6tables-save', '-c', '-t', 'filter'],
             root_helper=self.root_helper).AndReturn('')
 
         self.iptables.execute(
@@ -1321,6 +1492,16 @@ class TestSecurityGroupAgentWithIptables(base.BaseTestCase):
             process_input=self._regex(v6_filter),
             root_helper=self.root_helper).AndReturn('')
 
+    def _replay_iptables_noflush(self, v4_filter):
+        self.iptables.execute(
+            ['iptables-save', '-c', '-t', 'filter'],
+            root_helper=self.root_helper).AndReturn('')
+
+        self.iptables.execute(
+            ['iptables-restore', '-c', '--noflush'],
+            process_input=self._regex(v4_filter),
+            root_helper=self.root_helper).AndReturn('')
+
     def test_prepare_remove_port(self):
         self.rpc.security_group_rules_for_devices.return_value = self.devices1
         self._replay_iptables(IPTABLES_FILTER_1, IPTABLES_FILTER_V6_1)
@@ -1363,6 +1544,21 @@ class TestSecurityGroupAgentWithIptables(base.BaseTestCase):
 
         self.mox.VerifyAll()
 
+    def test_security_group_rule_updated_noflush(self):
+        # The rules of the ports change within their own chains only, just
+        # these chains are restored and the IPv6 table is left alone.
+        self.dirty_chains_p.stop()
+        self.rpc.security_group_rules_for_devices.return_value = self.devices2
+        self._replay_iptables(IPTABLES_FILTER_2, IPTABLES_FILTER_V6_2)
+        self._replay_iptables_noflush(IPTABLES_FILTER_2_3_NOFLUSH)
+        self.mox.ReplayAll()
+
+        self.agent.prepare_devices_filter(['tap_port1', 'tap_port3'])
+        self.rpc.security_group_rules_for_devices.return_value = self.devices3
+        self.agent.security_groups_rule_updated(['security_group1'])
+
+        self.mox.VerifyAll()
+
 
 class SGNotificationTestMixin():
     def test_security_group_rule_updated(self):
@@ -0,0 +1,97 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import eventlet
+import mock
+
+from neutron import service
+from neutron.tests import base
+
+
+class TestServeRpc(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestServeRpc, self).setUp()
+        self.plugin = mock.Mock()
+        get_plugin_p = mock.patch('neutron.manager.NeutronManager.get_plugin',
+                                  return_value=self.plugin)
+        get_plugin_p.start()
+        self.addCleanup(get_plugin_p.stop)
+        launcher_p = mock.patch.object(service.common_service,
+                                       'ProcessLauncher')
+        self.launcher_cls = launcher_p.start()
+        self.addCleanup(launcher_p.stop)
+
+    def test_serve_rpc_not_supported(self):
+        self.plugin.rpc_workers_supported.return_value = False
+        self.config(rpc_workers=2)
+        self.assertRaises(NotImplementedError, service.serve_rpc)
+        self.assertFalse(self.plugin.start_rpc_listener.called)
+        self.assertFalse(self.launcher_cls.called)
+
+    def test_serve_rpc_in_process(self):
+        rpc = service.serve_rpc()
+        self.assertIsInstance(rpc, service.RpcWorker)
+        self.plugin.start_rpc_listener.assert_called_once_with()
+        self.assertFalse(self.launcher_cls.called)
+
+    def test_serve_rpc_workers(self):
+        self.config(rpc_workers=2)
+        launcher = service.serve_rpc()
+        self.assertEqual(self.launcher_cls.return_value, launcher)
+        launcher.launch_service.assert_called_once_with(mock.ANY, workers=2)
+        self.assertFalse(self.plugin.start_rpc_listener.called)
+
+    def test_serve_rpc_workers_shared_launcher(self):
+        self.config(rpc_workers=2)
+        launcher = mock.Mock()
+        self.assertEqual(launcher, service.serve_rpc(launcher))
+        launcher.launch_service.assert_called_once_with(mock.ANY, workers=2)
+        self.assertFalse(self.launcher_cls.called)
+
+
+class TestRpcWorker(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestRpcWorker, self).setUp()
+        self.plugin = mock.Mock()
+        self.worker = service.RpcWorker(self.plugin)
+        get_engine_p = mock.patch.object(service.session, 'get_engine')
+        self.get_engine = get_engine_p.start()
+        self.addCleanup(get_engine_p.stop)
+        reset_p = mock.patch.object(service.q_rpc, 'reset_connection_pool')
+        self.reset_connection_pool = reset_p.start()
+        self.addCleanup(reset_p.stop)
+
+    def test_start_in_parent_keeps_connections(self):
+        self.worker.start()
+        self.plugin.start_rpc_listener.assert_called_once_with()
+        self.assertFalse(self.get_engine.called)
+        self.assertFalse(self.reset_connection_pool.called)
+
+    def test_start_in_child_drops_parent_connections(self):
+        with mock.patch('os.getpid', return_value=-1):
+            self.worker.start()
+        self.get_engine.return_value.pool.dispose.assert_called_once_with()
+        self.reset_connection_pool.assert_called_once_with()
+        self.plugin.start_rpc_listener.assert_called_once_with()
+
+    def test_stop_kills_consumer_thread(self):
+        thread = mock.Mock(spec=eventlet.greenthread.GreenThread)
+        self.plugin.start_rpc_listener.return_value = thread
+        self.worker.start()
+        self.worker.stop()
+        thread.kill.assert_called_once_with()
@@ -15,7 +15,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+import errno
 import os
+import signal
 import socket
 import urllib2
 
@@ -55,6 +58,54 @@ class TestWSGIServer(base.BaseTestCase):
         server.stop()
         server.wait()
 
+    def test_start_multiple_workers(self):
+        server = wsgi.Server("test_multiple_processes")
+        with contextlib.nested(
+            mock.patch.object(server, '_get_socket'),
+            mock.patch.object(wsgi.common_service, 'ProcessLauncher')
+        ) as (get_socket, launcher_cls):
+            launcher = launcher_cls.return_value
+            server.start(None, 0, host="127.0.0.1", workers=2)
+            self.assertIsInstance(server._server, wsgi.WorkerService)
+            launcher.launch_service.assert_called_once_with(server._server,
+                                                            workers=2)
+            server.wait()
+            launcher.wait.assert_called_once_with()
+
+    def test_stop_multiple_workers(self):
+        server = wsgi.Server("test_multiple_processes")
+        with contextlib.nested(
+            mock.patch.object(server, '_get_socket'),
+            mock.patch.object(wsgi.common_service, 'ProcessLauncher'),
+            mock.patch('os.kill',
+                       side_effect=[None, OSError(errno.ESRCH, 'gone')])
+        ) as (get_socket, launcher_cls, kill):
+            launcher = launcher_cls.return_value
+            launcher.children = {123: mock.Mock(), 456: mock.Mock()}
+            server.start(None, 0, host="127.0.0.1", workers=2)
+            server.stop()
+            self.assertFalse(launcher.running)
+            kill.assert_has_calls([mock.call(123, signal.SIGTERM),
+                                   mock.call(456, signal.SIGTERM)],
+                                  any_order=True)
+            server.wait()
+            launcher.wait.assert_called_once_with()
+
+    def test_worker_service_start_drops_parent_connections(self):
+        server = mock.Mock()
+        worker = wsgi.WorkerService(server, 'app')
+        with contextlib.nested(
+            mock.patch.object(wsgi.session, 'get_engine'),
+            mock.patch.object(wsgi.q_rpc, 'reset_connection_pool')
+        ) as (get_engine, reset_pool):
+            worker.start()
+        get_engine.return_value.pool.dispose.assert_called_once_with()
+        reset_pool.assert_called_once_with()
+        server.pool.spawn.assert_called_once_with(server._run, 'app',
+                                                  server._socket)
+        worker.stop()
+        server.pool.spawn.return_value.kill.assert_called_once_with()
+
     def test_ipv6_listen_called_with_scope(self):
         server = wsgi.Server("test_app")
 
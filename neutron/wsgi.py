@@ -22,6 +22,7 @@ from __future__ import print_function
 
 import errno
 import os
+import signal
 import socket
 import ssl
 import sys
@@ -38,10 +39,13 @@ import webob.exc
 
 from neutron.common import constants
 from neutron.common import exceptions as exception
+from neutron.common import rpc as q_rpc
 from neutron import context
+from neutron.openstack.common.db.sqlalchemy import session
 from neutron.openstack.common import gettextutils
 from neutron.openstack.common import jsonutils
 from neutron.openstack.common import log as logging
+from neutron.openstack.common import service as common_service
 
 socket_opts = [
     cfg.IntOpt('backlog',
@@ -84,12 +88,41 @@ def run_server(application, port):
     eventlet.wsgi.server(sock, application)
 
 
+class WorkerService(object):
+    """Wraps a worker to be handled by ProcessLauncher."""
+
+    def __init__(self, service, application):
+        self._service = service
+        self._application = application
+        self._server = None
+
+    def start(self):
+        # This runs in a process just forked from the parent: its
+        # database and messaging connections are shared with the parent
+        # and must not be used.
+        session.get_engine(sqlite_fk=True).pool.dispose()
+        q_rpc.reset_connection_pool()
+        self._server = self._service.pool.spawn(self._service._run,
+                                                self._application,
+                                                self._service._socket)
+
+    def wait(self):
+        self._server.wait()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.kill()
+            self._server = None
+
+
 class Server(object):
     """Server class to manage multiple WSGI sockets and applications."""
 
     def __init__(self, name, threads=1000):
         self.pool = eventlet.GreenPool(threads)
         self.name = name
+        self._launcher = None
+        self._server = None
 
     def _get_socket(self, host, port, backlog):
         bind_addr = (host, port)
@@ -168,8 +201,12 @@ class Server(object):
 
         return sock
 
-    def start(self, application, port, host='0.0.0.0'):
-        """Run a WSGI server with the given application."""
+    def start(self, application, port, host='0.0.0.0', workers=0):
+        """Run a WSGI server with the given application.
+
+        With workers, the requests are served by that many child
+        processes sharing the listening socket.
+        """
         self._host = host
         self._port = port
         backlog = CONF.backlog
@@ -177,7 +214,13 @@ class Server(object):
         self._socket = self._get_socket(self._host,
                                         self._port,
                                         backlog=backlog)
-        self._server = self.pool.spawn(self._run, application, self._socket)
+        if workers < 1:
+            self._server = self.pool.spawn(self._run, application,
+                                           self._socket)
+        else:
+            self._launcher = common_service.ProcessLauncher()
+            self._server = WorkerService(self, application)
+            self._launcher.launch_service(self._server, workers=workers)
 
     @property
     def host(self):
@@ -187,13 +230,32 @@ class Server(object):
     def port(self):
         return self._socket.getsockname()[1] if self._socket else self._port
 
+    @property
+    def launcher(self):
+        """The ProcessLauncher of the worker processes, if any."""
+        return self._launcher
+
     def stop(self):
-        self._server.kill()
+        if self._launcher:
+            # Stop respawning the workers and terminate them, wait()
+            # then reaps them.
+            self._launcher.running = False
+            for pid in self._launcher.children:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except OSError as exc:
+                    if exc.errno != errno.ESRCH:
+                        raise
+        else:
+            self._server.kill()
 
     def wait(self):
         """Wait until all servers have completed running."""
         try:
-            self.pool.waitall()
+            if self._launcher:
+                self._launcher.wait()
+            else:
+                self.pool.waitall()
         except KeyboardInterrupt:
             pass
 
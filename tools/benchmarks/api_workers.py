@@ -0,0 +1,87 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Load benchmark of GET /v2.0/ports against a running neutron-server.
+
+Sends the same list request from an increasing number of concurrent
+clients and prints the requests per second reached at each level.  Run
+it once per api_workers setting of the server, e.g. 0, 2, 4 and 8 on a
+host with at least as many cores, to compare how the API scales.
+
+Usage: python tools/benchmarks/api_workers.py [--url http://127.0.0.1:9696]
+           [--token TOKEN] [--concurrency 1,2,4,8,16] [--requests 500]
+"""
+from __future__ import print_function
+
+import argparse
+import sys
+import threading
+import time
+import urllib2
+
+
+def _client(request, count, errors):
+    for i in range(count):
+        try:
+            urllib2.urlopen(request).read()
+        except urllib2.URLError:
+            errors.append(1)
+
+
+def run(url, token, concurrency, requests):
+    """Return the requests per second and errors of one load level."""
+    request = urllib2.Request(url + '/v2.0/ports')
+    request.add_header('Accept', 'application/json')
+    if token:
+        request.add_header('X-Auth-Token', token)
+    errors = []
+    threads = [threading.Thread(target=_client,
+                                args=(request, requests // concurrency,
+                                      errors))
+               for i in range(concurrency)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done = (requests // concurrency) * concurrency
+    return done / (time.time() - start), len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--url', default='http://127.0.0.1:9696')
+    parser.add_argument('--token', help='keystone token, if the server '
+                        'uses keystone authentication')
+    parser.add_argument('--concurrency', default='1,2,4,8,16',
+                        help='comma separated numbers of clients')
+    parser.add_argument('--requests', type=int, default=500,
+                        help='number of requests per level')
+    args = parser.parse_args()
+
+    # Warm up the server and check it answers
+    _, errors = run(args.url, args.token, 1, 1)
+    if errors:
+        sys.exit('%s/v2.0/ports does not answer' % args.url)
+
+    print('%12s %12s %8s' % ('concurrency', 'req/s', 'errors'))
+    for concurrency in [int(c) for c in args.concurrency.split(',')]:
+        rate, errors = run(args.url, args.token, concurrency, args.requests)
+        print('%12d %12.1f %8d' % (concurrency, rate, errors))
+
+
+if __name__ == '__main__':
+    main()
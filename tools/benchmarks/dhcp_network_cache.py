@@ -0,0 +1,149 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark of the DHCP agent network cache under port events.
+
+Replays the port create, update and delete events of one network with
+many ports against the cache, the way the DHCP agent notification
+handlers apply them, and prints the events per second of each kind.
+The same events are replayed against a cache scanning the ports of the
+network, as the cache did before it indexed them.  The memory used by
+one port as a DictModel and as a PortModel is printed too.
+
+Usage: python tools/benchmarks/dhcp_network_cache.py [--ports 10000]
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from neutron.agent import dhcp_agent  # noqa
+from neutron.agent.linux import dhcp  # noqa
+
+NETWORK_ID = '12345678-1234-5678-1234567890ab'
+
+
+class ScanningNetworkCache(dhcp_agent.NetworkCache):
+    """The port methods of the cache before the ports were indexed."""
+
+    def put_port(self, port):
+        network = self.get_network_by_id(port.network_id)
+        for index in range(len(network.ports)):
+            if network.ports[index].id == port.id:
+                network.ports[index] = port
+                break
+        else:
+            network.ports.append(port)
+
+        self.port_lookup[port.id] = network.id
+
+    def remove_port(self, port):
+        network = self.get_network_by_port_id(port.id)
+
+        for index in range(len(network.ports)):
+            if network.ports[index] == port:
+                del network.ports[index]
+                del self.port_lookup[port.id]
+                break
+
+    def get_port_by_id(self, port_id):
+        network = self.get_network_by_port_id(port_id)
+        if network:
+            for port in network.ports:
+                if port.id == port_id:
+                    return port
+
+
+def _port(index, ip_index):
+    return {'id': 'port-%d' % index,
+            'network_id': NETWORK_ID,
+            'mac_address': 'fa:16:3e:%02x:%02x:%02x' % (
+                index >> 16, (index >> 8) & 0xff, index & 0xff),
+            'device_id': 'device-%d' % index,
+            'device_owner': 'compute:nova',
+            'admin_state_up': True,
+            'status': 'ACTIVE',
+            'name': '',
+            'tenant_id': 'tenant',
+            'binding:host_id': 'host',
+            'fixed_ips': [{'subnet_id': 'subnet',
+                           'ip_address': '10.%d.%d.%d' % (
+                               ip_index >> 16, (ip_index >> 8) & 0xff,
+                               ip_index & 0xff)}]}
+
+
+def _timed(events, handler):
+    start = time.time()
+    for event in events:
+        handler(event)
+    return len(events) / (time.time() - start)
+
+
+def run(cache, ports):
+    """Return the create, update and delete events per second of cache."""
+    cache.put(dhcp.NetModel(False, {'id': NETWORK_ID, 'subnets': [],
+                                    'ports': []}))
+
+    def create(port):
+        cache.put_port(dhcp.PortModel(port))
+
+    def update(port):
+        cache.get_port_by_id(port['id'])
+        cache.put_port(dhcp.PortModel(port))
+
+    def delete(port_id):
+        port = cache.get_port_by_id(port_id)
+        cache.remove_port(port)
+
+    return (_timed([_port(i, i) for i in range(ports)], create),
+            _timed([_port(i, ports + i) for i in range(ports)], update),
+            _timed(['port-%d' % i for i in range(ports)], delete))
+
+
+def _size(model):
+    size = sys.getsizeof(model)
+    if hasattr(model, '__dict__'):
+        size += sys.getsizeof(model.__dict__)
+    if getattr(model, '_extra', None):
+        size += sys.getsizeof(model._extra)
+    return size + sum(_size(fixed_ip)
+                      for fixed_ip in getattr(model, 'fixed_ips', []))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--ports', type=int, default=10000,
+                        help='number of ports of the network')
+    args = parser.parse_args()
+
+    print('%10s %12s %12s %12s' % ('cache', 'create/s', 'update/s',
+                                   'delete/s'))
+    for name, cache in (('scanning', ScanningNetworkCache()),
+                        ('indexed', dhcp_agent.NetworkCache())):
+        print('%10s %12.1f %12.1f %12.1f' % ((name,) + run(cache,
+                                                           args.ports)))
+
+    port = _port(0, 0)
+    print('\nbytes per port: DictModel %d, PortModel %d' % (
+        _size(dhcp.DictModel(port)), _size(dhcp.PortModel(port))))
+
+
+if __name__ == '__main__':
+    main()
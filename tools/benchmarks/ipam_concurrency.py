@@ -0,0 +1,151 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark of concurrent port creations on one subnet per IPAM backend.
+
+Creates a network with one /16 subnet, then starts threads which all
+create ports on it at the same time with the core DB plugin, as the API
+workers of a server under load do.  For each IPAM backend, the ports
+created per second, the mean and maximum time of a creation and the
+creations which failed, by error, are printed.
+
+The database is a temporary SQLite file by default, give the URL of an
+empty database with --connection to measure against MySQL.  SQLite does
+not lock rows: the creations which fail there are the ones which
+conflicted on a row, that MySQL or PostgreSQL would have made wait.
+
+Usage: python tools/benchmarks/ipam_concurrency.py [--connection URL]
+           [--workers 50] [--ports 4] [--cidr 10.0.0.0/16]
+"""
+from __future__ import print_function
+
+import argparse
+import collections
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from oslo.config import cfg  # noqa
+
+from neutron.api.v2 import attributes  # noqa
+from neutron.common import config  # noqa
+from neutron import context  # noqa
+from neutron.db import db_base_plugin_v2  # noqa
+
+BACKENDS = ['neutron.db.ipam.AvailabilityRangeIpam',
+            'neutron.db.ipam.RandomIpam']
+TENANT_ID = 'benchmark'
+
+
+def _create_subnet(plugin, cidr):
+    ctx = context.get_admin_context()
+    network = plugin.create_network(ctx, {'network': {
+        'name': 'benchmark', 'admin_state_up': True, 'shared': False,
+        'tenant_id': TENANT_ID}})
+    plugin.create_subnet(ctx, {'subnet': {
+        'name': 'benchmark', 'network_id': network['id'],
+        'tenant_id': TENANT_ID, 'ip_version': 4, 'cidr': cidr,
+        'enable_dhcp': True,
+        'gateway_ip': attributes.ATTR_NOT_SPECIFIED,
+        'allocation_pools': attributes.ATTR_NOT_SPECIFIED,
+        'dns_nameservers': attributes.ATTR_NOT_SPECIFIED,
+        'host_routes': attributes.ATTR_NOT_SPECIFIED}})
+    return network['id']
+
+
+def run(plugin, network_id, workers, ports):
+    """Return the ports per second, mean and max time and the failures."""
+    start = threading.Event()
+    times = []
+    failures = collections.Counter()
+
+    def worker(index):
+        start.wait()
+        for i in range(ports):
+            port = {'port': {
+                'network_id': network_id, 'tenant_id': TENANT_ID,
+                'name': 'port-%d-%d' % (index, i), 'admin_state_up': True,
+                'device_id': 'device-%d-%d' % (index, i),
+                'device_owner': 'compute:nova',
+                'mac_address': attributes.ATTR_NOT_SPECIFIED,
+                'fixed_ips': attributes.ATTR_NOT_SPECIFIED}}
+            begin = time.time()
+            try:
+                plugin.create_port(context.get_admin_context(), port)
+                times.append(time.time() - begin)
+            except Exception as e:
+                failures[e.__class__.__name__] += 1
+
+    threads = [threading.Thread(target=worker, args=(index,))
+               for index in range(workers)]
+    for thread in threads:
+        thread.start()
+    begin = time.time()
+    start.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - begin
+    if not times:
+        return 0.0, 0.0, 0.0, failures
+    return (len(times) / elapsed, sum(times) / len(times), max(times),
+            failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--connection',
+                        help='SQLAlchemy URL of an empty database')
+    parser.add_argument('--workers', type=int, default=50,
+                        help='number of threads creating ports')
+    parser.add_argument('--ports', type=int, default=4,
+                        help='number of ports created by each thread')
+    parser.add_argument('--cidr', default='10.0.0.0/16')
+    args = parser.parse_args()
+
+    config.parse([])
+    path = None
+    if not args.connection:
+        fd, path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+        args.connection = 'sqlite:///%s' % path
+    cfg.CONF.set_override('connection', args.connection, 'database')
+    cfg.CONF.set_override('max_pool_size', args.workers, 'database')
+    # Each backend allocates from its own network with the same subnet
+    cfg.CONF.set_override('allow_overlapping_ips', True)
+    try:
+        print('%40s %10s %10s %10s  %s' % ('backend', 'ports/s', 'mean (s)',
+                                           'max (s)', 'failures'))
+        for backend in BACKENDS:
+            cfg.CONF.set_override('ipam_driver', backend)
+            plugin = db_base_plugin_v2.NeutronDbPluginV2()
+            network_id = _create_subnet(plugin, args.cidr)
+            rate, mean, maximum, failures = run(plugin, network_id,
+                                                args.workers, args.ports)
+            print('%40s %10.1f %10.3f %10.3f  %s' % (
+                backend, rate, mean, maximum,
+                ', '.join('%s: %d' % failure
+                          for failure in failures.items()) or '-'))
+    finally:
+        if path:
+            os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Micro-benchmark of the IptablesManager diff engine.
+
+Builds a filter table shaped like the security group chains of a dense
+compute node, renders the matching 'iptables-save -c' output and times
+IptablesManager._modify_rules against the quadratic implementation it
+replaced.  Both must produce the same chains and the same rules, in the
+same order, for every chain.
+
+Usage: python tools/benchmarks/iptables_manager.py [--sizes 1000,10000]
+"""
+from __future__ import print_function
+
+import argparse
+import collections
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from neutron.agent.linux import iptables_manager  # noqa
+
+RULES_PER_CHAIN = 50
+
+
+def legacy_modify_rules(self, current_lines, table, table_name):
+    """The IptablesManager._modify_rules this benchmark compares against.
+
+    Every chain and rule rescans the saved table with substring matches,
+    which makes it quadratic in the number of rules.
+
+    """
+    unwrapped_chains = table.unwrapped_chains
+    chains = table.chains
+    remove_chains = table.remove_chains
+    rules = table.rules
+    remove_rules = table.remove_rules
+
+    if not current_lines:
+        fake_table = ['# Generated by iptables_manager',
+                      '*' + table_name, 'COMMIT',
+                      '# Completed by iptables_manager']
+        current_lines = fake_table
+
+    # Fill old_filter with any chains or rules we might have added,
+    # they could have a [packet:byte] count we want to preserve.
+    # Fill new_filter with any chains or rules without our name in them.
+    old_filter, new_filter = [], []
+    for line in current_lines:
+        (old_filter if self.wrap_name in line else
+         new_filter).append(line.strip())
+
+    rules_index = self._find_rules_index(new_filter)
+
+    all_chains = [':%s' % name for name in unwrapped_chains]
+    all_chains += [':%s-%s' % (self.wrap_name, name) for name in chains]
+
+    # Iterate through all the chains, trying to find an existing
+    # match.
+    our_chains = []
+    for chain in all_chains:
+        chain_str = str(chain).strip()
+
+        orig_filter = [s for s in old_filter if chain_str in s.strip()]
+        dup_filter = [s for s in new_filter if chain_str in s.strip()]
+        new_filter = [s for s in new_filter if chain_str not in s.strip()]
+
+        # if no old or duplicates, use original chain
+        if orig_filter:
+            # grab the last entry, if there is one
+            old = orig_filter[-1]
+            chain_str = str(old).strip()
+        elif dup_filter:
+            # grab the last entry, if there is one
+            dup = dup_filter[-1]
+            chain_str = str(dup).strip()
+        else:
+            # add-on the [packet:bytes]
+            chain_str += ' - [0:0]'
+
+        our_chains += [chain_str]
+
+    # Iterate through all the rules, trying to find an existing
+    # match.
+    our_rules = []
+    bot_rules = []
+    for rule in rules:
+        rule_str = str(rule).strip()
+        # Further down, we weed out duplicates from the bottom of the
+        # list, so here we remove the dupes ahead of time.
+
+        orig_filter = [s for s in old_filter if rule_str in s.strip()]
+        dup_filter = [s for s in new_filter if rule_str in s.strip()]
+        new_filter = [s for s in new_filter if rule_str not in s.strip()]
+
+        # if no old or duplicates, use original rule
+        if orig_filter:
+            # grab the last entry, if there is one
+            old = orig_filter[-1]
+            rule_str = str(old).strip()
+        elif dup_filter:
+            # grab the last entry, if there is one
+            dup = dup_filter[-1]
+            rule_str = str(dup).strip()
+            # backup one index so we write the array correctly
+            rules_index -= 1
+        else:
+            # add-on the [packet:bytes]
+            rule_str = '[0:0] ' + rule_str
+
+        if rule.top:
+            # rule.top == True means we want this rule to be at the top.
+            our_rules += [rule_str]
+        else:
+            bot_rules += [rule_str]
+
+    our_rules += bot_rules
+
+    new_filter[rules_index:rules_index] = our_rules
+    new_filter[rules_index:rules_index] = our_chains
+
+    def _strip_packets_bytes(line):
+        # strip any [packet:byte] counts at start or end of lines
+        if line.startswith(':'):
+            # it's a chain, for example, ":neutron-billing - [0:0]"
+            line = line.split(':')[1]
+            line = line.split(' - [', 1)[0]
+        elif line.startswith('['):
+            # it's a rule, for example, "[0:0] -A neutron-billing..."
+            line = line.split('] ', 1)[1]
+        line = line.strip()
+        return line
+
+    seen_chains = set()
+
+    def _weed_out_duplicate_chains(line):
+        # ignore [packet:byte] counts at end of lines
+        if line.startswith(':'):
+            line = _strip_packets_bytes(line)
+            if line in seen_chains:
+                return False
+            else:
+                seen_chains.add(line)
+
+        # Leave it alone
+        return True
+
+    seen_rules = set()
+
+    def _weed_out_duplicate_rules(line):
+        if line.startswith('['):
+            line = _strip_packets_bytes(line)
+            if line in seen_rules:
+                return False
+            else:
+                seen_rules.add(line)
+
+        # Leave it alone
+        return True
+
+    def _weed_out_removes(line):
+        # We need to find exact matches here
+        if line.startswith(':'):
+            line = _strip_packets_bytes(line)
+            for chain in remove_chains:
+                if chain == line:
+                    remove_chains.remove(chain)
+                    return False
+        elif line.startswith('['):
+            line = _strip_packets_bytes(line)
+            for rule in remove_rules:
+                rule_str = _strip_packets_bytes(str(rule))
+                if rule_str == line:
+                    remove_rules.remove(rule)
+                    return False
+
+        # Leave it alone
+        return True
+
+    # We filter duplicates.  Go throught the chains and rules, letting
+    # the *last* occurrence take precendence since it could have a
+    # non-zero [packet:byte] count we want to preserve.  We also filter
+    # out anything in the "remove" list.
+    new_filter.reverse()
+    new_filter = [line for line in new_filter
+                  if _weed_out_duplicate_chains(line) and
+                  _weed_out_duplicate_rules(line) and
+                  _weed_out_removes(line)]
+    new_filter.reverse()
+
+    # flush lists, just in case we didn't find something
+    remove_chains.clear()
+    for rule in remove_rules:
+        remove_rules.remove(rule)
+
+    return new_filter
+
+
+def build_manager(num_rules):
+    manager = iptables_manager.IptablesManager(state_less=True,
+                                               binary_name='bench-agent')
+    table = manager.ipv4['filter']
+    for chain_id in range(max(1, num_rules // RULES_PER_CHAIN)):
+        chain = 'i%08x' % chain_id
+        table.add_chain(chain)
+        table.add_rule('FORWARD', '-m physdev --physdev-out tap%08x '
+                       '-j $%s' % (chain_id, chain))
+        for rule_id in range(RULES_PER_CHAIN):
+            table.add_rule(chain, '-s 10.%d.%d.%d/32 -p tcp --dport %d '
+                           '-j RETURN' % (rule_id % 256, chain_id // 256,
+                                          chain_id % 256, 1024 + rule_id))
+    return manager
+
+
+def render_save(manager):
+    """Render what iptables-save -c prints once our rules are applied."""
+    table = manager.ipv4['filter']
+    lines = ['# Generated by iptables-save v1.4.12', '*filter',
+             ':INPUT ACCEPT [10:1000]', ':FORWARD ACCEPT [20:2000]',
+             ':OUTPUT ACCEPT [30:3000]']
+    lines += [line for line in manager._modify_rules([], table, 'filter')
+              if line.startswith(':') or line.startswith('[')]
+    lines += ['[1:100] -A FORWARD -j ACCEPT', 'COMMIT',
+              '# Completed by iptables-save']
+    # Pretend the kernel counted some packets on every rule.
+    return [('[%d:%d] %s' % (i, i * 100, line.split('] ', 1)[1])
+             if line.startswith('[') else line)
+            for i, line in enumerate(lines)]
+
+
+def normalize(lines):
+    """Reduce a restore payload to its chains and per-chain rule lists."""
+    chains = set()
+    rules = collections.defaultdict(list)
+    for line in lines:
+        if line.startswith(':'):
+            chains.add(line)
+        elif line.startswith('['):
+            rules[line.split()[2]].append(line)
+    return chains, dict(rules)
+
+
+def timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return time.time() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help='comma separated numbers of rules')
+    parser.add_argument('--legacy-max', type=int, default=10000,
+                        help='largest size to run the legacy engine on')
+    args = parser.parse_args()
+
+    print('%10s %12s %12s %10s' % ('rules', 'legacy (s)', 'new (s)',
+                                   'speedup'))
+    for size in [int(s) for s in args.sizes.split(',')]:
+        manager = build_manager(size)
+        table = manager.ipv4['filter']
+        saved = render_save(manager)
+
+        new_time, new_lines = timed(manager._modify_rules, saved, table,
+                                    'filter')
+        if size > args.legacy_max:
+            print('%10d %12s %12.3f %10s' % (size, '-', new_time, '-'))
+            continue
+
+        legacy_time, legacy_lines = timed(legacy_modify_rules, manager,
+                                          saved, table, 'filter')
+        if normalize(new_lines) != normalize(legacy_lines):
+            sys.exit('restore payloads differ for %d rules' % size)
+        print('%10d %12.3f %12.3f %9.1fx' % (size, legacy_time, new_time,
+                                             legacy_time / new_time))
+
+
+if __name__ == '__main__':
+    main()
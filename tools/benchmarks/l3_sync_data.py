@@ -0,0 +1,199 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark of the router sync data sent to the L3 agents.
+
+Creates routers with a gateway on one external network, one interface
+on their own subnet and floating IPs, with the core DB plugin and the L3
+DB mixin.  The sync data of all routers is then built by get_sync_data,
+and by the API getters get_routers, get_ports, get_subnets and
+get_floatingips as get_sync_data used to do.  For each, the time it took
+and the number of SQL statements run are printed.
+
+The database is an in-memory SQLite one by default.  Give the URL of an
+empty database with --connection to measure against MySQL.
+
+Usage: python tools/benchmarks/l3_sync_data.py [--connection sqlite://]
+           [--routers 200] [--floatingips 2] [--repeat 3]
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from oslo.config import cfg  # noqa
+from sqlalchemy.engine import Engine  # noqa
+from sqlalchemy import event  # noqa
+
+from neutron.api.v2 import attributes  # noqa
+from neutron.common import config  # noqa
+from neutron.common import constants  # noqa
+from neutron import context  # noqa
+from neutron.db import db_base_plugin_v2  # noqa
+from neutron.db import external_net_db  # noqa
+from neutron.db import l3_gwmode_db  # noqa
+from neutron.extensions import external_net  # noqa
+from neutron import manager  # noqa
+
+TENANT_ID = 'benchmark'
+
+_statements = [0]
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(conn, cursor, statement, parameters, context,
+                     executemany):
+    # An executemany runs the statement once per set of parameters
+    _statements[0] += len(parameters) if executemany else 1
+
+
+class SyncDataPlugin(db_base_plugin_v2.NeutronDbPluginV2,
+                     external_net_db.External_net_db_mixin,
+                     l3_gwmode_db.L3_NAT_db_mixin):
+
+    supported_extension_aliases = ['external-net', 'router', 'ext-gw-mode']
+
+
+def _create_network(plugin, ctx, name, cidr, external=False):
+    network = plugin.create_network(ctx, {'network': {
+        'name': name, 'admin_state_up': True, 'shared': False,
+        'tenant_id': TENANT_ID}})
+    if external:
+        plugin._process_l3_create(ctx, network, {external_net.EXTERNAL: True})
+    subnet = plugin.create_subnet(ctx, {'subnet': {
+        'name': name, 'network_id': network['id'], 'tenant_id': TENANT_ID,
+        'ip_version': 4, 'cidr': cidr, 'enable_dhcp': False,
+        'gateway_ip': attributes.ATTR_NOT_SPECIFIED,
+        'allocation_pools': attributes.ATTR_NOT_SPECIFIED,
+        'dns_nameservers': attributes.ATTR_NOT_SPECIFIED,
+        'host_routes': attributes.ATTR_NOT_SPECIFIED}})
+    return network['id'], subnet['id']
+
+
+def _create_port(plugin, ctx, network_id, name):
+    return plugin.create_port(ctx, {'port': {
+        'network_id': network_id, 'tenant_id': TENANT_ID, 'name': name,
+        'admin_state_up': True, 'device_id': name,
+        'device_owner': 'compute:nova',
+        'mac_address': attributes.ATTR_NOT_SPECIFIED,
+        'fixed_ips': attributes.ATTR_NOT_SPECIFIED}})
+
+
+def populate(plugin, ctx, routers, floatingips):
+    ext_network_id, ext_subnet_id = _create_network(
+        plugin, ctx, 'external', '172.16.0.0/12', external=True)
+    for i in range(routers):
+        name = 'router-%d' % i
+        router = plugin.create_router(ctx, {'router': {
+            'name': name, 'admin_state_up': True, 'tenant_id': TENANT_ID,
+            'external_gateway_info': {'network_id': ext_network_id}}})
+        network_id, subnet_id = _create_network(
+            plugin, ctx, name, '10.%d.%d.0/24' % (i // 256, i % 256))
+        plugin.add_router_interface(ctx, router['id'],
+                                    {'subnet_id': subnet_id})
+        for j in range(floatingips):
+            port = _create_port(plugin, ctx, network_id,
+                                'vm-%d-%d' % (i, j))
+            plugin.create_floatingip(ctx, {'floatingip': {
+                'floating_network_id': ext_network_id,
+                'tenant_id': TENANT_ID, 'port_id': port['id']}})
+
+
+def _populate_subnets(plugin, ctx, ports):
+    subnet_ports = {}
+    for port in ports:
+        if len(port['fixed_ips']) == 1:
+            subnet_id = port['fixed_ips'][0]['subnet_id']
+            subnet_ports.setdefault(subnet_id, []).append(port)
+    if not subnet_ports:
+        return
+    for subnet in plugin.get_subnets(ctx, {'id': subnet_ports.keys()},
+                                     ['id', 'cidr', 'gateway_ip']):
+        for port in subnet_ports[subnet['id']]:
+            port['subnet'] = subnet
+
+
+def get_sync_data_by_resource(plugin, ctx):
+    """Build the sync data of all routers with the API getters."""
+    routers = plugin.get_routers(ctx)
+    gw_port_ids = [router['gw_port_id'] for router in routers
+                   if router['gw_port_id']]
+    gw_ports = plugin.get_ports(ctx, {'id': gw_port_ids})
+    _populate_subnets(plugin, ctx, gw_ports)
+    routers = plugin._build_routers_list(routers, gw_ports)
+    router_ids = [router['id'] for router in routers]
+    floating_ips = plugin.get_floatingips(ctx, {'router_id': router_ids})
+    interfaces = plugin.get_ports(
+        ctx, {'device_id': router_ids,
+              'device_owner': [constants.DEVICE_OWNER_ROUTER_INTF]})
+    _populate_subnets(plugin, ctx, interfaces)
+    return plugin._process_sync_data(routers, interfaces, floating_ips)
+
+
+def measure(build, repeat):
+    """Return the best time of build and its number of statements."""
+    times = []
+    for i in range(repeat):
+        statements = _statements[0]
+        start = time.time()
+        routers = build()
+        times.append(time.time() - start)
+        statements = _statements[0] - statements
+    return routers, min(times), statements
+
+
+def _by_id(routers):
+    return sorted(routers, key=lambda router: router['id'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--connection', default='sqlite://',
+                        help='SQLAlchemy URL of an empty database')
+    parser.add_argument('--routers', type=int, default=200)
+    parser.add_argument('--floatingips', type=int, default=2,
+                        help='number of floating IPs of each router')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    config.parse([])
+    cfg.CONF.set_override('connection', args.connection, 'database')
+    cfg.CONF.set_override('core_plugin', '__main__.SyncDataPlugin')
+    cfg.CONF.set_override('rpc_backend',
+                          'neutron.openstack.common.rpc.impl_fake')
+    plugin = manager.NeutronManager.get_plugin()
+    ctx = context.get_admin_context()
+    populate(plugin, ctx, args.routers, args.floatingips)
+
+    print('%24s %10s %12s' % ('path', 'time (s)', 'statements'))
+    results = []
+    for name, build in (
+            ('get_sync_data', lambda: plugin.get_sync_data(ctx)),
+            ('API getters', lambda: get_sync_data_by_resource(plugin, ctx))):
+        routers, elapsed, statements = measure(build, args.repeat)
+        results.append(_by_id(routers))
+        print('%24s %10.3f %12d' % (name, elapsed, statements))
+    if results[0] != results[1]:
+        print('The sync data of the two paths differ')
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Startup benchmark of the ML2 plugin with large segmentation ID ranges.
+
+Creates the ML2 plugin with the given type drivers, mechanism drivers
+and VLAN, GRE and VXLAN ranges, as neutron-server does when it starts,
+and prints the time it took, the time spent initializing the type
+drivers, the growth of the peak RSS of the process and the number of
+SQL statements run.  The plugin is then created a second time on the
+same database, as when the server restarts.  Nothing is sent on the
+network, the RPC consumers are not started.
+
+The database is an in-memory SQLite one by default.  Give the URL of an
+empty database with --connection to measure against MySQL.
+
+Usage: python tools/benchmarks/ml2_startup.py [--connection sqlite://]
+           [--type-drivers vlan,gre,vxlan] [--mechanism-drivers openvswitch]
+           [--network-vlan-ranges physnet1:1:4094]
+           [--tunnel-id-ranges 1:100000] [--vni-ranges 1:100000]
+           [--segment-allocator table]
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from oslo.config import cfg  # noqa
+from sqlalchemy.engine import Engine  # noqa
+from sqlalchemy import event  # noqa
+
+from neutron.common import config  # noqa
+# Register the options of the type drivers
+from neutron.plugins.ml2.drivers import segment_ranges  # noqa
+from neutron.plugins.ml2.drivers import type_gre  # noqa
+from neutron.plugins.ml2.drivers import type_vlan  # noqa
+from neutron.plugins.ml2.drivers import type_vxlan  # noqa
+from neutron.plugins.ml2 import plugin  # noqa
+
+_statements = [0]
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(conn, cursor, statement, parameters, context,
+                     executemany):
+    # An executemany runs the statement once per set of parameters
+    _statements[0] += len(parameters) if executemany else 1
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _list(value):
+    return [item for item in value.split(',') if item]
+
+
+def configure(args):
+    config.parse([])
+    cfg.CONF.set_override('connection', args.connection, 'database')
+    cfg.CONF.set_override('type_drivers', _list(args.type_drivers), 'ml2')
+    cfg.CONF.set_override('tenant_network_types',
+                          _list(args.type_drivers), 'ml2')
+    cfg.CONF.set_override('mechanism_drivers',
+                          _list(args.mechanism_drivers), 'ml2')
+    cfg.CONF.set_override('segment_allocator', args.segment_allocator,
+                          'ml2')
+    cfg.CONF.set_override('network_vlan_ranges',
+                          _list(args.network_vlan_ranges), 'ml2_type_vlan')
+    cfg.CONF.set_override('tunnel_id_ranges',
+                          _list(args.tunnel_id_ranges), 'ml2_type_gre')
+    cfg.CONF.set_override('vni_ranges', _list(args.vni_ranges),
+                          'ml2_type_vxlan')
+
+
+def boot():
+    """Return the startup and type drivers times, RSS and statements."""
+    type_initialize = plugin.managers.TypeManager.initialize
+    type_time = []
+
+    def timed_type_initialize(self):
+        start = time.time()
+        type_initialize(self)
+        type_time.append(time.time() - start)
+
+    plugin.managers.TypeManager.initialize = timed_type_initialize
+    try:
+        rss = _peak_rss_mb()
+        statements = _statements[0]
+        start = time.time()
+        plugin.Ml2Plugin()
+        return (time.time() - start, type_time[0], _peak_rss_mb() - rss,
+                _statements[0] - statements)
+    finally:
+        plugin.managers.TypeManager.initialize = type_initialize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--connection', default='sqlite://',
+                        help='SQLAlchemy URL of an empty database')
+    parser.add_argument('--type-drivers', default='vlan,gre,vxlan')
+    parser.add_argument('--mechanism-drivers', default='openvswitch')
+    parser.add_argument('--network-vlan-ranges', default='physnet1:1:4094')
+    parser.add_argument('--tunnel-id-ranges', default='1:100000')
+    parser.add_argument('--vni-ranges', default='1:100000')
+    parser.add_argument('--segment-allocator', default='table',
+                        choices=['table', 'range'])
+    args = parser.parse_args()
+    configure(args)
+
+    print('%8s %12s %14s %14s %12s' % ('boot', 'startup (s)',
+                                       'type init (s)', 'peak RSS +MB',
+                                       'statements'))
+    for name in ('first', 'restart'):
+        print('%8s %12.2f %14.2f %14.1f %12d' % ((name,) + boot()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark of the policy checks of GET /v2.0/ports.
+
+Creates ports with the core DB plugin and the port binding extension,
+whose attributes are admin only in etc/policy.json.  All the ports are
+then listed through the API router as admin and as the tenant owning
+them, with the policy cache disabled and enabled.  For each, the best
+time of a listing and the number of policy checks it ran are printed.
+
+Usage: python tools/benchmarks/policy_ports.py [--ports 5000] [--repeat 3]
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, ROOT)
+
+from oslo.config import cfg  # noqa
+import webob  # noqa
+
+from neutron.api.v2 import attributes  # noqa
+from neutron.api.v2 import router  # noqa
+from neutron.common import config  # noqa
+from neutron import context  # noqa
+from neutron.db import db_base_plugin_v2  # noqa
+from neutron.db import portbindings_base  # noqa
+from neutron.extensions import portbindings  # noqa
+from neutron import manager  # noqa
+from neutron.openstack.common import jsonutils  # noqa
+from neutron.openstack.common import policy as common_policy  # noqa
+from neutron import policy  # noqa
+
+TENANT_ID = 'benchmark'
+
+_checks = [0]
+
+
+class PortsPlugin(db_base_plugin_v2.NeutronDbPluginV2,
+                  portbindings_base.PortBindingBaseMixin):
+
+    supported_extension_aliases = ['binding']
+
+    def __init__(self):
+        super(PortsPlugin, self).__init__()
+        self.base_binding_dict = {
+            portbindings.VIF_TYPE: portbindings.VIF_TYPE_OVS,
+            portbindings.CAPABILITIES: {portbindings.CAP_PORT_FILTER: True}}
+        portbindings_base.register_port_dict_function()
+
+
+def _count_check(func):
+    def check(*args, **kwargs):
+        _checks[0] += 1
+        return func(*args, **kwargs)
+    return check
+
+
+def populate(plugin, ctx, ports):
+    network = plugin.create_network(ctx, {'network': {
+        'name': 'benchmark', 'admin_state_up': True, 'shared': False,
+        'tenant_id': TENANT_ID}})
+    plugin.create_subnet(ctx, {'subnet': {
+        'name': 'benchmark', 'network_id': network['id'],
+        'tenant_id': TENANT_ID, 'ip_version': 4, 'cidr': '10.0.0.0/16',
+        'enable_dhcp': False,
+        'gateway_ip': attributes.ATTR_NOT_SPECIFIED,
+        'allocation_pools': attributes.ATTR_NOT_SPECIFIED,
+        'dns_nameservers': attributes.ATTR_NOT_SPECIFIED,
+        'host_routes': attributes.ATTR_NOT_SPECIFIED}})
+    plugin.create_port_bulk(ctx, {'ports': [{'port': {
+        'network_id': network['id'], 'tenant_id': TENANT_ID,
+        'name': 'port-%d' % i, 'admin_state_up': True,
+        'device_id': 'device-%d' % i, 'device_owner': 'compute:nova',
+        'mac_address': attributes.ATTR_NOT_SPECIFIED,
+        'fixed_ips': attributes.ATTR_NOT_SPECIFIED}} for i in range(ports)]})
+
+
+def measure(api, ctx, repeat):
+    """Return the ports listed, the best time and the policy checks."""
+    times = []
+    for i in range(repeat):
+        checks = _checks[0]
+        request = webob.Request.blank('/ports.json',
+                                      environ={'neutron.context': ctx})
+        start = time.time()
+        response = request.get_response(api)
+        times.append(time.time() - start)
+        checks = _checks[0] - checks
+    if response.status_int != 200:
+        raise Exception(response.body)
+    return jsonutils.loads(response.body)['ports'], min(times), checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--ports', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    config.parse([])
+    cfg.CONF.set_override('connection', 'sqlite://', 'database')
+    cfg.CONF.set_override('core_plugin', '__main__.PortsPlugin')
+    cfg.CONF.set_override('policy_file',
+                          os.path.join(ROOT, 'etc', 'policy.json'))
+    cfg.CONF.set_override('rpc_backend',
+                          'neutron.openstack.common.rpc.impl_fake')
+    # Every policy rule evaluated, whether compiled or not, is counted
+    for check_class in (common_policy.RuleCheck, common_policy.RoleCheck):
+        check_class.__call__ = _count_check(check_class.__call__)
+    plugin = manager.NeutronManager.get_plugin()
+    populate(plugin, context.get_admin_context(), args.ports)
+    api = router.APIRouter()
+
+    print('%8s %8s %10s %10s %8s' % ('context', 'cache', 'time (s)',
+                                     'checks', 'ports'))
+    contexts = (('admin', context.get_admin_context()),
+                ('tenant', context.Context('user', TENANT_ID,
+                                           roles=['member'])))
+    for name, ctx in contexts:
+        results = []
+        for cache in (False, True):
+            cfg.CONF.set_override('policy_cache', cache)
+            policy.reset()
+            ports, elapsed, checks = measure(api, ctx, args.repeat)
+            results.append(ports)
+            print('%8s %8s %10.3f %10d %8d' % (name, cache, elapsed,
+                                               checks, len(ports)))
+        if results[0] != results[1]:
+            print('The ports listed with and without the cache differ')
+            return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark of agent commands run as root, per root helper.
+
+Runs the read-only commands an L3 and a DHCP agent issue while syncing
+their routers and networks through neutron.agent.linux.utils.execute,
+once with a new root helper process per command and once through the
+root helper daemon, and prints the commands per second of each.
+
+Must run on a node where the agent user may run both root helpers, with
+the l3 and dhcp filters installed.
+
+Usage: python tools/benchmarks/rootwrap_daemon.py [--count 200]
+           [--root-helper 'sudo neutron-rootwrap /etc/neutron/rootwrap.conf']
+           [--root-helper-daemon
+            'sudo neutron-rootwrap-daemon /etc/neutron/rootwrap.conf']
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from oslo.config import cfg  # noqa
+
+from neutron.agent.common import config  # noqa
+from neutron.agent.linux import utils  # noqa
+
+WORKLOADS = {
+    'l3': [['ip', 'netns', 'list'],
+           ['ip', '-o', 'link', 'show'],
+           ['ip', 'addr', 'show'],
+           ['ip', 'route', 'list'],
+           ['iptables-save', '-c'],
+           ['ip6tables-save', '-c']],
+    'dhcp': [['ip', 'netns', 'list'],
+             ['ip', '-o', 'link', 'show'],
+             ['ip', 'addr', 'show'],
+             ['ip', 'route', 'list']],
+}
+
+
+def run(workload, count, root_helper):
+    commands = WORKLOADS[workload]
+    start = time.time()
+    for i in range(count):
+        utils.execute(commands[i % len(commands)], root_helper=root_helper,
+                      check_exit_code=False)
+    return count / (time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--count', type=int, default=200,
+                        help='number of commands per run')
+    parser.add_argument('--root-helper',
+                        default='sudo neutron-rootwrap '
+                                '/etc/neutron/rootwrap.conf')
+    parser.add_argument('--root-helper-daemon',
+                        default='sudo neutron-rootwrap-daemon '
+                                '/etc/neutron/rootwrap.conf')
+    args = parser.parse_args()
+
+    config.register_root_helper(cfg.CONF)
+    print('%10s %16s %16s %10s' % ('workload', 'helper (cmd/s)',
+                                   'daemon (cmd/s)', 'speedup'))
+    for workload in sorted(WORKLOADS):
+        cfg.CONF.set_override('root_helper_daemon', None, 'AGENT')
+        helper_rate = run(workload, args.count, args.root_helper)
+        cfg.CONF.set_override('root_helper_daemon', args.root_helper_daemon,
+                              'AGENT')
+        # Leave the daemon startup out of the measure
+        run(workload, 1, args.root_helper)
+        daemon_rate = run(workload, args.count, args.root_helper)
+        print('%10s %16.1f %16.1f %9.1fx' % (workload, helper_rate,
+                                             daemon_rate,
+                                             daemon_rate / helper_rate))
+
+
+if __name__ == '__main__':
+    main()